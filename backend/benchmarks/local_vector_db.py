@@ -0,0 +1,126 @@
+"""
+Compare the embedded "local" vector backend against Chroma.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.local_vector_db --rows 100000 --dim 384
+
+Both clients write into throwaway directories under --path. Reported are insert
+throughput, single-query search latency and throughput, and recall@k against an
+exact float32 search over the same vectors. Vectors are unit-normalized and drawn
+around --clusters centers like real embeddings; uniformly random vectors in high
+dimensions have no meaningful neighbors and make any HNSW graph look bad.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--path", default=tempfile.gettempdir())
+    return parser.parse_args()
+
+
+def make_items(vectors: np.ndarray):
+    return [
+        {
+            "id": f"bench-{idx}",
+            "text": f"chunk {idx}",
+            "vector": vector.tolist(),
+            "metadata": {"file_id": f"file-{idx % 100}"},
+        }
+        for idx, vector in enumerate(vectors)
+    ]
+
+
+def make_vectors(rng, centers: np.ndarray, rows: int) -> np.ndarray:
+    vectors = centers[rng.integers(0, len(centers), rows)]
+    vectors = vectors + 0.5 * rng.normal(size=vectors.shape)
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_neighbors(vectors: np.ndarray, queries: np.ndarray, k: int):
+    scores = queries @ vectors.T
+    return [{f"bench-{idx}" for idx in np.argsort(-row)[:k]} for row in scores]
+
+
+def measure(label, client, items, queries, truth, args):
+    collection_name = "benchmark-local"
+    if client.has_collection(collection_name):
+        client.delete_collection(collection_name)
+
+    start = time.perf_counter()
+    for offset in range(0, len(items), args.batch):
+        client.insert(collection_name, items[offset : offset + args.batch])
+    insert_elapsed = time.perf_counter() - start
+
+    # The first query pays for lazy index builds, keep it out of the latencies
+    client.search(collection_name, [queries[0].tolist()], args.k)
+
+    latencies = []
+    recall = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = client.search(collection_name, [query.tolist()], args.k)
+        latencies.append(time.perf_counter() - start)
+        recall += len(expected & set(result.ids[0])) / args.k
+
+    latencies = np.array(latencies) * 1000
+    print(
+        f"{label:<16} insert {len(items) / insert_elapsed:>9.0f} rows/s  "
+        f"search p50 {np.percentile(latencies, 50):>7.2f}ms "
+        f"p95 {np.percentile(latencies, 95):>7.2f}ms "
+        f"{1000 / latencies.mean():>8.0f} qps  "
+        f"recall@{args.k} {recall / len(queries):.3f}"
+    )
+    client.delete_collection(collection_name)
+
+
+def main():
+    args = parse_args()
+    root = tempfile.mkdtemp(prefix="owui-vector-bench-", dir=args.path)
+    os.environ["DATA_DIR"] = os.environ.get("DATA_DIR", root)
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(args.clusters, args.dim))
+    vectors = make_vectors(rng, centers, args.rows)
+    queries = make_vectors(rng, centers, args.queries)
+    truth = exact_neighbors(vectors, queries, args.k)
+    items = make_items(vectors)
+
+    try:
+        from open_webui.retrieval.vector.dbs import local
+
+        for dtype, threshold in (
+            ("float16", args.rows + 1),
+            ("float16", 0),
+            ("int8", 0),
+        ):
+            local.LOCAL_VECTOR_DB_PATH = os.path.join(root, f"local-{dtype}")
+            local.LOCAL_VECTOR_DB_DTYPE = dtype
+            local.LOCAL_VECTOR_DB_HNSW_THRESHOLD = threshold
+            label = f"local {dtype} {'hnsw' if threshold == 0 else 'exact'}"
+            measure(label, local.LocalClient(), items, queries, truth, args)
+
+        from open_webui.retrieval.vector.dbs import chroma
+
+        chroma.CHROMA_DATA_PATH = os.path.join(root, "chroma")
+        measure("chroma", chroma.ChromaClient(), items, queries, truth, args)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
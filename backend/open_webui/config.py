@@ -698,6 +698,11 @@ AZURE_STORAGE_ENDPOINT = os.environ.get("AZURE_STORAGE_ENDPOINT", None)
 AZURE_STORAGE_CONTAINER_NAME = os.environ.get("AZURE_STORAGE_CONTAINER_NAME", None)
 AZURE_STORAGE_KEY = os.environ.get("AZURE_STORAGE_KEY", None)
 
+# Uploads are copied and sent to remote storage in parts of this many bytes
+STORAGE_UPLOAD_CHUNK_SIZE = int(
+    os.environ.get("STORAGE_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024))
+)
+
 ####################################
 # File Upload DIR
 ####################################
@@ -706,6 +711,22 @@ UPLOAD_DIR = DATA_DIR / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 
+####################################
+# Background Jobs
+####################################
+
+# SQLite database holding queued file processing jobs, shared by all workers on the node
+JOB_QUEUE_DB_PATH = os.environ.get("JOB_QUEUE_DB_PATH", f"{DATA_DIR}/jobs.db")
+# Number of jobs processed concurrently by each worker process
+JOB_QUEUE_CONCURRENCY = int(os.environ.get("JOB_QUEUE_CONCURRENCY", "2"))
+# Seconds without a heartbeat after which a running job is considered abandoned
+JOB_QUEUE_LEASE_TIMEOUT = int(os.environ.get("JOB_QUEUE_LEASE_TIMEOUT", "60"))
+# Times an abandoned job is picked up again before it is marked as failed
+JOB_QUEUE_MAX_ATTEMPTS = int(os.environ.get("JOB_QUEUE_MAX_ATTEMPTS", "3"))
+# Seconds finished jobs are kept for status lookups
+JOB_QUEUE_RETENTION = int(os.environ.get("JOB_QUEUE_RETENTION", str(7 * 24 * 3600)))
+
+
 ####################################
 # Cache DIR
 ####################################
@@ -713,6 +734,24 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 CACHE_DIR = DATA_DIR / "cache"
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+# On-disk cache of files downloaded from S3, GCS or Azure, 0 disables it
+STORAGE_CACHE_DIR = os.environ.get("STORAGE_CACHE_DIR", f"{CACHE_DIR}/storage")
+STORAGE_CACHE_MAX_SIZE = int(
+    os.environ.get("STORAGE_CACHE_MAX_SIZE", str(1024 * 1024 * 1024))
+)
+
+# Synthesized speech is kept until the cache exceeds SPEECH_CACHE_MAX_SIZE bytes
+# (0 disables the cache) or goes unused for SPEECH_CACHE_MAX_AGE seconds (0: no limit)
+SPEECH_CACHE_MAX_SIZE = int(
+    os.environ.get("SPEECH_CACHE_MAX_SIZE", str(512 * 1024 * 1024))
+)
+SPEECH_CACHE_MAX_AGE = int(
+    os.environ.get("SPEECH_CACHE_MAX_AGE", str(30 * 24 * 60 * 60))
+)
+
+# Threads running local (transformers) speech synthesis
+SPEECH_SYNTHESIS_WORKERS = int(os.environ.get("SPEECH_SYNTHESIS_WORKERS", "1"))
+
 
 ####################################
 # DIRECT CONNECTIONS
@@ -782,6 +821,17 @@ OLLAMA_API_CONFIGS = PersistentConfig(
     {},
 )
 
+# Consecutive failures after which a backend stops receiving requests
+OLLAMA_CIRCUIT_BREAKER_THRESHOLD = int(
+    os.environ.get("OLLAMA_CIRCUIT_BREAKER_THRESHOLD", "3")
+)
+# Seconds before an ejected backend is tried again
+OLLAMA_CIRCUIT_BREAKER_COOLDOWN = int(
+    os.environ.get("OLLAMA_CIRCUIT_BREAKER_COOLDOWN", "30")
+)
+# Seconds between refreshes of the models each backend has loaded (/api/ps)
+OLLAMA_LOADED_MODELS_TTL = int(os.environ.get("OLLAMA_LOADED_MODELS_TTL", "10"))
+
 ####################################
 # OPENAI_API
 ####################################
@@ -1510,6 +1560,8 @@ Ensure that the tools are effectively utilized to achieve the highest-quality an
 ####################################
 
 VECTOR_DB = os.environ.get("VECTOR_DB", "chroma")
+# Page size used when reading whole collections (full context mode, BM25)
+VECTOR_DB_ITER_BATCH_SIZE = int(os.environ.get("VECTOR_DB_ITER_BATCH_SIZE", "1000"))
 
 # Chroma
 CHROMA_DATA_PATH = f"{DATA_DIR}/vector_db"
@@ -1534,8 +1586,27 @@ if VECTOR_DB == "chroma":
     else:
         CHROMA_HTTP_HEADERS = None
     CHROMA_HTTP_SSL = os.environ.get("CHROMA_HTTP_SSL", "false").lower() == "true"
+    # Number of collection handles kept in memory
+    CHROMA_COLLECTION_CACHE_SIZE = int(
+        os.environ.get("CHROMA_COLLECTION_CACHE_SIZE", "1024")
+    )
+    # Seconds before the cached list of collection names is refreshed
+    CHROMA_COLLECTION_CACHE_TTL = int(
+        os.environ.get("CHROMA_COLLECTION_CACHE_TTL", "60")
+    )
 # this uses the model defined in the Dockerfile ENV variable. If you dont use docker or docker based deployments such as k8s, the default embedding model will be used (sentence-transformers/all-MiniLM-L6-v2)
 
+# Local (embedded) vector store
+LOCAL_VECTOR_DB_PATH = os.environ.get(
+    "LOCAL_VECTOR_DB_PATH", f"{DATA_DIR}/vector_db/local"
+)
+# Storage type of the memory-mapped vectors, "float16" or "int8"
+LOCAL_VECTOR_DB_DTYPE = os.environ.get("LOCAL_VECTOR_DB_DTYPE", "float16").lower()
+# Collections with at least this many rows are searched through an HNSW graph
+LOCAL_VECTOR_DB_HNSW_THRESHOLD = int(
+    os.environ.get("LOCAL_VECTOR_DB_HNSW_THRESHOLD", "20000")
+)
+
 # Milvus
 
 MILVUS_URI = os.environ.get("MILVUS_URI", f"{DATA_DIR}/vector_db/milvus.db")
@@ -1573,6 +1644,27 @@ if VECTOR_DB == "pgvector" and not PGVECTOR_DB_URL.startswith("postgres"):
 PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH = int(
     os.environ.get("PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH", "1536")
 )
+# One of "auto", "hnsw", "ivfflat" or "none"
+PGVECTOR_INDEX_TYPE = os.environ.get("PGVECTOR_INDEX_TYPE", "auto").lower()
+PGVECTOR_HNSW_M = int(os.environ.get("PGVECTOR_HNSW_M", "16"))
+PGVECTOR_HNSW_EF_CONSTRUCTION = int(
+    os.environ.get("PGVECTOR_HNSW_EF_CONSTRUCTION", "64")
+)
+PGVECTOR_HNSW_EF_SEARCH = int(os.environ.get("PGVECTOR_HNSW_EF_SEARCH", "40"))
+# 0 derives lists/probes from the table size
+PGVECTOR_IVFFLAT_LISTS = int(os.environ.get("PGVECTOR_IVFFLAT_LISTS", "0"))
+PGVECTOR_IVFFLAT_PROBES = int(os.environ.get("PGVECTOR_IVFFLAT_PROBES", "0"))
+# Rebuild an ivfflat index once the ideal list count grows by this factor
+PGVECTOR_INDEX_REBUILD_RATIO = float(
+    os.environ.get("PGVECTOR_INDEX_REBUILD_RATIO", "2.0")
+)
+# Number of hash partitions on collection_name, only applied when the table is created
+PGVECTOR_PARTITIONS = int(os.environ.get("PGVECTOR_PARTITIONS", "0"))
+# Rows per COPY / multi-row INSERT batch on insert and upsert. Batching speeds up
+# writes without an index or with ivfflat; with an hnsw index (the "auto" default
+# on pgvector >= 0.5) each row's graph insertion dominates and bulk writes are
+# about as fast as row-by-row ones.
+PGVECTOR_BULK_BATCH_SIZE = int(os.environ.get("PGVECTOR_BULK_BATCH_SIZE", "1000"))
 
 ####################################
 # Information Retrieval (RAG)
@@ -1727,6 +1819,9 @@ RAG_EMBEDDING_BATCH_SIZE = PersistentConfig(
     ),
 )
 
+# Files of a batch embedded concurrently, e.g. when adding files to a knowledge base
+RAG_FILE_BATCH_CONCURRENCY = int(os.environ.get("RAG_FILE_BATCH_CONCURRENCY", "4"))
+
 RAG_RERANKING_MODEL = PersistentConfig(
     "RAG_RERANKING_MODEL",
     "rag.reranking_model",
@@ -2300,6 +2395,15 @@ WHISPER_MODEL_AUTO_UPDATE = (
     and os.environ.get("WHISPER_MODEL_AUTO_UPDATE", "").lower() == "true"
 )
 
+# Speech found by voice activity detection is transcribed in batches of
+# WHISPER_BATCH_SIZE chunks in parallel. Batching is faster on long audio but
+# can word transcripts differently, so the default of 0 transcribes the audio
+# sequentially, as before
+WHISPER_BATCH_SIZE = max(0, int(os.getenv("WHISPER_BATCH_SIZE", "0")))
+
+# Threads running the local transcription model
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "1"))
+
 # Add Deepgram configuration
 DEEPGRAM_API_KEY = PersistentConfig(
     "DEEPGRAM_API_KEY",
@@ -326,6 +326,38 @@ ENABLE_REALTIME_CHAT_SAVE = (
     os.environ.get("ENABLE_REALTIME_CHAT_SAVE", "False").lower() == "true"
 )
 
+# Streamed message updates are buffered and written at most every
+# CHAT_SAVE_INTERVAL seconds or every CHAT_SAVE_MAX_PENDING updates
+try:
+    CHAT_SAVE_INTERVAL = float(os.environ.get("CHAT_SAVE_INTERVAL", "1"))
+except Exception:
+    CHAT_SAVE_INTERVAL = 1.0
+
+try:
+    CHAT_SAVE_MAX_PENDING = int(os.environ.get("CHAT_SAVE_MAX_PENDING", "100"))
+except Exception:
+    CHAT_SAVE_MAX_PENDING = 100
+
+# Seconds a user's groups and merged permissions are reused across requests,
+# other workers' group changes are seen after at most this long
+try:
+    ACCESS_CONTROL_CACHE_TTL = float(os.environ.get("ACCESS_CONTROL_CACHE_TTL", "5"))
+except Exception:
+    ACCESS_CONTROL_CACHE_TTL = 5.0
+
+# Seconds an authenticated user is reused across requests
+try:
+    AUTH_USER_CACHE_TTL = float(os.environ.get("AUTH_USER_CACHE_TTL", "5"))
+except Exception:
+    AUTH_USER_CACHE_TTL = 5.0
+
+# last_active_at is recorded at most once per USER_LAST_ACTIVE_INTERVAL seconds
+# per user, and the recorded updates are written together
+try:
+    USER_LAST_ACTIVE_INTERVAL = int(os.environ.get("USER_LAST_ACTIVE_INTERVAL", "60"))
+except Exception:
+    USER_LAST_ACTIVE_INTERVAL = 60
+
 ####################################
 # REDIS
 ####################################
@@ -387,6 +419,25 @@ WEBSOCKET_MANAGER = os.environ.get("WEBSOCKET_MANAGER", "")
 WEBSOCKET_REDIS_URL = os.environ.get("WEBSOCKET_REDIS_URL", REDIS_URL)
 WEBSOCKET_REDIS_LOCK_TIMEOUT = os.environ.get("WEBSOCKET_REDIS_LOCK_TIMEOUT", 60)
 
+# Seconds over which streamed completion updates are merged into one event
+try:
+    WEBSOCKET_FRAME_INTERVAL = float(os.environ.get("WEBSOCKET_FRAME_INTERVAL", "0.05"))
+except Exception:
+    WEBSOCKET_FRAME_INTERVAL = 0.05
+
+# Seconds the session, user and usage pools are read from the local cache
+try:
+    WEBSOCKET_POOL_CACHE_TTL = float(os.environ.get("WEBSOCKET_POOL_CACHE_TTL", "1"))
+except Exception:
+    WEBSOCKET_POOL_CACHE_TTL = 1.0
+
+# Let the pools turn on Redis keyspace notifications (CONFIG SET) on the server,
+# otherwise they are only used if the server already has them configured
+ENABLE_WEBSOCKET_REDIS_KEYSPACE_NOTIFICATIONS = (
+    os.environ.get("ENABLE_WEBSOCKET_REDIS_KEYSPACE_NOTIFICATIONS", "False").lower()
+    == "true"
+)
+
 AIOHTTP_CLIENT_TIMEOUT = os.environ.get("AIOHTTP_CLIENT_TIMEOUT", "")
 
 if AIOHTTP_CLIENT_TIMEOUT == "":
@@ -411,6 +462,16 @@ else:
     except Exception:
         AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST = 5
 
+# Connections each worker may open to Ollama at once, 0 for no limit. A streamed
+# response holds its connection until it ends, so a limit makes further chats
+# queue behind the running ones; only set one to protect the backends.
+AIOHTTP_CLIENT_POOL_SIZE = os.environ.get("AIOHTTP_CLIENT_POOL_SIZE", "0")
+
+try:
+    AIOHTTP_CLIENT_POOL_SIZE = max(0, int(AIOHTTP_CLIENT_POOL_SIZE))
+except Exception:
+    AIOHTTP_CLIENT_POOL_SIZE = 0
+
 
 ####################################
 # OFFLINE_MODE
@@ -342,9 +342,12 @@ from open_webui.utils.chat import (
     chat_action as chat_action_handler,
 )
 from open_webui.utils.middleware import process_chat_payload, process_chat_response
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import access_control_scope, has_access
+from open_webui.utils.jobs import JOBS
+from open_webui.utils.message_buffer import MESSAGE_BUFFER
 
 from open_webui.utils.auth import (
+    LAST_ACTIVE,
     get_license_data,
     decode_token,
     get_admin_user,
@@ -353,7 +356,12 @@ from open_webui.utils.auth import (
 from open_webui.utils.oauth import OAuthManager
 from open_webui.utils.security_headers import SecurityHeadersMiddleware
 
-from open_webui.tasks import stop_task, list_tasks  # Import from tasks.py
+from open_webui.tasks import (  # Import from tasks.py
+    TASKS,
+    get_task_entry,
+    list_tasks,
+    stop_task,
+)
 
 
 if SAFE_MODE:
@@ -407,7 +415,14 @@ async def lifespan(app: FastAPI):
         get_license_data(app, LICENSE_KEY)
 
     asyncio.create_task(periodic_usage_pool_cleanup())
+    await JOBS.start(app)
+    await TASKS.start()
     yield
+    await TASKS.stop()
+    await JOBS.stop()
+    await ollama.close_session()
+    MESSAGE_BUFFER.flush_all()
+    LAST_ACTIVE.flush()
 
 
 app = FastAPI(
@@ -827,6 +842,13 @@ async def commit_session_after_request(request: Request, call_next):
     return response
 
 
+@app.middleware("http")
+async def scope_access_control(request: Request, call_next):
+    # Access checks made while handling the request load each user's groups once
+    with access_control_scope():
+        return await call_next(request)
+
+
 @app.middleware("http")
 async def check_url(request: Request, call_next):
     start_time = int(time.time())
@@ -1111,6 +1133,16 @@ async def chat_action(
 
 @app.post("/api/tasks/stop/{task_id}")
 async def stop_task_endpoint(task_id: str, user=Depends(get_verified_user)):
+    # Tasks of other users are reported as missing
+    entry = await get_task_entry(task_id)
+    if entry is None or (
+        user.role != "admin" and entry["metadata"].get("user_id") != user.id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task with ID {task_id} not found.",
+        )
+
     try:
         result = await stop_task(task_id)  # Use the function from tasks.py
         return result
@@ -1120,7 +1152,17 @@ async def stop_task_endpoint(task_id: str, user=Depends(get_verified_user)):
 
 @app.get("/api/tasks")
 async def list_tasks_endpoint(user=Depends(get_verified_user)):
-    return {"tasks": list_tasks()}  # Use the function from tasks.py
+    # The user's own tasks, or all of them for admins
+    tasks = [
+        task
+        for task in await list_tasks()  # Use the function from tasks.py
+        if user.role == "admin" or task["metadata"].get("user_id") == user.id
+    ]
+    return {
+        "tasks": [task["id"] for task in tasks],
+        # Runtime and metadata of the listed tasks
+        "details": tasks,
+    }
 
 
 ##################################
@@ -266,6 +266,35 @@ class ChatTable:
         chat["history"] = history
         return self.update_chat_by_id(id, chat)
 
+    def update_message_by_id_and_message_id(
+        self,
+        id: str,
+        message_id: str,
+        message: dict,
+        status_history: Optional[list[dict]] = None,
+    ) -> Optional[ChatModel]:
+        # Upsert and status updates of a message applied in a single write
+        chat = self.get_chat_by_id(id)
+        if chat is None:
+            return None
+
+        chat = chat.chat
+        history = chat.get("history", {})
+        messages = history.setdefault("messages", {})
+
+        if message:
+            messages[message_id] = {**messages.get(message_id, {}), **message}
+            history["currentId"] = message_id
+
+        if status_history and message_id in messages:
+            messages[message_id]["statusHistory"] = [
+                *messages[message_id].get("statusHistory", []),
+                *status_history,
+            ]
+
+        chat["history"] = history
+        return self.update_chat_by_id(id, chat)
+
     def insert_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
         with get_db() as db:
             # Get the existing chat to share
@@ -1,15 +1,29 @@
+import hashlib
 import logging
+import os
+import threading
 import time
+from contextlib import contextmanager
 from typing import Optional
 
 from open_webui.internal.db import Base, JSONField, get_db
-from open_webui.env import SRC_LOG_LEVELS
+from open_webui.env import DATA_DIR, SRC_LOG_LEVELS
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text, JSON
+from sqlalchemy import BigInteger, Column, String, Text, JSON, text
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
 
+# Lock files shared by the blobs, when the database has no advisory locks
+BLOB_LOCK_DIR = f"{DATA_DIR}/locks"
+BLOB_LOCK_STRIPES = 64
+_blob_thread_locks = [threading.Lock() for _ in range(BLOB_LOCK_STRIPES)]
+
 ####################
 # Files DB Schema
 ####################
@@ -179,6 +193,53 @@ class FilesTable:
                 for file in db.query(File).filter_by(user_id=user_id).all()
             ]
 
+    def get_files_by_path(self, path: str) -> list[FileModel]:
+        # Deduplicated uploads share their stored path
+        with get_db() as db:
+            return [
+                FileModel.model_validate(file)
+                for file in db.query(File)
+                .filter_by(path=path)
+                .order_by(File.created_at)
+                .all()
+            ]
+
+    @contextmanager
+    def lock_blob(self, name: str):
+        """
+        Hold an exclusive lock on the stored blob name across workers, so that
+        recording a file that references it and deleting it once it is no
+        longer referenced cannot interleave.
+        """
+        digest = hashlib.sha256(name.encode()).digest()
+        with get_db() as db:
+            if db.bind.dialect.name == "postgresql":
+                key = int.from_bytes(digest[:8], "big", signed=True)
+                db.execute(text("SELECT pg_advisory_lock(:key)"), {"key": key})
+                try:
+                    yield
+                finally:
+                    db.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                return
+
+        stripe = digest[0] % BLOB_LOCK_STRIPES
+        with _blob_thread_locks[stripe]:
+            if fcntl is None:
+                yield
+                return
+
+            os.makedirs(BLOB_LOCK_DIR, exist_ok=True)
+            with open(f"{BLOB_LOCK_DIR}/blob-{stripe}.lock", "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def count_files_by_path(self, path: str) -> int:
+        with get_db() as db:
+            return db.query(File).filter_by(path=path).count()
+
     def update_file_hash_by_id(self, id: str, hash: str) -> Optional[FileModel]:
         with get_db() as db:
             try:
@@ -211,6 +272,38 @@ class FilesTable:
             except Exception:
                 return None
 
+    def update_files_by_ids(self, updates: dict[str, dict]) -> list[FileModel]:
+        """
+        Update many files in one transaction. Each update may set "hash" and
+        merge into "data" and "meta", like the single-file methods above.
+        """
+        if not updates:
+            return []
+
+        with get_db() as db:
+            try:
+                files = db.query(File).filter(File.id.in_(list(updates.keys()))).all()
+                for file in files:
+                    update = updates[file.id]
+                    if "hash" in update:
+                        file.hash = update["hash"]
+                    if "data" in update:
+                        file.data = {
+                            **(file.data if file.data else {}),
+                            **update["data"],
+                        }
+                    if "meta" in update:
+                        file.meta = {
+                            **(file.meta if file.meta else {}),
+                            **update["meta"],
+                        }
+                db.commit()
+                return [FileModel.model_validate(file) for file in files]
+            except Exception as e:
+                log.exception(f"Error updating files: {e}")
+                db.rollback()
+                return []
+
     def delete_file_by_id(self, id: str) -> bool:
         with get_db() as db:
             try:
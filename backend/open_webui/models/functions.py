@@ -6,7 +6,7 @@ from open_webui.internal.db import Base, JSONField, get_db
 from open_webui.models.users import Users
 from open_webui.env import SRC_LOG_LEVELS
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Boolean, Column, String, Text
+from sqlalchemy import BigInteger, Boolean, Column, String, Text, func
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
@@ -81,6 +81,18 @@ class FunctionValves(BaseModel):
 
 
 class FunctionsTable:
+    def __init__(self):
+        # Writes from this process, for changes within the same second
+        self.writes = 0
+
+    def get_version(self) -> tuple:
+        # Changes whenever a function is added, updated or removed
+        with get_db() as db:
+            count, updated_at = db.query(
+                func.count(Function.id), func.max(Function.updated_at)
+            ).one()
+            return (self.writes, count, updated_at)
+
     def insert_new_function(
         self, user_id: str, type: str, form_data: FunctionForm
     ) -> Optional[FunctionModel]:
@@ -100,6 +112,7 @@ class FunctionsTable:
                 db.add(result)
                 db.commit()
                 db.refresh(result)
+                self.writes += 1
                 if result:
                     return FunctionModel.model_validate(result)
                 else:
@@ -182,6 +195,7 @@ class FunctionsTable:
                 function.valves = valves
                 function.updated_at = int(time.time())
                 db.commit()
+                self.writes += 1
                 db.refresh(function)
                 return self.get_function_by_id(id)
             except Exception:
@@ -242,6 +256,7 @@ class FunctionsTable:
                     }
                 )
                 db.commit()
+                self.writes += 1
                 return self.get_function_by_id(id)
             except Exception:
                 return None
@@ -256,6 +271,7 @@ class FunctionsTable:
                     }
                 )
                 db.commit()
+                self.writes += 1
                 return True
             except Exception:
                 return None
@@ -265,6 +281,7 @@ class FunctionsTable:
             try:
                 db.query(Function).filter_by(id=id).delete()
                 db.commit()
+                self.writes += 1
 
                 return True
             except Exception:
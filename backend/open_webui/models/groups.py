@@ -88,6 +88,10 @@ class GroupUpdateForm(GroupForm):
 
 
 class GroupTable:
+    def __init__(self):
+        # Writes from this process, cached group memberships older than this are stale
+        self.writes = 0
+
     def insert_new_group(
         self, user_id: str, form_data: GroupForm
     ) -> Optional[GroupModel]:
@@ -107,6 +111,7 @@ class GroupTable:
                 db.add(result)
                 db.commit()
                 db.refresh(result)
+                self.writes += 1
                 if result:
                     return GroupModel.model_validate(result)
                 else:
@@ -164,6 +169,7 @@ class GroupTable:
                     }
                 )
                 db.commit()
+                self.writes += 1
                 return self.get_group_by_id(id=id)
         except Exception as e:
             log.exception(e)
@@ -174,6 +180,7 @@ class GroupTable:
             with get_db() as db:
                 db.query(Group).filter_by(id=id).delete()
                 db.commit()
+                self.writes += 1
                 return True
         except Exception:
             return False
@@ -183,6 +190,7 @@ class GroupTable:
             try:
                 db.query(Group).delete()
                 db.commit()
+                self.writes += 1
 
                 return True
             except Exception:
@@ -202,6 +210,7 @@ class GroupTable:
                         }
                     )
                     db.commit()
+                    self.writes += 1
 
                 return True
             except Exception:
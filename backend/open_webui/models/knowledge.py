@@ -1,20 +1,20 @@
 import json
 import logging
 import time
-from typing import Optional
+from typing import Callable, Optional
 import uuid
 
 from open_webui.internal.db import Base, get_db
 from open_webui.env import SRC_LOG_LEVELS
 
-from open_webui.models.files import FileMetadataResponse
+from open_webui.models.files import File, FileMetadataResponse, Files
 from open_webui.models.users import Users, UserResponse
 
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text, JSON
+from sqlalchemy import BigInteger, Column, String, Text, JSON, cast, or_
 
-from open_webui.utils.access_control import has_access
+from open_webui.utils.access_control import get_user_access
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
@@ -126,34 +126,104 @@ class KnowledgeTable:
             except Exception:
                 return None
 
-    def get_knowledge_bases(self) -> list[KnowledgeUserModel]:
+    def get_knowledge_bases(
+        self, skip: Optional[int] = None, limit: Optional[int] = None
+    ) -> list[KnowledgeUserModel]:
         with get_db() as db:
-            knowledge_bases = []
-            for knowledge in (
-                db.query(Knowledge).order_by(Knowledge.updated_at.desc()).all()
-            ):
-                user = Users.get_user_by_id(knowledge.user_id)
-                knowledge_bases.append(
-                    KnowledgeUserModel.model_validate(
-                        {
-                            **KnowledgeModel.model_validate(knowledge).model_dump(),
-                            "user": user.model_dump() if user else None,
-                        }
-                    )
-                )
-            return knowledge_bases
+            query = db.query(Knowledge).order_by(Knowledge.updated_at.desc())
+            if skip:
+                query = query.offset(skip)
+            if limit:
+                query = query.limit(limit)
+            return self._with_users(query.all())
 
     def get_knowledge_bases_by_user_id(
-        self, user_id: str, permission: str = "write"
+        self,
+        user_id: str,
+        permission: str = "write",
+        skip: Optional[int] = None,
+        limit: Optional[int] = None,
     ) -> list[KnowledgeUserModel]:
-        knowledge_bases = self.get_knowledge_bases()
+        # has_access, expressed in SQL so that the database paginates
+        user_ids = Knowledge.access_control[(permission, "user_ids")].as_string()
+        group_ids = Knowledge.access_control[(permission, "group_ids")].as_string()
+        conditions = [Knowledge.user_id == user_id, user_ids.like(f'%"{user_id}"%')]
+        conditions += [
+            group_ids.like(f'%"{group_id}"%')
+            for group_id in get_user_access(user_id).group_ids
+        ]
+        if permission == "read":
+            # Public, stored as SQL NULL or as JSON null
+            conditions += [
+                Knowledge.access_control.is_(None),
+                cast(Knowledge.access_control, String) == "null",
+            ]
+
+        with get_db() as db:
+            query = (
+                db.query(Knowledge)
+                .filter(or_(*conditions))
+                .order_by(Knowledge.updated_at.desc())
+            )
+            if skip:
+                query = query.offset(skip)
+            if limit:
+                query = query.limit(limit)
+            return self._with_users(query.all())
+
+    def _with_users(self, knowledge_bases: list[Knowledge]) -> list[KnowledgeUserModel]:
+        # Load the owners of all knowledge bases in one query
+        users = {
+            user.id: user
+            for user in Users.get_users_by_user_ids(
+                list({knowledge.user_id for knowledge in knowledge_bases})
+            )
+        }
         return [
-            knowledge_base
-            for knowledge_base in knowledge_bases
-            if knowledge_base.user_id == user_id
-            or has_access(user_id, permission, knowledge_base.access_control)
+            KnowledgeUserModel.model_validate(
+                {
+                    **KnowledgeModel.model_validate(knowledge).model_dump(),
+                    "user": (
+                        users[knowledge.user_id].model_dump()
+                        if knowledge.user_id in users
+                        else None
+                    ),
+                }
+            )
+            for knowledge in knowledge_bases
         ]
 
+    def get_knowledge_bases_with_files(
+        self, knowledge_bases: list[KnowledgeUserModel]
+    ) -> list[KnowledgeUserResponse]:
+        """
+        Attach the metadata of their files to the knowledge bases, loading the
+        files of all of them in one query. Ids of deleted files are skipped.
+        """
+        file_ids = {
+            file_id
+            for knowledge_base in knowledge_bases
+            for file_id in (knowledge_base.data or {}).get("file_ids", [])
+        }
+        # Files come back most recently updated first, keep that order per knowledge base
+        files = Files.get_file_metadatas_by_ids(list(file_ids)) if file_ids else []
+        files_by_id = {file.id: (idx, file) for idx, file in enumerate(files)}
+
+        knowledge_with_files = []
+        for knowledge_base in knowledge_bases:
+            knowledge_files = sorted(
+                files_by_id[file_id]
+                for file_id in set((knowledge_base.data or {}).get("file_ids", []))
+                if file_id in files_by_id
+            )
+            knowledge_with_files.append(
+                KnowledgeUserResponse(
+                    **knowledge_base.model_dump(),
+                    files=[file for _, file in knowledge_files],
+                )
+            )
+        return knowledge_with_files
+
     def get_knowledge_by_id(self, id: str) -> Optional[KnowledgeModel]:
         try:
             with get_db() as db:
@@ -198,6 +268,89 @@ class KnowledgeTable:
             log.exception(e)
             return None
 
+    def _update_file_ids_by_id(
+        self, id: str, update: Callable[[list[str]], list[str]], touch: bool = True
+    ) -> Optional[KnowledgeModel]:
+        try:
+            with get_db() as db:
+                # Writing the row first takes its lock (the database write lock on
+                # SQLite) before it is read, so concurrent updates cannot be lost
+                updated_at = int(time.time()) if touch else Knowledge.updated_at
+                if not (
+                    db.query(Knowledge)
+                    .filter_by(id=id)
+                    .update({"updated_at": updated_at})
+                ):
+                    return None
+                knowledge = db.query(Knowledge).filter_by(id=id).first()
+                data = knowledge.data or {}
+                knowledge.data = {
+                    **data,
+                    "file_ids": update(list(data.get("file_ids", []))),
+                }
+                db.commit()
+                db.refresh(knowledge)
+                return KnowledgeModel.model_validate(knowledge)
+        except Exception as e:
+            log.exception(e)
+            return None
+
+    def add_file_ids_by_id(
+        self, id: str, file_ids: list[str]
+    ) -> Optional[KnowledgeModel]:
+        return self._update_file_ids_by_id(
+            id,
+            lambda current: current
+            + [
+                file_id for file_id in dict.fromkeys(file_ids) if file_id not in current
+            ],
+        )
+
+    def remove_file_ids_by_id(
+        self, id: str, file_ids: list[str]
+    ) -> Optional[KnowledgeModel]:
+        return self._update_file_ids_by_id(
+            id, lambda current: [_id for _id in current if _id not in file_ids]
+        )
+
+    def remove_missing_files_by_ids(self, ids: list[str]) -> list[str]:
+        """
+        Drop the ids of deleted files from the knowledge bases, returns the ids
+        of the knowledge bases that were updated. Only the missing ids are removed,
+        under the row lock, so files added in the meantime are kept.
+        """
+        updated_ids = []
+        try:
+            with get_db() as db:
+                file_ids_by_id = {
+                    id: (data or {}).get("file_ids", [])
+                    for id, data in db.query(Knowledge.id, Knowledge.data).filter(
+                        Knowledge.id.in_(ids)
+                    )
+                }
+                file_ids = {
+                    file_id
+                    for knowledge_file_ids in file_ids_by_id.values()
+                    for file_id in knowledge_file_ids
+                }
+                existing_file_ids = {
+                    id for (id,) in db.query(File.id).filter(File.id.in_(file_ids))
+                }
+        except Exception as e:
+            log.exception(e)
+            return updated_ids
+
+        for id, knowledge_file_ids in file_ids_by_id.items():
+            missing_file_ids = set(knowledge_file_ids) - existing_file_ids
+            # Repairing the list is not an edit, the knowledge base keeps its place
+            if missing_file_ids and self._update_file_ids_by_id(
+                id,
+                lambda current: [_id for _id in current if _id not in missing_file_ids],
+                touch=False,
+            ):
+                updated_ids.append(id)
+        return updated_ids
+
     def delete_knowledge_by_id(self, id: str) -> bool:
         try:
             with get_db() as db:
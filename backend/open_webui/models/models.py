@@ -143,6 +143,18 @@ class ModelForm(BaseModel):
 
 
 class ModelsTable:
+    def __init__(self):
+        # Writes from this process, for changes within the same second
+        self.writes = 0
+
+    def get_version(self) -> tuple:
+        # Changes whenever a model is added, updated or removed
+        with get_db() as db:
+            count, updated_at = db.query(
+                func.count(Model.id), func.max(Model.updated_at)
+            ).one()
+            return (self.writes, count, updated_at)
+
     def insert_new_model(
         self, form_data: ModelForm, user_id: str
     ) -> Optional[ModelModel]:
@@ -160,6 +172,7 @@ class ModelsTable:
                 db.add(result)
                 db.commit()
                 db.refresh(result)
+                self.writes += 1
 
                 if result:
                     return ModelModel.model_validate(result)
@@ -226,6 +239,7 @@ class ModelsTable:
                     }
                 )
                 db.commit()
+                self.writes += 1
 
                 return self.get_model_by_id(id)
             except Exception:
@@ -238,9 +252,15 @@ class ModelsTable:
                 result = (
                     db.query(Model)
                     .filter_by(id=id)
-                    .update(model.model_dump(exclude={"id"}))
+                    .update(
+                        {
+                            **model.model_dump(exclude={"id"}),
+                            "updated_at": int(time.time()),
+                        }
+                    )
                 )
                 db.commit()
+                self.writes += 1
 
                 model = db.get(Model, id)
                 db.refresh(model)
@@ -254,6 +274,7 @@ class ModelsTable:
             with get_db() as db:
                 db.query(Model).filter_by(id=id).delete()
                 db.commit()
+                self.writes += 1
 
                 return True
         except Exception:
@@ -264,6 +285,7 @@ class ModelsTable:
             with get_db() as db:
                 db.query(Model).delete()
                 db.commit()
+                self.writes += 1
 
                 return True
         except Exception:
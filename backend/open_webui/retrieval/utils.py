@@ -13,7 +13,7 @@ from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
 
 
-from open_webui.config import VECTOR_DB
+from open_webui.config import VECTOR_DB, VECTOR_DB_ITER_BATCH_SIZE
 from open_webui.retrieval.vector.connector import VECTOR_DB_CLIENT
 from open_webui.utils.misc import get_last_user_message, calculate_sha256_string
 
@@ -109,11 +109,20 @@ def query_doc_with_hybrid_search(
     r: float,
 ) -> dict:
     try:
-        result = VECTOR_DB_CLIENT.get(collection_name=collection_name)
+        # Only texts and metadata are needed for BM25, read them page by page
+        texts = []
+        metadatas = []
+        for page in VECTOR_DB_CLIENT.iter_items(
+            collection_name=collection_name,
+            batch_size=VECTOR_DB_ITER_BATCH_SIZE,
+            fields=("documents", "metadatas"),
+        ):
+            texts.extend(page.documents[0])
+            metadatas.extend(page.metadatas[0])
 
         bm25_retriever = BM25Retriever.from_texts(
-            texts=result.documents[0],
-            metadatas=result.metadatas[0],
+            texts=texts,
+            metadatas=metadatas,
         )
         bm25_retriever.k = k
 
@@ -153,27 +162,6 @@ def query_doc_with_hybrid_search(
         raise e
 
 
-def merge_get_results(get_results: list[dict]) -> dict:
-    # Initialize lists to store combined data
-    combined_documents = []
-    combined_metadatas = []
-    combined_ids = []
-
-    for data in get_results:
-        combined_documents.extend(data["documents"][0])
-        combined_metadatas.extend(data["metadatas"][0])
-        combined_ids.extend(data["ids"][0])
-
-    # Create the output dictionary
-    result = {
-        "documents": [combined_documents],
-        "metadatas": [combined_metadatas],
-        "ids": [combined_ids],
-    }
-
-    return result
-
-
 def merge_and_sort_query_results(
     query_results: list[dict], k: int, reverse: bool = False
 ) -> dict:
@@ -213,20 +201,41 @@ def merge_and_sort_query_results(
 
 
 def get_all_items_from_collections(collection_names: list[str]) -> dict:
-    results = []
+    combined_documents = []
+    combined_metadatas = []
+    combined_ids = []
 
     for collection_name in collection_names:
         if collection_name:
+            documents = []
+            metadatas = []
+            ids = []
             try:
-                result = get_doc(collection_name=collection_name)
-                if result is not None:
-                    results.append(result.model_dump())
+                # Stream pages straight into the combined lists instead of
+                # materializing (and copying) every collection as a whole
+                for page in VECTOR_DB_CLIENT.iter_items(
+                    collection_name=collection_name,
+                    batch_size=VECTOR_DB_ITER_BATCH_SIZE,
+                    fields=("documents", "metadatas"),
+                ):
+                    documents.extend(page.documents[0])
+                    metadatas.extend(page.metadatas[0])
+                    ids.extend(page.ids[0])
             except Exception as e:
                 log.exception(f"Error when querying the collection: {e}")
+                continue
+
+            combined_documents.extend(documents)
+            combined_metadatas.extend(metadatas)
+            combined_ids.extend(ids)
         else:
             pass
 
-    return merge_get_results(results)
+    return {
+        "documents": [combined_documents],
+        "metadatas": [combined_metadatas],
+        "ids": [combined_ids],
+    }
 
 
 def query_collection(
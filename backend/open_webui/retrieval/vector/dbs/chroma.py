@@ -1,11 +1,19 @@
 import chromadb
 import logging
+import threading
+import time
+from collections import OrderedDict
 from chromadb import Settings
 from chromadb.utils.batch_utils import create_batches
 
-from typing import Optional
+from typing import Iterator, Optional
 
-from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
+from open_webui.retrieval.vector.main import (
+    DEFAULT_ITEM_FIELDS,
+    VectorItem,
+    SearchResult,
+    GetResult,
+)
 from open_webui.config import (
     CHROMA_DATA_PATH,
     CHROMA_HTTP_HOST,
@@ -16,6 +24,8 @@ from open_webui.config import (
     CHROMA_DATABASE,
     CHROMA_CLIENT_AUTH_PROVIDER,
     CHROMA_CLIENT_AUTH_CREDENTIALS,
+    CHROMA_COLLECTION_CACHE_SIZE,
+    CHROMA_COLLECTION_CACHE_TTL,
 )
 from open_webui.env import SRC_LOG_LEVELS
 
@@ -54,21 +64,137 @@ class ChromaClient:
                 database=CHROMA_DATABASE,
             )
 
+        # Collection handles and when they were fetched by name, most recently used
+        # last. Handles and the snapshot of all collection names are trusted for
+        # CHROMA_COLLECTION_CACHE_TTL seconds, as other workers may delete collections.
+        self._collections = OrderedDict()
+        self._collection_names = None
+        self._collection_names_loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "refreshes": 0}
+
+    def cache_info(self) -> dict:
+        # Collection cache counters, for monitoring.
+        with self._lock:
+            return {
+                **self._cache_stats,
+                "size": len(self._collections),
+                "names": len(self._collection_names or ()),
+            }
+
+    def _cache_collection(self, collection_name: str, collection):
+        with self._lock:
+            self._collections[collection_name] = (collection, time.monotonic())
+            self._collections.move_to_end(collection_name)
+            while len(self._collections) > CHROMA_COLLECTION_CACHE_SIZE:
+                self._collections.popitem(last=False)
+                self._cache_stats["evictions"] += 1
+            if self._collection_names is not None:
+                self._collection_names.add(collection_name)
+
+    def _invalidate_collection(self, collection_name: str):
+        with self._lock:
+            self._collections.pop(collection_name, None)
+            if self._collection_names is not None:
+                self._collection_names.discard(collection_name)
+
+    def _get_cached_collection(self, collection_name: str):
+        # Must be called with the lock held. Expired handles are dropped.
+        cached = self._collections.get(collection_name)
+        if cached is None:
+            return None
+        collection, fetched_at = cached
+        if time.monotonic() - fetched_at >= CHROMA_COLLECTION_CACHE_TTL:
+            del self._collections[collection_name]
+            return None
+        self._collections.move_to_end(collection_name)
+        return collection
+
+    def _get_collection(self, collection_name: str):
+        # Return the cached handle of an existing collection, fetching it on a miss.
+        with self._lock:
+            collection = self._get_cached_collection(collection_name)
+            if collection is not None:
+                self._cache_stats["hits"] += 1
+                return collection
+            self._cache_stats["misses"] += 1
+
+        collection = self.client.get_collection(name=collection_name)
+        self._cache_collection(collection_name, collection)
+        return collection
+
+    def _get_or_create_collection(self, collection_name: str):
+        with self._lock:
+            collection = self._get_cached_collection(collection_name)
+            if collection is not None:
+                self._cache_stats["hits"] += 1
+                return collection
+            self._cache_stats["misses"] += 1
+
+        collection = self.client.get_or_create_collection(
+            name=collection_name, metadata={"hnsw:space": "cosine"}
+        )
+        self._cache_collection(collection_name, collection)
+        return collection
+
+    def _write(self, collection_name: str, write):
+        # Apply write to the collection, creating it if it does not exist.
+        collection = self._get_or_create_collection(collection_name)
+        try:
+            return write(collection)
+        except Exception as e:
+            # The cached handle may point to a collection deleted elsewhere,
+            # fetch it again and retry once
+            log.warning(f"Retrying write to collection {collection_name}: {e}")
+            self._invalidate_collection(collection_name)
+            return write(self._get_or_create_collection(collection_name))
+
     def has_collection(self, collection_name: str) -> bool:
         # Check if the collection exists based on the collection name.
-        collection_names = self.client.list_collections()
+        with self._lock:
+            if self._get_cached_collection(collection_name) is not None:
+                self._cache_stats["hits"] += 1
+                return True
+            snapshot_fresh = (
+                self._collection_names is not None
+                and time.monotonic() - self._collection_names_loaded_at
+                < CHROMA_COLLECTION_CACHE_TTL
+            )
+            if snapshot_fresh and collection_name in self._collection_names:
+                self._cache_stats["hits"] += 1
+                return True
+            self._cache_stats["misses"] += 1
+
+        if snapshot_fresh:
+            # Only hits are trusted, the collection may have been created since
+            try:
+                collection = self.client.get_collection(name=collection_name)
+            except Exception:
+                return False
+            self._cache_collection(collection_name, collection)
+            return True
+
+        # The name snapshot is reloaded in a single round trip
+        collection_names = set(self.client.list_collections())
+        with self._lock:
+            self._collection_names = collection_names
+            self._collection_names_loaded_at = time.monotonic()
+            self._cache_stats["refreshes"] += 1
         return collection_name in collection_names
 
     def delete_collection(self, collection_name: str):
         # Delete the collection based on the collection name.
-        return self.client.delete_collection(name=collection_name)
+        try:
+            return self.client.delete_collection(name=collection_name)
+        finally:
+            self._invalidate_collection(collection_name)
 
     def search(
         self, collection_name: str, vectors: list[list[float | int]], limit: int
     ) -> Optional[SearchResult]:
         # Search for the nearest neighbor items based on the vectors and return 'limit' number of results.
         try:
-            collection = self.client.get_collection(name=collection_name)
+            collection = self._get_collection(collection_name)
             if collection:
                 result = collection.query(
                     query_embeddings=vectors,
@@ -85,6 +211,8 @@ class ChromaClient:
                 )
             return None
         except Exception as e:
+            # The cached handle may point to a collection deleted elsewhere
+            self._invalidate_collection(collection_name)
             return None
 
     def query(
@@ -92,7 +220,7 @@ class ChromaClient:
     ) -> Optional[GetResult]:
         # Query the items from the collection based on the filter.
         try:
-            collection = self.client.get_collection(name=collection_name)
+            collection = self._get_collection(collection_name)
             if collection:
                 result = collection.get(
                     where=filter,
@@ -108,13 +236,18 @@ class ChromaClient:
                 )
             return None
         except:
+            self._invalidate_collection(collection_name)
             return None
 
     def get(self, collection_name: str) -> Optional[GetResult]:
         # Get all the items in the collection.
-        collection = self.client.get_collection(name=collection_name)
+        collection = self._get_collection(collection_name)
         if collection:
-            result = collection.get()
+            try:
+                result = collection.get()
+            except Exception:
+                self._invalidate_collection(collection_name)
+                raise
             return GetResult(
                 **{
                     "ids": [result["ids"]],
@@ -124,39 +257,77 @@ class ChromaClient:
             )
         return None
 
+    def iter_items(
+        self,
+        collection_name: str,
+        batch_size: int = 1000,
+        fields: tuple[str, ...] = DEFAULT_ITEM_FIELDS,
+    ) -> Iterator[GetResult]:
+        # Page through all the items in the collection, only loading the requested fields.
+        collection = self._get_collection(collection_name)
+        include = [
+            {"vectors": "embeddings"}.get(field, field)
+            for field in fields
+            if field in ("documents", "metadatas", "vectors")
+        ]
+
+        offset = 0
+        while True:
+            try:
+                result = collection.get(
+                    limit=batch_size, offset=offset, include=include
+                )
+            except Exception:
+                self._invalidate_collection(collection_name)
+                raise
+            if not result["ids"]:
+                break
+
+            yield GetResult(
+                ids=[result["ids"]],
+                documents=[result["documents"]] if "documents" in fields else None,
+                metadatas=[result["metadatas"]] if "metadatas" in fields else None,
+                vectors=(
+                    [[list(vector) for vector in result["embeddings"]]]
+                    if "vectors" in fields
+                    else None
+                ),
+            )
+            if len(result["ids"]) < batch_size:
+                break
+            offset += len(result["ids"])
+
     def insert(self, collection_name: str, items: list[VectorItem]):
         # Insert the items into the collection, if the collection does not exist, it will be created.
-        collection = self.client.get_or_create_collection(
-            name=collection_name, metadata={"hnsw:space": "cosine"}
-        )
-
         ids = [item["id"] for item in items]
         documents = [item["text"] for item in items]
         embeddings = [item["vector"] for item in items]
         metadatas = [item["metadata"] for item in items]
 
-        for batch in create_batches(
-            api=self.client,
-            documents=documents,
-            embeddings=embeddings,
-            ids=ids,
-            metadatas=metadatas,
-        ):
-            collection.add(*batch)
+        def add(collection):
+            for batch in create_batches(
+                api=self.client,
+                documents=documents,
+                embeddings=embeddings,
+                ids=ids,
+                metadatas=metadatas,
+            ):
+                collection.add(*batch)
+
+        self._write(collection_name, add)
 
     def upsert(self, collection_name: str, items: list[VectorItem]):
         # Update the items in the collection, if the items are not present, insert them. If the collection does not exist, it will be created.
-        collection = self.client.get_or_create_collection(
-            name=collection_name, metadata={"hnsw:space": "cosine"}
-        )
-
         ids = [item["id"] for item in items]
         documents = [item["text"] for item in items]
         embeddings = [item["vector"] for item in items]
         metadatas = [item["metadata"] for item in items]
 
-        collection.upsert(
-            ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas
+        self._write(
+            collection_name,
+            lambda collection: collection.upsert(
+                ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas
+            ),
         )
 
     def delete(
@@ -166,13 +337,22 @@ class ChromaClient:
         filter: Optional[dict] = None,
     ):
         # Delete the items from the collection based on the ids.
-        collection = self.client.get_collection(name=collection_name)
+        collection = self._get_collection(collection_name)
         if collection:
-            if ids:
-                collection.delete(ids=ids)
-            elif filter:
-                collection.delete(where=filter)
+            try:
+                if ids:
+                    collection.delete(ids=ids)
+                elif filter:
+                    collection.delete(where=filter)
+            except Exception:
+                self._invalidate_collection(collection_name)
+                raise
 
     def reset(self):
         # Resets the database. This will delete all collections and item entries.
-        return self.client.reset()
+        try:
+            return self.client.reset()
+        finally:
+            with self._lock:
+                self._collections.clear()
+                self._collection_names = None
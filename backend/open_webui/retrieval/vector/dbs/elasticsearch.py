@@ -1,8 +1,13 @@
 from elasticsearch import Elasticsearch, BadRequestError
-from typing import Optional
+from typing import Iterator, Optional
 import ssl
 from elasticsearch.helpers import bulk, scan
-from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
+from open_webui.retrieval.vector.main import (
+    DEFAULT_ITEM_FIELDS,
+    VectorItem,
+    SearchResult,
+    GetResult,
+)
 from open_webui.config import (
     ELASTICSEARCH_URL,
     ELASTICSEARCH_CA_CERTS,
@@ -224,6 +229,57 @@ class ElasticsearchClient:
 
         return self._scan_result_to_get_result(results)
 
+    def iter_items(
+        self,
+        collection_name: str,
+        batch_size: int = 1000,
+        fields: tuple[str, ...] = DEFAULT_ITEM_FIELDS,
+    ) -> Iterator[GetResult]:
+        # Scroll through all the items in the collection, only loading the requested fields.
+        sources = [
+            {"documents": "text", "metadatas": "metadata", "vectors": "vector"}[field]
+            for field in fields
+            if field in ("documents", "metadatas", "vectors")
+        ]
+        query = {
+            "query": {"bool": {"filter": [{"term": {"collection": collection_name}}]}},
+            "_source": sources or False,
+        }
+
+        hits = []
+        for hit in scan(
+            self.client,
+            index=f"{self.index_prefix}*",
+            query=query,
+            size=batch_size,
+        ):
+            hits.append(hit)
+            if len(hits) == batch_size:
+                yield self._hits_to_page(hits, fields)
+                hits = []
+        if hits:
+            yield self._hits_to_page(hits, fields)
+
+    def _hits_to_page(self, hits: list, fields: tuple[str, ...]) -> GetResult:
+        return GetResult(
+            ids=[[hit["_id"] for hit in hits]],
+            documents=(
+                [[hit.get("_source", {}).get("text") for hit in hits]]
+                if "documents" in fields
+                else None
+            ),
+            metadatas=(
+                [[hit.get("_source", {}).get("metadata") for hit in hits]]
+                if "metadatas" in fields
+                else None
+            ),
+            vectors=(
+                [[hit.get("_source", {}).get("vector") for hit in hits]]
+                if "vectors" in fields
+                else None
+            ),
+        )
+
     # Status: works
     def insert(self, collection_name: str, items: list[VectorItem]):
         if not self._has_index(dimension=len(items[0]["vector"])):
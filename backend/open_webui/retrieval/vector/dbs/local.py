@@ -0,0 +1,901 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+from open_webui.retrieval.vector.main import (
+    DEFAULT_ITEM_FIELDS,
+    VectorItem,
+    SearchResult,
+    GetResult,
+)
+from open_webui.config import (
+    LOCAL_VECTOR_DB_PATH,
+    LOCAL_VECTOR_DB_DTYPE,
+    LOCAL_VECTOR_DB_HNSW_THRESHOLD,
+)
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+# Vectors are stored unit-normalized, so int8 components are scaled by 127
+INT8_SCALE = 127.0
+# Rows decoded at a time during exact search and index builds
+BLOCK_SIZE = 65536
+# Smallest vector file allocated for a collection, in rows
+MIN_CAPACITY = 1024
+# SQLite limits the number of bound parameters per statement
+SQLITE_MAX_PARAMS = 900
+# Seconds to wait for the write transaction of another process
+SQLITE_BUSY_TIMEOUT = 60
+# Changed rows after which the HNSW graph is saved again and the change log
+# pruned, a tenth of the collection for larger ones
+CHECKPOINT_ROWS = 1024
+
+
+class LocalCollection:
+    """
+    Process-local view of a collection: the memory-mapped vector file, which rows
+    are live, and the HNSW graph once the collection is large enough.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        uid: str,
+        dim: int,
+        dtype: str,
+        count: int,
+        version: int,
+        generation: int,
+    ):
+        self.path = path
+        self.uid = uid
+        self.dim = dim
+        self.dtype = dtype
+        self.count = count
+        self.version = version
+        self.generation = generation
+        self.vectors = None
+        self.live = np.zeros(count, dtype=bool)
+        self.hnsw = None
+        # Set when the graph was built or caught up at a cost worth saving
+        self.checkpoint = False
+
+    @property
+    def vector_file(self) -> str:
+        # Compaction writes the next generation's file next to the current one
+        return os.path.join(self.path, f"vectors.{self.generation}.bin")
+
+    def index_file(self, version: int) -> str:
+        return os.path.join(self.path, f"index.{self.generation}.{version}.hnsw")
+
+    @property
+    def np_dtype(self):
+        return np.int8 if self.dtype == "int8" else np.float16
+
+    def open(self, capacity: int = 0):
+        os.makedirs(self.path, exist_ok=True)
+        row_size = self.dim * np.dtype(self.np_dtype).itemsize
+        size = (
+            os.path.getsize(self.vector_file) if os.path.exists(self.vector_file) else 0
+        )
+        capacity = max(capacity, size // row_size, MIN_CAPACITY)
+        if size < capacity * row_size:
+            with open(self.vector_file, "ab") as f:
+                f.truncate(capacity * row_size)
+        self.vectors = np.memmap(
+            self.vector_file, dtype=self.np_dtype, mode="r+", shape=(capacity, self.dim)
+        )
+
+    def ensure_capacity(self, rows: int):
+        if self.vectors is None or rows > self.vectors.shape[0]:
+            capacity = self.vectors.shape[0] if self.vectors is not None else 0
+            self.vectors = None
+            self.open(max(rows, capacity * 2))
+        if rows > len(self.live):
+            self.live = np.concatenate(
+                [self.live, np.zeros(rows - len(self.live), dtype=bool)]
+            )
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.dtype == "int8":
+            return np.clip(np.rint(vectors * INT8_SCALE), -127, 127).astype(np.int8)
+        return vectors.astype(np.float16)
+
+    def decode(self, start: int, end: int) -> np.ndarray:
+        return self.decode_rows(slice(start, end))
+
+    def decode_rows(self, rows) -> np.ndarray:
+        block = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.dtype == "int8":
+            block /= INT8_SCALE
+        return block
+
+
+def normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LocalClient:
+    """
+    Embedded vector store for single-node deployments, with no external service.
+
+    Each collection keeps its vectors unit-normalized in a memory-mapped float16
+    (or int8) file; ids, documents and metadata live in SQLite, which also
+    evaluates metadata filters. Small collections are scanned exactly with NumPy,
+    larger ones are searched through an HNSW graph (hnswlib, shipped with chromadb).
+    Distances are cosine similarities, higher is better.
+
+    Several processes can share the store. Every write logs the rows it touched
+    under a new collection version, and the other processes apply those rows to
+    their cached view instead of reloading it. Only compaction, which renumbers
+    the rows, starts a new generation that has to be reloaded.
+    """
+
+    def __init__(self):
+        self.path = LOCAL_VECTOR_DB_PATH
+        self.dtype = (
+            LOCAL_VECTOR_DB_DTYPE if LOCAL_VECTOR_DB_DTYPE == "int8" else "float16"
+        )
+        os.makedirs(self.path, exist_ok=True)
+
+        self.db = sqlite3.connect(
+            os.path.join(self.path, "collections.sqlite3"),
+            timeout=SQLITE_BUSY_TIMEOUT,
+            check_same_thread=False,
+        )
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # version counts writes, generation counts compactions. index_version is
+        # the version of the saved HNSW graph, changes up to log_start have been
+        # pruned and unsaved rows were logged since the last save or prune.
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS collections (
+                name TEXT PRIMARY KEY,
+                uid TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                dtype TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                version INTEGER NOT NULL DEFAULT 0,
+                generation INTEGER NOT NULL DEFAULT 0,
+                index_version INTEGER,
+                log_start INTEGER NOT NULL DEFAULT 0,
+                unsaved INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                collection TEXT NOT NULL,
+                id TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                text TEXT,
+                metadata TEXT,
+                PRIMARY KEY (collection, id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_items_row ON items (collection, row);
+            CREATE TABLE IF NOT EXISTS changes (
+                collection TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                row INTEGER NOT NULL,
+                live INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_changes_version ON changes (collection, version);
+            """
+        )
+        self.db.commit()
+
+        self._lock = threading.RLock()
+        self._collections: dict[str, LocalCollection] = {}
+
+        if hnswlib is None:
+            log.warning("hnswlib is not installed, using exact search only.")
+
+    def _collection_path(self, collection_name: str) -> str:
+        digest = hashlib.sha256(collection_name.encode()).hexdigest()
+        return os.path.join(self.path, digest[:2], digest)
+
+    @contextmanager
+    def _write_transaction(self, collection_name: Optional[str] = None):
+        # self._lock only serializes the threads of this process. SQLite's write
+        # lock is taken before the collection is read, so that other processes
+        # cannot claim the same rows until the vector file and count are written.
+        try:
+            with self.db:
+                self.db.execute("BEGIN IMMEDIATE")
+                yield
+        except BaseException:
+            # The cached view may hold changes that were rolled back
+            if collection_name is not None:
+                self._collections.pop(collection_name, None)
+            raise
+
+    @contextmanager
+    def _read_transaction(self):
+        # All reads see one snapshot, so a compaction committed by another process
+        # cannot renumber rows between looking them up and fetching them.
+        self.db.execute("BEGIN")
+        try:
+            yield
+        finally:
+            self.db.rollback()
+
+    def _get_collection(self, collection_name: str) -> Optional[LocalCollection]:
+        # Return the cached view of the collection, catching up on the writes of
+        # other processes since, or reloading it after a compaction.
+        row = self.db.execute(
+            "SELECT uid, dim, dtype, count, version, generation, log_start "
+            "FROM collections WHERE name = ?",
+            (collection_name,),
+        ).fetchone()
+        if row is None:
+            self._collections.pop(collection_name, None)
+            return None
+
+        uid, dim, dtype, count, version, generation, log_start = row
+        collection = self._collections.get(collection_name)
+        if (
+            collection is not None
+            and collection.uid == uid
+            and collection.generation == generation
+            and collection.version >= log_start
+        ):
+            if collection.version != version:
+                self._catch_up(collection_name, collection, count, version)
+            return collection
+
+        collection = LocalCollection(
+            self._collection_path(collection_name),
+            uid,
+            dim,
+            dtype,
+            count,
+            version,
+            generation,
+        )
+        collection.open(count)
+        for (item_row,) in self.db.execute(
+            "SELECT row FROM items WHERE collection = ?", (collection_name,)
+        ):
+            collection.live[item_row] = True
+        self._collections[collection_name] = collection
+        return collection
+
+    def _catch_up(
+        self,
+        collection_name: str,
+        collection: LocalCollection,
+        count: int,
+        version: int,
+    ):
+        written, deleted = self._read_changes(
+            collection_name, collection.version, version
+        )
+        if count > collection.vectors.shape[0]:
+            # Another process grew the vector file, map it again
+            collection.vectors = None
+            collection.open(count)
+        collection.count = count
+        collection.ensure_capacity(count)
+        collection.live[written] = True
+        collection.live[deleted] = False
+        if collection.hnsw is not None:
+            self._add_to_hnsw(collection, written)
+            self._mark_deleted(collection.hnsw, deleted)
+        collection.version = version
+
+    def _read_changes(
+        self, collection_name: str, after: int, upto: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # Rows written and still live, and rows deleted, in (after, upto]. Deleted
+        # rows are never reused within a generation.
+        written, deleted = set(), set()
+        for row, live in self.db.execute(
+            "SELECT row, live FROM changes "
+            "WHERE collection = ? AND version > ? AND version <= ?",
+            (collection_name, after, upto),
+        ):
+            (written if live else deleted).add(row)
+        return (
+            np.asarray(sorted(written - deleted), dtype=np.int64),
+            np.asarray(sorted(deleted), dtype=np.int64),
+        )
+
+    def _log_changes(
+        self,
+        collection_name: str,
+        collection: LocalCollection,
+        rows: list[int],
+        live: bool,
+    ):
+        collection.version += 1
+        self.db.executemany(
+            "INSERT INTO changes (collection, version, row, live) VALUES (?, ?, ?, ?)",
+            [
+                (collection_name, collection.version, int(row), int(live))
+                for row in rows
+            ],
+        )
+        self.db.execute(
+            "UPDATE collections SET count = ?, version = ?, unsaved = unsaved + ? "
+            "WHERE name = ?",
+            (collection.count, collection.version, len(rows), collection_name),
+        )
+
+    def _uses_hnsw(self, collection: LocalCollection) -> bool:
+        return (
+            hnswlib is not None and collection.count >= LOCAL_VECTOR_DB_HNSW_THRESHOLD
+        )
+
+    def _checkpoint_rows(self, collection: LocalCollection) -> int:
+        return max(CHECKPOINT_ROWS, collection.count // 10)
+
+    def _get_hnsw(self, collection_name: str, collection: LocalCollection):
+        # Load the last saved graph and replay the changes made after it, or build
+        # the graph when there is none that can be replayed.
+        if collection.hnsw is not None:
+            return collection.hnsw
+
+        index_version, log_start = self.db.execute(
+            "SELECT index_version, log_start FROM collections WHERE name = ?",
+            (collection_name,),
+        ).fetchone()
+        if index_version is not None and index_version >= log_start:
+            index = hnswlib.Index(space="ip", dim=collection.dim)
+            try:
+                index.load_index(
+                    collection.index_file(index_version),
+                    max_elements=collection.vectors.shape[0],
+                )
+            except RuntimeError as e:
+                log.warning(f"Could not load the saved HNSW index: {e}")
+            else:
+                collection.hnsw = index
+                written, deleted = self._read_changes(
+                    collection_name, index_version, collection.version
+                )
+                self._add_to_hnsw(collection, written)
+                self._mark_deleted(index, deleted)
+                collection.checkpoint = len(written) + len(
+                    deleted
+                ) >= self._checkpoint_rows(collection)
+                return index
+
+        collection.hnsw = self._build_hnsw(collection)
+        collection.checkpoint = True
+        return collection.hnsw
+
+    def _build_hnsw(self, collection: LocalCollection):
+        log.info(f"Building HNSW index over {collection.count} rows.")
+        index = hnswlib.Index(space="ip", dim=collection.dim)
+        index.init_index(
+            max_elements=collection.vectors.shape[0], ef_construction=200, M=16
+        )
+        for start in range(0, collection.count, BLOCK_SIZE):
+            end = min(start + BLOCK_SIZE, collection.count)
+            index.add_items(collection.decode(start, end), np.arange(start, end))
+        for dead_row in np.flatnonzero(~collection.live[: collection.count]):
+            index.mark_deleted(int(dead_row))
+        return index
+
+    def _add_to_hnsw(self, collection: LocalCollection, rows, vectors=None):
+        # Existing labels are updated in place, new rows are appended
+        if len(rows) == 0:
+            return
+        if collection.vectors.shape[0] > collection.hnsw.get_max_elements():
+            collection.hnsw.resize_index(collection.vectors.shape[0])
+        collection.hnsw.add_items(
+            vectors if vectors is not None else collection.decode_rows(rows), rows
+        )
+
+    def _mark_deleted(self, index, rows):
+        for row in rows:
+            try:
+                index.mark_deleted(int(row))
+            except RuntimeError:
+                # Written and deleted since the graph was saved, it never made it in
+                pass
+
+    def _checkpoint(self, collection_name: str, collection: LocalCollection):
+        # Runs inside a write transaction. Once enough rows changed, the graph is
+        # saved and the change log pruned up to the previous save, so that other
+        # processes load the graph and replay a bounded log instead of rebuilding.
+        checkpoint, collection.checkpoint = collection.checkpoint, False
+        index_version, log_start, unsaved = self.db.execute(
+            "SELECT index_version, log_start, unsaved FROM collections WHERE name = ?",
+            (collection_name,),
+        ).fetchone()
+        if not checkpoint and unsaved < self._checkpoint_rows(collection):
+            return
+
+        if not self._uses_hnsw(collection) or (
+            collection.hnsw is None and index_version is None
+        ):
+            # No graph to replay the log onto, processes that fall behind the
+            # pruned log reload the live rows instead
+            self.db.execute(
+                "DELETE FROM changes WHERE collection = ?", (collection_name,)
+            )
+            self.db.execute(
+                "UPDATE collections SET log_start = version, unsaved = 0 WHERE name = ?",
+                (collection_name,),
+            )
+            return
+
+        index = self._get_hnsw(collection_name, collection)
+        collection.checkpoint = False
+        index_file = collection.index_file(collection.version)
+        index.save_index(index_file + ".tmp")
+        os.replace(index_file + ".tmp", index_file)
+
+        log_start = max(log_start, index_version or 0)
+        self.db.execute(
+            "DELETE FROM changes WHERE collection = ? AND version <= ?",
+            (collection_name, log_start),
+        )
+        self.db.execute(
+            "UPDATE collections SET index_version = ?, log_start = ?, unsaved = 0 "
+            "WHERE name = ?",
+            (collection.version, log_start, collection_name),
+        )
+        self._remove_stale_files(collection, log_start)
+
+    def _persist(self, collection_name: str):
+        # Save a graph that was built during a read, under the write lock
+        try:
+            with self._write_transaction(collection_name):
+                collection = self._get_collection(collection_name)
+                if collection is not None:
+                    self._checkpoint(collection_name, collection)
+        except Exception as e:
+            log.warning(f"Could not save the HNSW index of {collection_name}: {e}")
+
+    def _remove_stale_files(self, collection: LocalCollection, log_start: int):
+        # Files are never overwritten in place: a process that has not caught up
+        # may still open the previous generation, or a graph it can replay from.
+        for filename in os.listdir(collection.path):
+            parts = filename.split(".")
+            try:
+                generation = int(parts[1])
+                version = int(parts[2]) if parts[0] == "index" else None
+            except (IndexError, ValueError):
+                continue
+            if generation < collection.generation - 1 or (
+                generation == collection.generation
+                and version is not None
+                and version < log_start
+            ):
+                try:
+                    os.remove(os.path.join(collection.path, filename))
+                except FileNotFoundError:
+                    pass
+
+    def _search_rows(
+        self,
+        collection_name: str,
+        collection: LocalCollection,
+        queries: np.ndarray,
+        k: int,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # Return the top k rows and their similarities for each query.
+        if self._uses_hnsw(collection):
+            index = self._get_hnsw(collection_name, collection)
+            index.set_ef(max(64, k))
+            rows, distances = index.knn_query(queries, k=k)
+            return rows, 1.0 - distances
+
+        scores = np.empty((len(queries), collection.count), dtype=np.float32)
+        for start in range(0, collection.count, BLOCK_SIZE):
+            end = min(start + BLOCK_SIZE, collection.count)
+            scores[:, start:end] = queries @ collection.decode(start, end).T
+        scores[:, ~collection.live[: collection.count]] = -np.inf
+
+        rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(scores, rows, axis=1)
+        order = np.argsort(-top, axis=1)
+        return np.take_along_axis(rows, order, axis=1), np.take_along_axis(
+            top, order, axis=1
+        )
+
+    def _fetch_rows(self, collection_name: str, rows: list[int]) -> dict:
+        items = {}
+        for start in range(0, len(rows), SQLITE_MAX_PARAMS):
+            chunk = rows[start : start + SQLITE_MAX_PARAMS]
+            for row, id, text, metadata in self.db.execute(
+                "SELECT row, id, text, metadata FROM items "
+                f"WHERE collection = ? AND row IN ({','.join('?' * len(chunk))})",
+                (collection_name, *chunk),
+            ):
+                items[row] = (id, text, json.loads(metadata) if metadata else None)
+        return items
+
+    def _find_rows(self, collection_name: str, ids: list[str]) -> dict:
+        rows = {}
+        for start in range(0, len(ids), SQLITE_MAX_PARAMS):
+            chunk = ids[start : start + SQLITE_MAX_PARAMS]
+            for id, row in self.db.execute(
+                "SELECT id, row FROM items "
+                f"WHERE collection = ? AND id IN ({','.join('?' * len(chunk))})",
+                (collection_name, *chunk),
+            ):
+                rows[id] = row
+        return rows
+
+    def _filter_clause(self, filter: Optional[dict]) -> tuple[str, list]:
+        clause = ""
+        params = []
+        for key, value in (filter or {}).items():
+            clause += " AND json_extract(metadata, ?) = ?"
+            params.extend([f'$."{key}"', value])
+        return clause, params
+
+    def has_collection(self, collection_name: str) -> bool:
+        # Check if the collection exists based on the collection name.
+        with self._lock:
+            return (
+                self.db.execute(
+                    "SELECT 1 FROM collections WHERE name = ?", (collection_name,)
+                ).fetchone()
+                is not None
+            )
+
+    def delete_collection(self, collection_name: str):
+        # Delete the collection based on the collection name.
+        with self._lock:
+            with self._write_transaction(collection_name):
+                self.db.execute(
+                    "DELETE FROM items WHERE collection = ?", (collection_name,)
+                )
+                self.db.execute(
+                    "DELETE FROM changes WHERE collection = ?", (collection_name,)
+                )
+                self.db.execute(
+                    "DELETE FROM collections WHERE name = ?", (collection_name,)
+                )
+            collection = self._collections.pop(collection_name, None)
+            if collection is not None:
+                collection.vectors = None
+            shutil.rmtree(self._collection_path(collection_name), ignore_errors=True)
+
+    def search(
+        self, collection_name: str, vectors: list[list[float | int]], limit: int
+    ) -> Optional[SearchResult]:
+        # Search for the nearest neighbor items based on the vectors and return 'limit' number of results.
+        try:
+            with self._lock:
+                with self._read_transaction():
+                    collection = self._get_collection(collection_name)
+                    if collection is None:
+                        return None
+
+                    live = int(collection.live[: collection.count].sum())
+                    k = min(limit, live) if limit is not None else live
+                    if k == 0:
+                        return SearchResult(
+                            ids=[[] for _ in vectors],
+                            distances=[[] for _ in vectors],
+                            documents=[[] for _ in vectors],
+                            metadatas=[[] for _ in vectors],
+                        )
+
+                    rows, scores = self._search_rows(
+                        collection_name, collection, normalize(vectors), k
+                    )
+                    items = self._fetch_rows(
+                        collection_name, sorted({int(row) for row in rows.flatten()})
+                    )
+                if collection.checkpoint:
+                    self._persist(collection_name)
+
+            ids, distances, documents, metadatas = [], [], [], []
+            for query_rows, query_scores in zip(rows, scores):
+                matches = [
+                    (items[int(row)], float(score))
+                    for row, score in zip(query_rows, query_scores)
+                    if int(row) in items
+                ]
+                ids.append([item[0] for item, _ in matches])
+                documents.append([item[1] for item, _ in matches])
+                metadatas.append([item[2] for item, _ in matches])
+                distances.append([score for _, score in matches])
+
+            return SearchResult(
+                ids=ids, distances=distances, documents=documents, metadatas=metadatas
+            )
+        except Exception as e:
+            log.exception(f"Error searching collection {collection_name}: {e}")
+            return None
+
+    def query(
+        self, collection_name: str, filter: dict, limit: Optional[int] = None
+    ) -> Optional[GetResult]:
+        # Query the items from the collection based on the filter.
+        with self._lock:
+            with self._read_transaction():
+                if not self.has_collection(collection_name):
+                    return None
+
+                clause, params = self._filter_clause(filter)
+                sql = (
+                    "SELECT id, text, metadata FROM items WHERE collection = ?"
+                    f"{clause} ORDER BY row"
+                )
+                if limit is not None:
+                    sql += f" LIMIT {int(limit)}"
+                rows = self.db.execute(sql, (collection_name, *params)).fetchall()
+
+        return GetResult(
+            ids=[[row[0] for row in rows]],
+            documents=[[row[1] for row in rows]],
+            metadatas=[[json.loads(row[2]) if row[2] else None for row in rows]],
+        )
+
+    def get(self, collection_name: str) -> Optional[GetResult]:
+        # Get all the items in the collection.
+        return self.query(collection_name, filter={})
+
+    def iter_items(
+        self,
+        collection_name: str,
+        batch_size: int = 1000,
+        fields: tuple[str, ...] = DEFAULT_ITEM_FIELDS,
+    ) -> Iterator[GetResult]:
+        # Page through all the items in the collection, only loading the requested fields.
+        # Pages are keyed on ids, which unlike rows survive compaction between pages.
+        # Vectors come back unit-normalized in storage precision.
+        last_id = None
+        while True:
+            with self._lock:
+                with self._read_transaction():
+                    collection = self._get_collection(collection_name)
+                    if collection is None:
+                        return
+                    sql = (
+                        "SELECT row, id, text, metadata FROM items WHERE collection = ?"
+                    )
+                    params = [collection_name]
+                    if last_id is not None:
+                        sql += " AND id > ?"
+                        params.append(last_id)
+                    rows = self.db.execute(
+                        f"{sql} ORDER BY id LIMIT ?", (*params, batch_size)
+                    ).fetchall()
+                    if not rows:
+                        return
+                    vectors = (
+                        collection.decode_rows([row[0] for row in rows]).tolist()
+                        if "vectors" in fields
+                        else None
+                    )
+
+            yield GetResult(
+                ids=[[row[1] for row in rows]],
+                documents=[[row[2] for row in rows]] if "documents" in fields else None,
+                metadatas=(
+                    [[json.loads(row[3]) if row[3] else None for row in rows]]
+                    if "metadatas" in fields
+                    else None
+                ),
+                vectors=[vectors] if vectors is not None else None,
+            )
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][1]
+
+    def _write(self, collection_name: str, items: list[VectorItem], upsert: bool):
+        # Last occurrence of an id wins, like repeated upserts would
+        items = list({item["id"]: item for item in items}.values())
+        if not items:
+            return
+
+        with self._lock:
+            with self._write_transaction(collection_name):
+                collection = self._get_collection(collection_name)
+                if collection is None:
+                    self.db.execute(
+                        "INSERT INTO collections (name, uid, dim, dtype) "
+                        "VALUES (?, ?, ?, ?)",
+                        (
+                            collection_name,
+                            uuid.uuid4().hex,
+                            len(items[0]["vector"]),
+                            self.dtype,
+                        ),
+                    )
+                    collection = self._get_collection(collection_name)
+
+                existing = self._find_rows(
+                    collection_name, [item["id"] for item in items]
+                )
+                if not upsert:
+                    # Like Chroma's add, ids that already exist are left untouched
+                    items = [item for item in items if item["id"] not in existing]
+                    if not items:
+                        return
+
+                vectors = normalize([item["vector"] for item in items])
+                if vectors.shape[1] != collection.dim:
+                    raise ValueError(
+                        f"Vector dimension {vectors.shape[1]} does not match "
+                        f"collection dimension {collection.dim}"
+                    )
+
+                rows = []
+                for item in items:
+                    if item["id"] in existing:
+                        rows.append(existing[item["id"]])
+                    else:
+                        rows.append(collection.count)
+                        collection.count += 1
+                rows = np.asarray(rows)
+
+                collection.ensure_capacity(collection.count)
+                collection.vectors[rows] = collection.encode(vectors)
+                collection.vectors.flush()
+                collection.live[rows] = True
+
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO items (collection, id, row, text, metadata) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (
+                            collection_name,
+                            item["id"],
+                            int(row),
+                            item["text"],
+                            json.dumps(item["metadata"]),
+                        )
+                        for item, row in zip(items, rows)
+                    ],
+                )
+                self._log_changes(collection_name, collection, rows, live=True)
+
+                if collection.hnsw is not None:
+                    self._add_to_hnsw(collection, rows, vectors)
+                self._checkpoint(collection_name, collection)
+
+    def insert(self, collection_name: str, items: list[VectorItem]):
+        # Insert the items into the collection, if the collection does not exist, it will be created.
+        self._write(collection_name, items, upsert=False)
+
+    def upsert(self, collection_name: str, items: list[VectorItem]):
+        # Update the items in the collection, if the items are not present, insert them. If the collection does not exist, it will be created.
+        self._write(collection_name, items, upsert=True)
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+    ):
+        # Delete the items from the collection based on the ids.
+        with self._lock:
+            with self._write_transaction(collection_name):
+                collection = self._get_collection(collection_name)
+                if collection is None:
+                    return
+
+                if ids:
+                    rows = list(self._find_rows(collection_name, ids).values())
+                elif filter:
+                    clause, params = self._filter_clause(filter)
+                    rows = [
+                        row
+                        for (row,) in self.db.execute(
+                            f"SELECT row FROM items WHERE collection = ?{clause}",
+                            (collection_name, *params),
+                        )
+                    ]
+                else:
+                    return
+                if not rows:
+                    return
+
+                for start in range(0, len(rows), SQLITE_MAX_PARAMS):
+                    chunk = rows[start : start + SQLITE_MAX_PARAMS]
+                    self.db.execute(
+                        "DELETE FROM items "
+                        f"WHERE collection = ? AND row IN ({','.join('?' * len(chunk))})",
+                        (collection_name, *chunk),
+                    )
+                collection.live[rows] = False
+                if collection.hnsw is not None:
+                    self._mark_deleted(collection.hnsw, rows)
+                self._log_changes(collection_name, collection, rows, live=False)
+
+                # Reclaim the space of deleted rows once they are the majority
+                live = int(collection.live[: collection.count].sum())
+                if collection.count >= MIN_CAPACITY and live < collection.count // 2:
+                    self._compact(collection_name, collection)
+                else:
+                    self._checkpoint(collection_name, collection)
+
+    def _compact(self, collection_name: str, collection: LocalCollection):
+        # Copy the live rows into the next generation's vector file, renumbering
+        # them in order. Runs inside the caller's transaction: the new file only
+        # becomes the collection's when it commits, and the current one is left
+        # in place for the processes that are still reading it.
+        old_rows = np.flatnonzero(collection.live[: collection.count])
+        log.info(
+            f"Compacting collection {collection_name}: "
+            f"{collection.count} -> {len(old_rows)} rows."
+        )
+
+        compacted = LocalCollection(
+            collection.path,
+            collection.uid,
+            collection.dim,
+            collection.dtype,
+            len(old_rows),
+            collection.version + 1,
+            collection.generation + 1,
+        )
+        capacity = max(len(old_rows), MIN_CAPACITY)
+        vectors = np.memmap(
+            compacted.vector_file,
+            dtype=compacted.np_dtype,
+            mode="w+",
+            shape=(capacity, compacted.dim),
+        )
+        for start in range(0, len(old_rows), BLOCK_SIZE):
+            block = old_rows[start : start + BLOCK_SIZE]
+            vectors[start : start + len(block)] = collection.vectors[block]
+        vectors.flush()
+        del vectors
+
+        self.db.executemany(
+            "UPDATE items SET row = ? WHERE collection = ? AND row = ?",
+            [
+                (new_row, collection_name, int(old_row))
+                for new_row, old_row in enumerate(old_rows)
+            ],
+        )
+        self.db.execute("DELETE FROM changes WHERE collection = ?", (collection_name,))
+        self.db.execute(
+            "UPDATE collections SET count = ?, version = ?, generation = ?, "
+            "index_version = NULL, log_start = ?, unsaved = 0 WHERE name = ?",
+            (
+                compacted.count,
+                compacted.version,
+                compacted.generation,
+                compacted.version,
+                collection_name,
+            ),
+        )
+
+        compacted.open(compacted.count)
+        compacted.live[:] = True
+        self._collections[collection_name] = compacted
+        self._remove_stale_files(compacted, compacted.version)
+
+    def reset(self):
+        # Resets the database. This will delete all collections and item entries.
+        with self._lock:
+            with self._write_transaction():
+                self.db.execute("DELETE FROM items")
+                self.db.execute("DELETE FROM changes")
+                self.db.execute("DELETE FROM collections")
+            for collection in self._collections.values():
+                collection.vectors = None
+            self._collections.clear()
+            for entry in os.listdir(self.path):
+                entry_path = os.path.join(self.path, entry)
+                if os.path.isdir(entry_path):
+                    shutil.rmtree(entry_path, ignore_errors=True)
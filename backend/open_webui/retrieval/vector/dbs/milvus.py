@@ -2,9 +2,14 @@ from pymilvus import MilvusClient as Client
 from pymilvus import FieldSchema, DataType
 import json
 import logging
-from typing import Optional
+from typing import Iterator, Optional
 
-from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
+from open_webui.retrieval.vector.main import (
+    DEFAULT_ITEM_FIELDS,
+    VectorItem,
+    SearchResult,
+    GetResult,
+)
 from open_webui.config import (
     MILVUS_URI,
     MILVUS_DB,
@@ -216,6 +221,59 @@ class MilvusClient:
         )
         return self._result_to_get_result([result])
 
+    def iter_items(
+        self,
+        collection_name: str,
+        batch_size: int = 1000,
+        fields: tuple[str, ...] = DEFAULT_ITEM_FIELDS,
+    ) -> Iterator[GetResult]:
+        # Page through all the items in the collection, only loading the requested fields.
+        # Pages are keyed on the primary key, offset + limit is capped at 16384 in Milvus.
+        collection_name = collection_name.replace("-", "_")
+        output_fields = ["id"]
+        if "documents" in fields:
+            output_fields.append("data")
+        if "metadatas" in fields:
+            output_fields.append("metadata")
+        if "vectors" in fields:
+            output_fields.append("vector")
+
+        last_id = None
+        while True:
+            results = self.client.query(
+                collection_name=f"{self.collection_prefix}_{collection_name}",
+                filter=(
+                    f"id > {json.dumps(last_id)}" if last_id is not None else 'id != ""'
+                ),
+                output_fields=output_fields,
+                limit=batch_size,
+            )
+            if not results:
+                break
+
+            results = sorted(results, key=lambda item: item.get("id"))
+            yield GetResult(
+                ids=[[item.get("id") for item in results]],
+                documents=(
+                    [[item.get("data", {}).get("text") for item in results]]
+                    if "documents" in fields
+                    else None
+                ),
+                metadatas=(
+                    [[item.get("metadata") for item in results]]
+                    if "metadatas" in fields
+                    else None
+                ),
+                vectors=(
+                    [[list(item.get("vector")) for item in results]]
+                    if "vectors" in fields
+                    else None
+                ),
+            )
+            if len(results) < batch_size:
+                break
+            last_id = results[-1].get("id")
+
     def insert(self, collection_name: str, items: list[VectorItem]):
         # Insert the items into the collection, if the collection does not exist, it will be created.
         collection_name = collection_name.replace("-", "_")
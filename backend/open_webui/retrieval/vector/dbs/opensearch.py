@@ -1,7 +1,13 @@
 from opensearchpy import OpenSearch
-from typing import Optional
-
-from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
+from opensearchpy.helpers import scan
+from typing import Iterator, Optional
+
+from open_webui.retrieval.vector.main import (
+    DEFAULT_ITEM_FIELDS,
+    VectorItem,
+    SearchResult,
+    GetResult,
+)
 from open_webui.config import (
     OPENSEARCH_URI,
     OPENSEARCH_SSL,
@@ -157,6 +163,54 @@ class OpenSearchClient:
         )
         return self._result_to_get_result(result)
 
+    def iter_items(
+        self,
+        collection_name: str,
+        batch_size: int = 1000,
+        fields: tuple[str, ...] = DEFAULT_ITEM_FIELDS,
+    ) -> Iterator[GetResult]:
+        # Scroll through all the items in the index, only loading the requested fields.
+        sources = [
+            {"documents": "text", "metadatas": "metadata", "vectors": "vector"}[field]
+            for field in fields
+            if field in ("documents", "metadatas", "vectors")
+        ]
+        query = {"query": {"match_all": {}}, "_source": sources or False}
+
+        hits = []
+        for hit in scan(
+            self.client,
+            index=f"{self.index_prefix}_{collection_name}",
+            query=query,
+            size=batch_size,
+        ):
+            hits.append(hit)
+            if len(hits) == batch_size:
+                yield self._hits_to_page(hits, fields)
+                hits = []
+        if hits:
+            yield self._hits_to_page(hits, fields)
+
+    def _hits_to_page(self, hits: list, fields: tuple[str, ...]) -> GetResult:
+        return GetResult(
+            ids=[[hit["_id"] for hit in hits]],
+            documents=(
+                [[hit["_source"].get("text") for hit in hits]]
+                if "documents" in fields
+                else None
+            ),
+            metadatas=(
+                [[hit["_source"].get("metadata") for hit in hits]]
+                if "metadatas" in fields
+                else None
+            ),
+            vectors=(
+                [[hit["_source"].get("vector") for hit in hits]]
+                if "vectors" in fields
+                else None
+            ),
+        )
+
     def insert(self, collection_name: str, items: list[VectorItem]):
         self._create_index_if_not_exists(
             collection_name=collection_name, dimension=len(items[0]["vector"])
@@ -1,5 +1,13 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+import io
+import json
 import logging
+import math
+import struct
+import threading
+import uuid
+
+import numpy as np
 from sqlalchemy import (
     cast,
     column,
@@ -17,17 +25,44 @@ from sqlalchemy.sql import true
 from sqlalchemy.pool import NullPool
 
 from sqlalchemy.orm import declarative_base, scoped_session, sessionmaker
-from sqlalchemy.dialects.postgresql import JSONB, array
+from sqlalchemy.dialects.postgresql import JSONB, array, insert as pg_insert
 from pgvector.sqlalchemy import Vector
 from sqlalchemy.ext.mutable import MutableDict
 from sqlalchemy.exc import NoSuchTableError
 
-from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
-from open_webui.config import PGVECTOR_DB_URL, PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH
+from open_webui.retrieval.vector.main import (
+    DEFAULT_ITEM_FIELDS,
+    VectorItem,
+    SearchResult,
+    GetResult,
+)
+from open_webui.config import (
+    PGVECTOR_DB_URL,
+    PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH,
+    PGVECTOR_INDEX_TYPE,
+    PGVECTOR_HNSW_M,
+    PGVECTOR_HNSW_EF_CONSTRUCTION,
+    PGVECTOR_HNSW_EF_SEARCH,
+    PGVECTOR_IVFFLAT_LISTS,
+    PGVECTOR_IVFFLAT_PROBES,
+    PGVECTOR_INDEX_REBUILD_RATIO,
+    PGVECTOR_PARTITIONS,
+    PGVECTOR_BULK_BATCH_SIZE,
+)
 
 from open_webui.env import SRC_LOG_LEVELS
 
 VECTOR_LENGTH = PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH
+VECTOR_INDEX_NAME = "idx_document_chunk_vector"
+# pgvector cannot build hnsw or ivfflat indexes above this dimension
+MAX_INDEX_DIMENSIONS = 2000
+# Upper bound enforced by pgvector for hnsw.ef_search
+MAX_HNSW_EF_SEARCH = 1000
+
+# Binary COPY framing, see https://www.postgresql.org/docs/current/sql-copy.html
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_TRAILER = struct.pack(">h", -1)
+COPY_COLUMNS = ("id", "vector", "collection_name", "text", "vmetadata")
 Base = declarative_base()
 
 log = logging.getLogger(__name__)
@@ -39,7 +74,8 @@ class DocumentChunk(Base):
 
     id = Column(Text, primary_key=True)
     vector = Column(Vector(dim=VECTOR_LENGTH), nullable=True)
-    collection_name = Column(Text, nullable=False)
+    # The partition key has to be part of the primary key of a partitioned table
+    collection_name = Column(Text, nullable=False, primary_key=PGVECTOR_PARTITIONS > 0)
     text = Column(Text, nullable=True)
     vmetadata = Column(MutableDict.as_mutable(JSONB), nullable=True)
 
@@ -61,39 +97,439 @@ class PgvectorClient:
             )
             self.session = scoped_session(SessionLocal)
 
+        self.engine = self.session.get_bind()
+        self.pgvector_version = (0, 0, 0)
+        self.partitioned = False
+        self.primary_key = ["id"]
+        self.index_type = None
+        self.index_lists = None
+        self._index_lock = threading.Lock()
+        self._rows_at_index_check = 0
+        self._rows_since_index_check = 0
+
         try:
             # Ensure the pgvector extension is available
             self.session.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
+            self.pgvector_version = self.get_pgvector_version()
 
             # Check vector length consistency
             self.check_vector_length()
 
+            if PGVECTOR_PARTITIONS > 0:
+                self.create_partitioned_table()
+
             # Create the tables if they do not exist
             # Base.metadata.create_all requires a bind (engine or connection)
             # Get the connection from the session
             connection = self.session.connection()
             Base.metadata.create_all(bind=connection)
 
-            # Create an index on the vector column if it doesn't exist
             self.session.execute(
                 text(
-                    "CREATE INDEX IF NOT EXISTS idx_document_chunk_vector "
-                    "ON document_chunk USING ivfflat (vector vector_cosine_ops) WITH (lists = 100);"
+                    "CREATE INDEX IF NOT EXISTS idx_document_chunk_collection_name "
+                    "ON document_chunk (collection_name);"
                 )
             )
+            # Keyset pagination over a collection in iter_items
             self.session.execute(
                 text(
-                    "CREATE INDEX IF NOT EXISTS idx_document_chunk_collection_name "
-                    "ON document_chunk (collection_name);"
+                    "CREATE INDEX IF NOT EXISTS idx_document_chunk_collection_name_id "
+                    "ON document_chunk (collection_name, id);"
                 )
             )
+            self.partitioned = self.get_table_kind() == "p"
+            self.primary_key = self.get_primary_key()
             self.session.commit()
-            log.info("Initialization complete.")
         except Exception as e:
             self.session.rollback()
             log.exception(f"Error during initialization: {e}")
             raise
 
+        # Create (or rebuild) the vector index outside of the session transaction,
+        # so that it can be built concurrently without locking out writers
+        self.ensure_vector_index()
+        log.info("Initialization complete.")
+
+    def get_pgvector_version(self) -> Tuple[int, ...]:
+        version = self.session.execute(
+            text("SELECT extversion FROM pg_extension WHERE extname = 'vector';")
+        ).scalar()
+        try:
+            return tuple(int(part) for part in version.split("."))
+        except (AttributeError, ValueError):
+            return (0, 0, 0)
+
+    def get_table_kind(self) -> Optional[str]:
+        # "r" for a plain table, "p" for a partitioned one, None if missing
+        return self.session.execute(
+            text("SELECT relkind FROM pg_class WHERE relname = 'document_chunk';")
+        ).scalar()
+
+    def get_primary_key(self) -> List[str]:
+        # Tables created before the partition key joined the primary key only use id
+        return list(
+            self.session.execute(
+                text(
+                    "SELECT a.attname FROM pg_index i "
+                    "JOIN pg_attribute a ON a.attrelid = i.indrelid "
+                    "AND a.attnum = ANY(i.indkey) "
+                    "WHERE i.indrelid = 'document_chunk'::regclass AND i.indisprimary "
+                    "ORDER BY array_position(i.indkey::smallint[], a.attnum);"
+                )
+            ).scalars()
+        )
+
+    def create_partitioned_table(self) -> None:
+        """
+        Create the 'document_chunk' table hash-partitioned on collection_name, so that
+        per-collection searches only scan (and index) their own partition.
+        Existing unpartitioned tables are left untouched.
+        """
+        relkind = self.get_table_kind()
+        if relkind is not None:
+            if relkind != "p":
+                log.warning(
+                    "PGVECTOR_PARTITIONS is set but 'document_chunk' already exists unpartitioned. "
+                    "Partitioning only applies to newly created tables."
+                )
+            return
+
+        # The partition key has to be part of the primary key
+        self.session.execute(
+            text(
+                "CREATE TABLE document_chunk ("
+                f"id TEXT NOT NULL, vector vector({VECTOR_LENGTH}), "
+                "collection_name TEXT NOT NULL, text TEXT, vmetadata JSONB, "
+                "PRIMARY KEY (id, collection_name)"
+                ") PARTITION BY HASH (collection_name);"
+            )
+        )
+        for remainder in range(PGVECTOR_PARTITIONS):
+            self.session.execute(
+                text(
+                    f"CREATE TABLE document_chunk_p{remainder} PARTITION OF document_chunk "
+                    f"FOR VALUES WITH (MODULUS {PGVECTOR_PARTITIONS}, REMAINDER {remainder});"
+                )
+            )
+        log.info(
+            f"Created 'document_chunk' with {PGVECTOR_PARTITIONS} hash partitions on collection_name."
+        )
+
+    def get_row_count(self) -> int:
+        with self.engine.connect() as conn:
+            # Table statistics are cheap and good enough to size the index. reltuples
+            # is only refreshed by (auto)analyze, n_live_tup follows recent inserts.
+            row_count = conn.execute(
+                text(
+                    "SELECT GREATEST("
+                    "COALESCE(SUM(GREATEST(c.reltuples, 0)), 0), "
+                    "COALESCE(SUM(s.n_live_tup), 0))::bigint "
+                    "FROM pg_class c "
+                    "LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid "
+                    "WHERE c.oid = 'document_chunk'::regclass "
+                    "OR c.oid IN (SELECT inhrelid FROM pg_inherits "
+                    "WHERE inhparent = 'document_chunk'::regclass);"
+                )
+            ).scalar()
+            if not row_count:
+                # No statistics collected yet
+                row_count = conn.execute(
+                    text("SELECT count(*) FROM document_chunk;")
+                ).scalar()
+        return int(row_count or 0)
+
+    def get_partition_row_counts(self) -> Dict[str, int]:
+        """Estimated row count of each partition of a partitioned 'document_chunk'."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT c.relname, GREATEST("
+                    "GREATEST(c.reltuples, 0), COALESCE(s.n_live_tup, 0))::bigint "
+                    "FROM pg_inherits i "
+                    "JOIN pg_class c ON c.oid = i.inhrelid "
+                    "LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid "
+                    "WHERE i.inhparent = 'document_chunk'::regclass ORDER BY c.relname;"
+                )
+            ).all()
+            row_counts = {}
+            for partition, row_count in rows:
+                if not row_count:
+                    # No statistics collected yet
+                    row_count = conn.execute(
+                        text(f"SELECT count(*) FROM {partition};")
+                    ).scalar()
+                row_counts[partition] = int(row_count or 0)
+        return row_counts
+
+    def get_index_type(self) -> Optional[str]:
+        """
+        Resolve PGVECTOR_INDEX_TYPE against what the installed pgvector supports.
+        Returns None if the vector column should not be indexed.
+        """
+        if PGVECTOR_INDEX_TYPE == "none":
+            return None
+        if VECTOR_LENGTH > MAX_INDEX_DIMENSIONS:
+            log.warning(
+                f"VECTOR_LENGTH {VECTOR_LENGTH} exceeds {MAX_INDEX_DIMENSIONS} dimensions, "
+                "the vector column will not be indexed."
+            )
+            return None
+        if PGVECTOR_INDEX_TYPE == "ivfflat":
+            return "ivfflat"
+
+        hnsw_supported = self.pgvector_version >= (0, 5, 0)
+        if PGVECTOR_INDEX_TYPE == "hnsw" and not hnsw_supported:
+            log.warning(
+                "HNSW indexes require pgvector >= 0.5.0, using ivfflat instead."
+            )
+        elif PGVECTOR_INDEX_TYPE not in ("auto", "hnsw"):
+            log.warning(
+                f"Unknown PGVECTOR_INDEX_TYPE '{PGVECTOR_INDEX_TYPE}', using auto."
+            )
+        return "hnsw" if hnsw_supported else "ivfflat"
+
+    @staticmethod
+    def get_ivfflat_lists(row_count: int) -> int:
+        if PGVECTOR_IVFFLAT_LISTS > 0:
+            return PGVECTOR_IVFFLAT_LISTS
+        # pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond that
+        if row_count <= 1_000_000:
+            return max(1, row_count // 1000)
+        return int(math.sqrt(row_count))
+
+    def get_vector_index(self) -> Optional[Tuple[str, Optional[int]]]:
+        """Return the access method and ivfflat list count of the current vector index."""
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                text(
+                    "SELECT am.amname, c.reloptions FROM pg_class c "
+                    "JOIN pg_am am ON am.oid = c.relam WHERE c.relname = :name;"
+                ),
+                {"name": VECTOR_INDEX_NAME},
+            ).first()
+        if row is None:
+            return None
+
+        lists = None
+        for option in row.reloptions or []:
+            key, _, value = option.partition("=")
+            if key == "lists":
+                lists = int(value)
+        return row.amname, lists
+
+    def get_vector_index_ddl(
+        self,
+        index_type: str,
+        name: str,
+        lists: Optional[int],
+        concurrently: bool,
+        table: str = "document_chunk",
+    ) -> str:
+        if index_type == "hnsw":
+            method = "hnsw"
+            options = f"m = {PGVECTOR_HNSW_M}, ef_construction = {PGVECTOR_HNSW_EF_CONSTRUCTION}"
+        else:
+            method = "ivfflat"
+            options = f"lists = {lists}"
+        return (
+            f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}{name} "
+            f"ON {table} USING {method} (vector vector_cosine_ops) WITH ({options});"
+        )
+
+    def ensure_vector_index(self) -> None:
+        """
+        Create the vector index if it is missing, and rebuild it when the configured
+        index type changed or an ivfflat index has outgrown its list count.
+        """
+        # Only one build at a time, later triggers are simply dropped
+        if not self._index_lock.acquire(blocking=False):
+            return
+        try:
+            row_count = self.get_row_count()
+            self._rows_at_index_check = row_count
+            self._rows_since_index_check = 0
+
+            index_type = self.get_index_type()
+            current = self.get_vector_index()
+            if index_type is None:
+                self.index_type, self.index_lists = current or (None, None)
+                return
+
+            partition_rows = (
+                self.get_partition_row_counts() if self.partitioned else None
+            )
+            if index_type != "ivfflat":
+                lists = None
+            elif self.partitioned:
+                # Every partition gets its own index sized to its rows, the
+                # largest one decides when the index has to be rebuilt
+                lists = self.get_ivfflat_lists(max(partition_rows.values(), default=0))
+            else:
+                lists = self.get_ivfflat_lists(row_count)
+            if current is not None:
+                current_type, current_lists = current
+                if current_type == index_type and (
+                    index_type != "ivfflat"
+                    or PGVECTOR_IVFFLAT_LISTS > 0
+                    or lists < (current_lists or 1) * PGVECTOR_INDEX_REBUILD_RATIO
+                ):
+                    self.index_type, self.index_lists = current
+                    return
+                log.info(
+                    f"Rebuilding vector index: {current_type} (lists={current_lists}) -> "
+                    f"{index_type} (lists={lists}) for {row_count} rows."
+                )
+            else:
+                log.info(f"Creating {index_type} vector index for {row_count} rows.")
+
+            self.build_vector_index(index_type, lists, partition_rows)
+            self.index_type, self.index_lists = index_type, lists
+        except Exception as e:
+            log.exception(f"Error managing the vector index: {e}")
+        finally:
+            self._index_lock.release()
+
+    def build_vector_index(
+        self,
+        index_type: str,
+        lists: Optional[int],
+        partition_rows: Optional[Dict[str, int]] = None,
+    ) -> None:
+        if self.partitioned:
+            self.build_partitioned_vector_index(index_type, lists, partition_rows)
+            return
+
+        # Build the replacement next to the live index, then swap them, so that
+        # searches and inserts keep working while the index is being built
+        new_name = f"{VECTOR_INDEX_NAME}_new"
+        with self.engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as conn:
+            # Leftover (invalid) index from an interrupted build
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {new_name};"))
+            conn.execute(
+                text(
+                    self.get_vector_index_ddl(
+                        index_type, new_name, lists, concurrently=True
+                    )
+                )
+            )
+            conn.execute(
+                text(f"DROP INDEX CONCURRENTLY IF EXISTS {VECTOR_INDEX_NAME};")
+            )
+            conn.execute(text(f"ALTER INDEX {new_name} RENAME TO {VECTOR_INDEX_NAME};"))
+
+    def build_partitioned_vector_index(
+        self, index_type: str, lists: Optional[int], partition_rows: Dict[str, int]
+    ) -> None:
+        """
+        CONCURRENTLY is not supported on partitioned tables. The replacement is
+        created ON ONLY the parent, which does not build anything, and each
+        partition's index is built concurrently and attached to it. The parent
+        index becomes valid once every partition has one, and is then swapped
+        with the live index.
+
+        ivfflat partition indexes are sized to their own partition's rows; the
+        parent carries the largest list count, which the rebuild check reads.
+        """
+        new_name = f"{VECTOR_INDEX_NAME}_new"
+        suffix = uuid.uuid4().hex[:8]
+        with self.engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as conn:
+            # Leftovers from an interrupted build, partition indexes that were
+            # never attached are not dropped along with the parent
+            conn.execute(text(f"DROP INDEX IF EXISTS {new_name};"))
+            for leftover in (
+                conn.execute(
+                    text(
+                        "SELECT c.relname FROM pg_class c "
+                        "JOIN pg_index x ON x.indexrelid = c.oid "
+                        "JOIN pg_inherits p ON p.inhrelid = x.indrelid "
+                        "WHERE p.inhparent = 'document_chunk'::regclass "
+                        "AND c.relname LIKE :pattern "
+                        "AND NOT EXISTS (SELECT 1 FROM pg_inherits a WHERE a.inhrelid = c.oid);"
+                    ),
+                    {"pattern": f"{VECTOR_INDEX_NAME}\\_%"},
+                )
+                .scalars()
+                .all()
+            ):
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {leftover};"))
+
+            conn.execute(
+                text(
+                    self.get_vector_index_ddl(
+                        index_type,
+                        new_name,
+                        lists,
+                        concurrently=False,
+                        table="ONLY document_chunk",
+                    )
+                )
+            )
+            for partition, row_count in partition_rows.items():
+                # Partition index names stay unique across rebuilds, they keep
+                # their name when the parent index is renamed
+                partition_index = f"{VECTOR_INDEX_NAME}_{suffix}_{partition}"
+                conn.execute(
+                    text(
+                        self.get_vector_index_ddl(
+                            index_type,
+                            partition_index,
+                            (
+                                self.get_ivfflat_lists(row_count)
+                                if index_type == "ivfflat"
+                                else None
+                            ),
+                            concurrently=True,
+                            table=partition,
+                        )
+                    )
+                )
+                conn.execute(
+                    text(f"ALTER INDEX {new_name} ATTACH PARTITION {partition_index};")
+                )
+
+            # Dropping the old index only holds the partitions' locks briefly
+            conn.execute(text(f"DROP INDEX IF EXISTS {VECTOR_INDEX_NAME};"))
+            conn.execute(text(f"ALTER INDEX {new_name} RENAME TO {VECTOR_INDEX_NAME};"))
+
+    def track_index_growth(self, row_count: int) -> None:
+        """
+        Schedule a background index check once the table grew by ~10% since the
+        last one. Only ivfflat indexes degrade with growth; hnsw grows incrementally.
+        """
+        if self.index_type != "ivfflat" or PGVECTOR_IVFFLAT_LISTS > 0:
+            return
+        self._rows_since_index_check += row_count
+        if self._rows_since_index_check < max(1000, self._rows_at_index_check // 10):
+            return
+        self._rows_since_index_check = 0
+        threading.Thread(target=self.ensure_vector_index, daemon=True).start()
+
+    def set_search_params(self, limit: Optional[int]) -> None:
+        """Tune the vector index scan for the current transaction."""
+        if self.index_type == "hnsw":
+            ef_search = min(
+                max(PGVECTOR_HNSW_EF_SEARCH, limit or 0), MAX_HNSW_EF_SEARCH
+            )
+            self.session.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)};"))
+            if self.pgvector_version >= (0, 8, 0):
+                # Keep walking the graph until enough rows of the collection are found
+                self.session.execute(
+                    text("SET LOCAL hnsw.iterative_scan = relaxed_order;")
+                )
+        elif self.index_type == "ivfflat":
+            probes = PGVECTOR_IVFFLAT_PROBES or max(
+                1, int(math.sqrt(self.index_lists or 1))
+            )
+            self.session.execute(text(f"SET LOCAL ivfflat.probes = {int(probes)};"))
+            if self.pgvector_version >= (0, 8, 0):
+                self.session.execute(
+                    text("SET LOCAL ivfflat.iterative_scan = relaxed_order;")
+                )
+
     def check_vector_length(self) -> None:
         """
         Check if the VECTOR_LENGTH matches the existing vector column dimension in the database.
@@ -141,24 +577,156 @@ class PgvectorClient:
             )
         return vector
 
-    def insert(self, collection_name: str, items: List[VectorItem]) -> None:
+    def encode_vectors(self, items: List[VectorItem]) -> np.ndarray:
+        """
+        Pad all vectors of a batch to VECTOR_LENGTH at once, as big-endian float4
+        (the wire format of pgvector's binary protocol).
+        """
+        vectors = np.zeros((len(items), VECTOR_LENGTH), dtype=">f4")
+        for idx, item in enumerate(items):
+            vector = item["vector"]
+            if len(vector) > VECTOR_LENGTH:
+                raise Exception(
+                    f"Vector length {len(vector)} not supported. Max length must be <= {VECTOR_LENGTH}"
+                )
+            vectors[idx, : len(vector)] = vector
+        return vectors
+
+    def encode_copy_batch(
+        self, collection_name: str, items: List[VectorItem]
+    ) -> io.BytesIO:
+        buffer = io.BytesIO()
+        buffer.write(COPY_HEADER)
+
+        vector_header = struct.pack(">hh", VECTOR_LENGTH, 0)
+        vector_size = struct.pack(">i", len(vector_header) + VECTOR_LENGTH * 4)
+        collection = collection_name.encode("utf-8")
+        collection_field = struct.pack(">i", len(collection)) + collection
+
+        def encode_text(value: Optional[str]) -> bytes:
+            if value is None:
+                return struct.pack(">i", -1)
+            data = value.encode("utf-8")
+            return struct.pack(">i", len(data)) + data
+
+        for item, vector in zip(items, self.encode_vectors(items)):
+            buffer.write(struct.pack(">h", len(COPY_COLUMNS)))
+            buffer.write(encode_text(item["id"]))
+            buffer.write(vector_size + vector_header + vector.tobytes())
+            buffer.write(collection_field)
+            buffer.write(encode_text(item["text"]))
+            if item["metadata"] is None:
+                buffer.write(struct.pack(">i", -1))
+            else:
+                # jsonb binary format: a version byte followed by the JSON text
+                metadata = b"\x01" + json.dumps(item["metadata"]).encode("utf-8")
+                buffer.write(struct.pack(">i", len(metadata)) + metadata)
+
+        buffer.write(COPY_TRAILER)
+        buffer.seek(0)
+        return buffer
+
+    def get_conflict_target(self) -> List[str]:
+        # Partitioned tables must include the partition key in the primary key,
+        # unpartitioned tables keep the primary key they were created with
+        return self.primary_key
+
+    def copy_batch(
+        self, collection_name: str, items: List[VectorItem], upsert: bool
+    ) -> None:
+        """
+        Stream a batch through binary COPY. Upserts are copied into a temporary
+        staging table and merged with a single INSERT ... ON CONFLICT DO UPDATE.
+        """
+        columns = ", ".join(COPY_COLUMNS)
+        cursor = self.session.connection().connection.cursor()
         try:
-            new_items = []
-            for item in items:
-                vector = self.adjust_vector_length(item["vector"])
-                new_chunk = DocumentChunk(
-                    id=item["id"],
-                    vector=vector,
-                    collection_name=collection_name,
-                    text=item["text"],
-                    vmetadata=item["metadata"],
+            if not upsert:
+                cursor.copy_expert(
+                    f"COPY document_chunk ({columns}) FROM STDIN WITH (FORMAT binary)",
+                    self.encode_copy_batch(collection_name, items),
                 )
-                new_items.append(new_chunk)
-            self.session.bulk_save_objects(new_items)
+                return
+
+            cursor.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS document_chunk_staging "
+                "(LIKE document_chunk INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+            )
+            cursor.copy_expert(
+                f"COPY document_chunk_staging ({columns}) FROM STDIN WITH (FORMAT binary)",
+                self.encode_copy_batch(collection_name, items),
+            )
+            updates = ", ".join(
+                f"{name} = EXCLUDED.{name}"
+                for name in COPY_COLUMNS
+                if name not in self.get_conflict_target()
+            )
+            cursor.execute(
+                f"INSERT INTO document_chunk ({columns}) "
+                f"SELECT {columns} FROM document_chunk_staging "
+                f"ON CONFLICT ({', '.join(self.get_conflict_target())}) DO UPDATE SET {updates}"
+            )
+            cursor.execute("TRUNCATE document_chunk_staging")
+        finally:
+            cursor.close()
+
+    def execute_batch(
+        self, collection_name: str, items: List[VectorItem], upsert: bool
+    ) -> None:
+        """Multi-row INSERT fallback for drivers without COPY support."""
+        rows = [
+            {
+                "id": item["id"],
+                "vector": vector,
+                "collection_name": collection_name,
+                "text": item["text"],
+                "vmetadata": item["metadata"],
+            }
+            for item, vector in zip(items, self.encode_vectors(items))
+        ]
+        stmt = pg_insert(DocumentChunk)
+        if upsert:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=self.get_conflict_target(),
+                set_={
+                    name: stmt.excluded[name]
+                    for name in COPY_COLUMNS
+                    if name not in self.get_conflict_target()
+                },
+            )
+        self.session.execute(stmt, rows)
+
+    def write_items(
+        self, collection_name: str, items: List[VectorItem], upsert: bool
+    ) -> None:
+        """
+        Write items in batches of PGVECTOR_BULK_BATCH_SIZE. This removes the
+        per-row round trips, but not the per-row hnsw graph insertion, which
+        bounds write throughput when the vector column has an hnsw index. The
+        index is kept in place rather than dropped for large batches, since the
+        table (and its index) is shared by every collection's searches.
+        """
+        if upsert:
+            # ON CONFLICT cannot touch the same row twice in one statement, the
+            # last occurrence wins like it would with row-by-row upserts
+            items = list({item["id"]: item for item in items}.values())
+
+        use_copy = self.engine.dialect.driver == "psycopg2"
+        for start in range(0, len(items), PGVECTOR_BULK_BATCH_SIZE):
+            batch = items[start : start + PGVECTOR_BULK_BATCH_SIZE]
+            if use_copy:
+                self.copy_batch(collection_name, batch, upsert)
+            else:
+                self.execute_batch(collection_name, batch, upsert)
+
+    def insert(self, collection_name: str, items: List[VectorItem]) -> None:
+        try:
+            self.write_items(collection_name, items, upsert=False)
             self.session.commit()
             log.info(
-                f"Inserted {len(new_items)} items into collection '{collection_name}'."
+                f"Inserted {len(items)} items into collection '{collection_name}'."
             )
+            self.track_index_growth(len(items))
         except Exception as e:
             self.session.rollback()
             log.exception(f"Error during insert: {e}")
@@ -166,33 +734,12 @@ class PgvectorClient:
 
     def upsert(self, collection_name: str, items: List[VectorItem]) -> None:
         try:
-            for item in items:
-                vector = self.adjust_vector_length(item["vector"])
-                existing = (
-                    self.session.query(DocumentChunk)
-                    .filter(DocumentChunk.id == item["id"])
-                    .first()
-                )
-                if existing:
-                    existing.vector = vector
-                    existing.text = item["text"]
-                    existing.vmetadata = item["metadata"]
-                    existing.collection_name = (
-                        collection_name  # Update collection_name if necessary
-                    )
-                else:
-                    new_chunk = DocumentChunk(
-                        id=item["id"],
-                        vector=vector,
-                        collection_name=collection_name,
-                        text=item["text"],
-                        vmetadata=item["metadata"],
-                    )
-                    self.session.add(new_chunk)
+            self.write_items(collection_name, items, upsert=True)
             self.session.commit()
             log.info(
                 f"Upserted {len(items)} items into collection '{collection_name}'."
             )
+            self.track_index_growth(len(items))
         except Exception as e:
             self.session.rollback()
             log.exception(f"Error during upsert: {e}")
@@ -259,6 +806,7 @@ class PgvectorClient:
                 .order_by(query_vectors.c.qid, subq.c.distance)
             )
 
+            self.set_search_params(limit)
             result_proxy = self.session.execute(stmt)
             results = result_proxy.all()
 
@@ -286,6 +834,7 @@ class PgvectorClient:
                 ids=ids, distances=distances, documents=documents, metadatas=metadatas
             )
         except Exception as e:
+            self.session.rollback()
             log.exception(f"Error during search: {e}")
             return None
 
@@ -345,6 +894,60 @@ class PgvectorClient:
             log.exception(f"Error during get: {e}")
             return None
 
+    def iter_items(
+        self,
+        collection_name: str,
+        batch_size: int = 1000,
+        fields: Tuple[str, ...] = DEFAULT_ITEM_FIELDS,
+    ) -> Iterator[GetResult]:
+        """
+        Page through a collection in id order, selecting only the requested columns.
+        Keyset pagination keeps every page an index range scan, however deep.
+        """
+        columns = [DocumentChunk.id]
+        if "documents" in fields:
+            columns.append(DocumentChunk.text)
+        if "metadatas" in fields:
+            columns.append(DocumentChunk.vmetadata)
+        if "vectors" in fields:
+            columns.append(DocumentChunk.vector)
+
+        last_id = None
+        while True:
+            stmt = select(*columns).where(
+                DocumentChunk.collection_name == collection_name
+            )
+            if last_id is not None:
+                stmt = stmt.where(DocumentChunk.id > last_id)
+            stmt = stmt.order_by(DocumentChunk.id).limit(batch_size)
+
+            try:
+                rows = self.session.execute(stmt).all()
+            except Exception as e:
+                self.session.rollback()
+                log.exception(f"Error during iter_items: {e}")
+                raise
+            if not rows:
+                break
+
+            yield GetResult(
+                ids=[[row.id for row in rows]],
+                documents=(
+                    [[row.text for row in rows]] if "documents" in fields else None
+                ),
+                metadatas=(
+                    [[row.vmetadata for row in rows]] if "metadatas" in fields else None
+                ),
+                vectors=(
+                    [[row.vector.tolist() for row in rows]]
+                    if "vectors" in fields
+                    else None
+                ),
+            )
+            if len(rows) < batch_size:
+                break
+            last_id = rows[-1].id
+
     def delete(
         self,
         collection_name: str,
@@ -1,11 +1,16 @@
-from typing import Optional
+from typing import Iterator, Optional
 import logging
 
 from qdrant_client import QdrantClient as Qclient
 from qdrant_client.http.models import PointStruct
 from qdrant_client.models import models
 
-from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
+from open_webui.retrieval.vector.main import (
+    DEFAULT_ITEM_FIELDS,
+    VectorItem,
+    SearchResult,
+    GetResult,
+)
 from open_webui.config import QDRANT_URI, QDRANT_API_KEY
 from open_webui.env import SRC_LOG_LEVELS
 
@@ -136,6 +141,50 @@ class QdrantClient:
         )
         return self._result_to_get_result(points.points)
 
+    def iter_items(
+        self,
+        collection_name: str,
+        batch_size: int = 1000,
+        fields: tuple[str, ...] = DEFAULT_ITEM_FIELDS,
+    ) -> Iterator[GetResult]:
+        # Scroll through all the items in the collection, only loading the requested fields.
+        payload_fields = [
+            {"documents": "text", "metadatas": "metadata"}[field]
+            for field in fields
+            if field in ("documents", "metadatas")
+        ]
+
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=f"{self.collection_prefix}_{collection_name}",
+                limit=batch_size,
+                offset=offset,
+                with_payload=payload_fields or False,
+                with_vectors="vectors" in fields,
+            )
+            if points:
+                yield GetResult(
+                    ids=[[point.id for point in points]],
+                    documents=(
+                        [[point.payload.get("text") for point in points]]
+                        if "documents" in fields
+                        else None
+                    ),
+                    metadatas=(
+                        [[point.payload.get("metadata") for point in points]]
+                        if "metadatas" in fields
+                        else None
+                    ),
+                    vectors=(
+                        [[point.vector for point in points]]
+                        if "vectors" in fields
+                        else None
+                    ),
+                )
+            if offset is None:
+                break
+
     def insert(self, collection_name: str, items: list[VectorItem]):
         # Insert the items into the collection, if the collection does not exist, it will be created.
         self._create_collection_if_not_exists(collection_name, len(items[0]["vector"]))
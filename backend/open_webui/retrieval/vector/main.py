@@ -1,6 +1,10 @@
 from pydantic import BaseModel
 from typing import Optional, List, Any
 
+# Fields loaded by iter_items unless others are requested ("documents",
+# "metadatas" and/or "vectors"), ids are always returned
+DEFAULT_ITEM_FIELDS = ("documents", "metadatas")
+
 
 class VectorItem(BaseModel):
     id: str
@@ -13,6 +17,7 @@ class GetResult(BaseModel):
     ids: Optional[List[List[str]]]
     documents: Optional[List[List[str]]]
     metadatas: Optional[List[List[Any]]]
+    vectors: Optional[List[List[Any]]] = None
 
 
 class SearchResult(GetResult):
@@ -1,8 +1,12 @@
+import asyncio
 import hashlib
+import io
 import json
 import logging
 import os
+import re
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from pathlib import Path
 from pydub import AudioSegment
@@ -24,15 +28,21 @@ from fastapi import (
     APIRouter,
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 
 from open_webui.utils.auth import get_admin_user, get_verified_user
+from open_webui.utils.speech_cache import SpeechCache, iter_file
 from open_webui.config import (
     WHISPER_MODEL_AUTO_UPDATE,
     WHISPER_MODEL_DIR,
     CACHE_DIR,
+    SPEECH_CACHE_MAX_AGE,
+    SPEECH_CACHE_MAX_SIZE,
+    SPEECH_SYNTHESIS_WORKERS,
+    TRANSCRIPTION_WORKERS,
+    WHISPER_BATCH_SIZE,
 )
 
 from open_webui.constants import ERROR_MESSAGES
@@ -56,6 +66,20 @@ log.setLevel(SRC_LOG_LEVELS["AUDIO"])
 
 SPEECH_CACHE_DIR = CACHE_DIR / "audio" / "speech"
 SPEECH_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+SPEECH_CACHE = SpeechCache(
+    SPEECH_CACHE_DIR, SPEECH_CACHE_MAX_SIZE, SPEECH_CACHE_MAX_AGE
+)
+
+SPEECH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=SPEECH_SYNTHESIS_WORKERS, thread_name_prefix="speech"
+)
+
+# Every use of the local transcription model goes through these workers
+TRANSCRIPTION_EXECUTOR = ThreadPoolExecutor(
+    max_workers=TRANSCRIPTION_WORKERS, thread_name_prefix="transcription"
+)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 
 ##########################################
@@ -100,6 +124,7 @@ def set_faster_whisper_model(model: str, auto_update: bool = False):
             "model_size_or_path": model,
             "device": DEVICE_TYPE if DEVICE_TYPE and DEVICE_TYPE == "cuda" else "cpu",
             "compute_type": "int8",
+            "num_workers": TRANSCRIPTION_WORKERS,
             "download_root": WHISPER_MODEL_DIR,
             "local_files_only": not auto_update,
         }
@@ -239,259 +264,266 @@ def load_speech_pipeline(request):
         )
 
 
-@router.post("/speech")
-async def speech(request: Request, user=Depends(get_verified_user)):
-    body = await request.body()
-    name = hashlib.sha256(
-        body
-        + str(request.app.state.config.TTS_ENGINE).encode("utf-8")
-        + str(request.app.state.config.TTS_MODEL).encode("utf-8")
-    ).hexdigest()
+def get_speaker_embedding(request):
+    import torch
 
-    file_path = SPEECH_CACHE_DIR.joinpath(f"{name}.mp3")
-    file_body_path = SPEECH_CACHE_DIR.joinpath(f"{name}.json")
+    load_speech_pipeline(request)
 
-    # Check if the file already exists in the cache
-    if file_path.is_file():
-        return FileResponse(file_path)
+    embeddings_dataset = request.app.state.speech_speaker_embeddings_dataset
 
-    payload = None
+    speaker_index = 6799
     try:
-        payload = json.loads(body.decode("utf-8"))
-    except Exception as e:
-        log.exception(e)
-        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+        speaker_index = embeddings_dataset["filename"].index(
+            request.app.state.config.TTS_MODEL
+        )
+    except Exception:
+        pass
 
-    if request.app.state.config.TTS_ENGINE == "openai":
-        payload["model"] = request.app.state.config.TTS_MODEL
+    return torch.tensor(embeddings_dataset[speaker_index]["xvector"]).unsqueeze(0)
 
-        try:
-            timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-            async with aiohttp.ClientSession(
-                timeout=timeout, trust_env=True
-            ) as session:
-                async with session.post(
-                    url=f"{request.app.state.config.TTS_OPENAI_API_BASE_URL}/audio/speech",
-                    json=payload,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Authorization": f"Bearer {request.app.state.config.TTS_OPENAI_API_KEY}",
-                        **(
-                            {
-                                "X-OpenWebUI-User-Name": user.name,
-                                "X-OpenWebUI-User-Id": user.id,
-                                "X-OpenWebUI-User-Email": user.email,
-                                "X-OpenWebUI-User-Role": user.role,
-                            }
-                            if ENABLE_FORWARD_USER_INFO_HEADERS
-                            else {}
-                        ),
-                    },
-                ) as r:
-                    r.raise_for_status()
-
-                    async with aiofiles.open(file_path, "wb") as f:
-                        await f.write(await r.read())
-
-                    async with aiofiles.open(file_body_path, "w") as f:
-                        await f.write(json.dumps(payload))
-
-            return FileResponse(file_path)
 
-        except Exception as e:
-            log.exception(e)
-            detail = None
+def synthesize_speech(request, text, speaker_embedding) -> bytes:
+    import soundfile as sf
 
-            try:
-                if r.status != 200:
-                    res = await r.json()
+    speech = request.app.state.speech_synthesiser(
+        text,
+        forward_params={"speaker_embeddings": speaker_embedding},
+    )
 
-                    if "error" in res:
-                        detail = f"External: {res['error'].get('message', '')}"
-            except Exception:
-                detail = f"External: {e}"
+    audio = io.BytesIO()
+    sf.write(audio, speech["audio"], samplerate=speech["sampling_rate"], format="MP3")
+    return audio.getvalue()
 
-            raise HTTPException(
-                status_code=getattr(r, "status", 500),
-                detail=detail if detail else "Open WebUI: Server Connection Error",
-            )
 
-    elif request.app.state.config.TTS_ENGINE == "elevenlabs":
-        voice_id = payload.get("voice", "")
+def split_sentences(text: str) -> list[str]:
+    return [
+        sentence
+        for sentence in re.split(r"(?<=[.!?])\s+", text.strip())
+        if sentence.strip()
+    ]
 
-        if voice_id not in get_available_voices(request):
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid voice id",
-            )
 
-        try:
-            timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-            async with aiohttp.ClientSession(
-                timeout=timeout, trust_env=True
-            ) as session:
-                async with session.post(
-                    f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}",
-                    json={
-                        "text": payload["input"],
-                        "model_id": request.app.state.config.TTS_MODEL,
-                        "voice_settings": {"stability": 0.5, "similarity_boost": 0.5},
-                    },
-                    headers={
-                        "Accept": "audio/mpeg",
-                        "Content-Type": "application/json",
-                        "xi-api-key": request.app.state.config.TTS_API_KEY,
-                    },
-                ) as r:
-                    r.raise_for_status()
-
-                    async with aiofiles.open(file_path, "wb") as f:
-                        await f.write(await r.read())
-
-                    async with aiofiles.open(file_body_path, "w") as f:
-                        await f.write(json.dumps(payload))
-
-            return FileResponse(file_path)
+async def raise_speech_error(r, e):
+    log.exception(e)
+    detail = None
 
-        except Exception as e:
-            log.exception(e)
-            detail = None
+    try:
+        if r.status != 200:
+            res = await r.json()
+            if "error" in res:
+                detail = f"External: {res['error'].get('message', '')}"
+    except Exception:
+        detail = f"External: {e}"
+
+    raise HTTPException(
+        status_code=getattr(r, "status", 500),
+        detail=detail if detail else "Open WebUI: Server Connection Error",
+    )
 
-            try:
-                if r.status != 200:
-                    res = await r.json()
-                    if "error" in res:
-                        detail = f"External: {res['error'].get('message', '')}"
-            except Exception:
-                detail = f"External: {e}"
 
-            raise HTTPException(
-                status_code=getattr(r, "status", 500),
-                detail=detail if detail else "Open WebUI: Server Connection Error",
-            )
+async def generate_openai_speech(request: Request, payload: dict, user):
+    payload["model"] = request.app.state.config.TTS_MODEL
 
-    elif request.app.state.config.TTS_ENGINE == "azure":
-        try:
-            payload = json.loads(body.decode("utf-8"))
-        except Exception as e:
-            log.exception(e)
-            raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    r = None
+    try:
+        timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
+            async with session.post(
+                url=f"{request.app.state.config.TTS_OPENAI_API_BASE_URL}/audio/speech",
+                json=payload,
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {request.app.state.config.TTS_OPENAI_API_KEY}",
+                    **(
+                        {
+                            "X-OpenWebUI-User-Name": user.name,
+                            "X-OpenWebUI-User-Id": user.id,
+                            "X-OpenWebUI-User-Email": user.email,
+                            "X-OpenWebUI-User-Role": user.role,
+                        }
+                        if ENABLE_FORWARD_USER_INFO_HEADERS
+                        else {}
+                    ),
+                },
+            ) as r:
+                r.raise_for_status()
 
-        region = request.app.state.config.TTS_AZURE_SPEECH_REGION
-        language = request.app.state.config.TTS_VOICE
-        locale = "-".join(request.app.state.config.TTS_VOICE.split("-")[:1])
-        output_format = request.app.state.config.TTS_AZURE_SPEECH_OUTPUT_FORMAT
+                async for chunk in r.content.iter_any():
+                    yield chunk
 
-        try:
-            data = f"""<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="{locale}">
-                <voice name="{language}">{payload["input"]}</voice>
-            </speak>"""
-            timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-            async with aiohttp.ClientSession(
-                timeout=timeout, trust_env=True
-            ) as session:
-                async with session.post(
-                    f"https://{region}.tts.speech.microsoft.com/cognitiveservices/v1",
-                    headers={
-                        "Ocp-Apim-Subscription-Key": request.app.state.config.TTS_API_KEY,
-                        "Content-Type": "application/ssml+xml",
-                        "X-Microsoft-OutputFormat": output_format,
-                    },
-                    data=data,
-                ) as r:
-                    r.raise_for_status()
-
-                    async with aiofiles.open(file_path, "wb") as f:
-                        await f.write(await r.read())
-
-                    async with aiofiles.open(file_body_path, "w") as f:
-                        await f.write(json.dumps(payload))
-
-                    return FileResponse(file_path)
+    except Exception as e:
+        await raise_speech_error(r, e)
 
-        except Exception as e:
-            log.exception(e)
-            detail = None
 
-            try:
-                if r.status != 200:
-                    res = await r.json()
-                    if "error" in res:
-                        detail = f"External: {res['error'].get('message', '')}"
-            except Exception:
-                detail = f"External: {e}"
+async def generate_elevenlabs_speech(request: Request, payload: dict, user):
+    voice_id = payload.get("voice", "")
 
-            raise HTTPException(
-                status_code=getattr(r, "status", 500),
-                detail=detail if detail else "Open WebUI: Server Connection Error",
-            )
+    if voice_id not in get_available_voices(request):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid voice id",
+        )
 
-    elif request.app.state.config.TTS_ENGINE == "transformers":
-        payload = None
-        try:
-            payload = json.loads(body.decode("utf-8"))
-        except Exception as e:
-            log.exception(e)
-            raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    r = None
+    try:
+        timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
+            async with session.post(
+                f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}",
+                json={
+                    "text": payload["input"],
+                    "model_id": request.app.state.config.TTS_MODEL,
+                    "voice_settings": {"stability": 0.5, "similarity_boost": 0.5},
+                },
+                headers={
+                    "Accept": "audio/mpeg",
+                    "Content-Type": "application/json",
+                    "xi-api-key": request.app.state.config.TTS_API_KEY,
+                },
+            ) as r:
+                r.raise_for_status()
 
-        import torch
-        import soundfile as sf
+                async for chunk in r.content.iter_any():
+                    yield chunk
 
-        load_speech_pipeline(request)
+    except Exception as e:
+        await raise_speech_error(r, e)
 
-        embeddings_dataset = request.app.state.speech_speaker_embeddings_dataset
 
-        speaker_index = 6799
-        try:
-            speaker_index = embeddings_dataset["filename"].index(
-                request.app.state.config.TTS_MODEL
-            )
-        except Exception:
-            pass
+async def generate_azure_speech(request: Request, payload: dict, user):
+    region = request.app.state.config.TTS_AZURE_SPEECH_REGION
+    language = request.app.state.config.TTS_VOICE
+    locale = "-".join(request.app.state.config.TTS_VOICE.split("-")[:1])
+    output_format = request.app.state.config.TTS_AZURE_SPEECH_OUTPUT_FORMAT
+
+    r = None
+    try:
+        data = f"""<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="{locale}">
+            <voice name="{language}">{payload["input"]}</voice>
+        </speak>"""
+        timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
+            async with session.post(
+                f"https://{region}.tts.speech.microsoft.com/cognitiveservices/v1",
+                headers={
+                    "Ocp-Apim-Subscription-Key": request.app.state.config.TTS_API_KEY,
+                    "Content-Type": "application/ssml+xml",
+                    "X-Microsoft-OutputFormat": output_format,
+                },
+                data=data,
+            ) as r:
+                r.raise_for_status()
+
+                async for chunk in r.content.iter_any():
+                    yield chunk
+
+    except Exception as e:
+        await raise_speech_error(r, e)
+
+
+async def generate_transformers_speech(request: Request, payload: dict, user):
+    # The model runs on the speech worker threads, never on the event loop
+    loop = asyncio.get_running_loop()
+    speaker_embedding = await loop.run_in_executor(
+        SPEECH_EXECUTOR, get_speaker_embedding, request
+    )
+
+    # Each sentence is sent as soon as it is synthesized
+    for sentence in split_sentences(payload["input"]):
+        yield await loop.run_in_executor(
+            SPEECH_EXECUTOR, synthesize_speech, request, sentence, speaker_embedding
+        )
+
+
+SPEECH_ENGINES = {
+    "openai": generate_openai_speech,
+    "elevenlabs": generate_elevenlabs_speech,
+    "azure": generate_azure_speech,
+    "transformers": generate_transformers_speech,
+}
+
+
+@router.post("/speech")
+async def speech(request: Request, user=Depends(get_verified_user)):
+    body = await request.body()
+    name = hashlib.sha256(
+        body
+        + str(request.app.state.config.TTS_ENGINE).encode("utf-8")
+        + str(request.app.state.config.TTS_MODEL).encode("utf-8")
+    ).hexdigest()
+
+    # Check if the file already exists in the cache
+    audio_file = SPEECH_CACHE.get(name)
+    if audio_file:
+        return StreamingResponse(
+            iter_file(audio_file),
+            media_type="audio/mpeg",
+            headers={"Content-Length": str(os.fstat(audio_file.fileno()).st_size)},
+        )
+
+    payload = None
+    try:
+        payload = json.loads(body.decode("utf-8"))
+    except Exception as e:
+        log.exception(e)
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    generate = SPEECH_ENGINES.get(request.app.state.config.TTS_ENGINE)
+    if generate is None:
+        return None
+
+    # Identical requests share one synthesis, the audio is sent as it is produced
+    flight = SPEECH_CACHE.synthesize(
+        name, payload, lambda: generate(request, payload, user)
+    )
+    await flight.started()
+    return StreamingResponse(flight.stream(), media_type="audio/mpeg")
 
-        speaker_embedding = torch.tensor(
-            embeddings_dataset[speaker_index]["xvector"]
-        ).unsqueeze(0)
 
-        speech = request.app.state.speech_synthesiser(
-            payload["input"],
-            forward_params={"speaker_embeddings": speaker_embedding},
+def get_whisper_segments(request: Request, file_path):
+    # Segments are decoded lazily, as the returned generator is consumed
+    if request.app.state.faster_whisper_model is None:
+        request.app.state.faster_whisper_model = set_faster_whisper_model(
+            request.app.state.config.WHISPER_MODEL
         )
 
-        sf.write(file_path, speech["audio"], samplerate=speech["sampling_rate"])
+    model = request.app.state.faster_whisper_model
+    if WHISPER_BATCH_SIZE > 0:
+        from faster_whisper import BatchedInferencePipeline
 
-        async with aiofiles.open(file_body_path, "w") as f:
-            await f.write(json.dumps(payload))
+        segments, info = BatchedInferencePipeline(model).transcribe(
+            file_path, beam_size=5, batch_size=WHISPER_BATCH_SIZE
+        )
+    else:
+        segments, info = model.transcribe(file_path, beam_size=5)
+    log.info(
+        "Detected language '%s' with probability %f"
+        % (info.language, info.language_probability)
+    )
+    return segments, info
 
-        return FileResponse(file_path)
+
+def save_transcript(file_path, data):
+    # save the transcript to a json file
+    id = os.path.basename(file_path).split(".")[0]
+    with open(f"{os.path.dirname(file_path)}/{id}.json", "w") as f:
+        json.dump(data, f)
 
 
 def transcribe(request: Request, file_path):
     log.info(f"transcribe: {file_path}")
     filename = os.path.basename(file_path)
-    file_dir = os.path.dirname(file_path)
-    id = filename.split(".")[0]
 
     if request.app.state.config.STT_ENGINE == "":
-        if request.app.state.faster_whisper_model is None:
-            request.app.state.faster_whisper_model = set_faster_whisper_model(
-                request.app.state.config.WHISPER_MODEL
-            )
 
-        model = request.app.state.faster_whisper_model
-        segments, info = model.transcribe(file_path, beam_size=5)
-        log.info(
-            "Detected language '%s' with probability %f"
-            % (info.language, info.language_probability)
-        )
+        def transcribe_segments():
+            segments, info = get_whisper_segments(request, file_path)
+            return "".join([segment.text for segment in segments])
 
-        transcript = "".join([segment.text for segment in list(segments)])
+        transcript = TRANSCRIPTION_EXECUTOR.submit(transcribe_segments).result()
         data = {"text": transcript.strip()}
 
-        # save the transcript to a json file
-        transcript_file = f"{file_dir}/{id}.json"
-        with open(transcript_file, "w") as f:
-            json.dump(data, f)
+        save_transcript(file_path, data)
 
         log.debug(data)
         return data
@@ -515,10 +547,7 @@ def transcribe(request: Request, file_path):
             r.raise_for_status()
             data = r.json()
 
-            # save the transcript to a json file
-            transcript_file = f"{file_dir}/{id}.json"
-            with open(transcript_file, "w") as f:
-                json.dump(data, f)
+            save_transcript(file_path, data)
 
             return data
         except Exception as e:
@@ -579,10 +608,7 @@ def transcribe(request: Request, file_path):
                 )
             data = {"text": transcript.strip()}
 
-            # Save transcript
-            transcript_file = f"{file_dir}/{id}.json"
-            with open(transcript_file, "w") as f:
-                json.dump(data, f)
+            save_transcript(file_path, data)
 
             return data
 
@@ -604,6 +630,7 @@ def compress_audio(file_path):
         file_dir = os.path.dirname(file_path)
         audio = AudioSegment.from_file(file_path)
         audio = audio.set_frame_rate(16000).set_channels(1)  # Compress audio
+        id = os.path.basename(file_path).split(".")[0]
         compressed_path = f"{file_dir}/{id}_compressed.opus"
         audio.export(compressed_path, format="opus", bitrate="32k")
         log.debug(f"Compressed audio to {compressed_path}")
@@ -617,10 +644,48 @@ def compress_audio(file_path):
         return file_path
 
 
+async def save_upload(file: UploadFile, file_path):
+    # Copied in chunks, the upload is never held in memory as a whole
+    async with aiofiles.open(file_path, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await f.write(chunk)
+
+
+async def stream_transcription(request: Request, file_path):
+    filename = file_path.split("/")[-1]
+    try:
+        if request.app.state.config.STT_ENGINE == "":
+            # Each segment is sent as soon as the model has decoded it
+            loop = asyncio.get_running_loop()
+            segments, info = await loop.run_in_executor(
+                TRANSCRIPTION_EXECUTOR, get_whisper_segments, request, file_path
+            )
+
+            texts = []
+            while (
+                segment := await loop.run_in_executor(
+                    TRANSCRIPTION_EXECUTOR, next, segments, None
+                )
+            ) is not None:
+                texts.append(segment.text)
+                yield f"data: {json.dumps({'text': segment.text, 'start': segment.start, 'end': segment.end})}\n\n"
+
+            data = {"text": "".join(texts).strip()}
+            await asyncio.to_thread(save_transcript, file_path, data)
+        else:
+            data = await asyncio.to_thread(transcribe, request, file_path)
+
+        yield f"data: {json.dumps({**data, 'filename': filename, 'done': True})}\n\n"
+    except Exception as e:
+        log.exception(e)
+        yield f"data: {json.dumps({'error': ERROR_MESSAGES.DEFAULT(e), 'done': True})}\n\n"
+
+
 @router.post("/transcriptions")
-def transcription(
+async def transcription(
     request: Request,
     file: UploadFile = File(...),
+    stream: bool = False,
     user=Depends(get_verified_user),
 ):
     log.info(f"file.content_type: {file.content_type}")
@@ -636,18 +701,16 @@ def transcription(
         id = uuid.uuid4()
 
         filename = f"{id}.{ext}"
-        contents = file.file.read()
 
         file_dir = f"{CACHE_DIR}/audio/transcriptions"
         os.makedirs(file_dir, exist_ok=True)
         file_path = f"{file_dir}/{filename}"
 
-        with open(file_path, "wb") as f:
-            f.write(contents)
+        await save_upload(file, file_path)
 
         try:
             try:
-                file_path = compress_audio(file_path)
+                file_path = await asyncio.to_thread(compress_audio, file_path)
             except Exception as e:
                 log.exception(e)
 
@@ -656,7 +719,14 @@ def transcription(
                     detail=ERROR_MESSAGES.DEFAULT(e),
                 )
 
-            data = transcribe(request, file_path)
+            if stream:
+                # Server-sent events, one per segment and a last one with the transcript
+                return StreamingResponse(
+                    stream_transcription(request, file_path),
+                    media_type="text/event-stream",
+                )
+
+            data = await asyncio.to_thread(transcribe, request, file_path)
             file_path = file_path.split("/")[-1]
             return {**data, "filename": file_path}
         except Exception as e:
@@ -21,6 +21,7 @@ from pydantic import BaseModel
 
 from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.utils.access_control import has_permission
+from open_webui.utils.message_buffer import MESSAGE_BUFFER
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
@@ -258,6 +259,17 @@ async def get_all_user_chats_in_db(user=Depends(get_admin_user)):
     return [ChatResponse(**chat.model_dump()) for chat in Chats.get_chats()]
 
 
+############################
+# GetMessageBufferStats
+############################
+
+
+@router.get("/buffer/stats")
+async def get_message_buffer_stats(user=Depends(get_admin_user)):
+    # Streamed message updates and the chat writes they were merged into, in this process
+    return MESSAGE_BUFFER.info()
+
+
 ############################
 # GetArchivedChats
 ############################
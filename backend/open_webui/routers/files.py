@@ -5,7 +5,17 @@ from pathlib import Path
 from typing import Optional
 from urllib.parse import quote
 
-from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse, StreamingResponse
 from open_webui.constants import ERROR_MESSAGES
 from open_webui.env import SRC_LOG_LEVELS
@@ -15,10 +25,22 @@ from open_webui.models.files import (
     FileModelResponse,
     Files,
 )
-from open_webui.routers.retrieval import ProcessFileForm, process_file
+from open_webui.routers.retrieval import (
+    ProcessFileForm,
+    process_file,
+    release_blob,
+    release_file,
+)
 from open_webui.routers.audio import transcribe
-from open_webui.storage.provider import Storage
+from open_webui.storage.cache import STORAGE_CACHE
+from open_webui.storage.provider import (
+    LocalStorageProvider,
+    Storage,
+    get_blob_name,
+    stage_blob,
+)
 from open_webui.utils.auth import get_admin_user, get_verified_user
+from open_webui.utils.jobs import JOBS, JobModel
 from pydantic import BaseModel
 
 log = logging.getLogger(__name__)
@@ -32,62 +54,104 @@ router = APIRouter()
 ############################
 
 
+@JOBS.register("process_file")
+def process_uploaded_file(request: Request, user, payload: dict) -> dict:
+    """
+    Extract and embed an uploaded file, transcribing audio files first.
+    Records the outcome in the file's data as "status" and "error".
+    """
+    id = payload["file_id"]
+    try:
+        file = Files.get_file_by_id(id)
+        if not file:
+            raise ValueError(ERROR_MESSAGES.NOT_FOUND)
+
+        Files.update_file_data_by_id(id, {"status": "processing"})
+        if payload.get("content_type") in [
+            "audio/mpeg",
+            "audio/wav",
+            "audio/ogg",
+            "audio/x-m4a",
+        ]:
+            file_path = Storage.get_file(user.id, file.path)
+            result = transcribe(request, file_path)
+            process_file(
+                request,
+                ProcessFileForm(file_id=id, content=result.get("text", "")),
+                user=user,
+            )
+        else:
+            process_file(request, ProcessFileForm(file_id=id), user=user)
+
+        Files.update_file_data_by_id(id, {"status": "completed"})
+        return {"file_id": id}
+    except Exception as e:
+        log.error(f"Error processing file: {id}")
+        Files.update_file_data_by_id(
+            id,
+            {
+                "status": "failed",
+                "error": str(e.detail) if hasattr(e, "detail") else str(e),
+            },
+        )
+        raise e
+
+
 @router.post("/", response_model=FileModelResponse)
 def upload_file(
     request: Request,
     file: UploadFile = File(...),
     user=Depends(get_verified_user),
     file_metadata: dict = {},
+    process_in_background: bool = False,
 ):
     log.info(f"file.content_type: {file.content_type}")
     try:
         unsanitized_filename = file.filename
-        filename = os.path.basename(unsanitized_filename)
+        name = os.path.basename(unsanitized_filename)
 
-        # replace filename with uuid
+        # Identical uploads share one stored copy, named by the hash of their bytes
         id = str(uuid.uuid4())
-        name = filename
-        filename = f"{id}_{filename}"
-        contents, file_path = Storage.upload_file(file.file, user.id, filename)
-
-        file_item = Files.insert_new_file(
-            user.id,
-            FileForm(
-                **{
-                    "id": id,
-                    "filename": name,
-                    "path": file_path,
-                    "meta": {
-                        "name": name,
-                        "content_type": file.content_type,
-                        "size": len(contents),
-                        "data": file_metadata,
-                    },
-                }
-            ),
-        )
-
-        try:
-            if file.content_type in [
-                "audio/mpeg",
-                "audio/wav",
-                "audio/ogg",
-                "audio/x-m4a",
-            ]:
-                file_path = Storage.get_file(user.id, file_path)
-                result = transcribe(request, file_path)
-                process_file(
-                    request,
-                    ProcessFileForm(file_id=id, content=result.get("text", "")),
-                    user=user,
+        # Deleting the blob once it is no longer referenced waits for the file to be recorded
+        with stage_blob(file.file) as (upload_metadata, staged_path):
+            blob_name = get_blob_name(upload_metadata["sha256"], name)
+            with Files.lock_blob(blob_name):
+                file_path = Storage.store_blob(staged_path, upload_metadata, name)
+                file_item = Files.insert_new_file(
+                    user.id,
+                    FileForm(
+                        **{
+                            "id": id,
+                            "filename": name,
+                            "path": file_path,
+                            "data": {"status": "pending"},
+                            "meta": {
+                                "name": name,
+                                "content_type": file.content_type,
+                                "size": upload_metadata["size"],
+                                "sha256": upload_metadata["sha256"],
+                                "data": file_metadata,
+                            },
+                        }
+                    ),
                 )
-            else:
-                process_file(request, ProcessFileForm(file_id=id), user=user)
+        if file_item is None:
+            # The stored bytes are shared, they are only deleted if nothing else uses them
+            release_blob(user.id, file_path)
+            raise ValueError("Error recording the uploaded file")
+
+        payload = {"file_id": id, "content_type": file.content_type}
+        if process_in_background:
+            # Processing continues in the job queue, progress is pushed as "job-events"
+            job = JOBS.enqueue("process_file", user.id, payload)
+            file_item = Files.update_file_data_by_id(id, {"job_id": job.id})
+            return FileModelResponse(**file_item.model_dump(), job_id=job.id)
 
+        try:
+            process_uploaded_file(request, user, payload)
             file_item = Files.get_file_by_id(id=id)
         except Exception as e:
             log.exception(e)
-            log.error(f"Error processing file: {file_item.id}")
             file_item = FileModelResponse(
                 **{
                     **file_item.model_dump(),
@@ -111,6 +175,34 @@ def upload_file(
         )
 
 
+############################
+# Get Job By Id
+############################
+
+
+@router.get("/jobs/{job_id}", response_model=JobModel)
+async def get_job_by_id(job_id: str, user=Depends(get_verified_user)):
+    job = JOBS.get_job_by_id(job_id)
+
+    if job and (job.user_id == user.id or user.role == "admin"):
+        return job
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES.NOT_FOUND,
+        )
+
+
+############################
+# Storage Cache Stats
+############################
+
+
+@router.get("/cache/stats")
+async def get_storage_cache_stats(user=Depends(get_admin_user)):
+    return STORAGE_CACHE.cache_info()
+
+
 ############################
 # List Files
 ############################
@@ -132,10 +224,15 @@ async def list_files(user=Depends(get_verified_user)):
 
 @router.delete("/all")
 async def delete_all_files(user=Depends(get_admin_user)):
+    paths = {file.path for file in Files.get_files() if file.path}
     result = Files.delete_all_files()
     if result:
         try:
             Storage.delete_all_files(user.id)
+            # Blobs are shared between users, only those no upload recorded since
+            # references are deleted
+            for path in paths:
+                release_blob(user.id, path)
         except Exception as e:
             log.exception(e)
             log.error("Error deleting files")
@@ -227,44 +324,154 @@ async def update_file_data_content_by_id(
 ############################
 
 
+def get_file_etag(file: FileModel) -> Optional[str]:
+    # Hash of the uploaded bytes, the same whichever backend stores the file
+    sha256 = (file.meta or {}).get("sha256")
+    return f'"{sha256}"' if sha256 else None
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    etags = [value.strip().removeprefix("W/") for value in header.split(",")]
+    return "*" in etags or etag.removeprefix("W/") in etags
+
+
+def parse_range_header(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single "bytes=" range into inclusive offsets, None means the whole file.
+    Requests for several ranges get the whole file, which RFC 9110 allows.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+
+    start, _, end = header.removeprefix("bytes=").strip().partition("-")
+    try:
+        if start:
+            start, end = int(start), min(int(end), size - 1) if end else size - 1
+        else:
+            # Suffix range, the last "end" bytes
+            start, end = max(size - int(end), 0), size - 1
+    except ValueError:
+        return None
+
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+async def get_file_response(
+    request: Request,
+    user,
+    file: FileModel,
+    headers: dict,
+    media_type: Optional[str] = None,
+) -> Response:
+    """
+    Serve the stored file with ETag, conditional GET and Range support.
+    Local and cached files are sent by FileResponse, which handles Range itself;
+    remote objects are streamed from storage without being downloaded first.
+    """
+    etag = get_file_etag(file)
+    if etag and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+
+    if isinstance(Storage, LocalStorageProvider):
+        file_path = Storage.get_file(user.id, file.path)
+    else:
+        size, storage_etag = await run_in_threadpool(
+            Storage.stat_file, user.id, file.path
+        )
+        etag = etag or f'"{storage_etag.strip(chr(34))}"'
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+            )
+
+        file_path = STORAGE_CACHE.lookup(file.path, storage_etag)
+        if file_path is None:
+            headers = {**headers, "ETag": etag, "Accept-Ranges": "bytes"}
+
+            byte_range = None
+            if request.headers.get("if-range", etag) == etag:
+                byte_range = parse_range_header(request.headers.get("range"), size)
+
+            if byte_range:
+                start, end = byte_range
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+                headers["Content-Length"] = str(end - start + 1)
+                return StreamingResponse(
+                    Storage.iter_file(user.id, file.path, start, end),
+                    status_code=status.HTTP_206_PARTIAL_CONTENT,
+                    headers=headers,
+                    media_type=media_type,
+                )
+
+            headers["Content-Length"] = str(size)
+            return StreamingResponse(
+                Storage.iter_file(user.id, file.path),
+                headers=headers,
+                media_type=media_type,
+            )
+
+    file_path = Path(file_path)
+    if not file_path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES.NOT_FOUND,
+        )
+
+    stat_result = await run_in_threadpool(os.stat, file_path)
+    response = FileResponse(
+        file_path,
+        headers={**headers, **({"ETag": etag} if etag else {})},
+        media_type=media_type,
+        stat_result=stat_result,
+    )
+    etag = response.headers["etag"]
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    if request.headers.get("if-range", etag) == etag:
+        # FileResponse leaves the unit out of the Content-Range of a 416, reject it here
+        parse_range_header(request.headers.get("range"), stat_result.st_size)
+    return response
+
+
 @router.get("/{id}/content")
-async def get_file_content_by_id(id: str, user=Depends(get_verified_user)):
+async def get_file_content_by_id(
+    request: Request, id: str, user=Depends(get_verified_user)
+):
     file = Files.get_file_by_id(id)
     if file and (file.user_id == user.id or user.role == "admin"):
         try:
-            file_path = Storage.get_file(user.id, file.path)
-            file_path = Path(file_path)
-
-            # Check if the file already exists in the cache
-            if file_path.is_file():
-                # Handle Unicode filenames
-                filename = file.meta.get("name", file.filename)
-                encoded_filename = quote(filename)  # RFC5987 encoding
-
-                content_type = file.meta.get("content_type")
-                filename = file.meta.get("name", file.filename)
-                encoded_filename = quote(filename)
-                headers = {}
-
-                if content_type == "application/pdf" or filename.lower().endswith(
-                    ".pdf"
-                ):
-                    headers["Content-Disposition"] = (
-                        f"inline; filename*=UTF-8''{encoded_filename}"
-                    )
-                    content_type = "application/pdf"
-                elif content_type != "text/plain":
-                    headers["Content-Disposition"] = (
-                        f"attachment; filename*=UTF-8''{encoded_filename}"
-                    )
-
-                return FileResponse(file_path, headers=headers, media_type=content_type)
-
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=ERROR_MESSAGES.NOT_FOUND,
+            # Handle Unicode filenames
+            content_type = file.meta.get("content_type")
+            filename = file.meta.get("name", file.filename)
+            encoded_filename = quote(filename)  # RFC5987 encoding
+            headers = {}
+
+            if content_type == "application/pdf" or filename.lower().endswith(".pdf"):
+                headers["Content-Disposition"] = (
+                    f"inline; filename*=UTF-8''{encoded_filename}"
                 )
+                content_type = "application/pdf"
+            elif content_type != "text/plain":
+                headers["Content-Disposition"] = (
+                    f"attachment; filename*=UTF-8''{encoded_filename}"
+                )
+
+            return await get_file_response(
+                request, user, file, headers, media_type=content_type
+            )
+        except HTTPException as e:
+            raise e
         except Exception as e:
             log.exception(e)
             log.error("Error getting file content")
@@ -280,22 +487,15 @@ async def get_file_content_by_id(id: str, user=Depends(get_verified_user)):
 
 
 @router.get("/{id}/content/html")
-async def get_html_file_content_by_id(id: str, user=Depends(get_verified_user)):
+async def get_html_file_content_by_id(
+    request: Request, id: str, user=Depends(get_verified_user)
+):
     file = Files.get_file_by_id(id)
     if file and (file.user_id == user.id or user.role == "admin"):
         try:
-            file_path = Storage.get_file(user.id, file.path)
-            file_path = Path(file_path)
-
-            # Check if the file already exists in the cache
-            if file_path.is_file():
-                log.info(f"file_path: {file_path}")
-                return FileResponse(file_path)
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=ERROR_MESSAGES.NOT_FOUND,
-                )
+            return await get_file_response(request, user, file, {})
+        except HTTPException as e:
+            raise e
         except Exception as e:
             log.exception(e)
             log.error("Error getting file content")
@@ -311,12 +511,12 @@ async def get_html_file_content_by_id(id: str, user=Depends(get_verified_user)):
 
 
 @router.get("/{id}/content/{file_name}")
-async def get_file_content_by_id(id: str, user=Depends(get_verified_user)):
+async def get_file_content_by_id(
+    request: Request, id: str, user=Depends(get_verified_user)
+):
     file = Files.get_file_by_id(id)
 
     if file and (file.user_id == user.id or user.role == "admin"):
-        file_path = file.path
-
         # Handle Unicode filenames
         filename = file.meta.get("name", file.filename)
         encoded_filename = quote(filename)  # RFC5987 encoding
@@ -324,22 +524,11 @@ async def get_file_content_by_id(id: str, user=Depends(get_verified_user)):
             "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"
         }
 
-        if file_path:
-            file_path = Storage.get_file(user.id, file_path)
-            file_path = Path(file_path)
-
-            # Check if the file already exists in the cache
-            if file_path.is_file():
-                return FileResponse(file_path, headers=headers)
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=ERROR_MESSAGES.NOT_FOUND,
-                )
+        if file.path:
+            return await get_file_response(request, user, file, headers)
         else:
             # File path doesn’t exist, return the content as .txt if possible
-            file_content = file.content.get("content", "")
-            file_name = file.filename
+            file_content = (file.data or {}).get("content", "")
 
             # Create a generator that encodes the file content
             def generator():
@@ -366,25 +555,16 @@ async def get_file_content_by_id(id: str, user=Depends(get_verified_user)):
 async def delete_file_by_id(id: str, user=Depends(get_verified_user)):
     file = Files.get_file_by_id(id)
     if file and (file.user_id == user.id or user.role == "admin"):
-        # We should add Chroma cleanup here
-
-        result = Files.delete_file_by_id(id)
-        if result:
-            try:
-                Storage.delete_file(file.path)
-            except Exception as e:
-                log.exception(e)
-                log.error("Error deleting files")
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=ERROR_MESSAGES.DEFAULT("Error deleting files"),
-                )
-            return {"message": "File deleted successfully"}
-        else:
+        try:
+            release_file(file)
+        except Exception as e:
+            log.exception(e)
+            log.error("Error deleting files")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=ERROR_MESSAGES.DEFAULT("Error deleting file"),
+                detail=ERROR_MESSAGES.DEFAULT("Error deleting files"),
             )
+        return {"message": "File deleted successfully"}
     else:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,6 +1,6 @@
 from typing import List, Optional
 from pydantic import BaseModel
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Request
 import logging
 
 from open_webui.models.knowledge import (
@@ -16,11 +16,13 @@ from open_webui.routers.retrieval import (
     ProcessFileForm,
     process_files_batch,
     BatchProcessFilesForm,
+    release_file,
 )
 from open_webui.storage.provider import Storage
 
 from open_webui.constants import ERROR_MESSAGES
 from open_webui.utils.auth import get_verified_user
+from open_webui.utils.jobs import JOBS
 from open_webui.utils.access_control import has_access, has_permission
 
 
@@ -38,99 +40,67 @@ router = APIRouter()
 ############################
 
 
-@router.get("/", response_model=list[KnowledgeUserResponse])
-async def get_knowledge(user=Depends(get_verified_user)):
-    knowledge_bases = []
-
-    if user.role == "admin":
-        knowledge_bases = Knowledges.get_knowledge_bases()
-    else:
-        knowledge_bases = Knowledges.get_knowledge_bases_by_user_id(user.id, "read")
-
-    # Get files for each knowledge base
-    knowledge_with_files = []
-    for knowledge_base in knowledge_bases:
-        files = []
-        if knowledge_base.data:
-            files = Files.get_file_metadatas_by_ids(
-                knowledge_base.data.get("file_ids", [])
-            )
+# Knowledge bases with a reconciliation already scheduled
+reconciling_knowledge_ids: set[str] = set()
 
-            # Check if all files exist
-            if len(files) != len(knowledge_base.data.get("file_ids", [])):
-                missing_files = list(
-                    set(knowledge_base.data.get("file_ids", []))
-                    - set([file.id for file in files])
-                )
-                if missing_files:
-                    data = knowledge_base.data or {}
-                    file_ids = data.get("file_ids", [])
 
-                    for missing_file in missing_files:
-                        file_ids.remove(missing_file)
+def reconcile_knowledge_files(knowledge_ids: list[str]):
+    try:
+        updated_ids = Knowledges.remove_missing_files_by_ids(knowledge_ids)
+        if updated_ids:
+            log.info(f"Removed missing files from knowledge bases: {updated_ids}")
+    finally:
+        reconciling_knowledge_ids.difference_update(knowledge_ids)
 
-                    data["file_ids"] = file_ids
-                    Knowledges.update_knowledge_data_by_id(
-                        id=knowledge_base.id, data=data
-                    )
 
-                    files = Files.get_file_metadatas_by_ids(file_ids)
+def get_knowledge_bases_with_files(
+    user, permission: str, page: Optional[int], background_tasks: BackgroundTasks
+) -> list[KnowledgeUserResponse]:
+    skip, limit = None, None
+    if page is not None:
+        limit = 60
+        skip = (page - 1) * limit
 
-        knowledge_with_files.append(
-            KnowledgeUserResponse(
-                **knowledge_base.model_dump(),
-                files=files,
-            )
+    if user.role == "admin":
+        knowledge_bases = Knowledges.get_knowledge_bases(skip=skip, limit=limit)
+    else:
+        knowledge_bases = Knowledges.get_knowledge_bases_by_user_id(
+            user.id, permission, skip=skip, limit=limit
         )
 
-    return knowledge_with_files
-
-
-@router.get("/list", response_model=list[KnowledgeUserResponse])
-async def get_knowledge_list(user=Depends(get_verified_user)):
-    knowledge_bases = []
+    knowledge_with_files = Knowledges.get_knowledge_bases_with_files(knowledge_bases)
 
-    if user.role == "admin":
-        knowledge_bases = Knowledges.get_knowledge_bases()
-    else:
-        knowledge_bases = Knowledges.get_knowledge_bases_by_user_id(user.id, "write")
-
-    # Get files for each knowledge base
-    knowledge_with_files = []
-    for knowledge_base in knowledge_bases:
-        files = []
-        if knowledge_base.data:
-            files = Files.get_file_metadatas_by_ids(
-                knowledge_base.data.get("file_ids", [])
-            )
+    # Knowledge bases still listing deleted files are repaired after the response is sent
+    missing_ids = [
+        knowledge_base.id
+        for knowledge_base in knowledge_with_files
+        if len(knowledge_base.files)
+        != len(set((knowledge_base.data or {}).get("file_ids", [])))
+        and knowledge_base.id not in reconciling_knowledge_ids
+    ]
+    if missing_ids:
+        reconciling_knowledge_ids.update(missing_ids)
+        background_tasks.add_task(reconcile_knowledge_files, missing_ids)
 
-            # Check if all files exist
-            if len(files) != len(knowledge_base.data.get("file_ids", [])):
-                missing_files = list(
-                    set(knowledge_base.data.get("file_ids", []))
-                    - set([file.id for file in files])
-                )
-                if missing_files:
-                    data = knowledge_base.data or {}
-                    file_ids = data.get("file_ids", [])
+    return knowledge_with_files
 
-                    for missing_file in missing_files:
-                        file_ids.remove(missing_file)
 
-                    data["file_ids"] = file_ids
-                    Knowledges.update_knowledge_data_by_id(
-                        id=knowledge_base.id, data=data
-                    )
+@router.get("/", response_model=list[KnowledgeUserResponse])
+async def get_knowledge(
+    background_tasks: BackgroundTasks,
+    page: Optional[int] = None,
+    user=Depends(get_verified_user),
+):
+    return get_knowledge_bases_with_files(user, "read", page, background_tasks)
 
-                    files = Files.get_file_metadatas_by_ids(file_ids)
 
-        knowledge_with_files.append(
-            KnowledgeUserResponse(
-                **knowledge_base.model_dump(),
-                files=files,
-            )
-        )
-    return knowledge_with_files
+@router.get("/list", response_model=list[KnowledgeUserResponse])
+async def get_knowledge_list(
+    background_tasks: BackgroundTasks,
+    page: Optional[int] = None,
+    user=Depends(get_verified_user),
+):
+    return get_knowledge_bases_with_files(user, "write", page, background_tasks)
 
 
 ############################
@@ -168,6 +138,7 @@ async def create_new_knowledge(
 
 class KnowledgeFilesResponse(KnowledgeResponse):
     files: list[FileModel]
+    job_id: Optional[str] = None
 
 
 @router.get("/{id}", response_model=Optional[KnowledgeFilesResponse])
@@ -255,6 +226,7 @@ def add_file_to_knowledge_by_id(
     id: str,
     form_data: KnowledgeFileIdForm,
     user=Depends(get_verified_user),
+    process_in_background: bool = False,
 ):
     knowledge = Knowledges.get_knowledge_by_id(id=id)
 
@@ -280,59 +252,86 @@ def add_file_to_knowledge_by_id(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=ERROR_MESSAGES.NOT_FOUND,
         )
-    if not file.data:
+    if not file.data or file.data.get("status") == "failed":
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=ERROR_MESSAGES.FILE_NOT_PROCESSED,
         )
 
-    # Add content to the vector database
-    try:
-        process_file(
-            request,
-            ProcessFileForm(file_id=form_data.file_id, collection_name=id),
-            user=user,
-        )
-    except Exception as e:
-        log.debug(e)
+    data = knowledge.data or {}
+    file_ids = data.get("file_ids", [])
+
+    if form_data.file_id in file_ids:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e),
+            detail=ERROR_MESSAGES.DEFAULT("file_id"),
         )
 
-    if knowledge:
-        data = knowledge.data or {}
-        file_ids = data.get("file_ids", [])
-
-        if form_data.file_id not in file_ids:
-            file_ids.append(form_data.file_id)
-            data["file_ids"] = file_ids
-
-            knowledge = Knowledges.update_knowledge_data_by_id(id=id, data=data)
-
-            if knowledge:
-                files = Files.get_files_by_ids(file_ids)
-
-                return KnowledgeFilesResponse(
-                    **knowledge.model_dump(),
-                    files=files,
-                )
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=ERROR_MESSAGES.DEFAULT("knowledge"),
-                )
-        else:
+    payload = {"knowledge_id": id, "file_id": form_data.file_id}
+    if not process_in_background:
+        try:
+            add_file_to_knowledge_job(request, user, payload)
+        except Exception as e:
+            log.debug(e)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=ERROR_MESSAGES.DEFAULT("file_id"),
+                detail=str(e.detail) if hasattr(e, "detail") else str(e),
             )
-    else:
+        knowledge = Knowledges.get_knowledge_by_id(id=id)
+        return KnowledgeFilesResponse(
+            **knowledge.model_dump(),
+            files=Files.get_files_by_ids(knowledge.data.get("file_ids", [])),
+        )
+
+    # The file is listed right away and dropped again if processing fails,
+    # if it is still being extracted the job waits for that to finish first.
+    knowledge = Knowledges.add_file_ids_by_id(id, [form_data.file_id])
+    if not knowledge:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=ERROR_MESSAGES.NOT_FOUND,
+            detail=ERROR_MESSAGES.DEFAULT("knowledge"),
         )
 
+    job = JOBS.enqueue(
+        "add_file_to_knowledge",
+        user.id,
+        payload,
+        depends_on=file.data.get("job_id"),
+    )
+    return KnowledgeFilesResponse(
+        **knowledge.model_dump(),
+        files=Files.get_files_by_ids(knowledge.data.get("file_ids", [])),
+        job_id=job.id,
+    )
+
+
+@JOBS.register("add_file_to_knowledge")
+def add_file_to_knowledge_job(request: Request, user, payload: dict) -> dict:
+    """
+    Add the file's content to the knowledge base's vector collection and list the
+    file in the knowledge base, or unlist it if that fails.
+    """
+    id = payload["knowledge_id"]
+    file_id = payload["file_id"]
+    try:
+        file = Files.get_file_by_id(file_id)
+        if not file or not file.data or file.data.get("status") == "failed":
+            raise ValueError(ERROR_MESSAGES.FILE_NOT_PROCESSED)
+
+        process_file(
+            request,
+            ProcessFileForm(file_id=file_id, collection_name=id),
+            user=user,
+        )
+    except Exception as e:
+        Knowledges.remove_file_ids_by_id(id, [file_id])
+        raise e
+
+    if not Knowledges.add_file_ids_by_id(id, [file_id]):
+        raise ValueError(ERROR_MESSAGES.NOT_FOUND)
+
+    return {"knowledge_id": id, "file_id": file_id}
+
 
 @router.post("/{id}/file/update", response_model=Optional[KnowledgeFilesResponse])
 def update_file_from_knowledge_by_id(
@@ -441,26 +440,18 @@ def remove_file_from_knowledge_by_id(
         collection_name=knowledge.id, filter={"file_id": form_data.file_id}
     )
 
-    # Remove the file's collection from vector database
-    file_collection = f"file-{form_data.file_id}"
-    if VECTOR_DB_CLIENT.has_collection(collection_name=file_collection):
-        VECTOR_DB_CLIENT.delete_collection(collection_name=file_collection)
-
-    # Delete file from database
-    Files.delete_file_by_id(form_data.file_id)
+    # Delete the file, its collection and, when no other file shares them, its bytes
+    release_file(file)
 
     if knowledge:
         data = knowledge.data or {}
         file_ids = data.get("file_ids", [])
 
         if form_data.file_id in file_ids:
-            file_ids.remove(form_data.file_id)
-            data["file_ids"] = file_ids
-
-            knowledge = Knowledges.update_knowledge_data_by_id(id=id, data=data)
+            knowledge = Knowledges.remove_file_ids_by_id(id, [form_data.file_id])
 
             if knowledge:
-                files = Files.get_files_by_ids(file_ids)
+                files = Files.get_files_by_ids(knowledge.data.get("file_ids", []))
 
                 return KnowledgeFilesResponse(
                     **knowledge.model_dump(),
@@ -631,6 +622,7 @@ def add_files_to_knowledge_batch(
             request=request,
             form_data=BatchProcessFilesForm(files=files, collection_name=id),
             user=user,
+            process_in_background=False,
         )
     except Exception as e:
         log.error(
@@ -638,18 +630,15 @@ def add_files_to_knowledge_batch(
         )
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    # Add successful files to knowledge base
-    data = knowledge.data or {}
-    existing_file_ids = data.get("file_ids", [])
-
     # Only add files that were successfully processed
     successful_file_ids = [r.file_id for r in result.results if r.status == "completed"]
-    for file_id in successful_file_ids:
-        if file_id not in existing_file_ids:
-            existing_file_ids.append(file_id)
-
-    data["file_ids"] = existing_file_ids
-    knowledge = Knowledges.update_knowledge_data_by_id(id=id, data=data)
+    knowledge = Knowledges.add_file_ids_by_id(id, successful_file_ids)
+    if not knowledge:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT("knowledge"),
+        )
+    existing_file_ids = knowledge.data.get("file_ids", [])
 
     # If there were any errors, include them in the response
     if result.errors:
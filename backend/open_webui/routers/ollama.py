@@ -1,19 +1,14 @@
-# TODO: Implement a more intelligent load balancing mechanism for distributing requests among multiple backend instances.
-# Current implementation uses a simple round-robin approach (random.choice). Consider incorporating algorithms like weighted round-robin,
-# least connections, or least response time for better resource utilization and performance optimization.
-
 import asyncio
 import json
 import logging
 import os
-import random
 import re
 import time
+from contextlib import nullcontext
 from typing import Optional, Union
 from urllib.parse import urlparse
 import aiohttp
 from aiocache import cached
-import requests
 from open_webui.models.users import UserModel
 
 from open_webui.env import (
@@ -46,6 +41,7 @@ from open_webui.utils.payload import (
 )
 from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.utils.access_control import has_access
+from open_webui.utils.balancer import OLLAMA_BALANCER, is_backend_failure
 
 
 from open_webui.config import (
@@ -56,6 +52,7 @@ from open_webui.env import (
     SRC_LOG_LEVELS,
     AIOHTTP_CLIENT_TIMEOUT,
     AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST,
+    AIOHTTP_CLIENT_POOL_SIZE,
     BYPASS_MODEL_ACCESS_CONTROL,
 )
 from open_webui.constants import ERROR_MESSAGES
@@ -70,29 +67,60 @@ log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
 #
 ##########################################
 
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """
+    The session shared by all requests to Ollama, so connections are pooled and
+    kept alive. Timeouts are set per request. The pool is unbounded unless
+    AIOHTTP_CLIENT_POOL_SIZE is set, streamed chats would queue behind a limit.
+    """
+    global _session, _session_loop
+
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        _session = aiohttp.ClientSession(
+            trust_env=True,
+            connector=aiohttp.TCPConnector(limit=AIOHTTP_CLIENT_POOL_SIZE),
+        )
+        _session_loop = loop
+    return _session
+
+
+async def close_session():
+    global _session, _session_loop
+
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+
 
 async def send_get_request(url, key=None, user: UserModel = None):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
-            async with session.get(
-                url,
-                headers={
-                    "Content-Type": "application/json",
-                    **({"Authorization": f"Bearer {key}"} if key else {}),
-                    **(
-                        {
-                            "X-OpenWebUI-User-Name": user.name,
-                            "X-OpenWebUI-User-Id": user.id,
-                            "X-OpenWebUI-User-Email": user.email,
-                            "X-OpenWebUI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-            ) as response:
-                return await response.json()
+        session = await get_session()
+        async with session.get(
+            url,
+            timeout=timeout,
+            headers={
+                "Content-Type": "application/json",
+                **({"Authorization": f"Bearer {key}"} if key else {}),
+                **(
+                    {
+                        "X-OpenWebUI-User-Name": user.name,
+                        "X-OpenWebUI-User-Id": user.id,
+                        "X-OpenWebUI-User-Email": user.email,
+                        "X-OpenWebUI-User-Role": user.role,
+                    }
+                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
+                    else {}
+                ),
+            },
+        ) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
@@ -102,7 +130,10 @@ async def send_get_request(url, key=None, user: UserModel = None):
 async def cleanup_response(
     response: Optional[aiohttp.ClientResponse],
     session: Optional[aiohttp.ClientSession],
+    backend: Optional[str] = None,
 ):
+    if backend:
+        OLLAMA_BALANCER.end(backend)
     if response:
         response.close()
     if session:
@@ -116,17 +147,23 @@ async def send_post_request(
     key: Optional[str] = None,
     content_type: Optional[str] = None,
     user: UserModel = None,
+    backend: Optional[str] = None,
+    model: Optional[str] = None,
 ):
+    """
+    backend is the base URL of the Ollama instance the request is routed to,
+    its load and health are reported to the balancer.
+    """
 
     r = None
+    started = OLLAMA_BALANCER.begin(backend) if backend else None
     try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-        )
+        session = await get_session()
 
         r = await session.post(
             url,
             data=payload,
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
             headers={
                 "Content-Type": "application/json",
                 **({"Authorization": f"Bearer {key}"} if key else {}),
@@ -142,6 +179,12 @@ async def send_post_request(
                 ),
             },
         )
+        if backend:
+            OLLAMA_BALANCER.report(
+                backend, started, failed=r.status >= 500, model=model
+            )
+            # The balancer is done with the request once cleanup_response runs
+            started = None
         r.raise_for_status()
 
         if stream:
@@ -155,15 +198,28 @@ async def send_post_request(
                 status_code=r.status,
                 headers=response_headers,
                 background=BackgroundTask(
-                    cleanup_response, response=r, session=session
+                    cleanup_response, response=r, session=None, backend=backend
                 ),
             )
         else:
             res = await r.json()
-            await cleanup_response(r, session)
+            await cleanup_response(r, None, backend)
             return res
 
+    except asyncio.CancelledError:
+        # The client went away, which says nothing about the backend's health
+        if backend:
+            OLLAMA_BALANCER.end(backend)
+        if r is not None:
+            r.close()
+        raise
     except Exception as e:
+        if backend:
+            if started is not None:
+                # No response from the backend at all
+                OLLAMA_BALANCER.report(backend, failed=is_backend_failure(e))
+            OLLAMA_BALANCER.end(backend)
+
         detail = None
 
         if r is not None:
@@ -180,6 +236,69 @@ async def send_post_request(
         )
 
 
+async def send_request(
+    method: str,
+    url: str,
+    payload: Optional[Union[str, bytes]] = None,
+    key: Optional[str] = None,
+    user: UserModel = None,
+    timeout: Optional[int] = AIOHTTP_CLIENT_TIMEOUT,
+    backend: Optional[str] = None,
+):
+    """
+    Send a request over the shared session and return the decoded JSON response,
+    raising an HTTPException with Ollama's error message when it fails. Like in
+    send_post_request, backend is reported to the balancer.
+    """
+
+    status = None
+    body = None
+    try:
+        session = await get_session()
+        with OLLAMA_BALANCER.track(backend) if backend else nullcontext():
+            async with session.request(
+                method,
+                url,
+                data=payload,
+                headers={
+                    **({"Content-Type": "application/json"} if payload else {}),
+                    **({"Authorization": f"Bearer {key}"} if key else {}),
+                    **(
+                        {
+                            "X-OpenWebUI-User-Name": user.name,
+                            "X-OpenWebUI-User-Id": user.id,
+                            "X-OpenWebUI-User-Email": user.email,
+                            "X-OpenWebUI-User-Role": user.role,
+                        }
+                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
+                        else {}
+                    ),
+                },
+                timeout=aiohttp.ClientTimeout(total=timeout),
+            ) as r:
+                status = r.status
+                body = await r.text()
+                r.raise_for_status()
+
+        return json.loads(body) if body else None
+    except Exception as e:
+        log.exception(e)
+
+        detail = None
+        if status is not None:
+            try:
+                res = json.loads(body)
+                if "error" in res:
+                    detail = f"Ollama: {res['error']}"
+            except Exception:
+                detail = f"Ollama: {e}"
+
+        raise HTTPException(
+            status_code=status if status else 500,
+            detail=detail if detail else "Open WebUI: Server Connection Error",
+        )
+
+
 def get_api_key(idx, url, configs):
     parsed_url = urlparse(url)
     base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
@@ -295,6 +414,12 @@ async def update_config(
     }
 
 
+@router.get("/backends")
+async def get_backends(user=Depends(get_admin_user)):
+    # Load, latency, health and loaded models of each backend, as seen by this process
+    return OLLAMA_BALANCER.info()
+
+
 @cached(ttl=3)
 async def get_all_models(request: Request, user: UserModel = None):
     log.info("get_all_models()")
@@ -409,44 +534,13 @@ async def get_ollama_tags(
         url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
         key = get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS)
 
-        r = None
-        try:
-            r = requests.request(
-                method="GET",
-                url=f"{url}/api/tags",
-                headers={
-                    **({"Authorization": f"Bearer {key}"} if key else {}),
-                    **(
-                        {
-                            "X-OpenWebUI-User-Name": user.name,
-                            "X-OpenWebUI-User-Id": user.id,
-                            "X-OpenWebUI-User-Email": user.email,
-                            "X-OpenWebUI-User-Role": user.role,
-                        }
-                        if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                        else {}
-                    ),
-                },
-            )
-            r.raise_for_status()
-
-            models = r.json()
-        except Exception as e:
-            log.exception(e)
-
-            detail = None
-            if r is not None:
-                try:
-                    res = r.json()
-                    if "error" in res:
-                        detail = f"Ollama: {res['error']}"
-                except Exception:
-                    detail = f"Ollama: {e}"
-
-            raise HTTPException(
-                status_code=r.status_code if r else 500,
-                detail=detail if detail else "Open WebUI: Server Connection Error",
-            )
+        models = await send_request(
+            "GET",
+            f"{url}/api/tags",
+            key=key,
+            user=user,
+            timeout=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST,
+        )
 
     if user.role == "user" and not BYPASS_MODEL_ACCESS_CONTROL:
         models["models"] = await get_filtered_models(models, user)
@@ -492,28 +586,11 @@ async def get_ollama_versions(request: Request, url_idx: Optional[int] = None):
         else:
             url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
 
-            r = None
-            try:
-                r = requests.request(method="GET", url=f"{url}/api/version")
-                r.raise_for_status()
-
-                return r.json()
-            except Exception as e:
-                log.exception(e)
-
-                detail = None
-                if r is not None:
-                    try:
-                        res = r.json()
-                        if "error" in res:
-                            detail = f"Ollama: {res['error']}"
-                    except Exception:
-                        detail = f"Ollama: {e}"
-
-                raise HTTPException(
-                    status_code=r.status_code if r else 500,
-                    detail=detail if detail else "Open WebUI: Server Connection Error",
-                )
+            return await send_request(
+                "GET",
+                f"{url}/api/version",
+                timeout=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST,
+            )
     else:
         return {"version": False}
 
@@ -662,46 +739,14 @@ async def copy_model(
     url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
     key = get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS)
 
-    try:
-        r = requests.request(
-            method="POST",
-            url=f"{url}/api/copy",
-            headers={
-                "Content-Type": "application/json",
-                **({"Authorization": f"Bearer {key}"} if key else {}),
-                **(
-                    {
-                        "X-OpenWebUI-User-Name": user.name,
-                        "X-OpenWebUI-User-Id": user.id,
-                        "X-OpenWebUI-User-Email": user.email,
-                        "X-OpenWebUI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                    else {}
-                ),
-            },
-            data=form_data.model_dump_json(exclude_none=True).encode(),
-        )
-        r.raise_for_status()
-
-        log.debug(f"r.text: {r.text}")
-        return True
-    except Exception as e:
-        log.exception(e)
-
-        detail = None
-        if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    detail = f"Ollama: {res['error']}"
-            except Exception:
-                detail = f"Ollama: {e}"
-
-        raise HTTPException(
-            status_code=r.status_code if r else 500,
-            detail=detail if detail else "Open WebUI: Server Connection Error",
-        )
+    await send_request(
+        "POST",
+        f"{url}/api/copy",
+        payload=form_data.model_dump_json(exclude_none=True).encode(),
+        key=key,
+        user=user,
+    )
+    return True
 
 
 @router.delete("/api/delete")
@@ -727,46 +772,14 @@ async def delete_model(
     url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
     key = get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS)
 
-    try:
-        r = requests.request(
-            method="DELETE",
-            url=f"{url}/api/delete",
-            data=form_data.model_dump_json(exclude_none=True).encode(),
-            headers={
-                "Content-Type": "application/json",
-                **({"Authorization": f"Bearer {key}"} if key else {}),
-                **(
-                    {
-                        "X-OpenWebUI-User-Name": user.name,
-                        "X-OpenWebUI-User-Id": user.id,
-                        "X-OpenWebUI-User-Email": user.email,
-                        "X-OpenWebUI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                    else {}
-                ),
-            },
-        )
-        r.raise_for_status()
-
-        log.debug(f"r.text: {r.text}")
-        return True
-    except Exception as e:
-        log.exception(e)
-
-        detail = None
-        if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    detail = f"Ollama: {res['error']}"
-            except Exception:
-                detail = f"Ollama: {e}"
-
-        raise HTTPException(
-            status_code=r.status_code if r else 500,
-            detail=detail if detail else "Open WebUI: Server Connection Error",
-        )
+    await send_request(
+        "DELETE",
+        f"{url}/api/delete",
+        payload=form_data.model_dump_json(exclude_none=True).encode(),
+        key=key,
+        user=user,
+    )
+    return True
 
 
 @router.post("/api/show")
@@ -782,50 +795,17 @@ async def show_model_info(
             detail=ERROR_MESSAGES.MODEL_NOT_FOUND(form_data.name),
         )
 
-    url_idx = random.choice(models[form_data.name]["urls"])
-
-    url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
+    url, url_idx = await get_ollama_url(request, form_data.name)
     key = get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS)
 
-    try:
-        r = requests.request(
-            method="POST",
-            url=f"{url}/api/show",
-            headers={
-                "Content-Type": "application/json",
-                **({"Authorization": f"Bearer {key}"} if key else {}),
-                **(
-                    {
-                        "X-OpenWebUI-User-Name": user.name,
-                        "X-OpenWebUI-User-Id": user.id,
-                        "X-OpenWebUI-User-Email": user.email,
-                        "X-OpenWebUI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                    else {}
-                ),
-            },
-            data=form_data.model_dump_json(exclude_none=True).encode(),
-        )
-        r.raise_for_status()
-
-        return r.json()
-    except Exception as e:
-        log.exception(e)
-
-        detail = None
-        if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    detail = f"Ollama: {res['error']}"
-            except Exception:
-                detail = f"Ollama: {e}"
-
-        raise HTTPException(
-            status_code=r.status_code if r else 500,
-            detail=detail if detail else "Open WebUI: Server Connection Error",
-        )
+    return await send_request(
+        "POST",
+        f"{url}/api/show",
+        payload=form_data.model_dump_json(exclude_none=True).encode(),
+        key=key,
+        user=user,
+        backend=url,
+    )
 
 
 class GenerateEmbedForm(BaseModel):
@@ -856,7 +836,7 @@ async def embed(
             model = f"{model}:latest"
 
         if model in models:
-            url_idx = random.choice(models[model]["urls"])
+            url, url_idx = await get_ollama_url(request, model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -866,46 +846,14 @@ async def embed(
     url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
     key = get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS)
 
-    try:
-        r = requests.request(
-            method="POST",
-            url=f"{url}/api/embed",
-            headers={
-                "Content-Type": "application/json",
-                **({"Authorization": f"Bearer {key}"} if key else {}),
-                **(
-                    {
-                        "X-OpenWebUI-User-Name": user.name,
-                        "X-OpenWebUI-User-Id": user.id,
-                        "X-OpenWebUI-User-Email": user.email,
-                        "X-OpenWebUI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                    else {}
-                ),
-            },
-            data=form_data.model_dump_json(exclude_none=True).encode(),
-        )
-        r.raise_for_status()
-
-        data = r.json()
-        return data
-    except Exception as e:
-        log.exception(e)
-
-        detail = None
-        if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    detail = f"Ollama: {res['error']}"
-            except Exception:
-                detail = f"Ollama: {e}"
-
-        raise HTTPException(
-            status_code=r.status_code if r else 500,
-            detail=detail if detail else "Open WebUI: Server Connection Error",
-        )
+    return await send_request(
+        "POST",
+        f"{url}/api/embed",
+        payload=form_data.model_dump_json(exclude_none=True).encode(),
+        key=key,
+        user=user,
+        backend=url,
+    )
 
 
 class GenerateEmbeddingsForm(BaseModel):
@@ -935,7 +883,7 @@ async def embeddings(
             model = f"{model}:latest"
 
         if model in models:
-            url_idx = random.choice(models[model]["urls"])
+            url, url_idx = await get_ollama_url(request, model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -945,46 +893,14 @@ async def embeddings(
     url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
     key = get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS)
 
-    try:
-        r = requests.request(
-            method="POST",
-            url=f"{url}/api/embeddings",
-            headers={
-                "Content-Type": "application/json",
-                **({"Authorization": f"Bearer {key}"} if key else {}),
-                **(
-                    {
-                        "X-OpenWebUI-User-Name": user.name,
-                        "X-OpenWebUI-User-Id": user.id,
-                        "X-OpenWebUI-User-Email": user.email,
-                        "X-OpenWebUI-User-Role": user.role,
-                    }
-                    if ENABLE_FORWARD_USER_INFO_HEADERS and user
-                    else {}
-                ),
-            },
-            data=form_data.model_dump_json(exclude_none=True).encode(),
-        )
-        r.raise_for_status()
-
-        data = r.json()
-        return data
-    except Exception as e:
-        log.exception(e)
-
-        detail = None
-        if r is not None:
-            try:
-                res = r.json()
-                if "error" in res:
-                    detail = f"Ollama: {res['error']}"
-            except Exception:
-                detail = f"Ollama: {e}"
-
-        raise HTTPException(
-            status_code=r.status_code if r else 500,
-            detail=detail if detail else "Open WebUI: Server Connection Error",
-        )
+    return await send_request(
+        "POST",
+        f"{url}/api/embeddings",
+        payload=form_data.model_dump_json(exclude_none=True).encode(),
+        key=key,
+        user=user,
+        backend=url,
+    )
 
 
 class GenerateCompletionForm(BaseModel):
@@ -1020,7 +936,7 @@ async def generate_completion(
             model = f"{model}:latest"
 
         if model in models:
-            url_idx = random.choice(models[model]["urls"])
+            url, url_idx = await get_ollama_url(request, model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -1042,6 +958,8 @@ async def generate_completion(
         payload=form_data.model_dump_json(exclude_none=True).encode(),
         key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         user=user,
+        backend=url,
+        model=form_data.model,
     )
 
 
@@ -1084,7 +1002,27 @@ async def get_ollama_url(request: Request, model: str, url_idx: Optional[int] =
                 status_code=400,
                 detail=ERROR_MESSAGES.MODEL_NOT_FOUND(model),
             )
-        url_idx = random.choice(models[model].get("urls", []))
+
+        backends = []
+        for idx in models[model].get("urls", []):
+            url = request.app.state.config.OLLAMA_BASE_URLS[idx]
+            api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(
+                str(idx),
+                request.app.state.config.OLLAMA_API_CONFIGS.get(
+                    url, {}
+                ),  # Legacy support
+            )
+            prefix_id = api_config.get("prefix_id", None)
+            backends.append(
+                {
+                    "idx": idx,
+                    "url": url,
+                    "key": api_config.get("key", None),
+                    # The name the backend knows the model by
+                    "model": model.replace(f"{prefix_id}.", "") if prefix_id else model,
+                }
+            )
+        url_idx = OLLAMA_BALANCER.select(backends)
     url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
     return url, url_idx
 
@@ -1172,6 +1110,8 @@ async def generate_chat_completion(
         key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         content_type="application/x-ndjson",
         user=user,
+        backend=url,
+        model=payload["model"],
     )
 
 
@@ -1275,6 +1215,8 @@ async def generate_openai_completion(
         stream=payload.get("stream", False),
         key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         user=user,
+        backend=url,
+        model=payload["model"],
     )
 
 
@@ -1354,6 +1296,8 @@ async def generate_openai_chat_completion(
         stream=payload.get("stream", False),
         key=get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS),
         user=user,
+        backend=url,
+        model=payload["model"],
     )
 
 
@@ -1380,36 +1324,24 @@ async def get_openai_models(
 
     else:
         url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
-        try:
-            r = requests.request(method="GET", url=f"{url}/api/tags")
-            r.raise_for_status()
-
-            model_list = r.json()
-
-            models = [
-                {
-                    "id": model["model"],
-                    "object": "model",
-                    "created": int(time.time()),
-                    "owned_by": "openai",
-                }
-                for model in models["models"]
-            ]
-        except Exception as e:
-            log.exception(e)
-            error_detail = "Open WebUI: Server Connection Error"
-            if r is not None:
-                try:
-                    res = r.json()
-                    if "error" in res:
-                        error_detail = f"Ollama: {res['error']}"
-                except Exception:
-                    error_detail = f"Ollama: {e}"
+        key = get_api_key(url_idx, url, request.app.state.config.OLLAMA_API_CONFIGS)
 
-            raise HTTPException(
-                status_code=r.status_code if r else 500,
-                detail=error_detail,
-            )
+        model_list = await send_request(
+            "GET",
+            f"{url}/api/tags",
+            key=key,
+            user=user,
+            timeout=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST,
+        )
+        models = [
+            {
+                "id": model["model"],
+                "object": "model",
+                "created": int(time.time()),
+                "owned_by": "openai",
+            }
+            for model in model_list["models"]
+        ]
 
     if user.role == "user" and not BYPASS_MODEL_ACCESS_CONTROL:
         # Filter models based on user access control
@@ -1482,14 +1414,19 @@ async def download_file_stream(
                     yield f'data: {{"progress": {progress}, "completed": {current_size}, "total": {total_size}}}\n\n'
 
                 if done:
-                    file.seek(0)
-                    hashed = calculate_sha256(file)
+                    file.flush()
+                    hashed = await asyncio.to_thread(
+                        calculate_sha256, file_path, chunk_size
+                    )
                     file.seek(0)
 
                     url = f"{ollama_url}/api/blobs/sha256:{hashed}"
-                    response = requests.post(url, data=file)
+                    async with (await get_session()).post(
+                        url, data=file, timeout=aiohttp.ClientTimeout(total=None)
+                    ) as response:
+                        ok = response.ok
 
-                    if response.ok:
+                    if ok:
                         res = {
                             "done": done,
                             "blob": f"sha256:{hashed}",
@@ -1499,7 +1436,9 @@ async def download_file_stream(
 
                         yield f"data: {json.dumps(res)}\n\n"
                     else:
-                        raise "Ollama: Could not create blob, Please try again."
+                        raise Exception(
+                            "Ollama: Could not create blob, Please try again."
+                        )
 
 
 # url = "https://huggingface.co/TheBloke/stablelm-zephyr-3b-GGUF/resolve/main/stablelm-zephyr-3b.Q2_K.gguf"
@@ -1573,7 +1512,7 @@ async def upload_model(
         log.info(f"Total Model Size: {str(total_size)}")  # DEBUG
 
         # --- P2: SSE progress + calculate sha256 hash ---
-        file_hash = calculate_sha256(file_path, chunk_size)
+        file_hash = await asyncio.to_thread(calculate_sha256, file_path, chunk_size)
         log.info(f"Model Hash: {str(file_hash)}")  # DEBUG
         try:
             with open(file_path, "rb") as f:
@@ -1589,11 +1528,15 @@ async def upload_model(
                     yield f"data: {json.dumps(data_msg)}\n\n"
 
             # --- P3: Upload to ollama /api/blobs ---
+            session = await get_session()
             with open(file_path, "rb") as f:
                 url = f"{ollama_url}/api/blobs/sha256:{file_hash}"
-                response = requests.post(url, data=f)
+                async with session.post(
+                    url, data=f, timeout=aiohttp.ClientTimeout(total=None)
+                ) as response:
+                    ok = response.ok
 
-            if response.ok:
+            if ok:
                 log.info(f"Uploaded to /api/blobs")  # DEBUG
                 # Remove local file
                 os.remove(file_path)
@@ -1611,13 +1554,16 @@ async def upload_model(
 
                 # Call ollama /api/create
                 # https://github.com/ollama/ollama/blob/main/docs/api.md#create-a-model
-                create_resp = requests.post(
-                    url=f"{ollama_url}/api/create",
+                async with session.post(
+                    f"{ollama_url}/api/create",
                     headers={"Content-Type": "application/json"},
                     data=json.dumps(create_payload),
-                )
+                    timeout=aiohttp.ClientTimeout(total=None),
+                ) as create_resp:
+                    create_ok = create_resp.ok
+                    create_text = await create_resp.text()
 
-                if create_resp.ok:
+                if create_ok:
                     log.info(f"API SUCCESS!")  # DEBUG
                     done_msg = {
                         "done": True,
@@ -1627,9 +1573,7 @@ async def upload_model(
                     }
                     yield f"data: {json.dumps(done_msg)}\n\n"
                 else:
-                    raise Exception(
-                        f"Failed to create model in Ollama. {create_resp.text}"
-                    )
+                    raise Exception(f"Failed to create model in Ollama. {create_text}")
 
             else:
                 raise Exception("Ollama: Could not create blob, Please try again.")
@@ -5,6 +5,7 @@ import os
 import shutil
 
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 from typing import Iterator, List, Optional, Sequence, Union
@@ -73,12 +74,14 @@ from open_webui.utils.misc import (
     calculate_sha256_string,
 )
 from open_webui.utils.auth import get_admin_user, get_verified_user
+from open_webui.utils.jobs import JOBS
 
 
 from open_webui.config import (
     ENV,
     RAG_EMBEDDING_MODEL_AUTO_UPDATE,
     RAG_EMBEDDING_MODEL_TRUST_REMOTE_CODE,
+    RAG_FILE_BATCH_CONCURRENCY,
     RAG_RERANKING_MODEL_AUTO_UPDATE,
     RAG_RERANKING_MODEL_TRUST_REMOTE_CODE,
     UPLOAD_DIR,
@@ -905,6 +908,115 @@ def save_docs_to_vector_db(
         raise e
 
 
+def copy_processed_file(request: Request, file: FileModel) -> Optional[dict]:
+    """
+    Reuse the extracted text and embeddings of an earlier upload with the same bytes.
+    Returns None when there is nothing to reuse and the file has to be processed.
+    """
+    embedding_config = json.dumps(
+        {
+            "engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
+            "model": request.app.state.config.RAG_EMBEDDING_MODEL,
+        }
+    )
+    bypass_embedding = request.app.state.config.BYPASS_EMBEDDING_AND_RETRIEVAL
+
+    try:
+        for source in Files.get_files_by_path(file.path):
+            if source.id == file.id or not source.hash:
+                continue
+
+            collection_name = None
+            if not bypass_embedding:
+                # Only files that were embedded successfully have their collection recorded
+                if (source.meta or {}).get("collection_name") != f"file-{source.id}":
+                    continue
+
+                items = []
+                for result in VECTOR_DB_CLIENT.iter_items(
+                    f"file-{source.id}", fields=("documents", "metadatas", "vectors")
+                ):
+                    for text, metadata, vector in zip(
+                        result.documents[0], result.metadatas[0], result.vectors[0]
+                    ):
+                        items.append(
+                            {
+                                "id": str(uuid.uuid4()),
+                                "text": text,
+                                "vector": vector,
+                                "metadata": {
+                                    **metadata,
+                                    "name": file.filename,
+                                    "created_by": file.user_id,
+                                    "file_id": file.id,
+                                    "source": file.filename,
+                                },
+                            }
+                        )
+
+                # Vectors from another embedding model are not comparable, embed again
+                if not items or any(
+                    item["metadata"].get("embedding_config") != embedding_config
+                    for item in items
+                ):
+                    continue
+
+                collection_name = f"file-{file.id}"
+                VECTOR_DB_CLIENT.insert(collection_name=collection_name, items=items)
+
+            text_content = (source.data or {}).get("content", "")
+            Files.update_files_by_ids(
+                {
+                    file.id: {
+                        "hash": source.hash,
+                        "data": {"content": text_content},
+                        **(
+                            {"meta": {"collection_name": collection_name}}
+                            if collection_name
+                            else {}
+                        ),
+                    }
+                }
+            )
+            log.info(f"Reused processed content of file {source.id} for {file.id}")
+            return {
+                "status": True,
+                "collection_name": collection_name,
+                "filename": file.filename,
+                "content": text_content,
+            }
+    except Exception as e:
+        # Fall back to processing the file from scratch
+        log.exception(f"Error reusing processed content for file {file.id}: {e}")
+
+    return None
+
+
+def release_file(file: FileModel):
+    """
+    Delete the file with its vectors. Deduplicated files share their stored bytes,
+    which are only deleted with the last file referencing them.
+    """
+    Files.delete_file_by_id(file.id)
+
+    collection_name = f"file-{file.id}"
+    if VECTOR_DB_CLIENT.has_collection(collection_name=collection_name):
+        VECTOR_DB_CLIENT.delete_collection(collection_name=collection_name)
+
+    release_blob(file.user_id, file.path)
+
+
+def release_blob(user_id: str, path: Optional[str]):
+    """
+    Delete stored bytes that no file references anymore.
+    """
+    if not path:
+        return
+    with Files.lock_blob(os.path.basename(path)):
+        if Files.count_files_by_path(path) == 0:
+            Storage.delete_file(user_id, path)
+
+
 class ProcessFileForm(BaseModel):
     file_id: str
     content: Optional[str] = None
@@ -985,6 +1097,9 @@ def process_file(
             # Process the file and save the content
             # Usage: /files/
             file_path = file.path
+            if file_path and (result := copy_processed_file(request, file)):
+                return result
+
             if file_path:
                 file_path = Storage.get_file(user.id, file_path)
                 loader = Loader(
@@ -1661,6 +1776,19 @@ class BatchProcessFilesResult(BaseModel):
 class BatchProcessFilesResponse(BaseModel):
     results: List[BatchProcessFilesResult]
     errors: List[BatchProcessFilesResult]
+    job_id: Optional[str] = None
+
+
+@JOBS.register("process_files_batch")
+def process_files_batch_job(request: Request, user, payload: dict) -> dict:
+    # Reload the files, their content may have changed since the job was queued
+    form_data = BatchProcessFilesForm(
+        files=Files.get_files_by_ids([file["id"] for file in payload["files"]]),
+        collection_name=payload["collection_name"],
+    )
+    return process_files_batch(
+        request, form_data, user=user, process_in_background=False
+    ).model_dump()
 
 
 @router.post("/process/files/batch")
@@ -1668,21 +1796,46 @@ def process_files_batch(
     request: Request,
     form_data: BatchProcessFilesForm,
     user=Depends(get_verified_user),
+    process_in_background: bool = False,
 ) -> BatchProcessFilesResponse:
     """
     Process a batch of files and save them to the vector database.
+    With process_in_background the batch is queued instead, and the response
+    only carries the job id.
     """
+    if process_in_background:
+        job = JOBS.enqueue(
+            "process_files_batch",
+            user.id,
+            {
+                "files": [{"id": file.id} for file in form_data.files],
+                "collection_name": form_data.collection_name,
+            },
+        )
+        return BatchProcessFilesResponse(
+            results=[
+                BatchProcessFilesResult(file_id=file.id, status="pending")
+                for file in form_data.files
+            ],
+            errors=[],
+            job_id=job.id,
+        )
+
     results: List[BatchProcessFilesResult] = []
     errors: List[BatchProcessFilesResult] = []
     collection_name = form_data.collection_name
 
-    # Prepare all documents first
-    all_docs: List[Document] = []
+    # Prepare the documents of every file first
+    file_docs: dict[str, List[Document]] = {}
+    file_updates: dict[str, dict] = {}
     for file in form_data.files:
         try:
+            if (file.data or {}).get("status") in ("pending", "processing"):
+                raise ValueError(ERROR_MESSAGES.FILE_NOT_PROCESSED)
+
             text_content = file.data.get("content", "")
 
-            docs: List[Document] = [
+            file_docs[file.id] = [
                 Document(
                     page_content=text_content.replace("<br/>", "\n"),
                     metadata={
@@ -1694,13 +1847,10 @@ def process_files_batch(
                     },
                 )
             ]
-
-            hash = calculate_sha256_string(text_content)
-            Files.update_file_hash_by_id(file.id, hash)
-            Files.update_file_data_by_id(file.id, {"content": text_content})
-
-            all_docs.extend(docs)
-            results.append(BatchProcessFilesResult(file_id=file.id, status="prepared"))
+            file_updates[file.id] = {
+                "hash": calculate_sha256_string(text_content),
+                "data": {"content": text_content},
+            }
 
         except Exception as e:
             log.error(f"process_files_batch: Error processing file {file.id}: {str(e)}")
@@ -1708,32 +1858,54 @@ def process_files_batch(
                 BatchProcessFilesResult(file_id=file.id, status="failed", error=str(e))
             )
 
-    # Save all documents in one batch
-    if all_docs:
-        try:
-            save_docs_to_vector_db(
-                request=request,
-                docs=all_docs,
-                collection_name=collection_name,
-                add=True,
-                user=user,
-            )
+    # Store all hashes and contents in one transaction
+    Files.update_files_by_ids(file_updates)
 
-            # Update all files with collection name
-            for result in results:
-                Files.update_file_metadata_by_id(
-                    result.file_id, {"collection_name": collection_name}
+    def save_file_docs(file_id: str):
+        save_docs_to_vector_db(
+            request=request,
+            docs=file_docs[file_id],
+            collection_name=collection_name,
+            add=True,
+            user=user,
+        )
+
+    # Embed the files concurrently, a file that fails does not fail the others
+    with ThreadPoolExecutor(max_workers=max(1, RAG_FILE_BATCH_CONCURRENCY)) as executor:
+        futures = {
+            executor.submit(save_file_docs, file_id): file_id for file_id in file_docs
+        }
+        for future in as_completed(futures):
+            file_id = futures[future]
+            try:
+                future.result()
+                result = BatchProcessFilesResult(file_id=file_id, status="completed")
+            except Exception as e:
+                log.error(
+                    f"process_files_batch: Error saving file {file_id} to vector DB: {str(e)}"
+                )
+                result = BatchProcessFilesResult(
+                    file_id=file_id, status="failed", error=str(e)
                 )
-                result.status = "completed"
+                errors.append(result)
+            results.append(result)
 
-        except Exception as e:
-            log.error(
-                f"process_files_batch: Error saving documents to vector DB: {str(e)}"
+            JOBS.report_progress(
+                {
+                    "total": len(form_data.files),
+                    "done": len(results) + len(form_data.files) - len(file_docs),
+                    "failed": len(errors),
+                    "file": result.model_dump(),
+                }
             )
-            for result in results:
-                result.status = "failed"
-                errors.append(
-                    BatchProcessFilesResult(file_id=result.file_id, error=str(e))
-                )
+
+    # Record the collection of every embedded file in one transaction
+    Files.update_files_by_ids(
+        {
+            result.file_id: {"meta": {"collection_name": collection_name}}
+            for result in results
+            if result.status == "completed"
+        }
+    )
 
     return BatchProcessFilesResponse(results=results, errors=errors)
@@ -6,16 +6,17 @@ import time
 
 from open_webui.models.users import Users, UserNameResponse
 from open_webui.models.channels import Channels
-from open_webui.models.chats import Chats
 
 from open_webui.env import (
     ENABLE_WEBSOCKET_SUPPORT,
     WEBSOCKET_MANAGER,
     WEBSOCKET_REDIS_URL,
     WEBSOCKET_REDIS_LOCK_TIMEOUT,
+    WEBSOCKET_FRAME_INTERVAL,
 )
 from open_webui.utils.auth import decode_token
-from open_webui.socket.utils import RedisDict, RedisLock
+from open_webui.socket.utils import AsyncDict, AsyncRedisDict, RedisLock
+from open_webui.utils.message_buffer import MESSAGE_BUFFER
 
 from open_webui.env import (
     GLOBAL_LOG_LEVEL,
@@ -55,9 +56,11 @@ TIMEOUT_DURATION = 3
 
 if WEBSOCKET_MANAGER == "redis":
     log.debug("Using Redis to manage websockets.")
-    SESSION_POOL = RedisDict("open-webui:session_pool", redis_url=WEBSOCKET_REDIS_URL)
-    USER_POOL = RedisDict("open-webui:user_pool", redis_url=WEBSOCKET_REDIS_URL)
-    USAGE_POOL = RedisDict("open-webui:usage_pool", redis_url=WEBSOCKET_REDIS_URL)
+    # Session id -> user, user id -> {session id: connected at},
+    # model id -> {session id: {"updated_at"}}
+    SESSION_POOL = AsyncRedisDict("open-webui:sessions", redis_url=WEBSOCKET_REDIS_URL)
+    USER_POOL = AsyncRedisDict("open-webui:users", redis_url=WEBSOCKET_REDIS_URL)
+    USAGE_POOL = AsyncRedisDict("open-webui:usage", redis_url=WEBSOCKET_REDIS_URL)
 
     clean_up_lock = RedisLock(
         redis_url=WEBSOCKET_REDIS_URL,
@@ -68,9 +71,9 @@ if WEBSOCKET_MANAGER == "redis":
     renew_func = clean_up_lock.renew_lock
     release_func = clean_up_lock.release_lock
 else:
-    SESSION_POOL = {}
-    USER_POOL = {}
-    USAGE_POOL = {}
+    SESSION_POOL = AsyncDict()
+    USER_POOL = AsyncDict()
+    USAGE_POOL = AsyncDict()
     aquire_func = release_func = renew_func = lambda: True
 
 
@@ -85,30 +88,11 @@ async def periodic_usage_pool_cleanup():
                 log.error(f"Unable to renew cleanup lock. Exiting usage pool cleanup.")
                 raise Exception("Unable to renew usage pool cleanup lock.")
 
-            now = int(time.time())
-            send_usage = False
-            for model_id, connections in list(USAGE_POOL.items()):
-                # Creating a list of sids to remove if they have timed out
-                expired_sids = [
-                    sid
-                    for sid, details in connections.items()
-                    if now - details["updated_at"] > TIMEOUT_DURATION
-                ]
-
-                for sid in expired_sids:
-                    del connections[sid]
-
-                if not connections:
-                    log.debug(f"Cleaning up model {model_id} from usage pool")
-                    del USAGE_POOL[model_id]
-                else:
-                    USAGE_POOL[model_id] = connections
-
-                send_usage = True
-
-            if send_usage:
+            # Only the sids past their deadline are visited
+            removed = await USAGE_POOL.pop_expired()
+            if removed:
                 # Emit updated usage information after cleaning
-                await sio.emit("usage", {"models": get_models_in_use()})
+                await emit_usage(removed=removed)
 
             await asyncio.sleep(TIMEOUT_DURATION)
     finally:
@@ -121,26 +105,53 @@ app = socketio.ASGIApp(
 )
 
 
-def get_models_in_use():
+def get_user_room(user_id):
+    # Every session of a user joins its room, so one emit reaches all of them
+    return f"user:{user_id}"
+
+
+async def add_user_session(sid, user):
+    await SESSION_POOL.set(sid, user.model_dump())
+    await USER_POOL.set_field(user.id, sid, int(time.time()))
+    await sio.enter_room(sid, get_user_room(user.id))
+
+
+async def get_models_in_use():
     # List models that are currently in use
-    models_in_use = list(USAGE_POOL.keys())
+    models_in_use = await USAGE_POOL.keys()
     return models_in_use
 
 
+async def emit_usage(added=None, removed=None, to=None):
+    # Sent when the set of models in use changes, along with what changed
+    await sio.emit(
+        "usage",
+        {
+            "models": await get_models_in_use(),
+            "added": added or [],
+            "removed": removed or [],
+        },
+        to=to,
+    )
+
+
 @sio.on("usage")
 async def usage(sid, data):
     model_id = data["model"]
     # Record the timestamp for the last update
     current_time = int(time.time())
 
-    # Store the new usage data and task
-    USAGE_POOL[model_id] = {
-        **(USAGE_POOL[model_id] if model_id in USAGE_POOL else {}),
-        sid: {"updated_at": current_time},
-    }
+    # Store the new usage data and task, expired by periodic_usage_pool_cleanup
+    added = await USAGE_POOL.set_field(
+        model_id,
+        sid,
+        {"updated_at": current_time},
+        expires_at=current_time + TIMEOUT_DURATION,
+    )
 
-    # Broadcast the usage data to all clients
-    await sio.emit("usage", {"models": get_models_in_use()})
+    # Heartbeats of models already in use change nothing for the other clients
+    if added:
+        await emit_usage(added=[model_id])
 
 
 @sio.event
@@ -153,15 +164,12 @@ async def connect(sid, environ, auth):
             user = Users.get_user_by_id(data["id"])
 
         if user:
-            SESSION_POOL[sid] = user.model_dump()
-            if user.id in USER_POOL:
-                USER_POOL[user.id] = USER_POOL[user.id] + [sid]
-            else:
-                USER_POOL[user.id] = [sid]
+            await add_user_session(sid, user)
 
             # print(f"user {user.name}({user.id}) connected with session ID {sid}")
-            await sio.emit("user-list", {"user_ids": list(USER_POOL.keys())})
-            await sio.emit("usage", {"models": get_models_in_use()})
+            await sio.emit("user-list", {"user_ids": await USER_POOL.keys()})
+            # Only the new client needs the current usage
+            await emit_usage(to=sid)
 
 
 @sio.on("user-join")
@@ -179,11 +187,7 @@ async def user_join(sid, data):
     if not user:
         return
 
-    SESSION_POOL[sid] = user.model_dump()
-    if user.id in USER_POOL:
-        USER_POOL[user.id] = USER_POOL[user.id] + [sid]
-    else:
-        USER_POOL[user.id] = [sid]
+    await add_user_session(sid, user)
 
     # Join all the channels
     channels = Channels.get_channels_by_user_id(user.id)
@@ -193,7 +197,7 @@ async def user_join(sid, data):
 
     # print(f"user {user.name}({user.id}) connected with session ID {sid}")
 
-    await sio.emit("user-list", {"user_ids": list(USER_POOL.keys())})
+    await sio.emit("user-list", {"user_ids": await USER_POOL.keys()})
     return {"id": user.id, "name": user.name}
 
 
@@ -240,7 +244,7 @@ async def channel_events(sid, data):
                 "channel_id": data["channel_id"],
                 "message_id": data.get("message_id", None),
                 "data": event_data,
-                "user": UserNameResponse(**SESSION_POOL[sid]).model_dump(),
+                "user": UserNameResponse(**(await SESSION_POOL.get(sid))).model_dump(),
             },
             room=room,
         )
@@ -248,35 +252,42 @@ async def channel_events(sid, data):
 
 @sio.on("user-list")
 async def user_list(sid):
-    await sio.emit("user-list", {"user_ids": list(USER_POOL.keys())})
+    await sio.emit("user-list", {"user_ids": await USER_POOL.keys()})
 
 
 @sio.event
 async def disconnect(sid):
-    if sid in SESSION_POOL:
-        user = SESSION_POOL[sid]
-        del SESSION_POOL[sid]
-
-        user_id = user["id"]
-        USER_POOL[user_id] = [_sid for _sid in USER_POOL[user_id] if _sid != sid]
+    user = await SESSION_POOL.get(sid)
+    if user:
+        await SESSION_POOL.delete(sid)
 
-        if len(USER_POOL[user_id]) == 0:
-            del USER_POOL[user_id]
+        await USER_POOL.delete_field(user["id"], sid)
 
-        await sio.emit("user-list", {"user_ids": list(USER_POOL.keys())})
+        await sio.emit("user-list", {"user_ids": await USER_POOL.keys()})
     else:
         pass
         # print(f"Unknown session ID {sid} disconnected")
 
 
+def is_frame_event(event_data):
+    # Completion updates carrying the whole content so far, only the latest matters
+    data = event_data.get("data")
+    return (
+        event_data.get("type") == "chat:completion"
+        and isinstance(data, dict)
+        and "content" in data
+        and not any(key in data for key in ("choices", "done", "error"))
+    )
+
+
 def get_event_emitter(request_info):
-    async def __event_emitter__(event_data):
-        user_id = request_info["user_id"]
-        session_ids = list(
-            set(USER_POOL.get(user_id, []) + [request_info["session_id"]])
-        )
+    # Completion updates are merged and sent at most once per frame interval
+    frame = {}
+    frame_task = None
+    emit_lock = asyncio.Lock()
 
-        for session_id in session_ids:
+    async def emit(event_data):
+        async with emit_lock:
             await sio.emit(
                 "chat-events",
                 {
@@ -284,41 +295,61 @@ def get_event_emitter(request_info):
                     "message_id": request_info.get("message_id", None),
                     "data": event_data,
                 },
-                to=session_id,
+                to=[
+                    get_user_room(request_info["user_id"]),
+                    request_info["session_id"],
+                ],
             )
 
+    async def flush_frame():
+        nonlocal frame_task
+        if frame_task is not None:
+            frame_task.cancel()
+            frame_task = None
+
+        if frame:
+            data = frame.copy()
+            frame.clear()
+            await emit({"type": "chat:completion", "data": data})
+
+    async def emit_frame_later():
+        nonlocal frame_task
+        await asyncio.sleep(WEBSOCKET_FRAME_INTERVAL)
+        frame_task = None
+        await flush_frame()
+
+    async def __event_emitter__(event_data):
+        nonlocal frame_task
+        if WEBSOCKET_FRAME_INTERVAL > 0 and is_frame_event(event_data):
+            frame.update(event_data["data"])
+            if frame_task is None:
+                frame_task = asyncio.create_task(emit_frame_later())
+        else:
+            # Keep the order of events, pending updates go first
+            await flush_frame()
+            await emit(event_data)
+
+        # Saved through the write-behind buffer, see MessageWriteBuffer
         if "type" in event_data and event_data["type"] == "status":
-            Chats.add_message_status_to_chat_by_id_and_message_id(
+            MESSAGE_BUFFER.add_status(
                 request_info["chat_id"],
                 request_info["message_id"],
                 event_data.get("data", {}),
             )
 
         if "type" in event_data and event_data["type"] == "message":
-            message = Chats.get_message_by_id_and_message_id(
+            MESSAGE_BUFFER.append_content(
                 request_info["chat_id"],
                 request_info["message_id"],
-            )
-
-            content = message.get("content", "")
-            content += event_data.get("data", {}).get("content", "")
-
-            Chats.upsert_message_to_chat_by_id_and_message_id(
-                request_info["chat_id"],
-                request_info["message_id"],
-                {
-                    "content": content,
-                },
+                event_data.get("data", {}).get("content", ""),
             )
 
         if "type" in event_data and event_data["type"] == "replace":
-            content = event_data.get("data", {}).get("content", "")
-
-            Chats.upsert_message_to_chat_by_id_and_message_id(
+            MESSAGE_BUFFER.upsert_message(
                 request_info["chat_id"],
                 request_info["message_id"],
                 {
-                    "content": content,
+                    "content": event_data.get("data", {}).get("content", ""),
                 },
             )
 
@@ -344,28 +375,28 @@ def get_event_call(request_info):
 get_event_caller = get_event_call
 
 
-def get_user_id_from_session_pool(sid):
-    user = SESSION_POOL.get(sid)
+async def get_user_id_from_session_pool(sid):
+    user = await SESSION_POOL.get(sid)
     if user:
         return user["id"]
     return None
 
 
-def get_user_ids_from_room(room):
+async def get_user_ids_from_room(room):
     active_session_ids = sio.manager.get_participants(
         namespace="/",
         room=room,
     )
 
-    active_user_ids = list(
-        set(
-            [SESSION_POOL.get(session_id[0])["id"] for session_id in active_session_ids]
-        )
+    sessions = await SESSION_POOL.get_many(
+        [session_id[0] for session_id in active_session_ids]
     )
+
+    active_user_ids = list(set([user["id"] for user in sessions.values()]))
     return active_user_ids
 
 
-def get_active_status_by_user_id(user_id):
-    if user_id in USER_POOL:
+async def get_active_status_by_user_id(user_id):
+    if await USER_POOL.contains(user_id):
         return True
     return False
@@ -1,6 +1,24 @@
+import asyncio
+import heapq
 import json
-import redis
+import logging
+import math
+import time
 import uuid
+from functools import lru_cache
+from typing import Optional
+
+import redis
+import redis.asyncio
+
+from open_webui.env import (
+    ENABLE_WEBSOCKET_REDIS_KEYSPACE_NOTIFICATIONS,
+    SRC_LOG_LEVELS,
+    WEBSOCKET_POOL_CACHE_TTL,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["SOCKET"])
 
 
 class RedisLock:
@@ -85,3 +103,328 @@ class RedisDict:
         if key not in self:
             self[key] = default
         return self[key]
+
+
+# Seconds before a stopped change listener is restarted, doubled on each failure
+LISTENER_MIN_BACKOFF = 1.0
+LISTENER_MAX_BACKOFF = 60.0
+
+# Deletes a field and drops the entry from the index once it has no fields left
+DELETE_FIELD_SCRIPT = r"""
+redis.call('HDEL', KEYS[2], ARGV[2])
+redis.call('ZREM', KEYS[3], ARGV[3])
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    redis.call('SREM', KEYS[1], ARGV[1])
+end
+"""
+
+# Deletes the fields whose deadline has passed, returns the keys left without fields
+POP_EXPIRED_SCRIPT = r"""
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+local removed = {}
+for _, member in ipairs(expired) do
+    local sep = string.find(member, '\0', 1, true)
+    local key = string.sub(member, 1, sep - 1)
+    local entry = ARGV[2] .. key
+    redis.call('HDEL', entry, string.sub(member, sep + 1))
+    if redis.call('EXISTS', entry) == 0 and redis.call('SREM', KEYS[1], key) == 1 then
+        table.insert(removed, key)
+    end
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+return removed
+"""
+
+
+@lru_cache
+def get_async_redis(redis_url):
+    # One connection pool per server, shared by all the pools
+    return redis.asyncio.Redis.from_url(redis_url, decode_responses=True)
+
+
+class AsyncRedisDict:
+    """
+    A dict of dicts in Redis, for the socket.io session, user and usage pools,
+    with the asyncio client so that handlers do not block the event loop.
+
+    Each entry is a hash "{name}:{key}" of JSON fields, and the set "{name}"
+    indexes the keys. Fields are updated one at a time, so concurrent workers
+    adding or removing different fields of an entry do not overwrite each other.
+    Reads are served from a local cache for `cache_ttl` seconds, entries are
+    dropped from it earlier when Redis keyspace notifications report a change.
+    Notifications are only turned on by the pools with
+    ENABLE_WEBSOCKET_REDIS_KEYSPACE_NOTIFICATIONS, without them the cache only
+    expires with its TTL.
+
+    Fields can be given a deadline, kept in the sorted set "{name}:expiry", and
+    `pop_expired` deletes the ones that passed it without scanning the others.
+    """
+
+    def __init__(self, name, redis_url, cache_ttl=WEBSOCKET_POOL_CACHE_TTL):
+        self.name = name
+        self.redis = get_async_redis(redis_url)
+        self.cache_ttl = cache_ttl
+
+        self._cache: dict[str, tuple[float, dict]] = {}
+        self._keys: Optional[tuple[float, list]] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._listener_retry_at = 0.0
+        self._listener_backoff = LISTENER_MIN_BACKOFF
+        self._delete_field = self.redis.register_script(DELETE_FIELD_SCRIPT)
+        self._pop_expired = self.redis.register_script(POP_EXPIRED_SCRIPT)
+
+    def _entry_name(self, key):
+        return f"{self.name}:{key}"
+
+    @property
+    def _expiry_name(self):
+        return f"{self.name}:expiry"
+
+    @staticmethod
+    def _expiry_member(key, field):
+        return f"{key}\0{field}"
+
+    def _cached(self, key, value):
+        self._cache[key] = (time.monotonic() + self.cache_ttl, value)
+
+    def _invalidate(self, key=None):
+        if key is not None:
+            self._cache.pop(key, None)
+        self._keys = None
+
+    def _listen(self):
+        if self._listener is not None and not self._listener.done():
+            return
+        if time.monotonic() < self._listener_retry_at:
+            return
+        self._listener = asyncio.get_running_loop().create_task(
+            self._listen_for_changes()
+        )
+
+    async def _notifications_enabled(self) -> bool:
+        # Hash (h), set (s) and generic (g) commands on keys (K)
+        try:
+            events = (await self.redis.config_get("notify-keyspace-events")).get(
+                "notify-keyspace-events", ""
+            )
+        except Exception as e:
+            # CONFIG may be disabled, notifications may still be configured
+            log.debug(f"Could not read keyspace notification settings: {e}")
+            return True
+
+        missing = set("K" if "A" in events else "Kghs") - set(events)
+        if not missing:
+            return True
+        if not ENABLE_WEBSOCKET_REDIS_KEYSPACE_NOTIFICATIONS:
+            log.info(
+                f"Redis keyspace notifications are not enabled, {self.name} is "
+                f"cached for {self.cache_ttl}s without invalidation."
+            )
+            return False
+
+        await self.redis.config_set("notify-keyspace-events", events + "".join(missing))
+        return True
+
+    async def _listen_for_changes(self):
+        try:
+            if not await self._notifications_enabled():
+                # Without notifications the cache only expires with its TTL
+                self._listener_retry_at = math.inf
+                return
+
+            db = self.redis.connection_pool.connection_kwargs.get("db", 0)
+            prefix = f"__keyspace@{db}__:"
+            async with self.redis.pubsub() as pubsub:
+                await pubsub.psubscribe(
+                    f"{prefix}{self.name}", f"{prefix}{self._entry_name('*')}"
+                )
+                self._listener_backoff = LISTENER_MIN_BACKOFF
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    name = message["channel"][len(prefix) :]
+                    if name == self.name:
+                        self._invalidate()
+                    else:
+                        self._invalidate(name[len(self.name) + 1 :])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.debug(f"Not listening for changes to {self.name}: {e}")
+
+        # Changes may have been missed, and the listener is only restarted later
+        self._invalidate()
+        self._cache.clear()
+        self._listener_retry_at = time.monotonic() + self._listener_backoff
+        self._listener_backoff = min(self._listener_backoff * 2, LISTENER_MAX_BACKOFF)
+
+    async def get(self, key, default=None):
+        self._listen()
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            value = cached[1]
+        else:
+            value = {
+                k: json.loads(v)
+                for k, v in (await self.redis.hgetall(self._entry_name(key))).items()
+            }
+            self._cached(key, value)
+        return dict(value) if value else default
+
+    async def get_many(self, keys):
+        # Entries not in the cache are fetched in a single round trip
+        self._listen()
+        now = time.monotonic()
+        values = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > now:
+                values[key] = cached[1]
+            else:
+                missing.append(key)
+
+        if missing:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in missing:
+                    pipe.hgetall(self._entry_name(key))
+                for key, fields in zip(missing, await pipe.execute()):
+                    values[key] = {k: json.loads(v) for k, v in fields.items()}
+                    self._cached(key, values[key])
+
+        return {key: dict(value) for key, value in values.items() if value}
+
+    async def set(self, key, value: dict):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._entry_name(key))
+            if value:
+                pipe.hset(
+                    self._entry_name(key),
+                    mapping={k: json.dumps(v) for k, v in value.items()},
+                )
+                pipe.sadd(self.name, key)
+            else:
+                pipe.srem(self.name, key)
+            await pipe.execute()
+        self._invalidate(key)
+
+    async def set_field(self, key, field, value, expires_at=None) -> bool:
+        """
+        Sets a field, to be deleted by `pop_expired` once `expires_at` (a Unix
+        time) has passed if given. Returns whether the key is new.
+        """
+        member = self._expiry_member(key, field)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._entry_name(key), field, json.dumps(value))
+            pipe.sadd(self.name, key)
+            if expires_at is not None:
+                pipe.zadd(self._expiry_name, {member: expires_at})
+            else:
+                pipe.zrem(self._expiry_name, member)
+            results = await pipe.execute()
+        self._invalidate(key)
+        return results[1] == 1
+
+    async def delete_field(self, key, field):
+        await self._delete_field(
+            keys=[self.name, self._entry_name(key), self._expiry_name],
+            args=[key, field, self._expiry_member(key, field)],
+        )
+        self._invalidate(key)
+
+    async def pop_expired(self, now=None) -> list:
+        # Only the expired fields are touched, in O(log(n) + expired)
+        removed = await self._pop_expired(
+            keys=[self.name, self._expiry_name],
+            args=[time.time() if now is None else now, f"{self.name}:"],
+        )
+        if removed:
+            self._invalidate()
+            for key in removed:
+                self._cache.pop(key, None)
+        return list(removed)
+
+    async def delete(self, key):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._entry_name(key))
+            pipe.srem(self.name, key)
+            await pipe.execute()
+        self._invalidate(key)
+
+    async def keys(self):
+        self._listen()
+        if self._keys is None or self._keys[0] <= time.monotonic():
+            self._keys = (
+                time.monotonic() + self.cache_ttl,
+                list(await self.redis.smembers(self.name)),
+            )
+        return list(self._keys[1])
+
+    async def contains(self, key):
+        return key in await self.keys()
+
+
+class AsyncDict:
+    """
+    In-process counterpart of AsyncRedisDict, for a single worker.
+    """
+
+    def __init__(self):
+        self.data: dict[str, dict] = {}
+
+        # Heap of (deadline, key, field), superseded deadlines are skipped when popped
+        self.expiry: list[tuple[float, str, str]] = []
+        self.deadlines: dict[tuple[str, str], float] = {}
+
+    async def get(self, key, default=None):
+        value = self.data.get(key)
+        return dict(value) if value else default
+
+    async def get_many(self, keys):
+        return {key: dict(self.data[key]) for key in keys if key in self.data}
+
+    async def set(self, key, value: dict):
+        if value:
+            self.data[key] = dict(value)
+        else:
+            self.data.pop(key, None)
+
+    async def set_field(self, key, field, value, expires_at=None) -> bool:
+        added = key not in self.data
+        self.data.setdefault(key, {})[field] = value
+        if expires_at is not None:
+            self.deadlines[(key, field)] = expires_at
+            heapq.heappush(self.expiry, (expires_at, key, field))
+        else:
+            self.deadlines.pop((key, field), None)
+        return added
+
+    async def delete_field(self, key, field):
+        self.deadlines.pop((key, field), None)
+        fields = self.data.get(key)
+        if fields is not None:
+            fields.pop(field, None)
+            if not fields:
+                del self.data[key]
+
+    async def pop_expired(self, now=None) -> list:
+        now = time.time() if now is None else now
+        removed = []
+        while self.expiry and self.expiry[0][0] <= now:
+            expires_at, key, field = heapq.heappop(self.expiry)
+            if self.deadlines.get((key, field)) != expires_at:
+                continue
+            await self.delete_field(key, field)
+            if key not in self.data:
+                removed.append(key)
+        return removed
+
+    async def delete(self, key):
+        for field in self.data.pop(key, {}):
+            self.deadlines.pop((key, field), None)
+
+    async def keys(self):
+        return list(self.data.keys())
+
+    async def contains(self, key):
+        return key in self.data
@@ -0,0 +1,368 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from open_webui.config import STORAGE_CACHE_DIR, STORAGE_CACHE_MAX_SIZE
+from open_webui.env import SRC_LOG_LEVELS
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+# Seconds after which a temporary entry left behind by a dead process, or a
+# checkout handed to a caller, is removed
+TMP_MAX_AGE = 3600
+# Seconds between two sweeps of the expired checkouts
+SWEEP_INTERVAL = 60
+
+CHECKOUT_DIR = "checkouts"
+LOCK_FILE = ".lock"
+
+
+def touch(file_path: str):
+    """
+    Recency survives restarts and is shared between workers through the access time.
+    """
+    os.utime(file_path, (time.time(), os.path.getmtime(file_path)))
+
+
+class StorageCache:
+    """
+    Size-bounded on-disk LRU cache of objects downloaded from remote storage.
+
+    Entries are keyed by the object's storage path and validated against its
+    ETag, so a changed object is downloaded again. Concurrent misses for the
+    same key wait for a single download. Each entry is a directory holding the
+    file under its original name plus a small JSON sidecar, which lets the index
+    be rebuilt when the process restarts.
+
+    Callers are given a hard link to the cached file in a checkout directory of
+    their own, never the entry itself, so evicting or replacing an entry does not
+    remove a file that is still being read. Checkouts are removed once they are
+    older than TMP_MAX_AGE, a file opened by then stays readable until closed.
+
+    Worker processes sharing the directory store and evict entries under a file
+    lock, from the entries found on disk, so max_size bounds the whole directory.
+    """
+
+    def __init__(self, path: str, max_size: int):
+        self.path = path
+        self.max_size = max_size
+        os.makedirs(os.path.join(self.path, CHECKOUT_DIR), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._dir_mutex = threading.Lock()
+        # key -> {"etag", "size", "file"}, least recently used first
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._downloads: dict[str, threading.Event] = {}
+        self._size = 0
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+        self._swept_at = 0.0
+
+        self._sweep()
+        with self._dir_lock():
+            trash = self._evict()
+        for trash_dir in trash:
+            shutil.rmtree(trash_dir, ignore_errors=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.path, hashlib.sha256(key.encode()).hexdigest())
+
+    @contextmanager
+    def _dir_lock(self):
+        # Serialise changes to the entries between threads and worker processes
+        with self._dir_mutex:
+            if fcntl is None:
+                yield
+                return
+
+            with open(os.path.join(self.path, LOCK_FILE), "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _scan(self) -> list[dict]:
+        # Complete entries on disk, least recently used first, called with the directory lock held
+        entries = []
+        for name in os.listdir(self.path):
+            entry_dir = os.path.join(self.path, name)
+            if name in (CHECKOUT_DIR, LOCK_FILE):
+                continue
+            if name.endswith(".tmp"):
+                # Possibly still being filled by another worker, only remove stale ones
+                try:
+                    if time.time() - os.path.getmtime(entry_dir) > TMP_MAX_AGE:
+                        shutil.rmtree(entry_dir, ignore_errors=True)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(os.path.join(entry_dir, "meta.json")) as f:
+                    entry = json.load(f)
+                entries.append((os.stat(entry["file"]).st_atime, entry))
+                continue
+            except Exception:
+                pass
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        return [entry for _, entry in sorted(entries, key=lambda item: item[0])]
+
+    def _discard(self, entry_dir: str) -> Optional[str]:
+        # Move the entry out of the way, called with the directory lock held. The
+        # returned directory is deleted by the caller once no lock is held.
+        trash_dir = f"{entry_dir}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.replace(entry_dir, trash_dir)
+        except FileNotFoundError:
+            return None
+        return trash_dir
+
+    def _evict(self) -> list[str]:
+        # Drop least recently used entries until the directory fits and reload the index
+        # from disk, called with the directory lock held. Returns the directories to delete.
+        entries = self._scan()
+        size = sum(entry["size"] for entry in entries)
+        trash = []
+        while size > self.max_size and len(entries) > 1:
+            entry = entries.pop(0)
+            size -= entry["size"]
+            trash.append(self._discard(os.path.dirname(entry["file"])))
+
+        with self._lock:
+            self._entries = OrderedDict((entry["key"], entry) for entry in entries)
+            self._size = size
+            self._stats["evictions"] += len(trash)
+        return [trash_dir for trash_dir in trash if trash_dir]
+
+    def _sweep(self):
+        # Remove checkouts old enough for their readers to be done
+        now = time.time()
+        with self._lock:
+            if now - self._swept_at < SWEEP_INTERVAL:
+                return
+            self._swept_at = now
+
+        checkout_root = os.path.join(self.path, CHECKOUT_DIR)
+        for name in os.listdir(checkout_root):
+            checkout_dir = os.path.join(checkout_root, name)
+            try:
+                if now - os.path.getmtime(checkout_dir) > TMP_MAX_AGE:
+                    shutil.rmtree(checkout_dir, ignore_errors=True)
+            except OSError:
+                pass
+
+    def _checkout(self, file_path: str) -> Optional[str]:
+        # Link the file into a new checkout directory, None if it no longer exists
+        checkout_dir = os.path.join(self.path, CHECKOUT_DIR, uuid.uuid4().hex)
+        os.makedirs(checkout_dir)
+        checkout_path = os.path.join(checkout_dir, os.path.basename(file_path))
+        try:
+            os.link(file_path, checkout_path)
+        except FileNotFoundError:
+            shutil.rmtree(checkout_dir, ignore_errors=True)
+            return None
+        except OSError:
+            # Without hard link support the checkout is a copy
+            try:
+                shutil.copyfile(file_path, checkout_path)
+            except FileNotFoundError:
+                shutil.rmtree(checkout_dir, ignore_errors=True)
+                return None
+        touch(checkout_path)
+        return checkout_path
+
+    def _store(
+        self,
+        key: str,
+        etag: str,
+        fill: Callable[[str], None],
+        filename: str,
+        checkout: bool = True,
+    ) -> Optional[str]:
+        # Fill a temporary directory and move it into place, readers never see partial files
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_dir)
+        trash = []
+        try:
+            fill(os.path.join(tmp_dir, filename))
+            touch(os.path.join(tmp_dir, filename))
+            entry = {
+                "key": key,
+                "etag": etag,
+                "size": os.path.getsize(os.path.join(tmp_dir, filename)),
+                "file": os.path.join(entry_dir, filename),
+            }
+            with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+                json.dump(entry, f)
+            # Taken before the entry is published, it cannot be evicted from under the caller
+            checkout_path = (
+                self._checkout(os.path.join(tmp_dir, filename)) if checkout else None
+            )
+
+            with self._dir_lock():
+                trash.append(self._discard(entry_dir))
+                os.replace(tmp_dir, entry_dir)
+                trash.extend(self._evict())
+            return checkout_path
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            for trash_dir in trash:
+                if trash_dir:
+                    shutil.rmtree(trash_dir, ignore_errors=True)
+
+    def _hit(self, key: str, etag: str) -> Optional[str]:
+        # Check out the cached file if it is current, the index is read under the
+        # lock and the file is linked outside of it
+        with self._lock:
+            entry = self._entries.get(key)
+        if not entry or entry["etag"] != etag:
+            return None
+
+        file_path = self._checkout(entry["file"])
+        with self._lock:
+            if file_path is None:
+                # Evicted by another thread or worker since the index was read
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                    self._size -= entry["size"]
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        return file_path
+
+    def lookup(self, key: str, etag: str) -> Optional[str]:
+        """
+        Return a checkout of the cached object if it is current, without downloading it.
+        """
+        if not self.enabled:
+            return None
+
+        self._sweep()
+        file_path = self._hit(key, etag)
+        if file_path is None:
+            with self._lock:
+                self._stats["misses"] += 1
+        return file_path
+
+    def get(
+        self,
+        key: str,
+        etag: str,
+        download: Callable[[str], None],
+        filename: Optional[str] = None,
+    ) -> str:
+        """
+        Return a local path holding the object stored at key, calling
+        download(path) to fetch it unless a copy with the same ETag is cached.
+        The path stays valid for TMP_MAX_AGE seconds, or until the file is
+        closed if it was opened by then.
+        """
+        filename = filename or os.path.basename(key)
+        self._sweep()
+        if not self.enabled:
+            checkout_dir = os.path.join(self.path, CHECKOUT_DIR, uuid.uuid4().hex)
+            os.makedirs(checkout_dir)
+            download(os.path.join(checkout_dir, filename))
+            return os.path.join(checkout_dir, filename)
+
+        while True:
+            file_path = self._hit(key, etag)
+            if file_path:
+                return file_path
+
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and entry["etag"] == etag:
+                    # Stored by another thread since the hit was checked
+                    continue
+
+                event = self._downloads.get(key)
+                if event is None:
+                    event = threading.Event()
+                    self._downloads[key] = event
+                    self._stats["misses"] += 1
+                    break
+                self._stats["coalesced"] += 1
+
+            # Another thread is downloading this key, use its result
+            event.wait()
+
+        try:
+            return self._store(key, etag, download, filename)
+        finally:
+            with self._lock:
+                self._downloads.pop(key, None)
+            event.set()
+
+    def put(self, key: str, etag: str, file_path: str):
+        """
+        Seed the cache with a local copy of an object that was just uploaded.
+        """
+        if not self.enabled:
+            return
+
+        def link(path: str):
+            try:
+                os.link(file_path, path)
+            except OSError:
+                shutil.copyfile(file_path, path)
+
+        try:
+            self._store(key, etag, link, os.path.basename(file_path), checkout=False)
+        except Exception as e:
+            log.warning(f"Failed to cache {key}: {e}")
+
+    def invalidate(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._size -= entry["size"]
+        with self._dir_lock():
+            trash_dir = self._discard(self._entry_dir(key))
+        if trash_dir:
+            shutil.rmtree(trash_dir, ignore_errors=True)
+
+    def clear(self):
+        with self._dir_lock():
+            trash = [
+                self._discard(os.path.dirname(entry["file"])) for entry in self._scan()
+            ]
+            with self._lock:
+                self._entries.clear()
+                self._size = 0
+        for trash_dir in trash:
+            if trash_dir:
+                shutil.rmtree(trash_dir, ignore_errors=True)
+
+    def cache_info(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_ratio": self._stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "size": self._size,
+                "max_size": self.max_size,
+            }
+
+
+STORAGE_CACHE = StorageCache(STORAGE_CACHE_DIR, STORAGE_CACHE_MAX_SIZE)
@@ -2,10 +2,15 @@ import os
 import shutil
 import json
 import logging
+import hashlib
+import re
+import uuid
 from abc import ABC, abstractmethod
-from typing import BinaryIO, Tuple
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Tuple
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
 from botocore.exceptions import ClientError
 from open_webui.config import (
@@ -23,6 +28,7 @@ from open_webui.config import (
     AZURE_STORAGE_CONTAINER_NAME,
     AZURE_STORAGE_KEY,
     STORAGE_PROVIDER,
+    STORAGE_UPLOAD_CHUNK_SIZE,
     UPLOAD_DIR,
 )
 from google.cloud import storage
@@ -30,13 +36,66 @@ from google.cloud.exceptions import GoogleCloudError, NotFound
 from open_webui.constants import ERROR_MESSAGES
 from azure.identity import DefaultAzureCredential
 from azure.storage.blob import BlobServiceClient
+from azure.core import MatchConditions
 from azure.core.exceptions import ResourceNotFoundError
 from open_webui.env import SRC_LOG_LEVELS
+from open_webui.storage.cache import STORAGE_CACHE
 
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MAIN"])
 
+# Size of the parts read when streaming a file to a client
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Content-addressed uploads shared by every user, named by the SHA-256 of their bytes
+BLOB_DIR = f"{UPLOAD_DIR}/blobs"
+BLOB_NAME_PATTERN = re.compile(r"^[0-9a-f]{64}(\.[\w-]+)?$")
+
+
+def get_blob_name(sha256: str, filename: str) -> str:
+    """The extension is kept, some loaders pick their parser from it."""
+    return f"{sha256}{os.path.splitext(filename)[1].lower()}"
+
+
+def copy_file(file: BinaryIO, file_path: str) -> dict:
+    """
+    Copies the file to file_path in chunks, returns its size and SHA-256.
+    Nothing is left behind if the file is empty or the copy fails.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    tmp_path = f"{file_path}.part"
+    try:
+        with open(tmp_path, "wb") as f:
+            while chunk := file.read(STORAGE_UPLOAD_CHUNK_SIZE):
+                sha256.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        if size == 0:
+            raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {"size": size, "sha256": sha256.hexdigest()}
+
+
+@contextmanager
+def stage_blob(file: BinaryIO) -> Iterator[Tuple[dict, str]]:
+    """
+    Copies the file next to the blobs while hashing it, yields its metadata and the
+    staged path. The blob name is known before anything is stored under it, the file
+    is read once. The staged copy is removed on exit unless store_blob moved it.
+    """
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    staged_path = f"{BLOB_DIR}/{uuid.uuid4()}.upload"
+    try:
+        yield copy_file(file, staged_path), staged_path
+    finally:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+
 
 class StorageProvider(ABC):
     @abstractmethod
@@ -44,7 +103,18 @@ class StorageProvider(ABC):
         pass
 
     @abstractmethod
-    def upload_file(self, file: BinaryIO, user_id: str, filename: str) -> Tuple[bytes, str]:
+    def upload_file(
+        self, file: BinaryIO, user_id: str, filename: str
+    ) -> Tuple[dict, str]:
+        """Stores the file, returns its metadata ("size", "sha256") and path."""
+        pass
+
+    @abstractmethod
+    def store_blob(self, staged_path: str, metadata: dict, filename: str) -> str:
+        """
+        Stores a file staged by stage_blob under the SHA-256 of its content, returns
+        its path. Uploading bytes that are already stored returns the existing path.
+        """
         pass
 
     @abstractmethod
@@ -55,19 +125,47 @@ class StorageProvider(ABC):
     def delete_file(self, user_id: str, file_path: str) -> None:
         pass
 
+    def stat_file(self, user_id: str, file_path: str) -> Tuple[int, str]:
+        """Returns the size and storage ETag of the file."""
+        stat_result = os.stat(self.get_file(user_id, file_path))
+        return stat_result.st_size, f"{stat_result.st_mtime}-{stat_result.st_size}"
+
+    def iter_file(
+        self, user_id: str, file_path: str, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """Streams bytes start to end (inclusive) of the file."""
+        with open(self.get_file(user_id, file_path), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1 if end is not None else None
+            while remaining is None or remaining > 0:
+                chunk = f.read(
+                    STREAM_CHUNK_SIZE
+                    if remaining is None
+                    else min(STREAM_CHUNK_SIZE, remaining)
+                )
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
 
 class LocalStorageProvider(StorageProvider):
     @staticmethod
-    def upload_file(file: BinaryIO, user_id: str, filename: str) -> Tuple[bytes, str]:
-        contents = file.read()
-        if not contents:
-            raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
+    def upload_file(file: BinaryIO, user_id: str, filename: str) -> Tuple[dict, str]:
         file_dir = f"{UPLOAD_DIR}/{user_id}"
         os.makedirs(file_dir, exist_ok=True)
         file_path = f"{file_dir}/{filename}"
-        with open(file_path, "wb") as f:
-            f.write(contents)
-        return contents, file_path
+        metadata = copy_file(file, file_path)
+        return metadata, file_path
+
+    @staticmethod
+    def store_blob(staged_path: str, metadata: dict, filename: str) -> str:
+        """Handles content-addressed storage of the file in local storage."""
+        file_path = f"{BLOB_DIR}/{get_blob_name(metadata['sha256'], filename)}"
+        # Same name means same bytes, replacing an existing blob is atomic and harmless
+        os.replace(staged_path, file_path)
+        return file_path
 
     @staticmethod
     def get_file(user_id: str, file_path: str) -> str:
@@ -78,7 +176,9 @@ class LocalStorageProvider(StorageProvider):
     def delete_file(user_id: str, file_path: str) -> None:
         """Handles deletion of the file from local storage."""
         filename = file_path.split("/")[-1]
-        file_dir = f"{UPLOAD_DIR}/{user_id}"
+        file_dir = (
+            BLOB_DIR if BLOB_NAME_PATTERN.match(filename) else f"{UPLOAD_DIR}/{user_id}"
+        )
         file_path = f"{file_dir}/{filename}"
         if os.path.isfile(file_path):
             os.remove(file_path)
@@ -134,17 +234,47 @@ class S3StorageProvider(StorageProvider):
 
         self.bucket_name = S3_BUCKET_NAME
         self.key_prefix = S3_KEY_PREFIX if S3_KEY_PREFIX else ""
+        # Files larger than one chunk are sent as a multipart upload
+        self.transfer_config = TransferConfig(
+            multipart_threshold=STORAGE_UPLOAD_CHUNK_SIZE,
+            multipart_chunksize=STORAGE_UPLOAD_CHUNK_SIZE,
+        )
 
-    def upload_file(self, file: BinaryIO, user_id: str, filename: str) -> Tuple[bytes, str]:
+    def upload_file(
+        self, file: BinaryIO, user_id: str, filename: str
+    ) -> Tuple[dict, str]:
         """Handles uploading of the file to S3 storage."""
-        _, file_path = LocalStorageProvider.upload_file(file, user_id, filename)
+        metadata, file_path = LocalStorageProvider.upload_file(file, user_id, filename)
         try:
             s3_key = os.path.join(self.key_prefix, filename)
-            self.s3_client.upload_file(file_path, self.bucket_name, s3_key)
-            return (
-                open(file_path, "rb").read(),
-                "s3://" + self.bucket_name + "/" + s3_key,
+            self.s3_client.upload_file(
+                file_path, self.bucket_name, s3_key, Config=self.transfer_config
             )
+            s3_file_path = "s3://" + self.bucket_name + "/" + s3_key
+            if STORAGE_CACHE.enabled:
+                head = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+                STORAGE_CACHE.put(s3_file_path, head["ETag"], file_path)
+            return metadata, s3_file_path
+        except ClientError as e:
+            raise RuntimeError(f"Error uploading file to S3: {e}")
+
+    def store_blob(self, staged_path: str, metadata: dict, filename: str) -> str:
+        """Handles content-addressed uploading of the file to S3 storage."""
+        file_path = LocalStorageProvider.store_blob(staged_path, metadata, filename)
+        try:
+            s3_key = os.path.join(self.key_prefix, os.path.basename(file_path))
+            s3_file_path = "s3://" + self.bucket_name + "/" + s3_key
+            try:
+                head = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in ("404", "NoSuchKey", "NotFound"):
+                    raise e
+                self.s3_client.upload_file(
+                    file_path, self.bucket_name, s3_key, Config=self.transfer_config
+                )
+                head = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            STORAGE_CACHE.put(s3_file_path, head["ETag"], file_path)
+            return s3_file_path
         except ClientError as e:
             raise RuntimeError(f"Error uploading file to S3: {e}")
 
@@ -152,12 +282,41 @@ class S3StorageProvider(StorageProvider):
         """Handles downloading of the file from S3 storage."""
         try:
             s3_key = self._extract_s3_key(file_path)
-            local_file_path = self._get_local_file_path(s3_key)
-            self.s3_client.download_file(self.bucket_name, s3_key, local_file_path)
-            return local_file_path
+            head = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            return STORAGE_CACHE.get(
+                file_path,
+                head["ETag"],
+                lambda local_file_path: self.s3_client.download_file(
+                    self.bucket_name, s3_key, local_file_path
+                ),
+            )
         except ClientError as e:
             raise RuntimeError(f"Error downloading file from S3: {e}")
 
+    def stat_file(self, user_id: str, file_path: str) -> Tuple[int, str]:
+        """Returns the size and ETag of the S3 object."""
+        try:
+            head = self.s3_client.head_object(
+                Bucket=self.bucket_name, Key=self._extract_s3_key(file_path)
+            )
+            return head["ContentLength"], head["ETag"]
+        except ClientError as e:
+            raise RuntimeError(f"Error reading file from S3: {e}")
+
+    def iter_file(
+        self, user_id: str, file_path: str, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """Streams a byte range of the S3 object without storing it locally."""
+        try:
+            response = self.s3_client.get_object(
+                Bucket=self.bucket_name,
+                Key=self._extract_s3_key(file_path),
+                Range=f"bytes={start}-{end if end is not None else ''}",
+            )
+        except ClientError as e:
+            raise RuntimeError(f"Error reading file from S3: {e}")
+        yield from response["Body"].iter_chunks(STREAM_CHUNK_SIZE)
+
     def delete_file(self, user_id: str, file_path: str) -> None:
         """Handles deletion of the file from S3 storage."""
         try:
@@ -167,9 +326,10 @@ class S3StorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting file from S3: {e}")
 
         # Always delete from local storage
+        STORAGE_CACHE.invalidate(file_path)
         LocalStorageProvider.delete_file(user_id, file_path)
 
-    def delete_all_files(self) -> None:
+    def delete_all_files(self, user_id: str) -> None:
         """Handles deletion of all files from S3 storage."""
         try:
             response = self.s3_client.list_objects_v2(Bucket=self.bucket_name)
@@ -186,15 +346,13 @@ class S3StorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting all files from S3: {e}")
 
         # Always delete from local storage
-        LocalStorageProvider.delete_all_files()
+        STORAGE_CACHE.clear()
+        LocalStorageProvider.delete_all_files(user_id)
 
     # The s3 key is the name assigned to an object. It excludes the bucket name, but includes the internal path and the file name.
     def _extract_s3_key(self, full_file_path: str) -> str:
         return "/".join(full_file_path.split("//")[1].split("/")[1:])
 
-    def _get_local_file_path(self, user_id: str, s3_key: str) -> str:
-        return f"{UPLOAD_DIR}/{user_id}/{s3_key.split('/')[-1]}"
-
 
 class GCSStorageProvider(StorageProvider):
     def __init__(self):
@@ -211,13 +369,38 @@ class GCSStorageProvider(StorageProvider):
             self.gcs_client = storage.Client()
         self.bucket = self.gcs_client.bucket(GCS_BUCKET_NAME)
 
-    def upload_file(self, file: BinaryIO, filename: str) -> Tuple[bytes, str]:
+    def upload_file(
+        self, file: BinaryIO, user_id: str, filename: str
+    ) -> Tuple[dict, str]:
         """Handles uploading of the file to GCS storage."""
-        contents, file_path = LocalStorageProvider.upload_file(file, filename)
+        metadata, file_path = LocalStorageProvider.upload_file(file, user_id, filename)
         try:
-            blob = self.bucket.blob(filename)
+            # A chunk size makes it a resumable upload sent in parts, GCS
+            # requires it to be a multiple of 256 KiB
+            chunk_size = max(1, STORAGE_UPLOAD_CHUNK_SIZE // (256 * 1024)) * 256 * 1024
+            blob = self.bucket.blob(filename, chunk_size=chunk_size)
             blob.upload_from_filename(file_path)
-            return contents, "gs://" + self.bucket_name + "/" + filename
+            gcs_file_path = "gs://" + self.bucket_name + "/" + filename
+            STORAGE_CACHE.put(gcs_file_path, blob.etag, file_path)
+            return metadata, gcs_file_path
+        except GoogleCloudError as e:
+            raise RuntimeError(f"Error uploading file to GCS: {e}")
+
+    def store_blob(self, staged_path: str, metadata: dict, filename: str) -> str:
+        """Handles content-addressed uploading of the file to GCS storage."""
+        file_path = LocalStorageProvider.store_blob(staged_path, metadata, filename)
+        try:
+            blob_name = os.path.basename(file_path)
+            blob = self.bucket.get_blob(blob_name)
+            if blob is None:
+                chunk_size = (
+                    max(1, STORAGE_UPLOAD_CHUNK_SIZE // (256 * 1024)) * 256 * 1024
+                )
+                blob = self.bucket.blob(blob_name, chunk_size=chunk_size)
+                blob.upload_from_filename(file_path)
+            gcs_file_path = "gs://" + self.bucket_name + "/" + blob_name
+            STORAGE_CACHE.put(gcs_file_path, blob.etag, file_path)
+            return gcs_file_path
         except GoogleCloudError as e:
             raise RuntimeError(f"Error uploading file to GCS: {e}")
 
@@ -225,15 +408,38 @@ class GCSStorageProvider(StorageProvider):
         """Handles downloading of the file from GCS storage."""
         try:
             filename = file_path.removeprefix("gs://").split("/")[1]
-            file_dir = f"{UPLOAD_DIR}/{user_id}"
-            local_file_path = f"{file_dir}/{filename}"
             blob = self.bucket.get_blob(filename)
-            blob.download_to_filename(local_file_path)
-
-            return local_file_path
+            if blob is None:
+                raise NotFound(f"{file_path} not found")
+            return STORAGE_CACHE.get(file_path, blob.etag, blob.download_to_filename)
         except NotFound as e:
             raise RuntimeError(f"Error downloading file from GCS: {e}")
 
+    def stat_file(self, user_id: str, file_path: str) -> Tuple[int, str]:
+        """Returns the size and ETag of the GCS blob."""
+        filename = file_path.removeprefix("gs://").split("/")[1]
+        blob = self.bucket.get_blob(filename)
+        if blob is None:
+            raise RuntimeError(f"Error reading file from GCS: {file_path} not found")
+        return blob.size, blob.etag
+
+    def iter_file(
+        self, user_id: str, file_path: str, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """Streams a byte range of the GCS blob without storing it locally."""
+        filename = file_path.removeprefix("gs://").split("/")[1]
+        blob = self.bucket.get_blob(filename)
+        if blob is None:
+            raise RuntimeError(f"Error reading file from GCS: {file_path} not found")
+        end = blob.size - 1 if end is None else end
+        for offset in range(start, end + 1, STREAM_CHUNK_SIZE):
+            # Pinning the generation keeps every part from the same version
+            yield blob.download_as_bytes(
+                start=offset,
+                end=min(offset + STREAM_CHUNK_SIZE - 1, end),
+                if_generation_match=blob.generation,
+            )
+
     def delete_file(self, user_id: str, file_path: str) -> None:
         """Handles deletion of the file from GCS storage."""
         try:
@@ -244,6 +450,7 @@ class GCSStorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting file from GCS: {e}")
 
         # Always delete from local storage
+        STORAGE_CACHE.invalidate(file_path)
         LocalStorageProvider.delete_file(user_id, file_path)
 
     def delete_all_files(self, user_id: str) -> None:
@@ -258,6 +465,7 @@ class GCSStorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting all files from GCS: {e}")
 
         # Always delete from local storage
+        STORAGE_CACHE.clear()
         LocalStorageProvider.delete_all_files(user_id)
 
 
@@ -270,25 +478,58 @@ class AzureStorageProvider(StorageProvider):
         if storage_key:
             # Configure using the Azure Storage Account Endpoint and Key
             self.blob_service_client = BlobServiceClient(
-                account_url=self.endpoint, credential=storage_key
+                account_url=self.endpoint,
+                credential=storage_key,
+                max_single_put_size=STORAGE_UPLOAD_CHUNK_SIZE,
+                max_block_size=STORAGE_UPLOAD_CHUNK_SIZE,
             )
         else:
             # Configure using the Azure Storage Account Endpoint and DefaultAzureCredential
             # If the key is not configured, then the DefaultAzureCredential will be used to support Managed Identity authentication
             self.blob_service_client = BlobServiceClient(
-                account_url=self.endpoint, credential=DefaultAzureCredential()
+                account_url=self.endpoint,
+                credential=DefaultAzureCredential(),
+                max_single_put_size=STORAGE_UPLOAD_CHUNK_SIZE,
+                max_block_size=STORAGE_UPLOAD_CHUNK_SIZE,
             )
         self.container_client = self.blob_service_client.get_container_client(
             self.container_name
         )
 
-    def upload_file(self, file: BinaryIO, filename: str) -> Tuple[bytes, str]:
+    def upload_file(
+        self, file: BinaryIO, user_id: str, filename: str
+    ) -> Tuple[dict, str]:
         """Handles uploading of the file to Azure Blob Storage."""
-        contents, file_path = LocalStorageProvider.upload_file(file, filename)
+        metadata, file_path = LocalStorageProvider.upload_file(file, user_id, filename)
         try:
+            # Files larger than max_single_put_size are staged as blocks and committed
             blob_client = self.container_client.get_blob_client(filename)
-            blob_client.upload_blob(contents, overwrite=True)
-            return contents, f"{self.endpoint}/{self.container_name}/{filename}"
+            with open(file_path, "rb") as f:
+                result = blob_client.upload_blob(
+                    f, length=metadata["size"], overwrite=True
+                )
+            azure_file_path = f"{self.endpoint}/{self.container_name}/{filename}"
+            STORAGE_CACHE.put(azure_file_path, result["etag"], file_path)
+            return metadata, azure_file_path
+        except Exception as e:
+            raise RuntimeError(f"Error uploading file to Azure Blob Storage: {e}")
+
+    def store_blob(self, staged_path: str, metadata: dict, filename: str) -> str:
+        """Handles content-addressed uploading of the file to Azure Blob Storage."""
+        file_path = LocalStorageProvider.store_blob(staged_path, metadata, filename)
+        try:
+            blob_name = os.path.basename(file_path)
+            blob_client = self.container_client.get_blob_client(blob_name)
+            if blob_client.exists():
+                etag = blob_client.get_blob_properties().etag
+            else:
+                with open(file_path, "rb") as f:
+                    etag = blob_client.upload_blob(
+                        f, length=metadata["size"], overwrite=True
+                    )["etag"]
+            azure_file_path = f"{self.endpoint}/{self.container_name}/{blob_name}"
+            STORAGE_CACHE.put(azure_file_path, etag, file_path)
+            return azure_file_path
         except Exception as e:
             raise RuntimeError(f"Error uploading file to Azure Blob Storage: {e}")
 
@@ -296,15 +537,46 @@ class AzureStorageProvider(StorageProvider):
         """Handles downloading of the file from Azure Blob Storage."""
         try:
             filename = file_path.split("/")[-1]
-            file_dir = f"{UPLOAD_DIR}/{user_id}"
-            local_file_path = f"{file_dir}/{filename}"
             blob_client = self.container_client.get_blob_client(filename)
-            with open(local_file_path, "wb") as download_file:
-                download_file.write(blob_client.download_blob().readall())
-            return local_file_path
+            etag = blob_client.get_blob_properties().etag
+
+            def download(local_file_path: str):
+                with open(local_file_path, "wb") as download_file:
+                    # Only accept the version that was validated above
+                    blob_client.download_blob(
+                        etag=etag, match_condition=MatchConditions.IfNotModified
+                    ).readinto(download_file)
+
+            return STORAGE_CACHE.get(file_path, etag, download)
         except ResourceNotFoundError as e:
             raise RuntimeError(f"Error downloading file from Azure Blob Storage: {e}")
 
+    def stat_file(self, user_id: str, file_path: str) -> Tuple[int, str]:
+        """Returns the size and ETag of the Azure blob."""
+        try:
+            blob_client = self.container_client.get_blob_client(
+                file_path.split("/")[-1]
+            )
+            properties = blob_client.get_blob_properties()
+            return properties.size, properties.etag
+        except ResourceNotFoundError as e:
+            raise RuntimeError(f"Error reading file from Azure Blob Storage: {e}")
+
+    def iter_file(
+        self, user_id: str, file_path: str, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[bytes]:
+        """Streams a byte range of the Azure blob without storing it locally."""
+        try:
+            blob_client = self.container_client.get_blob_client(
+                file_path.split("/")[-1]
+            )
+            downloader = blob_client.download_blob(
+                offset=start, length=end - start + 1 if end is not None else None
+            )
+        except ResourceNotFoundError as e:
+            raise RuntimeError(f"Error reading file from Azure Blob Storage: {e}")
+        yield from downloader.chunks()
+
     def delete_file(self, user_id: str, file_path: str) -> None:
         """Handles deletion of the file from Azure Blob Storage."""
         try:
@@ -315,6 +587,7 @@ class AzureStorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting file from Azure Blob Storage: {e}")
 
         # Always delete from local storage
+        STORAGE_CACHE.invalidate(file_path)
         LocalStorageProvider.delete_file(user_id, file_path)
 
     def delete_all_files(self, user_id: str) -> None:
@@ -327,6 +600,7 @@ class AzureStorageProvider(StorageProvider):
             raise RuntimeError(f"Error deleting all files from Azure Blob Storage: {e}")
 
         # Always delete from local storage
+        STORAGE_CACHE.clear()
         LocalStorageProvider.delete_all_files(user_id)
 
 
@@ -1,61 +1,322 @@
 # tasks.py
 import asyncio
-from typing import Dict
+import json
+import logging
+import time
+from typing import Dict, Optional
 from uuid import uuid4
 
-# A dictionary to keep track of active tasks
-tasks: Dict[str, asyncio.Task] = {}
+from open_webui.env import SRC_LOG_LEVELS, WEBSOCKET_MANAGER, WEBSOCKET_REDIS_URL
+from open_webui.socket.utils import get_async_redis
 
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
 
-def cleanup_task(task_id: str):
+# Seconds a worker's tasks are listed after it stops renewing its heartbeat
+WORKER_TIMEOUT = 30
+
+# Seconds to wait for another worker to stop one of its tasks
+STOP_TIMEOUT = 5
+
+
+class TaskRegistry:
     """
-    Remove a completed or canceled task from the global `tasks` dictionary.
+    Running generation tasks of this process, with when they started and the
+    metadata they were created with.
     """
-    tasks.pop(task_id, None)  # Remove the task if it exists
 
+    def __init__(self):
+        self.worker_id = str(uuid4())
+
+        # A dictionary to keep track of active tasks
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.entries: Dict[str, dict] = {}
+
+    def _registered(self, task_id: str, entry: dict):
+        pass
+
+    def _unregistered(self, task_id: str):
+        pass
+
+    def cleanup_task(self, task_id: str):
+        """
+        Remove a completed or canceled task from the registry.
+        """
+        if self.tasks.pop(task_id, None) is not None:
+            self.entries.pop(task_id, None)
+            self._unregistered(task_id)
+
+    def create_task(self, coroutine, metadata: Optional[dict] = None):
+        """
+        Create a new asyncio task and add it to the registry.
+        """
+        task_id = str(uuid4())  # Generate a unique ID for the task
+        task = asyncio.create_task(coroutine)  # Create the task
+
+        self.tasks[task_id] = task
+        self.entries[task_id] = {
+            "id": task_id,
+            "worker_id": self.worker_id,
+            "started_at": time.time(),
+            "metadata": metadata or {},
+        }
+        self._registered(task_id, self.entries[task_id])
+
+        # Add a done callback for cleanup
+        task.add_done_callback(lambda t: self.cleanup_task(task_id))
+        return task_id, task
+
+    def get_task(self, task_id: str) -> Optional[asyncio.Task]:
+        """
+        Retrieve a task of this process by its task ID.
+        """
+        return self.tasks.get(task_id)
+
+    async def _get_entries(self) -> list[dict]:
+        return list(self.entries.values())
+
+    async def get_entry(self, task_id: str) -> Optional[dict]:
+        """
+        Retrieve the entry of an active task by its task ID.
+        """
+        return self.entries.get(task_id)
+
+    async def list_tasks(self) -> list[dict]:
+        """
+        List all currently active tasks, with how long they have been running.
+        """
+        now = time.time()
+        return [
+            {**entry, "runtime": now - entry["started_at"]}
+            for entry in await self._get_entries()
+        ]
+
+    async def _cancel(self, task_id: str, task: asyncio.Task) -> dict:
+        task.cancel()  # Request task cancellation
+        try:
+            await task  # Wait for the task to handle the cancellation
+        except asyncio.CancelledError:
+            # Task successfully canceled
+            self.cleanup_task(task_id)
+            return {"status": True, "message": f"Task {task_id} successfully stopped."}
 
-def create_task(coroutine):
+        return {"status": False, "message": f"Failed to stop task {task_id}."}
+
+    async def stop_task(self, task_id: str) -> dict:
+        """
+        Cancel a running task and remove it from the registry.
+        """
+        task = self.tasks.get(task_id)
+        if not task:
+            raise ValueError(f"Task with ID {task_id} not found.")
+
+        return await self._cancel(task_id, task)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class RedisTaskRegistry(TaskRegistry):
     """
-    Create a new asyncio task and add it to the global task dictionary.
+    Task registry shared by all the workers through Redis.
+
+    Tasks are recorded in the hash "{name}", so every worker lists all of them,
+    and stop requests for tasks of another worker are published on
+    "{name}:stop" for the worker running them. Each worker renews the key
+    "{name}:worker:{id}", the tasks of workers that stopped renewing it are
+    dropped from the hash.
     """
-    task_id = str(uuid4())  # Generate a unique ID for the task
-    task = asyncio.create_task(coroutine)  # Create the task
 
-    # Add a done callback for cleanup
-    task.add_done_callback(lambda t: cleanup_task(task_id))
+    def __init__(self, redis_url: str, name: str = "open-webui:tasks"):
+        super().__init__()
+        self.name = name
+        self.redis = get_async_redis(redis_url)
+
+        # Writes of each task's entry, so that its removal comes after it
+        self._writes: Dict[str, asyncio.Task] = {}
+        self._pending: set[asyncio.Task] = set()
+        self._background: list[asyncio.Task] = []
+
+    @property
+    def _channel(self) -> str:
+        return f"{self.name}:stop"
+
+    def _worker_key(self, worker_id: str) -> str:
+        return f"{self.name}:worker:{worker_id}"
+
+    def _spawn(self, coroutine) -> asyncio.Task:
+        async def run():
+            try:
+                return await coroutine
+            except Exception as e:
+                log.warning(f"Task registry update failed: {e}")
+
+        task = asyncio.create_task(run())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    def _registered(self, task_id: str, entry: dict):
+        self._writes[task_id] = self._spawn(
+            self.redis.hset(self.name, task_id, json.dumps(entry, default=str))
+        )
+
+    def _unregistered(self, task_id: str):
+        write = self._writes.pop(task_id, None)
 
-    tasks[task_id] = task
-    return task_id, task
+        async def remove():
+            if write is not None:
+                await write
+            await self.redis.hdel(self.name, task_id)
+
+        self._spawn(remove())
+
+    async def _get_entries(self) -> list[dict]:
+        entries = {
+            task_id: json.loads(value)
+            for task_id, value in (await self.redis.hgetall(self.name)).items()
+        }
+
+        worker_ids = list(
+            {entry["worker_id"] for entry in entries.values()} - {self.worker_id}
+        )
+        if worker_ids:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for worker_id in worker_ids:
+                    pipe.exists(self._worker_key(worker_id))
+                alive = await pipe.execute()
+
+            stopped = {
+                worker_id for worker_id, exists in zip(worker_ids, alive) if not exists
+            }
+            stale = [
+                task_id
+                for task_id, entry in entries.items()
+                if entry["worker_id"] in stopped
+            ]
+            if stale:
+                await self.redis.hdel(self.name, *stale)
+                for task_id in stale:
+                    entries.pop(task_id)
+
+        # This process's own tasks are known locally, even before their entry is written
+        entries = {
+            task_id: entry
+            for task_id, entry in entries.items()
+            if entry["worker_id"] != self.worker_id
+        }
+        return list({**entries, **self.entries}.values())
+
+    async def get_entry(self, task_id: str) -> Optional[dict]:
+        if task_id in self.entries:
+            return self.entries[task_id]
+        value = await self.redis.hget(self.name, task_id)
+        return json.loads(value) if value is not None else None
+
+    async def stop_task(self, task_id: str) -> dict:
+        if task_id in self.tasks:
+            return await super().stop_task(task_id)
+
+        value = await self.redis.hget(self.name, task_id)
+        if value is None:
+            raise ValueError(f"Task with ID {task_id} not found.")
+
+        worker_id = json.loads(value)["worker_id"]
+        if not await self.redis.exists(self._worker_key(worker_id)):
+            await self.redis.hdel(self.name, task_id)
+            raise ValueError(f"Task with ID {task_id} not found.")
+
+        # The worker running the task cancels it and removes its entry
+        await self.redis.publish(
+            self._channel, json.dumps({"task_id": task_id, "worker_id": worker_id})
+        )
+        deadline = time.monotonic() + STOP_TIMEOUT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+            if not await self.redis.hexists(self.name, task_id):
+                return {
+                    "status": True,
+                    "message": f"Task {task_id} successfully stopped.",
+                }
+
+        return {"status": False, "message": f"Failed to stop task {task_id}."}
+
+    async def _heartbeat(self):
+        while True:
+            try:
+                await self.redis.set(
+                    self._worker_key(self.worker_id),
+                    int(time.time()),
+                    ex=WORKER_TIMEOUT,
+                )
+            except Exception as e:
+                log.warning(f"Task registry heartbeat failed: {e}")
+            await asyncio.sleep(WORKER_TIMEOUT / 3)
+
+    async def _listen_for_stops(self):
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self._channel)
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        data = json.loads(message["data"])
+                        task = self.tasks.get(data.get("task_id"))
+                        if task is not None and data.get("worker_id") == self.worker_id:
+                            self._spawn(self._cancel(data["task_id"], task))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning(f"Not listening for task stop requests: {e}")
+                await asyncio.sleep(1)
+
+    async def start(self):
+        self._background = [
+            asyncio.create_task(self._heartbeat()),
+            asyncio.create_task(self._listen_for_stops()),
+        ]
+
+    async def stop(self):
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        self._background = []
+
+        try:
+            if self.tasks:
+                await self.redis.hdel(self.name, *self.tasks.keys())
+            await self.redis.delete(self._worker_key(self.worker_id))
+        except Exception as e:
+            log.warning(f"Failed to remove the tasks of worker {self.worker_id}: {e}")
+
+
+if WEBSOCKET_MANAGER == "redis":
+    TASKS = RedisTaskRegistry(WEBSOCKET_REDIS_URL)
+else:
+    TASKS = TaskRegistry()
+
+tasks = TASKS.tasks
+
+
+def create_task(coroutine, metadata: Optional[dict] = None):
+    return TASKS.create_task(coroutine, metadata)
 
 
 def get_task(task_id: str):
-    """
-    Retrieve a task by its task ID.
-    """
-    return tasks.get(task_id)
+    return TASKS.get_task(task_id)
 
 
-def list_tasks():
-    """
-    List all currently active task IDs.
-    """
-    return list(tasks.keys())
+async def list_tasks():
+    return await TASKS.list_tasks()
+
+
+async def get_task_entry(task_id: str):
+    return await TASKS.get_entry(task_id)
 
 
 async def stop_task(task_id: str):
-    """
-    Cancel a running task and remove it from the global task list.
-    """
-    task = tasks.get(task_id)
-    if not task:
-        raise ValueError(f"Task with ID {task_id} not found.")
-
-    task.cancel()  # Request task cancellation
-    try:
-        await task  # Wait for the task to handle the cancellation
-    except asyncio.CancelledError:
-        # Task successfully canceled
-        tasks.pop(task_id, None)  # Remove it from the dictionary
-        return {"status": True, "message": f"Task {task_id} successfully stopped."}
-
-    return {"status": False, "message": f"Failed to stop task {task_id}."}
+    return await TASKS.stop_task(task_id)
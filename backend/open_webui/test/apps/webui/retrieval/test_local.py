@@ -0,0 +1,180 @@
+import multiprocessing
+import sqlite3
+
+import numpy as np
+import pytest
+
+from open_webui.retrieval.vector.dbs import local
+
+
+def write_items(worker: int, barrier):
+    client = local.LocalClient()
+    barrier.wait()
+    for batch in range(20):
+        client.insert(
+            "shared",
+            [
+                {
+                    "id": f"{worker}-{batch}-{i}",
+                    "text": f"{worker}-{batch}-{i}",
+                    "vector": [worker + 1.0, batch + 1.0, i + 1.0],
+                    "metadata": {"worker": worker},
+                }
+                for i in range(10)
+            ],
+        )
+
+
+def test_writes_from_two_processes_claim_distinct_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(local, "LOCAL_VECTOR_DB_PATH", str(tmp_path))
+    local.LocalClient().insert(
+        "shared", [{"id": "seed", "text": "", "vector": [1, 0, 0], "metadata": {}}]
+    )
+
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(2)
+    workers = [
+        context.Process(target=write_items, args=(worker, barrier))
+        for worker in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    db = sqlite3.connect(tmp_path / "collections.sqlite3")
+    rows = [row for (row,) in db.execute("SELECT row FROM items")]
+    (count,) = db.execute("SELECT count FROM collections").fetchone()
+    assert len(rows) == 401
+    assert sorted(rows) == list(range(401))
+    assert count == 401
+
+    result = local.LocalClient().search("shared", [[2.0, 3.0, 4.0]], limit=1)
+    assert result.ids == [["1-2-3"]]
+
+
+# Random directions are far apart, the nearest item to vector i is item i
+VECTORS = np.random.default_rng(0).normal(size=(2000, 16))
+
+
+def make_items(count: int, start: int = 0):
+    return [
+        {
+            "id": f"item-{idx}",
+            "text": f"text {idx}",
+            "vector": VECTORS[idx].tolist(),
+            "metadata": {"parity": idx % 2, "idx": idx},
+        }
+        for idx in range(start, start + count)
+    ]
+
+
+def query_vector(idx: int):
+    return VECTORS[idx].tolist()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(local, "LOCAL_VECTOR_DB_PATH", str(tmp_path))
+    return local.LocalClient()
+
+
+def test_search_returns_nearest_items(client):
+    client.insert("docs", make_items(100))
+
+    result = client.search("docs", [query_vector(10), query_vector(90)], limit=3)
+
+    assert [ids[0] for ids in result.ids] == ["item-10", "item-90"]
+    assert [len(ids) for ids in result.ids] == [3, 3]
+    assert result.distances[0] == sorted(result.distances[0], reverse=True)
+    assert result.documents[0][0] == "text 10"
+    assert result.metadatas[1][0] == {"parity": 0, "idx": 90}
+    assert client.search("missing", [query_vector(0)], limit=3) is None
+
+
+def test_query_and_delete_by_filter(client):
+    client.insert("docs", make_items(10))
+
+    result = client.query("docs", filter={"parity": 1}, limit=2)
+    assert result.ids == [["item-1", "item-3"]]
+
+    client.delete("docs", filter={"parity": 1})
+    assert client.get("docs").ids == [[f"item-{idx}" for idx in range(0, 10, 2)]]
+    result = client.search("docs", [query_vector(3)], limit=10)
+    assert len(result.ids[0]) == 5
+    assert "item-3" not in result.ids[0]
+
+
+def test_upsert_and_delete_by_ids(client):
+    client.insert("docs", make_items(10))
+    client.upsert("docs", [{**make_items(1, 5)[0], "id": "item-0", "text": "moved"}])
+    client.delete("docs", ids=["item-5"])
+
+    result = client.search("docs", [query_vector(5)], limit=1)
+    assert result.ids == [["item-0"]]
+    assert result.documents == [["moved"]]
+    assert len(client.get("docs").ids[0]) == 9
+
+
+def test_compaction_renumbers_rows_and_keeps_items(client, tmp_path):
+    client.insert("docs", make_items(local.MIN_CAPACITY))
+    other = local.LocalClient()
+    assert other.search("docs", [query_vector(0)], limit=1).ids == [["item-0"]]
+
+    client.delete(
+        "docs", ids=[f"item-{idx}" for idx in range(local.MIN_CAPACITY) if idx % 3]
+    )
+
+    db = sqlite3.connect(tmp_path / "collections.sqlite3")
+    (count, generation) = db.execute(
+        "SELECT count, generation FROM collections"
+    ).fetchone()
+    rows = sorted(row for (row,) in db.execute("SELECT row FROM items"))
+    assert generation == 1
+    assert rows == list(range(count))
+    assert count == len(range(0, local.MIN_CAPACITY, 3))
+
+    # Another process reloads the new generation instead of catching up
+    for searcher in (client, other):
+        result = searcher.search("docs", [query_vector(300), query_vector(303)], 1)
+        assert result.ids == [["item-300"], ["item-303"]]
+    ids = [
+        id for page in client.iter_items("docs", batch_size=100) for id in page.ids[0]
+    ]
+    assert sorted(ids) == sorted(f"item-{idx}" for idx in range(0, 1024, 3))
+
+
+def test_other_clients_catch_up_without_rebuilding_hnsw(client, monkeypatch):
+    monkeypatch.setattr(local, "LOCAL_VECTOR_DB_HNSW_THRESHOLD", 10)
+    monkeypatch.setattr(local, "CHECKPOINT_ROWS", 50)
+    builds = []
+    build_hnsw = local.LocalClient._build_hnsw
+    monkeypatch.setattr(
+        local.LocalClient,
+        "_build_hnsw",
+        lambda self, collection: builds.append(collection.count)
+        or build_hnsw(self, collection),
+    )
+
+    client.insert("docs", make_items(20))
+    reader = local.LocalClient()
+    assert reader.search("docs", [query_vector(5)], limit=1).ids == [["item-5"]]
+    assert builds == [20]
+    index = reader._collections["docs"].hnsw
+
+    # Writes of another client are replayed onto the graph in memory
+    client.insert("docs", make_items(10, 20))
+    client.delete("docs", ids=["item-25"])
+    result = reader.search("docs", [query_vector(24), query_vector(25)], limit=29)
+    assert result.ids[0][0] == "item-24"
+    assert sorted(result.ids[1]) == sorted(
+        f"item-{idx}" for idx in range(30) if idx != 25
+    )
+    assert reader._collections["docs"].hnsw is index
+
+    # A new client loads the saved graph and replays the rest of the log
+    client.insert("docs", make_items(60, 30))
+    fresh = local.LocalClient()
+    assert fresh.search("docs", [query_vector(80)], limit=1).ids == [["item-80"]]
+    assert builds == [20]
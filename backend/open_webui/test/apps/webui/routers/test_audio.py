@@ -0,0 +1,214 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from aiohttp import web
+from fastapi.responses import StreamingResponse
+from open_webui.routers import audio
+from open_webui.utils.speech_cache import SpeechCache, iter_file
+
+
+async def start_openai_speech():
+    calls = []
+
+    async def speech(request):
+        calls.append(await request.json())
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for chunk in (b"ID3", b"-sentence-1", b"-sentence-2"):
+            await asyncio.sleep(0.05)
+            await response.write(chunk)
+        return response
+
+    app = web.Application()
+    app.router.add_post("/audio/speech", speech)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", calls
+
+
+def make_request(url, body):
+    async def read_body():
+        return body
+
+    return SimpleNamespace(
+        body=read_body,
+        app=SimpleNamespace(
+            state=SimpleNamespace(
+                config=SimpleNamespace(
+                    TTS_ENGINE="openai",
+                    TTS_MODEL="tts-1",
+                    TTS_OPENAI_API_BASE_URL=url,
+                    TTS_OPENAI_API_KEY="",
+                )
+            )
+        ),
+    )
+
+
+async def read_streaming(response):
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+def test_identical_speech_requests_share_one_synthesis(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        audio, "SPEECH_CACHE", SpeechCache(tmp_path, max_size=1024, max_age=0)
+    )
+
+    async def main():
+        runner, url, calls = await start_openai_speech()
+        body = json.dumps({"input": "Hello. World.", "voice": "alloy"}).encode()
+        user = SimpleNamespace(
+            name="user", id="1", email="user@example.com", role="user"
+        )
+        try:
+            responses = await asyncio.gather(
+                *[audio.speech(make_request(url, body), user=user) for _ in range(5)]
+            )
+            bodies = await asyncio.gather(*[read_streaming(r) for r in responses])
+
+            cached = await audio.speech(make_request(url, body), user=user)
+        finally:
+            await runner.cleanup()
+
+        assert len(calls) == 1
+        assert bodies == [b"ID3-sentence-1-sentence-2"] * 5
+        assert isinstance(cached, StreamingResponse)
+        assert cached.headers["content-length"] == "25"
+        assert await read_streaming(cached) == b"ID3-sentence-1-sentence-2"
+        assert audio.SPEECH_CACHE.cache_info()["hits"] == 1
+        assert audio.SPEECH_CACHE.cache_info()["coalesced"] == 4
+
+    asyncio.run(main())
+
+
+def test_speech_cache_evicts_least_recently_used(tmp_path):
+    async def main():
+        cache = SpeechCache(tmp_path, max_size=10, max_age=0)
+
+        async def generate(audio):
+            yield audio
+
+        def cached(name):
+            file = cache.get(name)
+            if file is None:
+                return None
+            with file:
+                return file.read()
+
+        for name in ("a", "b"):
+            flight = cache.synthesize(name, {}, lambda: generate(b"12345"))
+            await flight.task
+        assert cached("a") == b"12345"
+
+        flight = cache.synthesize("c", {}, lambda: generate(b"12345"))
+        await flight.task
+
+        assert cached("b") is None
+        assert cached("a") == b"12345"
+        assert cached("c") == b"12345"
+        assert cache.cache_info()["size"] == 10
+
+    asyncio.run(main())
+
+
+def test_speech_cache_hit_survives_eviction(tmp_path):
+    async def main():
+        cache = SpeechCache(tmp_path, max_size=5, max_age=0)
+
+        async def generate(audio):
+            yield audio
+
+        flight = cache.synthesize("a", {}, lambda: generate(b"12345"))
+        await flight.task
+        file = cache.get("a")
+
+        # Storing another entry evicts the one being sent
+        flight = cache.synthesize("b", {}, lambda: generate(b"67890"))
+        await flight.task
+        assert not (tmp_path / "a.mp3").exists()
+
+        chunks = [chunk async for chunk in iter_file(file)]
+        assert b"".join(chunks) == b"12345"
+        assert file.closed
+
+    asyncio.run(main())
+
+
+class WhisperModel:
+    """Stands in for the faster-whisper model, decoding the given segments."""
+
+    def __init__(self, texts, error=None):
+        self.texts = texts
+        self.error = error
+        self.decoded = 0
+
+    def transcribe(self, file_path, beam_size):
+        def segments():
+            for i, text in enumerate(self.texts):
+                self.decoded += 1
+                yield SimpleNamespace(text=text, start=float(i), end=i + 1.0)
+            if self.error is not None:
+                raise self.error
+
+        return segments(), SimpleNamespace(language="en", language_probability=1.0)
+
+
+def make_stt_request(model):
+    return SimpleNamespace(
+        app=SimpleNamespace(
+            state=SimpleNamespace(
+                config=SimpleNamespace(STT_ENGINE="", WHISPER_MODEL="base"),
+                faster_whisper_model=model,
+            )
+        )
+    )
+
+
+async def read_events(stream):
+    events = []
+    async for event in stream:
+        assert event.startswith("data: ") and event.endswith("\n\n")
+        events.append(json.loads(event[len("data: ") :]))
+    return events
+
+
+def test_stream_transcription(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio, "WHISPER_BATCH_SIZE", 0)
+    model = WhisperModel([" Hello", " world."])
+    file_path = str(tmp_path / "speech.wav")
+
+    async def main():
+        stream = audio.stream_transcription(make_stt_request(model), file_path)
+        # Segments are sent as they are decoded, not once the audio is done
+        first = json.loads((await anext(stream))[len("data: ") :])
+        assert model.decoded == 1
+        return [first] + await read_events(stream)
+
+    events = asyncio.run(main())
+    assert events == [
+        {"text": " Hello", "start": 0.0, "end": 1.0},
+        {"text": " world.", "start": 1.0, "end": 2.0},
+        {"text": "Hello world.", "filename": "speech.wav", "done": True},
+    ]
+    assert json.loads((tmp_path / "speech.json").read_text()) == {
+        "text": "Hello world."
+    }
+
+
+def test_stream_transcription_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio, "WHISPER_BATCH_SIZE", 0)
+    model = WhisperModel([" Hello"], error=RuntimeError("decoding failed"))
+    file_path = str(tmp_path / "speech.wav")
+
+    events = asyncio.run(
+        read_events(audio.stream_transcription(make_stt_request(model), file_path))
+    )
+    assert events[0] == {"text": " Hello", "start": 0.0, "end": 1.0}
+    assert events[1:] == [
+        {"error": audio.ERROR_MESSAGES.DEFAULT("decoding failed"), "done": True}
+    ]
+    assert not (tmp_path / "speech.json").exists()
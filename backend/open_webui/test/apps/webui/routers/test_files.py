@@ -0,0 +1,163 @@
+import hashlib
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from open_webui.models.files import FileModel
+from open_webui.routers import files
+from open_webui.storage.cache import StorageCache
+from open_webui.storage.provider import LocalStorageProvider
+
+CONTENT = bytes(range(256)) * 4
+ETAG = f'"{hashlib.sha256(CONTENT).hexdigest()}"'
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("", None),
+        ("bytes=0-9", (0, 9)),
+        ("bytes=10-", (10, 99)),
+        ("bytes=-10", (90, 99)),
+        ("bytes=-1000", (0, 99)),
+        ("bytes=90-1000", (90, 99)),
+        ("bytes= 5-6", (5, 6)),
+        # Several ranges, other units and malformed values get the whole file
+        ("bytes=0-1,5-6", None),
+        ("items=0-9", None),
+        ("bytes=a-b", None),
+        ("bytes=-", None),
+    ],
+)
+def test_parse_range_header(header, expected):
+    assert files.parse_range_header(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=50-10", "bytes=-0"])
+def test_parse_range_header_unsatisfiable(header):
+    with pytest.raises(HTTPException) as exc:
+        files.parse_range_header(header, 100)
+    assert exc.value.status_code == 416
+    assert exc.value.headers == {"Content-Range": "bytes */100"}
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"other", "abc"', True),
+        ("*", True),
+        ('"other"', False),
+        ('"abcd"', False),
+    ],
+)
+def test_etag_matches(header, expected):
+    assert files.etag_matches(header, '"abc"') is expected
+
+
+class RemoteStorage:
+    """Stands in for a remote provider, serving CONTENT from memory."""
+
+    def __init__(self):
+        self.ranges = []
+
+    def stat_file(self, user_id, file_path):
+        return len(CONTENT), "remote-etag"
+
+    def iter_file(self, user_id, file_path, start=0, end=None):
+        self.ranges.append((start, end))
+        yield CONTENT[start : None if end is None else end + 1]
+
+
+@pytest.fixture(params=["local", "remote"])
+def client(request, monkeypatch, tmp_path):
+    file_path = tmp_path / "file.bin"
+    file_path.write_bytes(CONTENT)
+    if request.param == "local":
+        monkeypatch.setattr(files, "Storage", LocalStorageProvider())
+    else:
+        monkeypatch.setattr(files, "Storage", RemoteStorage())
+        # Nothing cached, the object is streamed from storage
+        cache = StorageCache(str(tmp_path / "cache"), max_size=0)
+        monkeypatch.setattr(files, "STORAGE_CACHE", cache)
+
+    file = FileModel(
+        id="file-1",
+        user_id="user-1",
+        filename="file.bin",
+        path=str(file_path),
+        meta={"sha256": hashlib.sha256(CONTENT).hexdigest()},
+        created_at=0,
+        updated_at=0,
+    )
+    app = FastAPI()
+
+    @app.get("/content")
+    async def content(request: Request):
+        return await files.get_file_response(
+            request,
+            SimpleNamespace(id="user-1"),
+            file,
+            {},
+            media_type="application/octet-stream",
+        )
+
+    return TestClient(app)
+
+
+def test_get_file_response(client):
+    response = client.get("/content")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == ETAG
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+@pytest.mark.parametrize(
+    "header, start, end",
+    [("bytes=10-19", 10, 19), ("bytes=1000-", 1000, 1023), ("bytes=-24", 1000, 1023)],
+)
+def test_get_file_response_range(client, header, start, end):
+    response = client.get("/content", headers={"Range": header})
+    assert response.status_code == 206
+    assert response.content == CONTENT[start : end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(CONTENT)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+def test_get_file_response_unsatisfiable_range(client):
+    response = client.get("/content", headers={"Range": "bytes=2000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+@pytest.mark.parametrize("header", [ETAG, f"W/{ETAG}", "*", f'"other", {ETAG}'])
+def test_get_file_response_not_modified(client, header):
+    response = client.get("/content", headers={"If-None-Match": header})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == ETAG
+
+
+def test_get_file_response_modified(client):
+    response = client.get("/content", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_get_file_response_if_range(client):
+    # A stale validator gets the whole, current file
+    response = client.get(
+        "/content", headers={"Range": "bytes=0-9", "If-Range": '"other"'}
+    )
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+    response = client.get("/content", headers={"Range": "bytes=0-9", "If-Range": ETAG})
+    assert response.status_code == 206
+    assert response.content == CONTENT[:10]
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from aiohttp import web
+from open_webui.routers import ollama
+
+
+async def start_slow_ollama(delay):
+    async def copy(request):
+        await asyncio.sleep(delay)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post("/api/copy", copy)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_slow_upstream_does_not_block_event_loop():
+    async def main():
+        runner, url = await start_slow_ollama(delay=1)
+        request = SimpleNamespace(
+            app=SimpleNamespace(
+                state=SimpleNamespace(
+                    config=SimpleNamespace(
+                        ENABLE_OLLAMA_API=True,
+                        OLLAMA_BASE_URLS=[url],
+                        OLLAMA_API_CONFIGS={},
+                    )
+                )
+            )
+        )
+
+        gaps = []
+
+        async def tick():
+            last = time.monotonic()
+            while True:
+                await asyncio.sleep(0.01)
+                now = time.monotonic()
+                gaps.append(now - last)
+                last = now
+
+        ticker = asyncio.create_task(tick())
+        try:
+            res = await ollama.copy_model(
+                request,
+                ollama.CopyModelForm(source="llama3", destination="llama3-copy"),
+                url_idx=0,
+                user=None,
+            )
+        finally:
+            ticker.cancel()
+            await ollama.close_session()
+            await runner.cleanup()
+
+        assert res is True
+        # The loop kept serving other coroutines while the upstream was slow
+        assert len(gaps) > 50
+        assert max(gaps) < 0.2
+
+    asyncio.run(main())
+
+
+def test_session_pool_is_unbounded_by_default():
+    async def main():
+        session = await ollama.get_session()
+        try:
+            # Streamed chats hold a connection each, a limit would queue them
+            assert session.connector.limit == 0
+            assert await ollama.get_session() is session
+        finally:
+            await ollama.close_session()
+
+    asyncio.run(main())
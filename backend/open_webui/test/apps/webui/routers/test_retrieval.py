@@ -0,0 +1,110 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from open_webui.constants import ERROR_MESSAGES
+from open_webui.models import files as files_model
+from open_webui.models.files import File, FileForm, Files
+from open_webui.routers import retrieval
+
+
+@pytest.fixture
+def files_db(monkeypatch):
+    # Files backed by a private in-memory database
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    File.__table__.create(engine)
+    SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+    @contextmanager
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(files_model, "get_db", get_db)
+
+
+def insert_file(id: str, data: dict):
+    return Files.insert_new_file(
+        "user",
+        FileForm(
+            id=id,
+            filename=f"{id}.txt",
+            path=f"/uploads/{id}.txt",
+            data=data,
+            meta={"name": f"{id}.txt"},
+        ),
+    )
+
+
+def test_update_files_by_ids_merges_data_and_meta(files_db):
+    insert_file("a", {"content": "old", "status": "completed"})
+    insert_file("b", {"content": "b"})
+
+    updated = Files.update_files_by_ids(
+        {
+            "a": {"hash": "hash-a", "data": {"content": "new"}},
+            "b": {"meta": {"collection_name": "kb"}},
+            "missing": {"hash": "hash-missing"},
+        }
+    )
+
+    assert sorted(file.id for file in updated) == ["a", "b"]
+    a = Files.get_file_by_id("a")
+    assert a.hash == "hash-a"
+    assert a.data == {"content": "new", "status": "completed"}
+    b = Files.get_file_by_id("b")
+    assert b.hash is None
+    assert b.meta == {"name": "b.txt", "collection_name": "kb"}
+    assert Files.update_files_by_ids({}) == []
+
+
+@pytest.mark.parametrize("concurrency", [0, 4])
+def test_process_files_batch_isolates_failing_files(files_db, monkeypatch, concurrency):
+    monkeypatch.setattr(retrieval, "RAG_FILE_BATCH_CONCURRENCY", concurrency)
+    saved = []
+
+    def save_docs_to_vector_db(request, docs, collection_name, add, user):
+        file_id = docs[0].metadata["file_id"]
+        if file_id == "broken":
+            raise ValueError("embedding failed")
+        saved.append((file_id, collection_name))
+
+    monkeypatch.setattr(retrieval, "save_docs_to_vector_db", save_docs_to_vector_db)
+
+    files = [
+        insert_file("ok", {"content": "ok"}),
+        insert_file("broken", {"content": "broken"}),
+        insert_file("pending", {"status": "pending"}),
+    ]
+    response = retrieval.process_files_batch(
+        SimpleNamespace(),
+        retrieval.BatchProcessFilesForm(files=files, collection_name="kb"),
+        user=SimpleNamespace(id="user"),
+        process_in_background=False,
+    )
+
+    assert saved == [("ok", "kb")]
+    statuses = {result.file_id: result.status for result in response.results}
+    assert statuses == {"ok": "completed", "broken": "failed"}
+    errors = {error.file_id: error.error for error in response.errors}
+    assert errors == {
+        "broken": "embedding failed",
+        "pending": ERROR_MESSAGES.FILE_NOT_PROCESSED,
+    }
+
+    # Only embedded files are recorded in the collection
+    assert Files.get_file_by_id("ok").meta["collection_name"] == "kb"
+    assert "collection_name" not in Files.get_file_by_id("broken").meta
+    assert Files.get_file_by_id("ok").hash is not None
+    assert Files.get_file_by_id("pending").hash is None
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+
+from open_webui.storage import cache as storage_cache
+from open_webui.storage.cache import StorageCache
+
+
+def writer(content: bytes):
+    def download(path: str):
+        with open(path, "wb") as f:
+            f.write(content)
+
+    return download
+
+
+def test_get_downloads_once(tmp_path):
+    cache = StorageCache(str(tmp_path), max_size=1024)
+    calls = []
+
+    def download(path: str):
+        calls.append(path)
+        writer(b"content")(path)
+
+    first = cache.get("s3://bucket/a.txt", "etag-1", download)
+    second = cache.get("s3://bucket/a.txt", "etag-1", download)
+    assert len(calls) == 1
+    assert first != second
+    assert os.path.basename(first) == "a.txt"
+    assert open(second, "rb").read() == b"content"
+
+    # A changed object is downloaded again
+    cache.get("s3://bucket/a.txt", "etag-2", download)
+    assert len(calls) == 2
+    assert cache.cache_info()["hits"] == 1
+    assert cache.cache_info()["entries"] == 1
+
+
+def test_checkout_survives_eviction_and_invalidation(tmp_path):
+    cache = StorageCache(str(tmp_path), max_size=10)
+    file_path = cache.get("a", "1", writer(b"aaaaaaaa"))
+    # Storing b pushes a out of the cache, the handed out path is still readable
+    cache.get("b", "1", writer(b"bbbbbbbb"))
+    assert cache.cache_info()["evictions"] == 1
+    assert cache.lookup("a", "1") is None
+    assert open(file_path, "rb").read() == b"aaaaaaaa"
+
+    other_path = cache.lookup("b", "1")
+    cache.invalidate("b")
+    cache.clear()
+    assert open(other_path, "rb").read() == b"bbbbbbbb"
+
+
+def test_workers_share_the_size_limit(tmp_path):
+    worker = StorageCache(str(tmp_path), max_size=20)
+    other_worker = StorageCache(str(tmp_path), max_size=20)
+    worker.get("a", "1", writer(b"a" * 8))
+    other_worker.get("b", "1", writer(b"b" * 8))
+    worker.get("c", "1", writer(b"c" * 8))
+
+    # Each worker alone is under the limit, together they are not
+    entries = [name for name in os.listdir(tmp_path) if len(name) == 64]
+    assert len(entries) == 2
+    assert other_worker.lookup("a", "1") is None
+    assert worker.lookup("b", "1") is not None
+    assert worker.cache_info()["size"] == 16
+
+
+def test_recently_used_entries_are_kept(tmp_path):
+    cache = StorageCache(str(tmp_path), max_size=20)
+    cache.get("a", "1", writer(b"a" * 8))
+    time.sleep(0.01)
+    cache.get("b", "1", writer(b"b" * 8))
+    time.sleep(0.01)
+    assert cache.lookup("a", "1")
+    time.sleep(0.01)
+    cache.get("c", "1", writer(b"c" * 8))
+    assert cache.lookup("a", "1")
+    assert cache.lookup("b", "1") is None
+
+    # The order is rebuilt from disk on restart
+    restarted = StorageCache(str(tmp_path), max_size=20)
+    assert set(restarted._entries) == {"a", "c"}
+
+
+def test_concurrent_misses_are_coalesced(tmp_path):
+    cache = StorageCache(str(tmp_path), max_size=1024)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def download(path: str):
+        calls.append(path)
+        started.set()
+        release.wait()
+        writer(b"content")(path)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get("a", "1", download)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(set(results)) == 4
+    assert all(open(path, "rb").read() == b"content" for path in results)
+
+
+def test_expired_checkouts_are_swept(tmp_path, monkeypatch):
+    cache = StorageCache(str(tmp_path), max_size=1024)
+    file_path = cache.get("a", "1", writer(b"content"))
+    checkout_dir = os.path.dirname(file_path)
+    expired = time.time() - storage_cache.TMP_MAX_AGE - 1
+    os.utime(checkout_dir, (expired, expired))
+
+    cache._swept_at = 0.0
+    cache.lookup("a", "1")
+    assert not os.path.exists(checkout_dir)
+    # The entry itself is untouched
+    assert cache.lookup("a", "1") is not None
+
+
+def test_disabled_cache_hands_out_private_copies(tmp_path):
+    cache = StorageCache(str(tmp_path), max_size=0)
+    first = cache.get("a", "1", writer(b"first"))
+    second = cache.get("a", "1", writer(b"second"))
+    assert open(first, "rb").read() == b"first"
+    assert open(second, "rb").read() == b"second"
+    assert cache.lookup("a", "1") is None
@@ -1,3 +1,4 @@
+import hashlib
 import io
 import os
 import boto3
@@ -5,6 +6,7 @@ import pytest
 from botocore.exceptions import ClientError
 from moto import mock_aws
 from open_webui.storage import provider
+from open_webui.storage.cache import StorageCache
 from gcp_storage_emulator.server import create_server
 from google.cloud import storage
 from azure.storage.blob import BlobServiceClient, ContainerClient, BlobClient
@@ -19,6 +21,19 @@ def mock_upload_dir(monkeypatch, tmp_path):
     return directory
 
 
+def store_blob(storage, content, filename):
+    """Stages the content and stores it the way the upload route does."""
+    with provider.stage_blob(io.BytesIO(content)) as (metadata, staged_path):
+        return metadata, storage.store_blob(staged_path, metadata, filename)
+
+
+def mock_storage_cache(monkeypatch, tmp_path):
+    """Monkey-patch the cache of downloaded objects with an empty one."""
+    cache = StorageCache(str(tmp_path / "cache"), max_size=1024 * 1024)
+    monkeypatch.setattr(provider, "STORAGE_CACHE", cache)
+    return cache
+
+
 def test_imports():
     provider.StorageProvider
     provider.LocalStorageProvider
@@ -58,6 +73,7 @@ def test_class_instantiation():
 
 class TestLocalStorageProvider:
     Storage = provider.LocalStorageProvider()
+    user_id = "user-1"
     file_content = b"test content"
     file_bytesio = io.BytesIO(file_content)
     filename = "test.txt"
@@ -66,88 +82,170 @@ class TestLocalStorageProvider:
 
     def test_upload_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        contents, file_path = self.Storage.upload_file(self.file_bytesio, self.filename)
-        assert (upload_dir / self.filename).exists()
-        assert (upload_dir / self.filename).read_bytes() == self.file_content
-        assert contents == self.file_content
-        assert file_path == str(upload_dir / self.filename)
+        metadata, file_path = self.Storage.upload_file(
+            io.BytesIO(self.file_content), self.user_id, self.filename
+        )
+        assert (upload_dir / self.user_id / self.filename).exists()
+        assert (
+            upload_dir / self.user_id / self.filename
+        ).read_bytes() == self.file_content
+        assert metadata == {
+            "size": len(self.file_content),
+            "sha256": hashlib.sha256(self.file_content).hexdigest(),
+        }
+        assert file_path == str(upload_dir / self.user_id / self.filename)
+        with pytest.raises(ValueError):
+            self.Storage.upload_file(
+                self.file_bytesio_empty, self.user_id, self.filename_extra
+            )
+        assert not (upload_dir / self.user_id / self.filename_extra).exists()
+
+    def test_upload_file_in_chunks(self, monkeypatch, tmp_path):
+        upload_dir = mock_upload_dir(monkeypatch, tmp_path)
+        monkeypatch.setattr(provider, "STORAGE_UPLOAD_CHUNK_SIZE", 5)
+        file_content = os.urandom(1024)
+        metadata, file_path = self.Storage.upload_file(
+            io.BytesIO(file_content), self.user_id, self.filename
+        )
+        assert (upload_dir / self.user_id / self.filename).read_bytes() == file_content
+        assert metadata["size"] == len(file_content)
+        assert metadata["sha256"] == hashlib.sha256(file_content).hexdigest()
+
+    def test_store_blob_deduplicates(self, monkeypatch, tmp_path):
+        upload_dir = mock_upload_dir(monkeypatch, tmp_path)
+        monkeypatch.setattr(provider, "BLOB_DIR", str(upload_dir / "blobs"))
+        sha256 = hashlib.sha256(self.file_content).hexdigest()
+        metadata, file_path = store_blob(
+            self.Storage, self.file_content, "Handbook.PDF"
+        )
+        _, other_file_path = store_blob(self.Storage, self.file_content, "copy.pdf")
+        assert (
+            file_path == other_file_path == str(upload_dir / "blobs" / f"{sha256}.pdf")
+        )
+        assert metadata["sha256"] == sha256
+        # The staged copies were moved into place, only the blob is left
+        assert os.listdir(upload_dir / "blobs") == [f"{sha256}.pdf"]
+        self.Storage.delete_file(self.user_id, file_path)
+        assert not os.path.exists(file_path)
+
+    def test_stage_blob_cleans_up(self, monkeypatch, tmp_path):
+        upload_dir = mock_upload_dir(monkeypatch, tmp_path)
+        monkeypatch.setattr(provider, "BLOB_DIR", str(upload_dir / "blobs"))
+        with pytest.raises(RuntimeError):
+            with provider.stage_blob(io.BytesIO(self.file_content)) as (metadata, _):
+                assert metadata["size"] == len(self.file_content)
+                raise RuntimeError("upload failed")
         with pytest.raises(ValueError):
-            self.Storage.upload_file(self.file_bytesio_empty, self.filename)
+            with provider.stage_blob(io.BytesIO()):
+                pass
+        assert os.listdir(upload_dir / "blobs") == []
 
     def test_get_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        file_path = str(upload_dir / self.filename)
-        file_path_return = self.Storage.get_file(file_path)
+        file_path = str(upload_dir / self.user_id / self.filename)
+        file_path_return = self.Storage.get_file(self.user_id, file_path)
         assert file_path == file_path_return
 
     def test_delete_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        (upload_dir / self.filename).write_bytes(self.file_content)
-        assert (upload_dir / self.filename).exists()
-        file_path = str(upload_dir / self.filename)
-        self.Storage.delete_file(file_path)
-        assert not (upload_dir / self.filename).exists()
+        (upload_dir / self.user_id).mkdir()
+        (upload_dir / self.user_id / self.filename).write_bytes(self.file_content)
+        assert (upload_dir / self.user_id / self.filename).exists()
+        file_path = str(upload_dir / self.user_id / self.filename)
+        self.Storage.delete_file(self.user_id, file_path)
+        assert not (upload_dir / self.user_id / self.filename).exists()
 
     def test_delete_all_files(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        (upload_dir / self.filename).write_bytes(self.file_content)
-        (upload_dir / self.filename_extra).write_bytes(self.file_content)
-        self.Storage.delete_all_files()
-        assert not (upload_dir / self.filename).exists()
-        assert not (upload_dir / self.filename_extra).exists()
+        (upload_dir / self.user_id).mkdir()
+        (upload_dir / self.user_id / self.filename).write_bytes(self.file_content)
+        (upload_dir / self.user_id / self.filename_extra).write_bytes(self.file_content)
+        monkeypatch.setattr(provider, "BLOB_DIR", str(upload_dir / "blobs"))
+        _, blob_path = store_blob(self.Storage, self.file_content, self.filename)
+        self.Storage.delete_all_files(self.user_id)
+        assert not (upload_dir / self.user_id / self.filename).exists()
+        assert not (upload_dir / self.user_id / self.filename_extra).exists()
+        # Blobs are shared between users, they are released file by file
+        assert os.path.exists(blob_path)
 
 
 @mock_aws
 class TestS3StorageProvider:
+    user_id = "user-1"
+    file_content = b"test content"
+    filename = "test.txt"
+    filename_extra = "test_exyta.txt"
 
-    def __init__(self):
+    def setup_method(self, method):
         self.Storage = provider.S3StorageProvider()
         self.Storage.bucket_name = "my-bucket"
         self.s3_client = boto3.resource("s3", region_name="us-east-1")
-        self.file_content = b"test content"
-        self.filename = "test.txt"
-        self.filename_extra = "test_exyta.txt"
         self.file_bytesio_empty = io.BytesIO()
-        super().__init__()
 
     def test_upload_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
+        mock_storage_cache(monkeypatch, tmp_path)
         # S3 checks
         with pytest.raises(Exception):
-            self.Storage.upload_file(io.BytesIO(self.file_content), self.filename)
+            self.Storage.upload_file(
+                io.BytesIO(self.file_content), self.user_id, self.filename
+            )
         self.s3_client.create_bucket(Bucket=self.Storage.bucket_name)
-        contents, s3_file_path = self.Storage.upload_file(
-            io.BytesIO(self.file_content), self.filename
+        upload = MagicMock(wraps=self.Storage.s3_client.upload_file)
+        monkeypatch.setattr(self.Storage.s3_client, "upload_file", upload)
+        metadata, s3_file_path = self.Storage.upload_file(
+            io.BytesIO(self.file_content), self.user_id, self.filename
         )
         object = self.s3_client.Object(self.Storage.bucket_name, self.filename)
         assert self.file_content == object.get()["Body"].read()
+        # Sent from the local copy, in parts of STORAGE_UPLOAD_CHUNK_SIZE
+        upload.assert_called_once_with(
+            str(upload_dir / self.user_id / self.filename),
+            self.Storage.bucket_name,
+            self.filename,
+            Config=self.Storage.transfer_config,
+        )
+        assert (
+            self.Storage.transfer_config.multipart_chunksize
+            == provider.STORAGE_UPLOAD_CHUNK_SIZE
+        )
         # local checks
-        assert (upload_dir / self.filename).exists()
-        assert (upload_dir / self.filename).read_bytes() == self.file_content
-        assert contents == self.file_content
+        assert (upload_dir / self.user_id / self.filename).exists()
+        assert (
+            upload_dir / self.user_id / self.filename
+        ).read_bytes() == self.file_content
+        assert metadata == {
+            "size": len(self.file_content),
+            "sha256": hashlib.sha256(self.file_content).hexdigest(),
+        }
         assert s3_file_path == "s3://" + self.Storage.bucket_name + "/" + self.filename
         with pytest.raises(ValueError):
-            self.Storage.upload_file(self.file_bytesio_empty, self.filename)
+            self.Storage.upload_file(
+                self.file_bytesio_empty, self.user_id, self.filename
+            )
 
     def test_get_file(self, monkeypatch, tmp_path):
-        upload_dir = mock_upload_dir(monkeypatch, tmp_path)
+        mock_upload_dir(monkeypatch, tmp_path)
+        mock_storage_cache(monkeypatch, tmp_path)
         self.s3_client.create_bucket(Bucket=self.Storage.bucket_name)
-        contents, s3_file_path = self.Storage.upload_file(
-            io.BytesIO(self.file_content), self.filename
+        metadata, s3_file_path = self.Storage.upload_file(
+            io.BytesIO(self.file_content), self.user_id, self.filename
         )
-        file_path = self.Storage.get_file(s3_file_path)
-        assert file_path == str(upload_dir / self.filename)
-        assert (upload_dir / self.filename).exists()
+        file_path = self.Storage.get_file(self.user_id, s3_file_path)
+        assert os.path.basename(file_path) == self.filename
+        with open(file_path, "rb") as f:
+            assert f.read() == self.file_content
 
     def test_delete_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
+        mock_storage_cache(monkeypatch, tmp_path)
         self.s3_client.create_bucket(Bucket=self.Storage.bucket_name)
-        contents, s3_file_path = self.Storage.upload_file(
-            io.BytesIO(self.file_content), self.filename
+        metadata, s3_file_path = self.Storage.upload_file(
+            io.BytesIO(self.file_content), self.user_id, self.filename
         )
-        assert (upload_dir / self.filename).exists()
-        self.Storage.delete_file(s3_file_path)
-        assert not (upload_dir / self.filename).exists()
+        assert (upload_dir / self.user_id / self.filename).exists()
+        self.Storage.delete_file(self.user_id, s3_file_path)
+        assert not (upload_dir / self.user_id / self.filename).exists()
         with pytest.raises(ClientError) as exc:
             self.s3_client.Object(self.Storage.bucket_name, self.filename).load()
         error = exc.value.response["Error"]
@@ -156,36 +254,27 @@ class TestS3StorageProvider:
 
     def test_delete_all_files(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
+        mock_storage_cache(monkeypatch, tmp_path)
         # create 2 files
         self.s3_client.create_bucket(Bucket=self.Storage.bucket_name)
-        self.Storage.upload_file(io.BytesIO(self.file_content), self.filename)
-        object = self.s3_client.Object(self.Storage.bucket_name, self.filename)
-        assert self.file_content == object.get()["Body"].read()
-        assert (upload_dir / self.filename).exists()
-        assert (upload_dir / self.filename).read_bytes() == self.file_content
-        self.Storage.upload_file(io.BytesIO(self.file_content), self.filename_extra)
-        object = self.s3_client.Object(self.Storage.bucket_name, self.filename_extra)
-        assert self.file_content == object.get()["Body"].read()
-        assert (upload_dir / self.filename).exists()
-        assert (upload_dir / self.filename).read_bytes() == self.file_content
-
-        self.Storage.delete_all_files()
-        assert not (upload_dir / self.filename).exists()
-        with pytest.raises(ClientError) as exc:
-            self.s3_client.Object(self.Storage.bucket_name, self.filename).load()
-        error = exc.value.response["Error"]
-        assert error["Code"] == "404"
-        assert error["Message"] == "Not Found"
-        assert not (upload_dir / self.filename_extra).exists()
-        with pytest.raises(ClientError) as exc:
-            self.s3_client.Object(self.Storage.bucket_name, self.filename_extra).load()
-        error = exc.value.response["Error"]
-        assert error["Code"] == "404"
-        assert error["Message"] == "Not Found"
-
-        self.Storage.delete_all_files()
-        assert not (upload_dir / self.filename).exists()
-        assert not (upload_dir / self.filename_extra).exists()
+        for filename in (self.filename, self.filename_extra):
+            self.Storage.upload_file(
+                io.BytesIO(self.file_content), self.user_id, filename
+            )
+            object = self.s3_client.Object(self.Storage.bucket_name, filename)
+            assert self.file_content == object.get()["Body"].read()
+            assert (
+                upload_dir / self.user_id / filename
+            ).read_bytes() == self.file_content
+
+        self.Storage.delete_all_files(self.user_id)
+        for filename in (self.filename, self.filename_extra):
+            assert not (upload_dir / self.user_id / filename).exists()
+            with pytest.raises(ClientError) as exc:
+                self.s3_client.Object(self.Storage.bucket_name, filename).load()
+            error = exc.value.response["Error"]
+            assert error["Code"] == "404"
+            assert error["Message"] == "Not Found"
 
     def test_init_without_credentials(self, monkeypatch):
         """Test that S3StorageProvider can initialize without explicit credentials."""
@@ -202,6 +291,7 @@ class TestS3StorageProvider:
 class TestGCSStorageProvider:
     Storage = provider.GCSStorageProvider()
     Storage.bucket_name = "my-bucket"
+    user_id = "user-1"
     file_content = b"test content"
     filename = "test.txt"
     filename_extra = "test_exyta.txt"
@@ -225,82 +315,97 @@ class TestGCSStorageProvider:
 
     def test_upload_file(self, monkeypatch, tmp_path, setup):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
+        mock_storage_cache(monkeypatch, tmp_path)
         # catch error if bucket does not exist
         with pytest.raises(Exception):
-            self.Storage.bucket = monkeypatch(self.Storage, "bucket", None)
-            self.Storage.upload_file(io.BytesIO(self.file_content), self.filename)
-        contents, gcs_file_path = self.Storage.upload_file(
-            io.BytesIO(self.file_content), self.filename
+            with monkeypatch.context() as m:
+                m.setattr(self.Storage, "bucket", None)
+                self.Storage.upload_file(
+                    io.BytesIO(self.file_content), self.user_id, self.filename
+                )
+        # Sent as a resumable upload in parts of a multiple of 256 KiB
+        monkeypatch.setattr(provider, "STORAGE_UPLOAD_CHUNK_SIZE", 300 * 1024)
+        blob = MagicMock(wraps=self.Storage.bucket.blob)
+        monkeypatch.setattr(self.Storage.bucket, "blob", blob)
+        metadata, gcs_file_path = self.Storage.upload_file(
+            io.BytesIO(self.file_content), self.user_id, self.filename
         )
+        blob.assert_called_once_with(self.filename, chunk_size=256 * 1024)
         object = self.Storage.bucket.get_blob(self.filename)
         assert self.file_content == object.download_as_bytes()
         # local checks
-        assert (upload_dir / self.filename).exists()
-        assert (upload_dir / self.filename).read_bytes() == self.file_content
-        assert contents == self.file_content
+        assert (upload_dir / self.user_id / self.filename).exists()
+        assert (
+            upload_dir / self.user_id / self.filename
+        ).read_bytes() == self.file_content
+        assert metadata["size"] == len(self.file_content)
         assert gcs_file_path == "gs://" + self.Storage.bucket_name + "/" + self.filename
         # test error if file is empty
         with pytest.raises(ValueError):
-            self.Storage.upload_file(self.file_bytesio_empty, self.filename)
+            self.Storage.upload_file(
+                self.file_bytesio_empty, self.user_id, self.filename
+            )
 
     def test_get_file(self, monkeypatch, tmp_path, setup):
-        upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        contents, gcs_file_path = self.Storage.upload_file(
-            io.BytesIO(self.file_content), self.filename
+        mock_upload_dir(monkeypatch, tmp_path)
+        mock_storage_cache(monkeypatch, tmp_path)
+        metadata, gcs_file_path = self.Storage.upload_file(
+            io.BytesIO(self.file_content), self.user_id, self.filename
         )
-        file_path = self.Storage.get_file(gcs_file_path)
-        assert file_path == str(upload_dir / self.filename)
-        assert (upload_dir / self.filename).exists()
+        file_path = self.Storage.get_file(self.user_id, gcs_file_path)
+        assert os.path.basename(file_path) == self.filename
+        with open(file_path, "rb") as f:
+            assert f.read() == self.file_content
 
     def test_delete_file(self, monkeypatch, tmp_path, setup):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        contents, gcs_file_path = self.Storage.upload_file(
-            io.BytesIO(self.file_content), self.filename
+        mock_storage_cache(monkeypatch, tmp_path)
+        metadata, gcs_file_path = self.Storage.upload_file(
+            io.BytesIO(self.file_content), self.user_id, self.filename
         )
         # ensure that local directory has the uploaded file as well
-        assert (upload_dir / self.filename).exists()
+        assert (upload_dir / self.user_id / self.filename).exists()
         assert self.Storage.bucket.get_blob(self.filename).name == self.filename
-        self.Storage.delete_file(gcs_file_path)
+        self.Storage.delete_file(self.user_id, gcs_file_path)
         # check that deleting file from gcs will delete the local file as well
-        assert not (upload_dir / self.filename).exists()
+        assert not (upload_dir / self.user_id / self.filename).exists()
         assert self.Storage.bucket.get_blob(self.filename) == None
 
     def test_delete_all_files(self, monkeypatch, tmp_path, setup):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
+        mock_storage_cache(monkeypatch, tmp_path)
         # create 2 files
-        self.Storage.upload_file(io.BytesIO(self.file_content), self.filename)
-        object = self.Storage.bucket.get_blob(self.filename)
-        assert (upload_dir / self.filename).exists()
-        assert (upload_dir / self.filename).read_bytes() == self.file_content
-        assert self.Storage.bucket.get_blob(self.filename).name == self.filename
-        assert self.file_content == object.download_as_bytes()
-        self.Storage.upload_file(io.BytesIO(self.file_content), self.filename_extra)
-        object = self.Storage.bucket.get_blob(self.filename_extra)
-        assert (upload_dir / self.filename_extra).exists()
-        assert (upload_dir / self.filename_extra).read_bytes() == self.file_content
-        assert (
-            self.Storage.bucket.get_blob(self.filename_extra).name
-            == self.filename_extra
-        )
-        assert self.file_content == object.download_as_bytes()
-
-        self.Storage.delete_all_files()
-        assert not (upload_dir / self.filename).exists()
-        assert not (upload_dir / self.filename_extra).exists()
+        for filename in (self.filename, self.filename_extra):
+            self.Storage.upload_file(
+                io.BytesIO(self.file_content), self.user_id, filename
+            )
+            object = self.Storage.bucket.get_blob(filename)
+            assert (
+                upload_dir / self.user_id / filename
+            ).read_bytes() == self.file_content
+            assert object.name == filename
+            assert self.file_content == object.download_as_bytes()
+
+        self.Storage.delete_all_files(self.user_id)
+        assert not (upload_dir / self.user_id / self.filename).exists()
+        assert not (upload_dir / self.user_id / self.filename_extra).exists()
         assert self.Storage.bucket.get_blob(self.filename) == None
         assert self.Storage.bucket.get_blob(self.filename_extra) == None
 
 
 class TestAzureStorageProvider:
-    def __init__(self):
-        super().__init__()
+    user_id = "user-1"
+    file_content = b"test content"
+    filename = "test.txt"
+    filename_extra = "test_extra.txt"
 
-    @pytest.fixture(scope="class")
-    def setup_storage(self, monkeypatch):
+    def setup_method(self, method):
         # Create mock Blob Service Client and related clients
         mock_blob_service_client = MagicMock()
         mock_container_client = MagicMock()
         mock_blob_client = MagicMock()
+        mock_blob_client.upload_blob.return_value = {"etag": '"etag"'}
+        mock_blob_client.get_blob_properties.return_value.etag = '"etag"'
 
         # Set up return values for the mock
         mock_blob_service_client.get_container_client.return_value = (
@@ -308,123 +413,131 @@ class TestAzureStorageProvider:
         )
         mock_container_client.get_blob_client.return_value = mock_blob_client
 
-        # Monkeypatch the Azure classes to return our mocks
-        monkeypatch.setattr(
-            azure.storage.blob,
-            "BlobServiceClient",
-            lambda *args, **kwargs: mock_blob_service_client,
-        )
-        monkeypatch.setattr(
-            azure.storage.blob,
-            "ContainerClient",
-            lambda *args, **kwargs: mock_container_client,
+        self.Storage = provider.AzureStorageProvider.__new__(
+            provider.AzureStorageProvider
         )
-        monkeypatch.setattr(
-            azure.storage.blob, "BlobClient", lambda *args, **kwargs: mock_blob_client
-        )
-
-        self.Storage = provider.AzureStorageProvider()
         self.Storage.endpoint = "https://myaccount.blob.core.windows.net"
         self.Storage.container_name = "my-container"
-        self.file_content = b"test content"
-        self.filename = "test.txt"
-        self.filename_extra = "test_extra.txt"
         self.file_bytesio_empty = io.BytesIO()
 
         # Apply mocks to the Storage instance
         self.Storage.blob_service_client = mock_blob_service_client
         self.Storage.container_client = mock_container_client
 
+    def test_init_uploads_in_blocks(self, monkeypatch):
+        monkeypatch.setattr(provider, "AZURE_STORAGE_ENDPOINT", self.Storage.endpoint)
+        monkeypatch.setattr(provider, "AZURE_STORAGE_KEY", "key")
+        blob_service_client = MagicMock()
+        monkeypatch.setattr(provider, "BlobServiceClient", blob_service_client)
+        provider.AzureStorageProvider()
+        blob_service_client.assert_called_once_with(
+            account_url=self.Storage.endpoint,
+            credential="key",
+            max_single_put_size=provider.STORAGE_UPLOAD_CHUNK_SIZE,
+            max_block_size=provider.STORAGE_UPLOAD_CHUNK_SIZE,
+        )
+
     def test_upload_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
+        mock_storage_cache(monkeypatch, tmp_path)
 
         # Simulate an error when container does not exist
         self.Storage.container_client.get_blob_client.side_effect = Exception(
             "Container does not exist"
         )
         with pytest.raises(Exception):
-            self.Storage.upload_file(io.BytesIO(self.file_content), self.filename)
+            self.Storage.upload_file(
+                io.BytesIO(self.file_content), self.user_id, self.filename
+            )
 
-        # Reset side effect and create container
+        # Reset side effect
         self.Storage.container_client.get_blob_client.side_effect = None
-        self.Storage.create_container()
-        contents, azure_file_path = self.Storage.upload_file(
-            io.BytesIO(self.file_content), self.filename
+        metadata, azure_file_path = self.Storage.upload_file(
+            io.BytesIO(self.file_content), self.user_id, self.filename
         )
 
-        # Assertions
+        # Assertions, the local copy is streamed with its length
         self.Storage.container_client.get_blob_client.assert_called_with(self.filename)
-        self.Storage.container_client.get_blob_client().upload_blob.assert_called_once_with(
-            self.file_content, overwrite=True
-        )
-        assert contents == self.file_content
+        upload_blob = self.Storage.container_client.get_blob_client().upload_blob
+        upload_blob.assert_called_once()
+        args, kwargs = upload_blob.call_args
+        assert args[0].name == str(upload_dir / self.user_id / self.filename)
+        assert kwargs == {"length": len(self.file_content), "overwrite": True}
+        assert metadata["size"] == len(self.file_content)
         assert (
             azure_file_path
             == f"https://myaccount.blob.core.windows.net/{self.Storage.container_name}/{self.filename}"
         )
-        assert (upload_dir / self.filename).exists()
-        assert (upload_dir / self.filename).read_bytes() == self.file_content
+        assert (upload_dir / self.user_id / self.filename).exists()
+        assert (
+            upload_dir / self.user_id / self.filename
+        ).read_bytes() == self.file_content
 
         with pytest.raises(ValueError):
-            self.Storage.upload_file(self.file_bytesio_empty, self.filename)
+            self.Storage.upload_file(
+                self.file_bytesio_empty, self.user_id, self.filename
+            )
 
     def test_get_file(self, monkeypatch, tmp_path):
-        upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        self.Storage.create_container()
+        mock_upload_dir(monkeypatch, tmp_path)
+        mock_storage_cache(monkeypatch, tmp_path)
 
-        # Mock upload behavior
-        self.Storage.upload_file(io.BytesIO(self.file_content), self.filename)
         # Mock blob download behavior
-        self.Storage.container_client.get_blob_client().download_blob().readall.return_value = (
+        self.Storage.container_client.get_blob_client().download_blob().readinto.side_effect = lambda f: f.write(
             self.file_content
         )
 
         file_url = f"https://myaccount.blob.core.windows.net/{self.Storage.container_name}/{self.filename}"
-        file_path = self.Storage.get_file(file_url)
+        file_path = self.Storage.get_file(self.user_id, file_url)
 
-        assert file_path == str(upload_dir / self.filename)
-        assert (upload_dir / self.filename).exists()
-        assert (upload_dir / self.filename).read_bytes() == self.file_content
+        assert os.path.basename(file_path) == self.filename
+        with open(file_path, "rb") as f:
+            assert f.read() == self.file_content
 
     def test_delete_file(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        self.Storage.create_container()
+        mock_storage_cache(monkeypatch, tmp_path)
 
         # Mock file upload
-        self.Storage.upload_file(io.BytesIO(self.file_content), self.filename)
+        self.Storage.upload_file(
+            io.BytesIO(self.file_content), self.user_id, self.filename
+        )
         # Mock deletion
         self.Storage.container_client.get_blob_client().delete_blob.return_value = None
 
         file_url = f"https://myaccount.blob.core.windows.net/{self.Storage.container_name}/{self.filename}"
-        self.Storage.delete_file(file_url)
+        self.Storage.delete_file(self.user_id, file_url)
 
         self.Storage.container_client.get_blob_client().delete_blob.assert_called_once()
-        assert not (upload_dir / self.filename).exists()
+        assert not (upload_dir / self.user_id / self.filename).exists()
 
     def test_delete_all_files(self, monkeypatch, tmp_path):
         upload_dir = mock_upload_dir(monkeypatch, tmp_path)
-        self.Storage.create_container()
+        mock_storage_cache(monkeypatch, tmp_path)
 
         # Mock file uploads
-        self.Storage.upload_file(io.BytesIO(self.file_content), self.filename)
-        self.Storage.upload_file(io.BytesIO(self.file_content), self.filename_extra)
+        self.Storage.upload_file(
+            io.BytesIO(self.file_content), self.user_id, self.filename
+        )
+        self.Storage.upload_file(
+            io.BytesIO(self.file_content), self.user_id, self.filename_extra
+        )
 
         # Mock listing and deletion behavior
-        self.Storage.container_client.list_blobs.return_value = [
-            {"name": self.filename},
-            {"name": self.filename_extra},
-        ]
-        self.Storage.container_client.get_blob_client().delete_blob.return_value = None
+        blobs = [MagicMock(), MagicMock()]
+        blobs[0].name, blobs[1].name = self.filename, self.filename_extra
+        self.Storage.container_client.list_blobs.return_value = blobs
 
-        self.Storage.delete_all_files()
+        self.Storage.delete_all_files(self.user_id)
 
         self.Storage.container_client.list_blobs.assert_called_once()
-        self.Storage.container_client.get_blob_client().delete_blob.assert_any_call()
-        assert not (upload_dir / self.filename).exists()
-        assert not (upload_dir / self.filename_extra).exists()
+        self.Storage.container_client.delete_blob.assert_any_call(self.filename)
+        self.Storage.container_client.delete_blob.assert_any_call(self.filename_extra)
+        assert not (upload_dir / self.user_id / self.filename).exists()
+        assert not (upload_dir / self.user_id / self.filename_extra).exists()
 
-    def test_get_file_not_found(self, monkeypatch):
-        self.Storage.create_container()
+    def test_get_file_not_found(self, monkeypatch, tmp_path):
+        mock_storage_cache(monkeypatch, tmp_path)
 
         file_url = f"https://myaccount.blob.core.windows.net/{self.Storage.container_name}/{self.filename}"
         # Mock behavior to raise an error for missing blobs
@@ -432,4 +545,4 @@ class TestAzureStorageProvider:
             Exception("Blob not found")
         )
         with pytest.raises(Exception, match="Blob not found"):
-            self.Storage.get_file(file_url)
+            self.Storage.get_file(self.user_id, file_url)
@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+
+from open_webui.utils import balancer as balancer_module
+from open_webui.utils.balancer import BackendBalancer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(balancer_module.time, "monotonic", clock.monotonic)
+    return clock
+
+
+@pytest.fixture
+def balancer(clock):
+    balancer = BackendBalancer(threshold=2, cooldown=30, loaded_models_ttl=3600)
+    # No event loop runs in these tests, so /api/ps is never fetched
+    return balancer
+
+
+BACKENDS = [
+    {"idx": 0, "url": "http://a", "key": None, "model": "llama3"},
+    {"idx": 1, "url": "http://b", "key": None, "model": "llama3"},
+]
+
+
+def fail(balancer, url, times):
+    for _ in range(times):
+        balancer.begin(url)
+        balancer.report(url, failed=True)
+        balancer.end(url)
+
+
+def test_prefers_least_loaded(balancer):
+    balancer.begin("http://a")
+    assert balancer.select(BACKENDS) == 1
+    balancer.begin("http://b")
+    balancer.begin("http://b")
+    assert balancer.select(BACKENDS) == 0
+    balancer.end("http://b")
+    balancer.end("http://b")
+    assert balancer.select(BACKENDS) == 1
+
+
+def test_prefers_loaded_model_then_latency(balancer, clock):
+    started = balancer.begin("http://a")
+    clock.now += 2
+    balancer.report("http://a", started)
+    balancer.end("http://a")
+    started = balancer.begin("http://b")
+    clock.now += 1
+    balancer.report("http://b", started)
+    balancer.end("http://b")
+    assert balancer.select(BACKENDS) == 1
+
+    balancer._state("http://a").loaded_models = {"llama3"}
+    assert balancer.select(BACKENDS) == 0
+    # Requests in flight outweigh latency but not a loaded model
+    balancer.begin("http://a")
+    assert balancer.select(BACKENDS) == 0
+
+
+def test_trips_after_threshold(balancer, clock):
+    fail(balancer, "http://a", 1)
+    assert balancer.info()["http://a"]["ejected"] is False
+    fail(balancer, "http://a", 1)
+    assert balancer.info()["http://a"]["ejected"] is True
+    assert all(balancer.select(BACKENDS) == 1 for _ in range(10))
+
+    # 4xx errors are the request's fault and do not count
+    assert not balancer_module.is_backend_failure(
+        type("Error", (Exception,), {"status": 404})()
+    )
+    assert balancer_module.is_backend_failure(ConnectionError())
+
+
+def test_every_backend_ejected(balancer, clock):
+    fail(balancer, "http://a", 2)
+    clock.now += 10
+    fail(balancer, "http://b", 2)
+    # The one that comes back first is tried
+    assert balancer.select(BACKENDS) == 0
+
+
+def test_half_open_recovery(balancer, clock):
+    fail(balancer, "http://a", 2)
+    clock.now += 31
+    balancer.begin("http://b")
+    # Cooldown is over, a single request probes the backend
+    assert balancer.select(BACKENDS) == 0
+    assert balancer.select(BACKENDS) == 1
+    assert balancer.select(BACKENDS) == 1
+
+    # A failed probe ejects it again
+    fail(balancer, "http://a", 1)
+    assert balancer.info()["http://a"]["ejected"] is True
+    assert balancer.select(BACKENDS) == 1
+
+    clock.now += 31
+    assert balancer.select(BACKENDS) == 0
+    started = balancer.begin("http://a")
+    balancer.report("http://a", started)
+    balancer.end("http://a")
+    assert balancer.info()["http://a"]["failures"] == 0
+    assert balancer.info()["http://a"]["ejected"] is False
+    assert balancer.select(BACKENDS) == 0
+
+
+def test_cancelled_probe_is_released(balancer, clock):
+    fail(balancer, "http://a", 2)
+    clock.now += 31
+    balancer.begin("http://b")
+    assert balancer.select(BACKENDS) == 0
+
+    async def probe():
+        with balancer.track("http://a"):
+            await asyncio.sleep(10)
+
+    async def main():
+        task = asyncio.create_task(probe())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert balancer.info()["http://a"]["in_flight"] == 0
+    # The next request probes the backend instead of it staying out of rotation
+    assert balancer.select(BACKENDS) == 0
+
+
+def test_unreported_probe_expires(balancer, clock):
+    fail(balancer, "http://a", 2)
+    clock.now += 31
+    balancer.begin("http://b")
+    # Selected, but the request never reached the backend
+    assert balancer.select(BACKENDS) == 0
+    assert balancer.select(BACKENDS) == 1
+    clock.now += 31
+    assert balancer.select(BACKENDS) == 0
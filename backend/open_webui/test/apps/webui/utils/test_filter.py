@@ -0,0 +1,181 @@
+import asyncio
+import threading
+from types import ModuleType, SimpleNamespace
+
+import pytest
+from pydantic import BaseModel
+
+from open_webui.utils import filter as filter_utils
+from open_webui.utils.filter import (
+    get_filter_chain,
+    process_filter_functions,
+    valves_cache,
+)
+
+
+def make_module(name: str, **attributes) -> ModuleType:
+    module = ModuleType(name)
+    for key, value in attributes.items():
+        setattr(module, key, value)
+    return module
+
+
+class Valves(BaseModel):
+    suffix: str = "!"
+
+
+class UserValves(BaseModel):
+    prefix: str = ""
+
+
+@pytest.fixture
+def functions(monkeypatch):
+    calls = {"valves": 0, "user_valves": 0}
+
+    def get_function_valves_by_id(id):
+        calls["valves"] += 1
+        return {"suffix": "?"} if id == "question" else None
+
+    def get_user_valves_by_id_and_user_id(id, user_id):
+        calls["user_valves"] += 1
+        return {"prefix": f"{user_id}:"}
+
+    monkeypatch.setattr(
+        filter_utils,
+        "Functions",
+        SimpleNamespace(
+            writes=0,
+            get_function_valves_by_id=get_function_valves_by_id,
+            get_user_valves_by_id_and_user_id=get_user_valves_by_id_and_user_id,
+        ),
+    )
+    valves_cache.clear()
+    return calls
+
+
+def make_request(modules: dict) -> SimpleNamespace:
+    return SimpleNamespace(
+        app=SimpleNamespace(state=SimpleNamespace(FUNCTIONS=modules))
+    )
+
+
+def function(id: str, updated_at: int = 0) -> SimpleNamespace:
+    return SimpleNamespace(id=id, updated_at=updated_at)
+
+
+EXTRA_PARAMS = {"__user__": {"id": "user-1"}, "__metadata__": {"chat_id": "c"}}
+
+
+def test_stream_chain_runs_handlers_in_order(functions):
+    threads = []
+
+    async def shout(event, __id__):
+        event["content"] = event["content"].upper() + f"[{__id__}]"
+        return event
+
+    def punctuate(event):
+        # Sync handlers run off the event loop
+        threads.append(threading.current_thread())
+        event["content"] += valves_module.valves.suffix
+        return event
+
+    valves_module = make_module(
+        "question", stream=punctuate, Valves=Valves, valves=None
+    )
+    request = make_request(
+        {
+            "shout": make_module("shout", stream=shout),
+            "question": valves_module,
+            # Filters without a stream handler are left out
+            "inlet_only": make_module("inlet_only", inlet=lambda body: body),
+        }
+    )
+    chain = get_filter_chain(
+        request,
+        [function("shout"), None, function("inlet_only"), function("question")],
+        "stream",
+        EXTRA_PARAMS,
+    )
+    assert [filter_id for filter_id, *_ in chain.handlers] == ["shout", "question"]
+
+    async def main():
+        return [await chain({"content": f"chunk {i}"}) for i in range(3)]
+
+    events = asyncio.run(main())
+    assert [event["content"] for event in events] == [
+        f"CHUNK {i}[shout]?" for i in range(3)
+    ]
+    assert len(threads) == 3 and threading.main_thread() not in threads
+    # Valves are read once for the chain, not once per chunk
+    assert functions["valves"] == 1
+
+
+def test_user_valves_are_resolved_once(functions):
+    seen = []
+
+    def stream(event, __user__):
+        seen.append(__user__["valves"].prefix)
+        return event
+
+    request = make_request(
+        {"personal": make_module("personal", stream=stream, UserValves=UserValves)}
+    )
+    chain = get_filter_chain(request, [function("personal")], "stream", EXTRA_PARAMS)
+
+    async def main():
+        for _ in range(5):
+            await chain({"content": "x"})
+
+    asyncio.run(main())
+    assert seen == ["user-1:"] * 5
+    assert functions["user_valves"] == 1
+    # The caller's user is not modified
+    assert "valves" not in EXTRA_PARAMS["__user__"]
+
+
+def test_valves_cache_follows_function_updates(functions):
+    module = make_module(
+        "question", stream=lambda event: event, Valves=Valves, valves=None
+    )
+    request = make_request({"question": module})
+    get_filter_chain(request, [function("question", 1)], "stream", EXTRA_PARAMS)
+    get_filter_chain(request, [function("question", 1)], "stream", EXTRA_PARAMS)
+    assert functions["valves"] == 1
+    get_filter_chain(request, [function("question", 2)], "stream", EXTRA_PARAMS)
+    assert functions["valves"] == 2
+    assert module.valves.suffix == "?"
+
+
+def test_empty_chain_is_falsy(functions):
+    assert not get_filter_chain(make_request({}), [], "stream", EXTRA_PARAMS)
+
+
+def test_inlet_passes_body_and_skips_files(functions):
+    def inlet(body):
+        body["seen"] = True
+        return body
+
+    request = make_request(
+        {"files": make_module("files", inlet=inlet, file_handler=True)}
+    )
+    body, flags = asyncio.run(
+        process_filter_functions(
+            request,
+            [function("files")],
+            "inlet",
+            {"metadata": {"files": ["a"]}},
+            EXTRA_PARAMS,
+        )
+    )
+    assert body == {"metadata": {}, "seen": True}
+    assert flags == {}
+
+
+def test_handler_errors_propagate(functions):
+    def stream(event):
+        raise ValueError("broken filter")
+
+    request = make_request({"broken": make_module("broken", stream=stream)})
+    chain = get_filter_chain(request, [function("broken")], "stream", EXTRA_PARAMS)
+    with pytest.raises(ValueError, match="broken filter"):
+        asyncio.run(chain({"content": "x"}))
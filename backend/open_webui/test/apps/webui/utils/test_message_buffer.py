@@ -0,0 +1,266 @@
+import asyncio
+import json
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.responses import StreamingResponse
+
+from open_webui.models import chats as chats_model
+from open_webui.models.chats import Chat, Chats
+from open_webui.utils import message_buffer, middleware
+from open_webui.utils.message_buffer import MessageWriteBuffer
+
+
+class FakeChats:
+    """Records the writes of the buffer instead of rewriting a chat."""
+
+    def __init__(self):
+        self.messages = {("chat-1", "message-1"): {"content": "Saved "}}
+        self.writes = []
+
+    def get_message_by_id_and_message_id(self, chat_id, message_id):
+        return self.messages.get((chat_id, message_id))
+
+    def update_message_by_id_and_message_id(
+        self, chat_id, message_id, message, status_history=None
+    ):
+        self.writes.append((chat_id, message_id, dict(message), status_history))
+
+
+@pytest.fixture
+def chats(monkeypatch):
+    chats = FakeChats()
+    monkeypatch.setattr(message_buffer, "Chats", chats)
+    return chats
+
+
+def test_updates_are_merged_in_order(chats):
+    async def main():
+        buffer = MessageWriteBuffer(interval=60, max_pending=100)
+        buffer.upsert_message("chat-1", "message-1", {"model": "a", "done": False})
+        buffer.append_content("chat-1", "message-1", "Hello")
+        buffer.add_status("chat-1", "message-1", {"description": "searching"})
+        buffer.append_content("chat-1", "message-1", " world")
+        buffer.upsert_message("chat-1", "message-1", {"done": True})
+        buffer.add_status("chat-1", "message-1", {"description": "done"})
+        assert chats.writes == []
+
+        buffer.flush("chat-1", "message-1")
+        return buffer
+
+    buffer = asyncio.run(main())
+    assert chats.writes == [
+        (
+            "chat-1",
+            "message-1",
+            # Appended content continues what was saved, later keys win
+            {"model": "a", "done": True, "content": "Saved Hello world"},
+            [{"description": "searching"}, {"description": "done"}],
+        )
+    ]
+    assert buffer.info() == {
+        "pending": 0,
+        "updates": 6,
+        "writes": 1,
+        "writes_saved": 5,
+    }
+
+
+def test_upserted_content_is_appended_to(chats):
+    async def main():
+        buffer = MessageWriteBuffer(interval=60, max_pending=100)
+        buffer.upsert_message("chat-1", "message-1", {"content": "Replaced"})
+        buffer.append_content("chat-1", "message-1", "!")
+        buffer.flush_all()
+
+    asyncio.run(main())
+    assert chats.writes[0][2] == {"content": "Replaced!"}
+
+
+def test_flushes_after_max_pending(chats):
+    async def main():
+        buffer = MessageWriteBuffer(interval=60, max_pending=3)
+        for i in range(7):
+            buffer.upsert_message("chat-1", "message-1", {"content": str(i)})
+        assert [write[2]["content"] for write in chats.writes] == ["2", "5"]
+        assert buffer.info()["pending"] == 1
+        buffer.flush_all()
+
+    asyncio.run(main())
+    assert [write[2]["content"] for write in chats.writes] == ["2", "5", "6"]
+
+
+def test_flushes_after_interval(chats):
+    async def main():
+        buffer = MessageWriteBuffer(interval=0.05, max_pending=100)
+        buffer.upsert_message("chat-1", "message-1", {"content": "a"})
+        buffer.upsert_message("chat-2", "message-2", {"content": "b"})
+        await asyncio.sleep(0.02)
+        buffer.upsert_message("chat-1", "message-1", {"content": "c"})
+        assert chats.writes == []
+        # Counted from the first update, not pushed back by later ones
+        await asyncio.sleep(0.06)
+        assert sorted(write[2]["content"] for write in chats.writes) == ["b", "c"]
+        assert buffer.info()["pending"] == 0
+
+    asyncio.run(main())
+
+
+def test_writes_through_without_event_loop(chats):
+    buffer = MessageWriteBuffer(interval=60, max_pending=100)
+    buffer.upsert_message("chat-1", "message-1", {"content": "a"})
+    buffer.upsert_message("chat-1", "message-1", {"content": "b"})
+    assert [write[2]["content"] for write in chats.writes] == ["a", "b"]
+
+
+def test_cancelled_response_is_flushed(chats, monkeypatch):
+    buffer = MessageWriteBuffer(interval=60, max_pending=100)
+    monkeypatch.setattr(middleware, "MESSAGE_BUFFER", buffer)
+    emitted = []
+
+    async def event_emitter(event):
+        emitted.append(event)
+
+    async def event_caller(event):
+        return None
+
+    monkeypatch.setattr(middleware, "get_event_emitter", lambda metadata: event_emitter)
+    monkeypatch.setattr(middleware, "get_event_call", lambda metadata: event_caller)
+    monkeypatch.setattr(middleware, "get_sorted_filter_ids", lambda model: [])
+    monkeypatch.setattr(
+        middleware,
+        "Chats",
+        SimpleNamespace(
+            upsert_message_to_chat_by_id_and_message_id=lambda *args: None,
+            get_message_by_id_and_message_id=lambda *args: {},
+        ),
+    )
+    tasks = []
+
+    def create_task(coroutine, metadata=None):
+        tasks.append(asyncio.create_task(coroutine))
+        return "task-1", tasks[-1]
+
+    monkeypatch.setattr(middleware, "create_task", create_task)
+
+    async def main():
+        streaming = asyncio.Event()
+
+        async def body():
+            for content in ["Hello", " world"]:
+                chunk = {"choices": [{"delta": {"content": content}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            streaming.set()
+            await asyncio.sleep(3600)
+
+        result = await middleware.process_chat_response(
+            SimpleNamespace(),
+            StreamingResponse(body(), media_type="text/event-stream"),
+            {"model": "model-1", "messages": [{"role": "user", "content": "Hi"}]},
+            SimpleNamespace(id="user-1", email="", name="", role="user"),
+            {"chat_id": "chat-1", "message_id": "message-1", "session_id": "s"},
+            {"id": "model-1"},
+            [],
+            {},
+        )
+        assert result == {"status": True, "task_id": "task-1"}
+
+        await asyncio.wait_for(streaming.wait(), 5)
+        # Nothing is written while the response streams
+        assert chats.writes == []
+        tasks[0].cancel()
+        await asyncio.gather(tasks[0], return_exceptions=True)
+
+    asyncio.run(main())
+    assert {"type": "task-cancelled"} in emitted
+    assert chats.writes[-1][2]["content"] == "Hello world"
+    assert buffer.info()["pending"] == 0
+
+
+@pytest.fixture
+def chats_db(monkeypatch):
+    # Chats backed by a private in-memory database
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Chat.__table__.create(engine)
+    SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+    @contextmanager
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(chats_model, "get_db", get_db)
+    with get_db() as db:
+        db.add(
+            Chat(
+                id="chat-1",
+                user_id="user-1",
+                title="Chat",
+                chat={
+                    "title": "Chat",
+                    "history": {
+                        "currentId": "message-0",
+                        "messages": {
+                            "message-0": {"role": "user", "content": "Hi"},
+                            "message-1": {
+                                "role": "assistant",
+                                "content": "",
+                                "statusHistory": [{"description": "started"}],
+                            },
+                        },
+                    },
+                },
+                created_at=0,
+                updated_at=0,
+            )
+        )
+        db.commit()
+
+
+def test_update_message_by_id_and_message_id(chats_db):
+    chat = Chats.update_message_by_id_and_message_id(
+        "chat-1",
+        "message-1",
+        {"content": "Hello", "done": True},
+        [{"description": "done"}],
+    )
+    history = chat.chat["history"]
+    assert history["currentId"] == "message-1"
+    assert history["messages"]["message-1"] == {
+        "role": "assistant",
+        "content": "Hello",
+        "done": True,
+        "statusHistory": [{"description": "started"}, {"description": "done"}],
+    }
+    assert history["messages"]["message-0"] == {"role": "user", "content": "Hi"}
+    assert Chats.get_chat_by_id("chat-1").chat["history"] == history
+
+
+def test_update_message_by_id_and_message_id_status_only(chats_db):
+    chat = Chats.update_message_by_id_and_message_id(
+        "chat-1", "message-1", {}, [{"description": "searching"}]
+    )
+    history = chat.chat["history"]
+    # A status alone does not move the current message
+    assert history["currentId"] == "message-0"
+    assert history["messages"]["message-1"]["statusHistory"][-1] == {
+        "description": "searching"
+    }
+
+    # Statuses of a message that was never saved are dropped
+    chat = Chats.update_message_by_id_and_message_id(
+        "chat-1", "message-2", {}, [{"description": "lost"}]
+    )
+    assert "message-2" not in chat.chat["history"]["messages"]
+    assert Chats.update_message_by_id_and_message_id("missing", "m", {"a": 1}) is None
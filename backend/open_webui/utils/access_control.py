@@ -1,9 +1,14 @@
+import copy
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Optional, Union, List, Dict, Any
 from open_webui.models.users import Users, UserModel
-from open_webui.models.groups import Groups
+from open_webui.models.groups import Groups, GroupModel
 
 
 from open_webui.config import DEFAULT_USER_PERMISSIONS
+from open_webui.env import ACCESS_CONTROL_CACHE_TTL
 import json
 
 
@@ -25,48 +30,122 @@ def fill_missing_permissions(
     return permissions
 
 
-def get_permissions(
-    user_id: str,
-    default_permissions: Dict[str, Any],
+def combine_permissions(
+    permissions: Dict[str, Any], group_permissions: Dict[str, Any]
 ) -> Dict[str, Any]:
+    """Combine permissions from multiple groups by taking the most permissive value."""
+    for key, value in group_permissions.items():
+        if isinstance(value, dict):
+            if key not in permissions:
+                permissions[key] = {}
+            permissions[key] = combine_permissions(permissions[key], value)
+        else:
+            if key not in permissions:
+                permissions[key] = value
+            else:
+                permissions[key] = (
+                    permissions[key] or value
+                )  # Use the most permissive value (True > False)
+    return permissions
+
+
+class UserAccess:
     """
-    Get all permissions for a user by combining the permissions of all groups the user is a member of.
-    If a permission is defined in multiple groups, the most permissive value is used (True > False).
-    Permissions are nested in a dict with the permission key as the key and a boolean as the value.
+    The groups of a user, loaded once and shared by the access checks of a
+    request, with their ids and the merged permissions precomputed.
     """
 
-    def combine_permissions(
-        permissions: Dict[str, Any], group_permissions: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """Combine permissions from multiple groups by taking the most permissive value."""
-        for key, value in group_permissions.items():
-            if isinstance(value, dict):
-                if key not in permissions:
-                    permissions[key] = {}
-                permissions[key] = combine_permissions(permissions[key], value)
-            else:
-                if key not in permissions:
-                    permissions[key] = value
-                else:
-                    permissions[key] = (
-                        permissions[key] or value
-                    )  # Use the most permissive value (True > False)
+    def __init__(self, user_id: str, groups: list[GroupModel], writes: int):
+        self.user_id = user_id
+        self.groups = groups
+        self.group_ids = frozenset(group.id for group in groups)
+        # Groups.writes when the groups were loaded
+        self.writes = writes
+        self._permissions: dict[str, Dict[str, Any]] = {}
+
+    def get_permissions(self, default_permissions: Dict[str, Any]) -> Dict[str, Any]:
+        key = json.dumps(default_permissions, sort_keys=True)
+        permissions = self._permissions.get(key)
+        if permissions is None:
+            # Deep copy default permissions to avoid modifying the original dict
+            permissions = copy.deepcopy(default_permissions)
+
+            # Combine permissions from all user groups
+            for group in self.groups:
+                permissions = combine_permissions(permissions, group.permissions)
+
+            # Ensure all fields from default_permissions are present and filled in
+            permissions = fill_missing_permissions(permissions, default_permissions)
+            self._permissions[key] = permissions
         return permissions
 
-    user_groups = Groups.get_groups_by_member_id(user_id)
 
-    # Deep copy default permissions to avoid modifying the original dict
-    permissions = json.loads(json.dumps(default_permissions))
+# user id -> UserAccess for the current request, see access_control_scope
+_request_access: ContextVar[Optional[dict[str, UserAccess]]] = ContextVar(
+    "request_access", default=None
+)
 
-    # Combine permissions from all user groups
-    for group in user_groups:
-        group_permissions = group.permissions
-        permissions = combine_permissions(permissions, group_permissions)
+# user id -> (expires at, UserAccess) shared by all requests
+_user_access_cache: dict[str, tuple[float, UserAccess]] = {}
+USER_ACCESS_CACHE_MAX_SIZE = 4096
 
-    # Ensure all fields from default_permissions are present and filled in
-    permissions = fill_missing_permissions(permissions, default_permissions)
 
-    return permissions
+@contextmanager
+def access_control_scope():
+    """
+    Share group lookups between the access checks made until the scope exits.
+    """
+    token = _request_access.set({})
+    try:
+        yield
+    finally:
+        _request_access.reset(token)
+
+
+def get_user_access(user_id: str) -> UserAccess:
+    """
+    Return the groups of a user, from the current request, the process-wide
+    cache for up to ACCESS_CONTROL_CACHE_TTL seconds, or the database. Entries
+    are discarded as soon as this process changes any group.
+    """
+    writes = Groups.writes
+    scope = _request_access.get()
+
+    access = scope.get(user_id) if scope is not None else None
+    if access is None or access.writes != writes:
+        now = time.monotonic()
+        cached = _user_access_cache.get(user_id)
+        if cached is not None and cached[0] > now and cached[1].writes == writes:
+            access = cached[1]
+        else:
+            access = UserAccess(
+                user_id, Groups.get_groups_by_member_id(user_id), writes
+            )
+            if ACCESS_CONTROL_CACHE_TTL > 0:
+                if len(_user_access_cache) >= USER_ACCESS_CACHE_MAX_SIZE:
+                    for key, (expires_at, _) in list(_user_access_cache.items()):
+                        if expires_at <= now:
+                            _user_access_cache.pop(key, None)
+                    if len(_user_access_cache) >= USER_ACCESS_CACHE_MAX_SIZE:
+                        _user_access_cache.clear()
+                _user_access_cache[user_id] = (now + ACCESS_CONTROL_CACHE_TTL, access)
+
+        if scope is not None:
+            scope[user_id] = access
+    return access
+
+
+def get_permissions(
+    user_id: str,
+    default_permissions: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Get all permissions for a user by combining the permissions of all groups the user is a member of.
+    If a permission is defined in multiple groups, the most permissive value is used (True > False).
+    Permissions are nested in a dict with the permission key as the key and a boolean as the value.
+    The result is cached and shared, it must not be modified.
+    """
+    return get_user_access(user_id).get_permissions(default_permissions)
 
 
 def has_permission(
@@ -93,7 +172,7 @@ def has_permission(
     permission_hierarchy = permission_key.split(".")
 
     # Retrieve user group permissions
-    user_groups = Groups.get_groups_by_member_id(user_id)
+    user_groups = get_user_access(user_id).groups
 
     for group in user_groups:
         group_permissions = group.permissions
@@ -115,15 +194,15 @@ def has_access(
     if access_control is None:
         return type == "read"
 
-    user_groups = Groups.get_groups_by_member_id(user_id)
-    user_group_ids = [group.id for group in user_groups]
     permission_access = access_control.get(type, {})
     permitted_group_ids = permission_access.get("group_ids", [])
     permitted_user_ids = permission_access.get("user_ids", [])
 
-    return user_id in permitted_user_ids or any(
-        group_id in permitted_group_ids for group_id in user_group_ids
-    )
+    if user_id in permitted_user_ids:
+        return True
+    if not permitted_group_ids:
+        return False
+    return not get_user_access(user_id).group_ids.isdisjoint(permitted_group_ids)
 
 
 # Get all users with access to a resource
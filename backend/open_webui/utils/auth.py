@@ -6,12 +6,14 @@ import hmac
 import hashlib
 import requests
 import os
+import threading
+import time
 
 
 from datetime import UTC, datetime, timedelta
-from typing import Optional, Union, List, Dict
+from typing import Callable, Optional, Union, List, Dict
 
-from open_webui.models.users import Users
+from open_webui.models.users import Users, UserModel
 
 from open_webui.constants import ERROR_MESSAGES
 from open_webui.env import (
@@ -19,6 +21,8 @@ from open_webui.env import (
     TRUSTED_SIGNATURE_KEY,
     STATIC_DIR,
     SRC_LOG_LEVELS,
+    AUTH_USER_CACHE_TTL,
+    USER_LAST_ACTIVE_INTERVAL,
 )
 
 from fastapi import BackgroundTasks, Depends, HTTPException, Request, Response, status
@@ -149,6 +153,82 @@ def get_http_authorization_cred(auth_header: str):
         raise ValueError(ERROR_MESSAGES.INVALID_TOKEN)
 
 
+# "id:{user id}" or "key:{API key hash}" -> (expires at, Users.writes, user)
+_user_cache: dict[str, tuple[float, int, UserModel]] = {}
+USER_CACHE_MAX_SIZE = 4096
+
+
+def get_cached_user(
+    key: str, load: Callable[[], Optional[UserModel]]
+) -> Optional[UserModel]:
+    """
+    Return the user cached under key for up to AUTH_USER_CACHE_TTL seconds, or
+    load() it. Entries are discarded as soon as this process changes any user.
+    """
+    writes = Users.writes
+    now = time.monotonic()
+    cached = _user_cache.get(key)
+    if cached is not None and cached[0] > now and cached[1] == writes:
+        return cached[2].model_copy()
+
+    user = load()
+    if user is not None and AUTH_USER_CACHE_TTL > 0:
+        if len(_user_cache) >= USER_CACHE_MAX_SIZE:
+            for k, (expires_at, _, _) in list(_user_cache.items()):
+                if expires_at <= now:
+                    _user_cache.pop(k, None)
+            if len(_user_cache) >= USER_CACHE_MAX_SIZE:
+                _user_cache.clear()
+        _user_cache[key] = (now + AUTH_USER_CACHE_TTL, writes, user.model_copy())
+    return user
+
+
+class LastActiveUpdates:
+    """
+    Records when users were last active at most once per `interval` seconds
+    each, and writes the recorded times in a single statement, at most once
+    per `interval` seconds as well.
+    """
+
+    def __init__(self, interval: int = USER_LAST_ACTIVE_INTERVAL):
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        # user id -> when last recorded, and user id -> last_active_at to write
+        self._recorded: dict[str, float] = {}
+        self._pending: dict[str, int] = {}
+        self._flushed_at = float("-inf")
+
+    def touch(self, user_id: str) -> bool:
+        """
+        Record that the user is active, returns whether a flush is due.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._recorded.get(user_id, float("-inf")) >= self.interval:
+                self._recorded[user_id] = now
+                self._pending[user_id] = int(time.time())
+            return bool(self._pending) and now - self._flushed_at >= self.interval
+
+    def flush(self):
+        now = time.monotonic()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = now
+            # Users not seen for an interval would be recorded again anyway
+            self._recorded = {
+                user_id: recorded_at
+                for user_id, recorded_at in self._recorded.items()
+                if now - recorded_at < self.interval
+            }
+
+        if pending and not Users.update_users_last_active_by_ids(pending):
+            log.warning(f"Failed to update last_active_at of {len(pending)} users")
+
+
+LAST_ACTIVE = LastActiveUpdates()
+
+
 def get_current_user(
     request: Request,
     background_tasks: BackgroundTasks,
@@ -185,7 +265,7 @@ def get_current_user(
                     status.HTTP_403_FORBIDDEN, detail=ERROR_MESSAGES.API_KEY_NOT_ALLOWED
                 )
 
-        return get_current_user_by_api_key(token)
+        return get_current_user_by_api_key(token, background_tasks)
 
     # auth by jwt token
     try:
@@ -197,7 +277,9 @@ def get_current_user(
         )
 
     if data is not None and "id" in data:
-        user = Users.get_user_by_id(data["id"])
+        user = get_cached_user(
+            f"id:{data['id']}", lambda: Users.get_user_by_id(data["id"])
+        )
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -206,8 +288,7 @@ def get_current_user(
         else:
             # Refresh the user's last active timestamp asynchronously
             # to prevent blocking the request
-            if background_tasks:
-                background_tasks.add_task(Users.update_user_last_active_by_id, user.id)
+            update_last_active(user.id, background_tasks)
         return user
     else:
         raise HTTPException(
@@ -216,8 +297,21 @@ def get_current_user(
         )
 
 
-def get_current_user_by_api_key(api_key: str):
-    user = Users.get_user_by_api_key(api_key)
+def update_last_active(user_id: str, background_tasks: Optional[BackgroundTasks]):
+    if LAST_ACTIVE.touch(user_id):
+        if background_tasks:
+            background_tasks.add_task(LAST_ACTIVE.flush)
+        else:
+            LAST_ACTIVE.flush()
+
+
+def get_current_user_by_api_key(
+    api_key: str, background_tasks: Optional[BackgroundTasks] = None
+):
+    user = get_cached_user(
+        f"key:{hashlib.sha256(api_key.encode()).hexdigest()}",
+        lambda: Users.get_user_by_api_key(api_key),
+    )
 
     if user is None:
         raise HTTPException(
@@ -225,7 +319,7 @@ def get_current_user_by_api_key(api_key: str):
             detail=ERROR_MESSAGES.INVALID_TOKEN,
         )
     else:
-        Users.update_user_last_active_by_id(user.id)
+        update_last_active(user.id, background_tasks)
 
     return user
 
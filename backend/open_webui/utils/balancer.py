@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import aiohttp
+
+from open_webui.config import (
+    OLLAMA_CIRCUIT_BREAKER_COOLDOWN,
+    OLLAMA_CIRCUIT_BREAKER_THRESHOLD,
+    OLLAMA_LOADED_MODELS_TTL,
+)
+from open_webui.env import AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST, SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
+
+# Weight of the newest sample in the latency moving average
+LATENCY_DECAY = 0.3
+
+
+def is_backend_failure(e: Exception) -> bool:
+    # Connection errors, timeouts and 5xx responses count against the backend,
+    # 4xx responses are the request's fault
+    status = getattr(e, "status", None) or getattr(
+        getattr(e, "response", None), "status_code", None
+    )
+    return status is None or status >= 500
+
+
+class BackendState:
+    def __init__(self):
+        self.in_flight = 0
+        self.latency: Optional[float] = None  # seconds to the response headers
+        self.failures = 0
+        self.ejected_until = 0.0
+        # A probe that never reports, e.g. a request that fails before it is sent,
+        # stops blocking the backend after a cooldown
+        self.probing_until = 0.0
+        self.loaded_models: set[str] = set()
+        self.loaded_models_at = 0.0
+        self.refreshing = False
+
+    def to_dict(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "latency": self.latency,
+            "failures": self.failures,
+            "ejected": self.ejected_until > time.monotonic(),
+            "loaded_models": sorted(self.loaded_models),
+        }
+
+
+class BackendBalancer:
+    """
+    Picks the backend for a request among those serving the model.
+
+    Backends that already have the model loaded are preferred, then the ones
+    with the fewest requests in flight from this process, then the fastest to
+    respond recently. A backend that fails several times in a row is ejected for
+    a cooldown, after which a single request probes it before it is trusted again.
+    The loaded models are refreshed from /api/ps in the background.
+    """
+
+    def __init__(
+        self,
+        threshold: int = OLLAMA_CIRCUIT_BREAKER_THRESHOLD,
+        cooldown: int = OLLAMA_CIRCUIT_BREAKER_COOLDOWN,
+        loaded_models_ttl: int = OLLAMA_LOADED_MODELS_TTL,
+    ):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.loaded_models_ttl = loaded_models_ttl
+
+        self._lock = threading.Lock()
+        self._states: dict[str, BackendState] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def _state(self, url: str) -> BackendState:
+        state = self._states.get(url)
+        if state is None:
+            state = self._states[url] = BackendState()
+        return state
+
+    def select(self, backends: list[dict]) -> int:
+        """
+        Pick one of the backends, given as {"idx", "url", "key", "model"} where
+        model is the name the backend knows the model by. Returns its idx.
+        """
+        self._refresh_loaded_models(backends)
+
+        now = time.monotonic()
+        with self._lock:
+            available = [
+                backend
+                for backend in backends
+                if self._state(backend["url"]).ejected_until <= now
+                and self._state(backend["url"]).probing_until <= now
+            ]
+            if not available:
+                # Every backend is ejected, try the one that comes back first
+                return min(backends, key=lambda b: self._state(b["url"]).ejected_until)[
+                    "idx"
+                ]
+
+            def score(backend: dict):
+                state = self._state(backend["url"])
+                return (
+                    backend["model"] not in state.loaded_models,
+                    state.in_flight,
+                    state.latency or 0.0,
+                    random.random(),
+                )
+
+            backend = min(available, key=score)
+            state = self._state(backend["url"])
+            if state.failures >= self.threshold:
+                # Cooldown is over, let this request probe the backend
+                state.probing_until = now + self.cooldown
+            return backend["idx"]
+
+    def begin(self, url: str) -> float:
+        with self._lock:
+            self._state(url).in_flight += 1
+        return time.monotonic()
+
+    def end(self, url: str):
+        with self._lock:
+            state = self._state(url)
+            state.in_flight = max(0, state.in_flight - 1)
+            # A probe cancelled before it reported leaves the backend to the next request
+            state.probing_until = 0.0
+
+    def report(
+        self,
+        url: str,
+        started: Optional[float] = None,
+        failed: bool = False,
+        model: Optional[str] = None,
+    ):
+        with self._lock:
+            state = self._state(url)
+            state.probing_until = 0.0
+            if failed:
+                state.failures += 1
+                if state.failures >= self.threshold:
+                    if state.ejected_until <= time.monotonic():
+                        log.warning(
+                            f"Ejecting Ollama backend {url} for {self.cooldown}s"
+                        )
+                    state.ejected_until = time.monotonic() + self.cooldown
+                return
+
+            state.failures = 0
+            state.ejected_until = 0.0
+            if started is not None:
+                latency = time.monotonic() - started
+                state.latency = (
+                    latency
+                    if state.latency is None
+                    else LATENCY_DECAY * latency + (1 - LATENCY_DECAY) * state.latency
+                )
+            if model:
+                # The backend loads the model to serve the request
+                state.loaded_models.add(model)
+
+    @contextmanager
+    def track(self, url: str, model: Optional[str] = None):
+        started = self.begin(url)
+        try:
+            yield
+        except Exception as e:
+            self.report(url, failed=is_backend_failure(e))
+            raise
+        else:
+            self.report(url, started, model=model)
+        finally:
+            self.end(url)
+
+    def _refresh_loaded_models(self, backends: list[dict]):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            for backend in backends:
+                state = self._state(backend["url"])
+                if (
+                    state.refreshing
+                    or now - state.loaded_models_at < self.loaded_models_ttl
+                ):
+                    continue
+                state.refreshing = True
+                task = loop.create_task(
+                    self._fetch_loaded_models(backend["url"], backend.get("key"))
+                )
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _fetch_loaded_models(self, url: str, key: Optional[str] = None):
+        try:
+            timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_MODEL_LIST)
+            async with aiohttp.ClientSession(
+                timeout=timeout, trust_env=True
+            ) as session:
+                async with session.get(
+                    f"{url}/api/ps",
+                    headers={**({"Authorization": f"Bearer {key}"} if key else {})},
+                ) as r:
+                    r.raise_for_status()
+                    data = await r.json()
+
+            with self._lock:
+                self._state(url).loaded_models = {
+                    model.get("model", model.get("name"))
+                    for model in data.get("models", [])
+                }
+            # Doubles as a health check for ejected backends
+            self.report(url)
+        except Exception as e:
+            log.debug(f"Failed to fetch loaded models from {url}: {e}")
+            if is_backend_failure(e):
+                self.report(url, failed=True)
+        finally:
+            with self._lock:
+                state = self._state(url)
+                state.refreshing = False
+                state.loaded_models_at = time.monotonic()
+
+    def info(self) -> dict:
+        with self._lock:
+            return {url: state.to_dict() for url, state in self._states.items()}
+
+
+OLLAMA_BALANCER = BackendBalancer()
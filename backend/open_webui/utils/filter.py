@@ -1,3 +1,4 @@
+import asyncio
 import inspect
 import logging
 
@@ -32,16 +33,70 @@ def get_sorted_filter_ids(model: dict):
     return filter_ids
 
 
-async def process_filter_functions(
-    request, filter_functions, filter_type, form_data, extra_params
-):
-    skip_files = None
+# Valves by filter id, with the version of the function they were read from
+valves_cache: dict[str, tuple] = {}
+
+
+def get_function_valves(function_module, function):
+    version = (function.updated_at, Functions.writes)
+    cached = valves_cache.get(function.id)
+    if cached is None or cached[0] != version:
+        valves = Functions.get_function_valves_by_id(function.id)
+        cached = valves_cache[function.id] = (
+            version,
+            function_module.Valves(**(valves if valves else {})),
+        )
+    return cached[1]
+
+
+class FilterChain:
+    """
+    The handlers of one filter type, with their modules, valves, user valves and
+    parameters resolved once so the chain can run on every chunk of a stream.
+    An empty chain is falsy.
+    """
+
+    def __init__(self, filter_type: str):
+        self.filter_type = filter_type
+        self.handlers = []  # (filter_id, handler, is_coroutine, params)
+        self.skip_files = None
+
+    def __bool__(self):
+        return len(self.handlers) > 0
+
+    async def __call__(self, form_data):
+        for filter_id, handler, is_coroutine, params in self.handlers:
+            try:
+                params = {
+                    ("event" if self.filter_type == "stream" else "body"): form_data,
+                    **params,
+                }
+
+                # Execute handler, sync handlers must not block the event loop
+                if is_coroutine:
+                    form_data = await handler(**params)
+                else:
+                    form_data = await asyncio.to_thread(handler, **params)
+
+            except Exception as e:
+                log.exception(f"Error in {self.filter_type} handler {filter_id}: {e}")
+                raise e
+
+        # Handle file cleanup for inlet
+        if self.skip_files and "files" in form_data.get("metadata", {}):
+            del form_data["metadata"]["files"]
+
+        return form_data
+
+
+def get_filter_chain(request, filter_functions, filter_type, extra_params):
+    chain = FilterChain(filter_type)
 
     for function in filter_functions:
         filter = function
-        filter_id = function.id
         if not filter:
             continue
+        filter_id = function.id
 
         if filter_id in request.app.state.FUNCTIONS:
             function_module = request.app.state.FUNCTIONS[filter_id]
@@ -56,56 +111,48 @@ async def process_filter_functions(
 
         # Check if the function has a file_handler variable
         if filter_type == "inlet" and hasattr(function_module, "file_handler"):
-            skip_files = function_module.file_handler
+            chain.skip_files = function_module.file_handler
 
         # Apply valves to the function
         if hasattr(function_module, "valves") and hasattr(function_module, "Valves"):
-            valves = Functions.get_function_valves_by_id(filter_id)
-            function_module.valves = function_module.Valves(
-                **(valves if valves else {})
-            )
-
-        try:
-            # Prepare parameters
-            sig = inspect.signature(handler)
-
-            params = {"body": form_data}
-            if filter_type == "stream":
-                params = {"event": form_data}
-
-            params = params | {
-                k: v
-                for k, v in {
-                    **extra_params,
-                    "__id__": filter_id,
-                }.items()
-                if k in sig.parameters
-            }
-
-            # Handle user parameters
-            if "__user__" in sig.parameters:
-                if hasattr(function_module, "UserValves"):
-                    try:
-                        params["__user__"]["valves"] = function_module.UserValves(
+            function_module.valves = get_function_valves(function_module, function)
+
+        # Prepare parameters
+        sig = inspect.signature(handler)
+
+        params = {
+            k: v
+            for k, v in {
+                **extra_params,
+                "__id__": filter_id,
+            }.items()
+            if k in sig.parameters
+        }
+
+        # Handle user parameters
+        if "__user__" in sig.parameters:
+            if hasattr(function_module, "UserValves"):
+                try:
+                    params["__user__"] = {
+                        **params["__user__"],
+                        "valves": function_module.UserValves(
                             **Functions.get_user_valves_by_id_and_user_id(
                                 filter_id, params["__user__"]["id"]
                             )
-                        )
-                    except Exception as e:
-                        log.exception(f"Failed to get user values: {e}")
+                        ),
+                    }
+                except Exception as e:
+                    log.exception(f"Failed to get user values: {e}")
 
-            # Execute handler
-            if inspect.iscoroutinefunction(handler):
-                form_data = await handler(**params)
-            else:
-                form_data = handler(**params)
+        chain.handlers.append(
+            (filter_id, handler, inspect.iscoroutinefunction(handler), params)
+        )
 
-        except Exception as e:
-            log.exception(f"Error in {filter_type} handler {filter_id}: {e}")
-            raise e
+    return chain
 
-    # Handle file cleanup for inlet
-    if skip_files and "files" in form_data.get("metadata", {}):
-        del form_data["metadata"]["files"]
 
-    return form_data, {}
+async def process_filter_functions(
+    request, filter_functions, filter_type, form_data, extra_params
+):
+    chain = get_filter_chain(request, filter_functions, filter_type, extra_params)
+    return await chain(form_data), {}
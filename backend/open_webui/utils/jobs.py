@@ -0,0 +1,451 @@
+import asyncio
+import contextvars
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+from fastapi import FastAPI, Request
+from pydantic import BaseModel
+
+from open_webui.config import (
+    JOB_QUEUE_DB_PATH,
+    JOB_QUEUE_CONCURRENCY,
+    JOB_QUEUE_LEASE_TIMEOUT,
+    JOB_QUEUE_MAX_ATTEMPTS,
+    JOB_QUEUE_RETENTION,
+)
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.models.users import Users
+from open_webui.socket.main import sio, get_user_room
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+# Seconds between checks for jobs enqueued by other worker processes
+POLL_INTERVAL = 1.0
+
+# Job being run by the current handler thread, for progress reports
+current_job: contextvars.ContextVar[Optional["JobModel"]] = contextvars.ContextVar(
+    "current_job", default=None
+)
+
+
+class JobModel(BaseModel):
+    id: str
+    type: str
+    user_id: str
+    status: str  # pending, running, completed, failed
+    payload: dict
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    progress: Optional[dict] = None
+    depends_on: Optional[str] = None
+    attempts: int = 0
+
+    created_at: int  # timestamp in epoch
+    updated_at: int  # timestamp in epoch
+
+
+class JobQueue:
+    """
+    Durable queue for long-running work (file extraction, embedding) that should
+    not hold an HTTP request open.
+
+    Jobs are rows in a local SQLite database, so they survive restarts and are
+    shared between the worker processes of a node. Each process runs a bounded
+    number of jobs at once; a running job holds a lease that a dedicated thread
+    renews while it runs, so that a busy event loop does not let it expire, and
+    jobs whose lease expires (the process died) are picked up again.
+    A job may depend on another one, it only starts once that job has finished.
+    Status changes are pushed to the job's user over socket.io as "job-events".
+    """
+
+    def __init__(
+        self,
+        path: str = JOB_QUEUE_DB_PATH,
+        concurrency: int = JOB_QUEUE_CONCURRENCY,
+        lease_timeout: int = JOB_QUEUE_LEASE_TIMEOUT,
+        max_attempts: int = JOB_QUEUE_MAX_ATTEMPTS,
+    ):
+        self.path = path
+        self.concurrency = max(1, concurrency)
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+
+        self.handlers: dict[str, Callable] = {}
+        self._lock = threading.RLock()
+        self._db = None
+        self._app = None
+        self._loop = None
+        self._wakeup = None
+        self._workers: list[asyncio.Task] = []
+        # Ids of the jobs run by this process, their leases are renewed by _renewer
+        self._running: set[str] = set()
+        self._renewer: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._waiters: dict[str, list[asyncio.Future]] = {}
+        self._last_cleanup = 0
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    db = sqlite3.connect(
+                        self.path, check_same_thread=False, isolation_level=None
+                    )
+                    db.row_factory = sqlite3.Row
+                    db.execute("PRAGMA journal_mode=WAL")
+                    db.execute("PRAGMA busy_timeout=5000")
+                    db.executescript(
+                        """
+                        CREATE TABLE IF NOT EXISTS job (
+                            id TEXT PRIMARY KEY,
+                            type TEXT NOT NULL,
+                            user_id TEXT NOT NULL,
+                            status TEXT NOT NULL,
+                            payload TEXT NOT NULL,
+                            result TEXT,
+                            error TEXT,
+                            progress TEXT,
+                            depends_on TEXT,
+                            attempts INTEGER NOT NULL DEFAULT 0,
+                            lease_expires_at REAL,
+                            created_at INTEGER NOT NULL,
+                            updated_at INTEGER NOT NULL
+                        );
+                        CREATE INDEX IF NOT EXISTS idx_job_status ON job (status, created_at);
+                        """
+                    )
+                    columns = [
+                        row["name"] for row in db.execute("PRAGMA table_info(job)")
+                    ]
+                    if "progress" not in columns:
+                        db.execute("ALTER TABLE job ADD COLUMN progress TEXT")
+                    self._db = db
+        return self._db
+
+    def register(self, job_type: str):
+        """
+        Register the handler for a job type. Handlers are regular (blocking)
+        functions called as handler(request, user, payload) in a worker thread;
+        their return value is stored as the job result.
+        """
+
+        def decorator(handler: Callable) -> Callable:
+            self.handlers[job_type] = handler
+            return handler
+
+        return decorator
+
+    def _to_model(self, row: sqlite3.Row) -> JobModel:
+        return JobModel(
+            **{
+                **{key: row[key] for key in row.keys() if key != "lease_expires_at"},
+                "payload": json.loads(row["payload"]),
+                "result": json.loads(row["result"]) if row["result"] else None,
+                "progress": json.loads(row["progress"]) if row["progress"] else None,
+            }
+        )
+
+    def enqueue(
+        self,
+        job_type: str,
+        user_id: str,
+        payload: dict,
+        depends_on: Optional[str] = None,
+    ) -> JobModel:
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        now = int(time.time())
+        id = str(uuid.uuid4())
+        with self._lock:
+            self.db.execute(
+                "INSERT INTO job (id, type, user_id, status, payload, depends_on, "
+                "created_at, updated_at) VALUES (?, ?, ?, 'pending', ?, ?, ?, ?)",
+                (id, job_type, user_id, json.dumps(payload), depends_on, now, now),
+            )
+        job = self.get_job_by_id(id)
+
+        self._notify(job)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job
+
+    def get_job_by_id(self, id: str) -> Optional[JobModel]:
+        with self._lock:
+            row = self.db.execute("SELECT * FROM job WHERE id = ?", (id,)).fetchone()
+        return self._to_model(row) if row else None
+
+    def _claim(self) -> Optional[JobModel]:
+        # Atomically take the oldest runnable job, including ones abandoned by a
+        # worker that stopped renewing its lease.
+        now = time.time()
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.db.execute(
+                    """
+                    SELECT * FROM job
+                    WHERE (status = 'pending' OR (status = 'running' AND lease_expires_at < ?))
+                    AND (
+                        depends_on IS NULL
+                        OR NOT EXISTS (
+                            SELECT 1 FROM job AS parent
+                            WHERE parent.id = job.depends_on
+                            AND parent.status IN ('pending', 'running')
+                        )
+                    )
+                    ORDER BY created_at LIMIT 1
+                    """,
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    self.db.execute("COMMIT")
+                    return None
+
+                abandoned = row["attempts"] >= self.max_attempts
+                if abandoned:
+                    self.db.execute(
+                        "UPDATE job SET status = 'failed', error = ?, updated_at = ? "
+                        "WHERE id = ?",
+                        ("Job was abandoned too many times", int(now), row["id"]),
+                    )
+                else:
+                    self.db.execute(
+                        "UPDATE job SET status = 'running', attempts = attempts + 1, "
+                        "lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                        (now + self.lease_timeout, int(now), row["id"]),
+                    )
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+        job = self.get_job_by_id(row["id"])
+        if abandoned:
+            self._notify(job)
+            self._resolve(job)
+            return self._claim()
+        return job
+
+    def _renew(self):
+        while not self._stopped.wait(self.lease_timeout / 3):
+            ids = list(self._running)
+            if not ids:
+                continue
+            try:
+                with self._lock:
+                    self.db.execute(
+                        "UPDATE job SET lease_expires_at = ? "
+                        f"WHERE id IN ({','.join('?' * len(ids))}) AND status = 'running'",
+                        (time.time() + self.lease_timeout, *ids),
+                    )
+            except Exception as e:
+                log.warning(f"Failed to renew job leases: {e}")
+
+    def report_progress(self, progress: dict):
+        """
+        Record and push the progress of the job running in the calling thread.
+        Does nothing outside of a job handler, e.g. for synchronous requests.
+        """
+        job = current_job.get()
+        if job is None:
+            return
+
+        with self._lock:
+            self.db.execute(
+                "UPDATE job SET progress = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(progress), int(time.time()), job.id),
+            )
+        self._notify(job.model_copy(update={"progress": progress}))
+
+    def _finish(
+        self, id: str, status: str, result: Any = None, error: Optional[str] = None
+    ) -> JobModel:
+        with self._lock:
+            self.db.execute(
+                "UPDATE job SET status = ?, result = ?, error = ?, "
+                "lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    int(time.time()),
+                    id,
+                ),
+            )
+        return self.get_job_by_id(id)
+
+    def _cleanup(self):
+        now = time.time()
+        if now - self._last_cleanup < 3600:
+            return
+        self._last_cleanup = now
+        with self._lock:
+            self.db.execute(
+                "DELETE FROM job WHERE status IN ('completed', 'failed') "
+                "AND updated_at < ?",
+                (int(now - JOB_QUEUE_RETENTION),),
+            )
+
+    def _notify(self, job: JobModel):
+        # Push the job status to every socket.io session of its user
+        if self._loop is None:
+            return
+
+        async def emit():
+            await sio.emit(
+                "job-events",
+                job.model_dump(exclude={"payload"}) | {"data": job.payload},
+                to=get_user_room(job.user_id),
+            )
+
+        def done(task: asyncio.Task):
+            if not task.cancelled() and task.exception():
+                log.warning(f"Failed to send job event: {task.exception()}")
+
+        self._loop.call_soon_threadsafe(
+            lambda: self._loop.create_task(emit()).add_done_callback(done)
+        )
+
+    def _resolve(self, job: JobModel):
+        # Wake up local waiters, may be called from worker threads
+        def resolve():
+            for future in self._waiters.pop(job.id, []):
+                if not future.done():
+                    future.set_result(job)
+
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(resolve)
+
+    async def wait(self, id: str, timeout: Optional[float] = None) -> JobModel:
+        """
+        Wait for a job to finish and return it. Jobs finished by another worker
+        process are noticed by polling.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(id, []).append(future)
+        try:
+            while True:
+                job = await asyncio.to_thread(self.get_job_by_id, id)
+                if job is None:
+                    raise ValueError(f"Job with ID {id} not found.")
+                if job.status in ("completed", "failed"):
+                    return job
+
+                wait_for = POLL_INTERVAL
+                if deadline is not None:
+                    wait_for = min(wait_for, deadline - time.monotonic())
+                    if wait_for <= 0:
+                        raise asyncio.TimeoutError()
+                try:
+                    return await asyncio.wait_for(asyncio.shield(future), wait_for)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Nothing resolves the future of a job finished by another process
+            waiters = self._waiters.get(id, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(id, None)
+
+    async def _run(self, job: JobModel):
+        handler = self.handlers.get(job.type)
+        if handler is None:
+            job = self._finish(job.id, "failed", error=f"Unknown job type: {job.type}")
+            self._notify(job)
+            self._resolve(job)
+            return
+
+        self._notify(job)
+        try:
+            user = await asyncio.to_thread(Users.get_user_by_id, job.user_id)
+            if user is None:
+                raise ValueError("User not found")
+
+            request = Request(
+                {
+                    "type": "http",
+                    "app": self._app,
+                    "method": "POST",
+                    "path": f"/jobs/{job.id}",
+                    "headers": [],
+                    "query_string": b"",
+                }
+            )
+            # to_thread copies the context, so the handler can report progress
+            token = current_job.set(job)
+            future = asyncio.ensure_future(
+                asyncio.to_thread(handler, request, user, job.payload)
+            )
+            current_job.reset(token)
+            self._running.add(job.id)
+            try:
+                result = await future
+            finally:
+                self._running.discard(job.id)
+
+            job = self._finish(job.id, "completed", result=result)
+        except Exception as e:
+            log.exception(f"Job {job.id} ({job.type}) failed: {e}")
+            job = self._finish(
+                job.id,
+                "failed",
+                error=str(e.detail) if hasattr(e, "detail") else str(e),
+            )
+
+        self._notify(job)
+        self._resolve(job)
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self._claim)
+                if job is None:
+                    await asyncio.to_thread(self._cleanup)
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.exception(f"Job worker error: {e}")
+                await asyncio.sleep(POLL_INTERVAL)
+
+    async def start(self, app: FastAPI):
+        self._app = app
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+        ]
+        self._stopped.clear()
+        self._renewer = threading.Thread(target=self._renew, daemon=True)
+        self._renewer.start()
+        log.info(f"Started {self.concurrency} job workers")
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._stopped.set()
+        if self._renewer is not None:
+            await asyncio.to_thread(self._renewer.join)
+            self._renewer = None
+        self._loop = None
+
+
+JOBS = JobQueue()
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from typing import Optional
+
+from open_webui.env import (
+    CHAT_SAVE_INTERVAL,
+    CHAT_SAVE_MAX_PENDING,
+    SRC_LOG_LEVELS,
+)
+from open_webui.models.chats import Chats
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+class MessageUpdates:
+    def __init__(self, timer: Optional[asyncio.TimerHandle] = None):
+        self.message: dict = {}
+        self.status_history: list[dict] = []
+        self.count = 0
+        self.timer = timer
+
+
+class MessageWriteBuffer:
+    """
+    Write-behind buffer for the chat messages being streamed.
+
+    Every emitted event used to rewrite the whole chat. Updates to a message are
+    now merged in memory, in order, and written in one go once `interval`
+    seconds have passed since the first of them or `max_pending` of them have
+    accumulated. The response handler flushes the message when it completes or
+    is cancelled and the app flushes everything on shutdown, so the final state
+    is always written.
+    """
+
+    def __init__(
+        self,
+        interval: float = CHAT_SAVE_INTERVAL,
+        max_pending: int = CHAT_SAVE_MAX_PENDING,
+    ):
+        self.interval = interval
+        self.max_pending = max(1, max_pending)
+
+        self._pending: dict[tuple[str, str], MessageUpdates] = {}
+
+        # Updates received and writes made, the difference is the writes saved
+        self.updates = 0
+        self.writes = 0
+
+    def _get_updates(self, chat_id: str, message_id: str) -> MessageUpdates:
+        key = (chat_id, message_id)
+        updates = self._pending.get(key)
+        if updates is None:
+            timer = None
+            try:
+                timer = asyncio.get_running_loop().call_later(
+                    self.interval, self.flush, chat_id, message_id
+                )
+            except RuntimeError:
+                pass
+            updates = self._pending[key] = MessageUpdates(timer)
+        return updates
+
+    def _updated(self, chat_id: str, message_id: str, updates: MessageUpdates):
+        updates.count += 1
+        self.updates += 1
+        if updates.count >= self.max_pending or updates.timer is None:
+            self.flush(chat_id, message_id)
+
+    def upsert_message(self, chat_id: str, message_id: str, message: dict):
+        updates = self._get_updates(chat_id, message_id)
+        updates.message.update(message)
+        self._updated(chat_id, message_id, updates)
+
+    def append_content(self, chat_id: str, message_id: str, content: str):
+        updates = self._get_updates(chat_id, message_id)
+        if "content" not in updates.message:
+            message = Chats.get_message_by_id_and_message_id(chat_id, message_id)
+            updates.message["content"] = (message or {}).get("content", "")
+        updates.message["content"] += content
+        self._updated(chat_id, message_id, updates)
+
+    def add_status(self, chat_id: str, message_id: str, status: dict):
+        updates = self._get_updates(chat_id, message_id)
+        updates.status_history.append(status)
+        self._updated(chat_id, message_id, updates)
+
+    def flush(self, chat_id: str, message_id: str):
+        updates = self._pending.pop((chat_id, message_id), None)
+        if updates is None:
+            return
+
+        if updates.timer is not None:
+            updates.timer.cancel()
+
+        try:
+            Chats.update_message_by_id_and_message_id(
+                chat_id,
+                message_id,
+                updates.message,
+                updates.status_history,
+            )
+            self.writes += 1
+            log.debug(
+                f"Saved {updates.count} updates of message {message_id} in chat {chat_id} in one write"
+            )
+        except Exception as e:
+            log.exception(f"Error saving message {message_id} in chat {chat_id}: {e}")
+
+    def flush_all(self):
+        for chat_id, message_id in list(self._pending.keys()):
+            self.flush(chat_id, message_id)
+
+    def info(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "updates": self.updates,
+            "writes": self.writes,
+            "writes_saved": self.updates - self.writes,
+        }
+
+
+MESSAGE_BUFFER = MessageWriteBuffer()
@@ -73,12 +73,14 @@ from open_webui.utils.misc import (
 from open_webui.utils.tools import get_tools
 from open_webui.utils.plugin import load_function_module_by_id
 from open_webui.utils.filter import (
+    get_filter_chain,
     get_sorted_filter_ids,
     process_filter_functions,
 )
 from open_webui.utils.code_interpreter import execute_code_jupyter
 
 from open_webui.tasks import create_task
+from open_webui.utils.message_buffer import MESSAGE_BUFFER
 
 from open_webui.config import (
     CACHE_DIR,
@@ -1035,7 +1037,7 @@ async def process_chat_response(
                     )
 
                     # Send a webhook notification if the user is not active
-                    if get_active_status_by_user_id(user.id) is None:
+                    if await get_active_status_by_user_id(user.id) is None:
                         webhook_url = Users.get_user_webhook_url_by_id(user.id)
                         if webhook_url:
                             post_webhook(
@@ -1076,12 +1078,14 @@ async def process_chat_response(
         "__request__": request,
         "__model__": model,
     }
-    filter_functions = [
-        Functions.get_function_by_id(filter_id)
-        for filter_id in get_sorted_filter_ids(model)
-    ]
 
-    print(f"{filter_functions=}")
+    def get_stream_filter_chain():
+        # Stream filters run on every chunk, resolve them once when streaming starts
+        filter_functions = [
+            Functions.get_function_by_id(filter_id)
+            for filter_id in get_sorted_filter_ids(model)
+        ]
+        return get_filter_chain(request, filter_functions, "stream", extra_params)
 
     # Streaming response
     if event_emitter and event_caller:
@@ -1395,6 +1399,10 @@ async def process_chat_response(
 
                 return content, content_blocks, end_flag
 
+            stream_filter_chain = get_stream_filter_chain()
+
+            # Read back what the events emitted so far have buffered
+            MESSAGE_BUFFER.flush(metadata["chat_id"], metadata["message_id"])
             message = Chats.get_message_by_id_and_message_id(
                 metadata["chat_id"], metadata["message_id"]
             )
@@ -1454,7 +1462,7 @@ async def process_chat_response(
                     )
 
                     # Save message in the database
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    MESSAGE_BUFFER.upsert_message(
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
@@ -1486,18 +1494,13 @@ async def process_chat_response(
                         try:
                             data = json.loads(data)
 
-                            data, _ = await process_filter_functions(
-                                request=request,
-                                filter_functions=filter_functions,
-                                filter_type="stream",
-                                form_data=data,
-                                extra_params=extra_params,
-                            )
+                            if stream_filter_chain:
+                                data = await stream_filter_chain(data)
 
                             if data:
                                 if "selected_model_id" in data:
                                     model_id = data["selected_model_id"]
-                                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                                    MESSAGE_BUFFER.upsert_message(
                                         metadata["chat_id"],
                                         metadata["message_id"],
                                         {
@@ -1662,7 +1665,7 @@ async def process_chat_response(
 
                                         if ENABLE_REALTIME_CHAT_SAVE:
                                             # Save message in the database
-                                            Chats.upsert_message_to_chat_by_id_and_message_id(
+                                            MESSAGE_BUFFER.upsert_message(
                                                 metadata["chat_id"],
                                                 metadata["message_id"],
                                                 {
@@ -2023,16 +2026,18 @@ async def process_chat_response(
 
                 if not ENABLE_REALTIME_CHAT_SAVE:
                     # Save message in the database
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    MESSAGE_BUFFER.upsert_message(
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
                             "content": serialize_content_blocks(content_blocks),
                         },
                     )
+                # Title and tags generation read the saved messages
+                MESSAGE_BUFFER.flush(metadata["chat_id"], metadata["message_id"])
 
                 # Send a webhook notification if the user is not active
-                if get_active_status_by_user_id(user.id) is None:
+                if await get_active_status_by_user_id(user.id) is None:
                     webhook_url = Users.get_user_webhook_url_by_id(user.id)
                     if webhook_url:
                         post_webhook(
@@ -2061,19 +2066,31 @@ async def process_chat_response(
 
                 if not ENABLE_REALTIME_CHAT_SAVE:
                     # Save message in the database
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                    MESSAGE_BUFFER.upsert_message(
                         metadata["chat_id"],
                         metadata["message_id"],
                         {
                             "content": serialize_content_blocks(content_blocks),
                         },
                     )
+            finally:
+                # The final state of the message must be durable
+                MESSAGE_BUFFER.flush(metadata["chat_id"], metadata["message_id"])
 
             if response.background is not None:
                 await response.background()
 
         # background_tasks.add_task(post_response_handler, response, events)
-        task_id, _ = create_task(post_response_handler(response, events))
+        task_id, _ = create_task(
+            post_response_handler(response, events),
+            {
+                "user_id": metadata.get("user_id"),
+                "chat_id": metadata.get("chat_id"),
+                "message_id": metadata.get("message_id"),
+                "session_id": metadata.get("session_id"),
+                "model_id": model.get("id"),
+            },
+        )
         return {"status": True, "task_id": task_id}
 
     else:
@@ -2082,26 +2099,18 @@ async def process_chat_response(
             def wrap_item(item):
                 return f"data: {item}\n\n"
 
+            stream_filter_chain = get_stream_filter_chain()
+
             for event in events:
-                event, _ = await process_filter_functions(
-                    request=request,
-                    filter_functions=filter_functions,
-                    filter_type="stream",
-                    form_data=event,
-                    extra_params=extra_params,
-                )
+                if stream_filter_chain:
+                    event = await stream_filter_chain(event)
 
                 if event:
                     yield wrap_item(json.dumps(event))
 
             async for data in original_generator:
-                data, _ = await process_filter_functions(
-                    request=request,
-                    filter_functions=filter_functions,
-                    filter_type="stream",
-                    form_data=data,
-                    extra_params=extra_params,
-                )
+                if stream_filter_chain:
+                    data = await stream_filter_chain(data)
 
                 if data:
                     yield data
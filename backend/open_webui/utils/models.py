@@ -1,6 +1,9 @@
+import hashlib
+import json
 import time
 import logging
 import sys
+from typing import Optional
 
 from aiocache import cached
 from fastapi import Request
@@ -59,102 +62,137 @@ async def get_all_base_models(request: Request, user: UserModel = None):
     return models
 
 
-async def get_all_models(request, user: UserModel = None):
-    models = await get_all_base_models(request, user=user)
-
-    # If there are no models, return an empty list
-    if len(models) == 0:
-        return []
+def get_arena_models(request: Request) -> list[dict]:
+    if len(request.app.state.config.EVALUATION_ARENA_MODELS) > 0:
+        return [
+            {
+                "id": model["id"],
+                "name": model["name"],
+                "info": {
+                    "meta": model["meta"],
+                },
+                "object": "model",
+                "created": int(time.time()),
+                "owned_by": "arena",
+                "arena": True,
+            }
+            for model in request.app.state.config.EVALUATION_ARENA_MODELS
+        ]
+    else:
+        # Add default arena model
+        return [
+            {
+                "id": DEFAULT_ARENA_MODEL["id"],
+                "name": DEFAULT_ARENA_MODEL["name"],
+                "info": {
+                    "meta": DEFAULT_ARENA_MODEL["meta"],
+                },
+                "object": "model",
+                "created": int(time.time()),
+                "owned_by": "arena",
+                "arena": True,
+            }
+        ]
 
-    # Add arena models
-    if request.app.state.config.ENABLE_EVALUATION_ARENA_MODELS:
-        arena_models = []
-        if len(request.app.state.config.EVALUATION_ARENA_MODELS) > 0:
-            arena_models = [
-                {
-                    "id": model["id"],
-                    "name": model["name"],
-                    "info": {
-                        "meta": model["meta"],
-                    },
-                    "object": "model",
-                    "created": int(time.time()),
-                    "owned_by": "arena",
-                    "arena": True,
-                }
-                for model in request.app.state.config.EVALUATION_ARENA_MODELS
-            ]
-        else:
-            # Add default arena model
-            arena_models = [
-                {
-                    "id": DEFAULT_ARENA_MODEL["id"],
-                    "name": DEFAULT_ARENA_MODEL["name"],
-                    "info": {
-                        "meta": DEFAULT_ARENA_MODEL["meta"],
-                    },
-                    "object": "model",
-                    "created": int(time.time()),
-                    "owned_by": "arena",
-                    "arena": True,
-                }
-            ]
-        models = models + arena_models
 
-    global_action_ids = [
-        function.id for function in Functions.get_global_action_functions()
-    ]
-    enabled_action_ids = [
-        function.id
-        for function in Functions.get_functions_by_type("action", active_only=True)
+def get_catalog_version(models: list[dict]) -> str:
+    # Upstream catalogs are refetched on every call, their timestamps change each time
+    catalog = [
+        {key: value for key, value in model.items() if key != "created"}
+        for model in models
     ]
+    return hashlib.sha256(
+        json.dumps(catalog, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
 
-    custom_models = Models.get_all_models()
-    for custom_model in custom_models:
-        if custom_model.base_model_id is None:
-            for model in models:
-                if (
-                    custom_model.id == model["id"]
-                    or custom_model.id == model["id"].split(":")[0]
-                ):
+def get_action_items_from_module(function, module) -> list[dict]:
+    if hasattr(module, "actions"):
+        return [
+            {
+                "id": f"{function.id}.{action['id']}",
+                "name": action.get("name", f"{function.name} ({action['id']})"),
+                "description": function.meta.description,
+                "icon_url": action.get(
+                    "icon_url", function.meta.manifest.get("icon_url", None)
+                ),
+            }
+            for action in module.actions
+        ]
+    else:
+        return [
+            {
+                "id": function.id,
+                "name": function.name,
+                "description": function.meta.description,
+                "icon_url": function.meta.manifest.get("icon_url", None),
+            }
+        ]
+
+
+class ModelRegistry:
+    """
+    The models served by get_all_models, indexed by id.
+
+    The base models are merged with the custom models and their actions are
+    resolved only when the upstream catalogs, the custom models or the
+    functions change, otherwise the last build is served from memory.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.models: list[dict] = []
+        self.models_by_id: dict[str, dict] = {}
+
+    def get(self, id: str) -> Optional[dict]:
+        return self.models_by_id.get(id)
+
+    def build(self, request: Request, base_models: list[dict], version):
+        # Copies, the upstream catalogs are cached and must not be modified
+        models = {}
+        models_by_name = {}  # "llama3" also matches "llama3:latest"
+        for model in base_models:
+            model = {**model}
+            models[model["id"]] = model
+            models_by_name.setdefault(model["id"].split(":")[0], []).append(model)
+
+        def get_matching_models(id: str) -> list[dict]:
+            matches = {id: models[id]} if id in models else {}
+            for model in models_by_name.get(id, []):
+                if models.get(model["id"]) is model:
+                    matches.setdefault(model["id"], model)
+            return list(matches.values())
+
+        for custom_model in Models.get_all_models():
+            if custom_model.base_model_id is None:
+                for model in get_matching_models(custom_model.id):
                     if custom_model.is_active:
                         model["name"] = custom_model.name
                         model["info"] = custom_model.model_dump()
-
-                        action_ids = []
-                        if "info" in model and "meta" in model["info"]:
-                            action_ids.extend(
-                                model["info"]["meta"].get("actionIds", [])
-                            )
-
-                        model["action_ids"] = action_ids
+                        model["action_ids"] = (model["info"].get("meta") or {}).get(
+                            "actionIds", []
+                        )
                     else:
-                        models.remove(model)
-
-        elif custom_model.is_active and (
-            custom_model.id not in [model["id"] for model in models]
-        ):
-            owned_by = "openai"
-            pipe = None
-            action_ids = []
-
-            for model in models:
-                if (
-                    custom_model.base_model_id == model["id"]
-                    or custom_model.base_model_id == model["id"].split(":")[0]
-                ):
-                    owned_by = model.get("owned_by", "unknown owner")
-                    if "pipe" in model:
-                        pipe = model["pipe"]
-                    break
-
-            if custom_model.meta:
-                meta = custom_model.meta.model_dump()
-                if "actionIds" in meta:
-                    action_ids.extend(meta["actionIds"])
-
-            models.append(
-                {
+                        del models[model["id"]]
+
+            elif custom_model.is_active and custom_model.id not in models:
+                owned_by = "openai"
+                pipe = None
+                action_ids = []
+
+                base_model = next(
+                    iter(get_matching_models(custom_model.base_model_id)), None
+                )
+                if base_model is not None:
+                    owned_by = base_model.get("owned_by", "unknown owner")
+                    pipe = base_model.get("pipe")
+
+                if custom_model.meta:
+                    meta = custom_model.meta.model_dump()
+                    if "actionIds" in meta:
+                        action_ids.extend(meta["actionIds"])
+
+                model = {
                     "id": f"{custom_model.id}",
                     "name": custom_model.name,
                     "object": "model",
@@ -165,62 +203,75 @@ async def get_all_models(request, user: UserModel = None):
                     **({"pipe": pipe} if pipe is not None else {}),
                     "action_ids": action_ids,
                 }
-            )
-
-    # Process action_ids to get the actions
-    def get_action_items_from_module(function, module):
-        actions = []
-        if hasattr(module, "actions"):
-            actions = module.actions
-            return [
-                {
-                    "id": f"{function.id}.{action['id']}",
-                    "name": action.get("name", f"{function.name} ({action['id']})"),
-                    "description": function.meta.description,
-                    "icon_url": action.get(
-                        "icon_url", function.meta.manifest.get("icon_url", None)
-                    ),
-                }
-                for action in actions
-            ]
-        else:
-            return [
-                {
-                    "id": function.id,
-                    "name": function.name,
-                    "description": function.meta.description,
-                    "icon_url": function.meta.manifest.get("icon_url", None),
-                }
+                models[model["id"]] = model
+                models_by_name.setdefault(model["id"].split(":")[0], []).append(model)
+
+        # Resolve the actions once per function rather than once per model
+        action_functions = {
+            function.id: function
+            for function in Functions.get_functions_by_type("action", active_only=True)
+        }
+        global_action_ids = [
+            function.id for function in action_functions.values() if function.is_global
+        ]
+        action_items = {}
+
+        def get_action_items(action_id: str) -> list[dict]:
+            if action_id not in action_items:
+                if action_id in request.app.state.FUNCTIONS:
+                    function_module = request.app.state.FUNCTIONS[action_id]
+                else:
+                    function_module, _, _ = load_function_module_by_id(action_id)
+                    request.app.state.FUNCTIONS[action_id] = function_module
+
+                action_items[action_id] = get_action_items_from_module(
+                    action_functions[action_id], function_module
+                )
+            return action_items[action_id]
+
+        for model in models.values():
+            action_ids = [
+                action_id
+                for action_id in dict.fromkeys(
+                    model.pop("action_ids", []) + global_action_ids
+                )
+                if action_id in action_functions
             ]
 
-    def get_function_module_by_id(function_id):
-        if function_id in request.app.state.FUNCTIONS:
-            function_module = request.app.state.FUNCTIONS[function_id]
-        else:
-            function_module, _, _ = load_function_module_by_id(function_id)
-            request.app.state.FUNCTIONS[function_id] = function_module
-
-    for model in models:
-        action_ids = [
-            action_id
-            for action_id in list(set(model.pop("action_ids", []) + global_action_ids))
-            if action_id in enabled_action_ids
-        ]
+            model["actions"] = []
+            for action_id in action_ids:
+                model["actions"].extend(get_action_items(action_id))
 
-        model["actions"] = []
-        for action_id in action_ids:
-            action_function = Functions.get_function_by_id(action_id)
-            if action_function is None:
-                raise Exception(f"Action not found: {action_id}")
+        self.models = list(models.values())
+        self.models_by_id = models
+        self.version = version
 
-            function_module = get_function_module_by_id(action_id)
-            model["actions"].extend(
-                get_action_items_from_module(action_function, function_module)
-            )
-    log.debug(f"get_all_models() returned {len(models)} models")
 
-    request.app.state.MODELS = {model["id"]: model for model in models}
-    return models
+MODEL_REGISTRY = ModelRegistry()
+
+
+async def get_all_models(request, user: UserModel = None):
+    models = await get_all_base_models(request, user=user)
+
+    # If there are no models, return an empty list
+    if len(models) == 0:
+        return []
+
+    # Add arena models
+    if request.app.state.config.ENABLE_EVALUATION_ARENA_MODELS:
+        models = models + get_arena_models(request)
+
+    version = (
+        get_catalog_version(models),
+        Models.get_version(),
+        Functions.get_version(),
+    )
+    if MODEL_REGISTRY.version != version:
+        MODEL_REGISTRY.build(request, models, version)
+        log.debug(f"get_all_models() rebuilt {len(MODEL_REGISTRY.models)} models")
+
+    request.app.state.MODELS = MODEL_REGISTRY.models_by_id
+    return list(MODEL_REGISTRY.models)
 
 
 def check_model_access(user, model):
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Callable, Optional
+
+import aiofiles
+
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["AUDIO"])
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+async def iter_file(file: BinaryIO) -> AsyncIterator[bytes]:
+    """
+    Read an audio file returned by SpeechCache.get() off the event loop, closing it once read.
+    """
+    try:
+        while chunk := await asyncio.to_thread(file.read, READ_CHUNK_SIZE):
+            yield chunk
+    finally:
+        file.close()
+
+
+class SpeechFlight:
+    """
+    Audio of a synthesis in progress, read by every request waiting for it.
+    """
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def add(self, chunk: bytes):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def started(self):
+        # Wait for the first chunk, so a failed synthesis can still return an error
+        while not self.chunks and not self.done:
+            await self._changed.wait()
+        if self.error is not None and not self.chunks:
+            raise self.error
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        sent = 0
+        while True:
+            while sent < len(self.chunks):
+                yield self.chunks[sent]
+                sent += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class SpeechCache:
+    """
+    Size- and age-bounded on-disk LRU cache of synthesized speech.
+
+    Entries are "{name}.mp3" files with the request body in a "{name}.json"
+    sidecar, the index is rebuilt from the files' access times on startup.
+    Entries are dropped, least recently used first, once the cache exceeds
+    `max_size` bytes or when they have not been used for `max_age` seconds.
+    Concurrent requests for audio that is not cached share a single synthesis
+    and receive its audio as it is produced.
+    """
+
+    def __init__(self, path: Path, max_size: int, max_age: int):
+        self.path = path
+        self.max_size = max_size
+        self.max_age = max_age
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        # name -> {"size", "used_at"}, least recently used first
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._flights: dict[str, SpeechFlight] = {}
+        self._size = 0
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+        self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _file(self, name: str) -> Path:
+        return self.path / f"{name}.mp3"
+
+    def _body_file(self, name: str) -> Path:
+        return self.path / f"{name}.json"
+
+    def _load(self):
+        for tmp_path in self.path.glob("*.tmp"):
+            tmp_path.unlink(missing_ok=True)
+
+        entries = []
+        for file_path in self.path.glob("*.mp3"):
+            stat = file_path.stat()
+            entries.append((stat.st_atime, file_path.stem, stat.st_size))
+
+        for used_at, name, size in sorted(entries):
+            self._entries[name] = {"size": size, "used_at": used_at}
+            self._size += size
+        self._evict()
+
+    def _remove(self, name: str):
+        entry = self._entries.pop(name, None)
+        if entry:
+            self._size -= entry["size"]
+        self._file(name).unlink(missing_ok=True)
+        self._body_file(name).unlink(missing_ok=True)
+
+    def _evict(self):
+        # The least recently used entry is also the oldest, so only evicted entries are visited
+        expired_before = time.time() - self.max_age
+        while self._entries:
+            name, entry = next(iter(self._entries.items()))
+            if self._size <= self.max_size and (
+                self.max_age <= 0 or entry["used_at"] > expired_before
+            ):
+                break
+            self._remove(name)
+            self._stats["evictions"] += 1
+
+    def get(self, name: str) -> Optional[BinaryIO]:
+        """
+        Return the cached audio for name, if any, as a file opened for reading.
+
+        The file is opened before it is returned, so an eviction while the audio
+        is being sent does not remove it from under the response.
+        """
+        if not self.enabled:
+            return None
+
+        self._evict()
+        entry = self._entries.get(name)
+        file_path = self._file(name)
+        try:
+            file = open(file_path, "rb") if entry is not None else None
+        except FileNotFoundError:
+            file = None
+        if file is None:
+            self._stats["misses"] += 1
+            return None
+
+        entry["used_at"] = time.time()
+        self._entries.move_to_end(name)
+        self._stats["hits"] += 1
+        # Recency survives restarts through the access time
+        os.utime(file_path, (entry["used_at"], os.fstat(file.fileno()).st_mtime))
+        return file
+
+    def synthesize(
+        self,
+        name: str,
+        payload: dict,
+        generate: Callable[[], AsyncIterator[bytes]],
+    ) -> SpeechFlight:
+        """
+        Return the synthesis of name, starting generate() unless one is already
+        running. The audio is cached once it is complete.
+        """
+        flight = self._flights.get(name)
+        if flight is not None:
+            self._stats["coalesced"] += 1
+            return flight
+
+        flight = self._flights[name] = SpeechFlight()
+        # Runs on its own, so the audio is cached even if the requests go away
+        flight.task = asyncio.create_task(self._run(name, payload, generate(), flight))
+        return flight
+
+    async def _run(
+        self,
+        name: str,
+        payload: dict,
+        chunks: AsyncIterator[bytes],
+        flight: SpeechFlight,
+    ):
+        try:
+            async for chunk in chunks:
+                if chunk:
+                    flight.add(chunk)
+            if self.enabled and flight.chunks:
+                await self._store(name, payload, b"".join(flight.chunks))
+            flight.finish()
+        except BaseException as e:
+            flight.finish(e)
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            self._flights.pop(name, None)
+
+    async def _store(self, name: str, payload: dict, audio: bytes):
+        # Written to a temporary file and moved into place, readers never see partial files
+        tmp_path = self.path / f"{name}.{uuid.uuid4().hex}.tmp"
+        try:
+            async with aiofiles.open(tmp_path, "wb") as f:
+                await f.write(audio)
+            async with aiofiles.open(self._body_file(name), "w") as f:
+                await f.write(json.dumps(payload))
+            os.replace(tmp_path, self._file(name))
+
+            old = self._entries.pop(name, None)
+            if old:
+                self._size -= old["size"]
+            self._entries[name] = {"size": len(audio), "used_at": time.time()}
+            self._size += len(audio)
+            self._evict()
+        except Exception as e:
+            log.warning(f"Failed to cache speech {name}: {e}")
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def cache_info(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_ratio": self._stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "size": self._size,
+            "max_size": self.max_size,
+            "max_age": self.max_age,
+            "in_flight": len(self._flights),
+        }